@@ -29,6 +29,9 @@ from PySide6.QtWidgets import (
 from core.settings_manager import SettingsManager
 from core.translator import TranslationManager
 from core.permissions import is_admin as _is_admin, has_perm as _has_perm, has_any_perm
+from core.table_model import RowTableView
+from core.table_delegates import ActionButtonsDelegate
+from core.query_worker import QueryRunner
 
 logger = logging.getLogger(__name__)
 
@@ -292,6 +295,18 @@ class BaseTab(QWidget):
       - طباعة (print) — غير مستخدمة في أي تاب حالياً
       - استيراد Excel (import) — غير مُكتمل ولا يُسجّل في DB
       - filter_box (ترتيب) — تابات مثل transactions تُخفيه وتستخدم combo خاص بها
+
+    محرّك الجدول:
+      - use_model_view = False (افتراضي) → QTableWidget + QTableWidgetItem لكل خلية
+      - use_model_view = True  → RowTableView + RowTableModel (انظر core/table_model.py)
+        بلا أي كائن لكل خلية — مناسب للتابات التي تكتفي بـ display_data /
+        _display_with_actions ولا تستدعي self.table.item()/setItem() مباشرة.
+
+    التحميل في الخلفية:
+      - async_reload = True → run_async / fetch_page_async تنفّذ الاستعلامات
+        وبناء الصفوف في QThreadPool (انظر core/query_worker.py)، والنتيجة
+        تُطبَّق على الجدول في thread الواجهة. النتائج القديمة تُهمَل.
+      - reload_data_sync() للمسارات التي تقرأ self.data مباشرة بعد التحميل.
     """
 
     row_double_clicked = Signal(int)
@@ -308,6 +323,9 @@ class BaseTab(QWidget):
         "view":    None,
     }
 
+    use_model_view: bool = False
+    async_reload:   bool = False
+
     def __init__(self, title=None, parent=None, user=None):
         super().__init__(parent)
         self.title        = title
@@ -338,6 +356,20 @@ class BaseTab(QWidget):
         self._sort_col: int  = -1       # العمود المرتَّب حالياً (-1 = لا يوجد)
         self._sort_asc: bool = True     # اتجاه الترتيب
 
+        # ── server-side paging (fetch_page) ──────────────────────────────
+        # True بعد fetch_page: self.data = صفوف الصفحة الحالية فقط
+        # و total_rows يأتي من الـ DB — العرض لا يبحث/يرتّب/يقطّع محلياً
+        self._server_paged: bool = False
+
+        # ── keyset paging (crud.supports_keyset — انظر keyset_page) ──────
+        # مفتاحا أول/آخر صف في الصفحة المعروضة + مؤشر next/prev المعلَّق
+        self._page_keys: tuple = (None, None)
+        self._keyset_nav = None     # (target_page, "after"|"before", key)
+
+        # ── background loading (run_async) ───────────────────────────────
+        self._query_runner: QueryRunner | None = None
+        self._force_sync: bool = False
+
         # ── column visibility & width memory ─────────────────────────────
         self._col_visibility: dict = {}   # {col_index: bool}
         self._col_widths_key: str  = ""   # مفتاح الحفظ في SettingsManager
@@ -481,7 +513,12 @@ class BaseTab(QWidget):
         self._layout.addWidget(self._sel_bar)
 
         # ── الجدول ────────────────────────────────────────────────────
-        self.table = QTableWidget(0, 0, self)
+        if self.use_model_view:
+            self.table = RowTableView(self)
+            self.table_model = self.table.row_model()
+        else:
+            self.table = QTableWidget(0, 0, self)
+            self.table_model = None
         self.table.setObjectName("data-table")
         self._layout.addWidget(self.table)
 
@@ -494,7 +531,12 @@ class BaseTab(QWidget):
         self._lbl_sort  = QLabel()
         self._lbl_sort.setObjectName("status-sort-lbl")
 
+        self._lbl_loading = QLabel(self._("loading"))
+        self._lbl_loading.setObjectName("status-loading-lbl")
+        self._lbl_loading.hide()
+
         status_bar.addWidget(self._lbl_count)
+        status_bar.addWidget(self._lbl_loading)
         status_bar.addStretch(1)
         status_bar.addWidget(self._lbl_sort)
         self._layout.addLayout(status_bar)
@@ -572,7 +614,20 @@ class BaseTab(QWidget):
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.table.setSortingEnabled(True)
+        if self.table_model is not None:
+            # الترتيب يتم في _apply_base_sort / server-side — الـ model لا يرتّب نفسه
+            self.table.setSortingEnabled(False)
+            self.table.horizontalHeader().setSectionsClickable(True)
+            self.table_model.check_toggled.connect(
+                lambda r, checked: self._on_row_checkbox_changed(r, 2 if checked else 0)
+            )
+            # أزرار Edit/Delete مرسومة — بلا widgets لكل صف
+            self._actions_delegate = ActionButtonsDelegate(self.table, self)
+            self._actions_delegate.edit_requested.connect(lambda o: self._open_edit_dialog(o))
+            self._actions_delegate.delete_requested.connect(lambda o: self._delete_single(o))
+            self._actions_delegate_col = -1
+        else:
+            self.table.setSortingEnabled(True)
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.horizontalHeader().setSectionsMovable(False)
         self.table.horizontalHeader().setStretchLastSection(False)
@@ -627,6 +682,8 @@ class BaseTab(QWidget):
 
         hdr_font = _make_table_item_font(bold=True)
         self.table.horizontalHeader().setFont(hdr_font)
+        if self.table_model is not None:
+            self.table_model.set_font(_BOLD_ITEM_FONT)
 
     def _on_theme_changed(self, *_):
         """عند تغيير الثيم: يعيد بناء الفونت ويعيد تطبيق الأحجام."""
@@ -635,6 +692,9 @@ class BaseTab(QWidget):
         # إعادة تطبيق الفونت على الصفوف الموجودة
         global _BOLD_ITEM_FONT
         _BOLD_ITEM_FONT = _make_table_item_font()
+        if self.table_model is not None:
+            self.table_model.set_font(_BOLD_ITEM_FONT)
+            return
         for row in range(self.table.rowCount()):
             for col in range(self.table.columnCount()):
                 item = self.table.item(row, col)
@@ -702,13 +762,16 @@ class BaseTab(QWidget):
     def set_columns(self, columns: list):
         """تعيين الأعمدة مباشرة."""
         self.columns = columns or []
-        # عمود الـ checkbox (col 0) + بقية الأعمدة
-        self.table.setColumnCount(len(self.columns) + 1)
-        # header col 0: checkbox لـ select-all
-        self._setup_checkbox_header()
-        self.table.setHorizontalHeaderLabels(
-            [""] + [self._(c.get("label", "")) if c.get("label") else "" for c in self.columns]
-        )
+        labels = [self._(c.get("label", "")) if c.get("label") else "" for c in self.columns]
+        if self.table_model is not None:
+            self.table_model.set_columns(self.columns, labels)
+            self._setup_checkbox_header()
+        else:
+            # عمود الـ checkbox (col 0) + بقية الأعمدة
+            self.table.setColumnCount(len(self.columns) + 1)
+            # header col 0: checkbox لـ select-all
+            self._setup_checkbox_header()
+            self.table.setHorizontalHeaderLabels([""] + labels)
         self.table.setColumnWidth(0, 42)
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Fixed)
         # استعادة العروض والإخفاء المحفوظة
@@ -813,29 +876,51 @@ class BaseTab(QWidget):
         """يُعاد تعريفه في التابات الفرعية لجلب البيانات وتحديث self.data."""
         self.display_data()
 
-    def display_data(self):
-        """عرض self.data في الجدول مع بحث + ترتيب + pagination."""
+    def _paginate_for_display(self) -> list:
+        """
+        يُرجع صفوف الصفحة الحالية من self.data ويحدّث pagination/status/empty.
+        client-side: بحث + ترتيب + تقطيع محلي.
+        server-side (بعد fetch_page): self.data هي الصفحة نفسها.
+        """
         rows = list(self.data) if self.data else []
-        total_before = len(rows)
         searched = bool((self.search_bar.text() or "").strip())
 
-        if not getattr(self, "_skip_base_search", False):
-            rows = self._apply_base_search(rows)
-        if not getattr(self, "_skip_base_sort", False):
-            rows = self._apply_base_sort(rows)
-
-        self.total_rows  = len(rows)
-        self.total_pages = max(1, (self.total_rows + self.rows_per_page - 1) // self.rows_per_page)
-        self.current_page = max(1, min(self.current_page, self.total_pages))
-        start     = (self.current_page - 1) * self.rows_per_page
-        page_rows = rows[start: start + self.rows_per_page]
+        if self._server_paged:
+            page_rows = rows
+            matched = total_before = self.total_rows
+        else:
+            total_before = len(rows)
+            if not getattr(self, "_skip_base_search", False):
+                rows = self._apply_base_search(rows)
+            if not getattr(self, "_skip_base_sort", False):
+                rows = self._apply_base_sort(rows)
+
+            self.total_rows  = len(rows)
+            self.total_pages = max(1, (self.total_rows + self.rows_per_page - 1) // self.rows_per_page)
+            self.current_page = max(1, min(self.current_page, self.total_pages))
+            start     = (self.current_page - 1) * self.rows_per_page
+            page_rows = rows[start: start + self.rows_per_page]
+            matched   = len(rows)
 
         self._update_pagination_label()
-        self._update_status_bar(len(rows), total_before)
-        self._show_empty_state(len(rows) == 0, searched=searched)
+        self._update_status_bar(matched, total_before)
+        self._show_empty_state(matched == 0, searched=searched)
+        return page_rows
+
+    def display_data(self):
+        """عرض self.data في الجدول مع بحث + ترتيب + pagination."""
+        page_rows = self._paginate_for_display()
 
         if not self.columns:
-            self.table.setRowCount(0)
+            if self.table_model is not None:
+                self.table_model.clear()
+            else:
+                self.table.setRowCount(0)
+            return
+
+        if self.table_model is not None:
+            self.table_model.set_rows(page_rows)
+            self._stretch_columns()
             return
 
         self.table.setSortingEnabled(False)
@@ -872,25 +957,47 @@ class BaseTab(QWidget):
         can_delete   = _has_perm(self.current_user, delete_perm) if delete_perm else False
         show_actions = can_edit or can_delete
 
-        rows = list(self.data) if self.data else []
-        total_before = len(rows)
-        searched = bool((self.search_bar.text() or "").strip())
+        page_rows = self._paginate_for_display()
 
-        if not getattr(self, "_skip_base_search", False):
-            rows = self._apply_base_search(rows)
-        if not getattr(self, "_skip_base_sort", False):
-            rows = self._apply_base_sort(rows)
+        if self.table_model is not None:
+            self.table_model.set_rows(page_rows)
+            self._fill_action_cells(page_rows, show_actions, can_edit, can_delete)
+        else:
+            self._fill_table_items(page_rows, show_actions, can_edit, can_delete)
 
-        self.total_rows  = len(rows)
-        self.total_pages = max(1, (self.total_rows + self.rows_per_page - 1) // self.rows_per_page)
-        self.current_page = max(1, min(self.current_page, self.total_pages))
-        start     = (self.current_page - 1) * self.rows_per_page
-        page_rows = rows[start: start + self.rows_per_page]
+        # إخفاء عمود actions إذا لا صلاحية
+        try:
+            ai = next((i for i, c in enumerate(self.columns) if c.get("key") == "actions"), None)
+            if ai is not None:
+                self.table.setColumnHidden(ai, not show_actions)
+        except Exception:
+            pass
 
-        self._update_pagination_label()
-        self._update_status_bar(len(rows), total_before)
-        self._show_empty_state(len(rows) == 0, searched=searched)
+        self._apply_admin_columns()
+        self._stretch_columns()
 
+    def _fill_action_cells(self, page_rows, show_actions, can_edit, can_delete):
+        """
+        model mode: البيانات تأتي من RowTableModel — عمود actions يرسمه
+        ActionButtonsDelegate ويُصدر edit_requested / delete_requested
+        المربوطة بـ _open_edit_dialog / _delete_single.
+        """
+        ai = next((i for i, c in enumerate(self.columns) if c.get("key") == "actions"), None)
+        col = ai + 1 if ai is not None else -1
+        if col != self._actions_delegate_col:
+            if self._actions_delegate_col >= 0:
+                self.table.setItemDelegateForColumn(self._actions_delegate_col, None)
+            if col >= 0:
+                self.table.setItemDelegateForColumn(col, self._actions_delegate)
+            self._actions_delegate_col = col
+        self._actions_delegate.set_permissions(
+            show_actions and can_edit, show_actions and can_delete
+        )
+        if col >= 0:
+            self.table.viewport().update()
+
+    def _fill_table_items(self, page_rows, show_actions, can_edit, can_delete):
+        """widget mode: QTableWidgetItem لكل خلية."""
         self.table.setSortingEnabled(False)
         self.table.setUpdatesEnabled(False)
         try:
@@ -920,17 +1027,6 @@ class BaseTab(QWidget):
             self.table.setUpdatesEnabled(True)
             self.table.setSortingEnabled(True)
 
-        # إخفاء عمود actions إذا لا صلاحية
-        try:
-            ai = next((i for i, c in enumerate(self.columns) if c.get("key") == "actions"), None)
-            if ai is not None:
-                self.table.setColumnHidden(ai, not show_actions)
-        except Exception:
-            pass
-
-        self._apply_admin_columns()
-        self._stretch_columns()
-
     def _set_action_cell(self, row_idx, col_idx, obj, can_edit, can_delete):
         """يبني cell الأزرار لعمود actions."""
         if can_edit and can_delete:
@@ -946,17 +1042,62 @@ class BaseTab(QWidget):
             btn_d.clicked.connect(lambda _=False, o=obj: self._delete_single(o))
             lay.addWidget(btn_e)
             lay.addWidget(btn_d)
-            self.table.setCellWidget(row_idx, col_idx, w)
+            self._set_cell_widget(row_idx, col_idx, w)
         elif can_edit:
             btn = QPushButton(self._("edit"))
             btn.setObjectName("table-edit")
             btn.clicked.connect(lambda _=False, o=obj: self._open_edit_dialog(o))
-            self.table.setCellWidget(row_idx, col_idx, btn)
+            self._set_cell_widget(row_idx, col_idx, btn)
         elif can_delete:
             btn = QPushButton(self._("delete"))
             btn.setObjectName("table-delete")
             btn.clicked.connect(lambda _=False, o=obj: self._delete_single(o))
-            self.table.setCellWidget(row_idx, col_idx, btn)
+            self._set_cell_widget(row_idx, col_idx, btn)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # TABLE BACKEND HELPERS  (QTableWidget ↔ RowTableView)
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _set_cell_widget(self, row: int, col: int, widget: QWidget):
+        if self.table_model is not None:
+            self.table.setIndexWidget(self.table_model.index(row, col), widget)
+        else:
+            self.table.setCellWidget(row, col, widget)
+
+    def _row_data_at(self, visual_row: int):
+        """row dict المعروض في الصف المرئي visual_row (أو None)."""
+        if self.table_model is not None:
+            return self.table_model.row_at(visual_row)
+        item = self.table.item(visual_row, 1)
+        return item.data(Qt.UserRole) if item is not None else None
+
+    def _data_index_for_visual_row(self, visual_row: int) -> int:
+        """[SORT-FIX] يحوّل الصف المرئي إلى index داخل self.data."""
+        row_data = self._row_data_at(visual_row)
+        if row_data is not None and self.data:
+            try:
+                return self.data.index(row_data)
+            except ValueError:
+                pass
+        return visual_row
+
+    def _cell_text(self, row: int, col: int) -> str:
+        if self.table_model is not None:
+            return self.table_model.cell_text(row, col)
+        item = self.table.item(row, col)
+        return item.text() if item else ""
+
+    def _header_text(self, col: int) -> str:
+        if self.table_model is not None:
+            return self.table_model.headerData(col, Qt.Horizontal) or ""
+        h = self.table.horizontalHeaderItem(col)
+        return h.text() if h else ""
+
+    def _set_current_row(self, row: int):
+        if self.table_model is not None:
+            self.table.setCurrentIndex(self.table_model.index(row, 0))
+        else:
+            self.table.setCurrentCell(row, 0)
 
     def _stretch_columns(self):
         """يضبط عرض الأعمدة تلقائياً حسب المحتوى ثم يتيح للمستخدم التعديل."""
@@ -1018,6 +1159,183 @@ class BaseTab(QWidget):
         self.current_page = 1
         self.reload_data()
 
+    # ─────────────────────────────────────────────────────────────────────
+    # SERVER-SIDE QUERY  (BaseCRUD.query_page)
+    # ─────────────────────────────────────────────────────────────────────
+
+    def build_query_spec(self, **filters):
+        """يبني QuerySpec من نص البحث + عمود الترتيب + الصفحة الحالية."""
+        from database.crud.base_crud import QuerySpec
+        sort_key = None
+        if 0 <= self._sort_col < len(self.columns):
+            col = self.columns[self._sort_col]
+            if col.get("key") != "actions":
+                sort_key = col.get("sort_key") or col.get("key")
+        try:
+            lang = TranslationManager.get_instance().get_current_language()
+        except Exception:
+            lang = "ar"
+        return QuerySpec(
+            search    = (self.search_bar.text() or "").strip(),
+            sort_key  = sort_key,
+            sort_desc = not self._sort_asc,
+            page      = self.current_page,
+            per_page  = self.rows_per_page,
+            lang      = lang,
+            filters   = filters,
+        )
+
+    def fetch_page(self, crud, **filters) -> list:
+        """
+        يجلب الصفحة المرئية فقط من crud.query_page ويحدّث total_rows/total_pages.
+        يُستدعى من reload_data في التاب الفرعي بدل crud.get_all():
+            items = self.fetch_page(self.clients_crud)
+        ثم يبني self.data من items ويستدعي display_data كالمعتاد.
+        """
+        self._server_paged = True
+        try:
+            items, total = crud.query_page(self.build_query_spec(**filters))
+        except Exception as e:
+            logger.error(f"{type(self).__name__}.fetch_page failed: {e}")
+            items, total = [], 0
+        self.total_rows  = total
+        self.total_pages = max(1, (total + self.rows_per_page - 1) // self.rows_per_page)
+        if self.current_page > self.total_pages:
+            # الصفحة الحالية لم تعد موجودة (حذف/بحث) — اجلب آخر صفحة
+            self.current_page = self.total_pages
+            if total:
+                return self.fetch_page(crud, **filters)
+        return items
+
+    def keyset_page(self, crud, list_fn, **filters) -> list:
+        """
+        يجلب الصفحة الحالية عبر list_fn(limit=..., offset=|after=|before=, **filters).
+
+        إذا وصلنا لهذه الصفحة بـ go_to_next_page/go_to_prev_page وكان
+        crud.supports_keyset → after/before = مفتاح آخر/أول صف في الصفحة
+        السابقة (seek بدل OFFSET). غير ذلك (أول صفحة، بحث، فلتر، refresh)
+        → offset عادي. المؤشر يُستهلك مرة واحدة فقط.
+            items = self.keyset_page(self.trx_crud, self.trx_crud.list_transactions, **filters)
+        """
+        self._server_paged = True
+        cursor = self._take_keyset_cursor(crud)
+        items = self._keyset_fetch(list_fn, cursor, self.current_page, self.rows_per_page, **filters)
+        self._remember_page_keys(crud, items)
+        return items
+
+    def _take_keyset_cursor(self, crud) -> dict | None:
+        """يستهلك مؤشر next/prev المعلَّق: {"after"|"before": key} أو None."""
+        nav, self._keyset_nav = self._keyset_nav, None
+        if (nav and nav[0] == self.current_page and self.current_page > 1
+                and getattr(crud, "supports_keyset", False)):
+            return {nav[1]: nav[2]}
+        return None
+
+    @staticmethod
+    def _keyset_fetch(list_fn, cursor, page: int, per_page: int, **filters) -> list:
+        """لا يلمس self — آمن للاستدعاء من run_async."""
+        items = None
+        if cursor:
+            items = list_fn(limit=per_page, **cursor, **filters) or []
+        if not items:
+            # لا مؤشر، أو تغيّرت البيانات حول المؤشر (حذف) → offset
+            items = list_fn(limit=per_page, offset=(page - 1) * per_page, **filters) or []
+        return items
+
+    def _remember_page_keys(self, crud, items) -> None:
+        if items and getattr(crud, "supports_keyset", False):
+            self._page_keys = (crud.keyset_key(items[0]), crud.keyset_key(items[-1]))
+        else:
+            self._page_keys = (None, None)
+
+    def _arm_keyset(self, direction: str, target_page: int):
+        """يحفظ مؤشر الانتقال لـ target_page (يُستهلك في keyset_page)."""
+        key = self._page_keys[1] if direction == "after" else self._page_keys[0]
+        self._keyset_nav = (target_page, direction, key) if key is not None else None
+
+    # ─────────────────────────────────────────────────────────────────────
+    # BACKGROUND LOADING  (core/query_worker)
+    # ─────────────────────────────────────────────────────────────────────
+
+    def run_async(self, fn, on_done, on_error=None) -> None:
+        """
+        يشغّل fn(token) في الخلفية ثم on_done(result) في thread الواجهة.
+
+        fn لا تلمس أي widget — كل ما تحتاجه من الواجهة (نص البحث، الفلاتر،
+        الصفحة) يُقرأ قبل الاستدعاء ويُمرَّر عبر closure.
+        إذا async_reload = False أو داخل reload_data_sync() → تنفيذ مباشر.
+        """
+        if not self.async_reload or self._force_sync:
+            from core.query_worker import CancelToken
+            try:
+                result = fn(CancelToken())
+            except Exception as e:
+                logger.error(f"{type(self).__name__}: load failed: {e}", exc_info=True)
+                (on_error or self._on_async_error)(str(e))
+                return
+            on_done(result)
+            return
+        if self._query_runner is None:
+            self._query_runner = QueryRunner(self)
+            self._query_runner.loading_changed.connect(self._set_loading)
+        self._query_runner.submit(fn, on_done, on_error or self._on_async_error)
+
+    def fetch_page_async(self, crud, build_rows, display=None, **filters) -> None:
+        """
+        مثل fetch_page لكن في الخلفية:
+            self.fetch_page_async(self.countries_crud, self._build_rows)
+        build_rows(items) → list[dict] (نفس كود بناء الصفوف الحالي في التاب)،
+        display() يُستدعى بعد تعيين self.data (افتراضياً display_data).
+        """
+        spec = self.build_query_spec(**filters)
+        self._server_paged = True
+
+        def _job(token):
+            items, total = crud.query_page(spec)
+            token.check()
+            return build_rows(items), total
+
+        def _apply(result):
+            rows, total = result
+            self.total_rows  = total
+            self.total_pages = max(1, (total + self.rows_per_page - 1) // self.rows_per_page)
+            if self.current_page > self.total_pages and total:
+                # الصفحة الحالية لم تعد موجودة (حذف/بحث) — اجلب آخر صفحة
+                self.current_page = self.total_pages
+                self.fetch_page_async(crud, build_rows, display, **filters)
+                return
+            self.data = rows
+            (display or self.display_data)()
+
+        self.run_async(_job, _apply)
+
+    def reload_data_sync(self):
+        """reload_data بشكل متزامن — للكود الذي يقرأ self.data مباشرة بعده."""
+        if self._query_runner is not None:
+            self._query_runner.cancel()
+        self._force_sync = True
+        try:
+            self.reload_data()
+        finally:
+            self._force_sync = False
+
+    def cancel_loading(self):
+        if self._query_runner is not None:
+            self._query_runner.cancel()
+
+    def _set_loading(self, loading: bool):
+        """حالة التحميل: مؤشر في شريط الحالة + تعطيل التنقل بين الصفحات."""
+        self._lbl_loading.setVisible(loading)
+        self.btn_prev.setEnabled(not loading)
+        self.btn_next.setEnabled(not loading)
+        if loading:
+            self.table.viewport().setCursor(Qt.BusyCursor)
+        else:
+            self.table.viewport().unsetCursor()
+
+    def _on_async_error(self, message: str):
+        self._lbl_count.setText(f"⚠️ {message}")
+
     # ─────────────────────────────────────────────────────────────────────
     # PAGINATION
     # ─────────────────────────────────────────────────────────────────────
@@ -1043,11 +1361,13 @@ class BaseTab(QWidget):
 
     def go_to_prev_page(self):
         if self.current_page > 1:
+            self._arm_keyset("before", self.current_page - 1)
             self.current_page -= 1
             self.reload_data()
 
     def go_to_next_page(self):
         if self.current_page < self.total_pages:
+            self._arm_keyset("after", self.current_page + 1)
             self.current_page += 1
             self.reload_data()
 
@@ -1070,9 +1390,8 @@ class BaseTab(QWidget):
             real_col = col_idx + 1  # offset checkbox
             total_val = 0.0
             for row in range(self.table.rowCount()):
-                item = self.table.item(row, real_col)
-                if item:
-                    txt = item.text().replace(",", "").replace(" ", "").strip()
+                txt = self._cell_text(row, real_col).replace(",", "").replace(" ", "").strip()
+                if txt:
                     try:
                         total_val += float(txt)
                     except (ValueError, TypeError):
@@ -1124,19 +1443,19 @@ class BaseTab(QWidget):
     def select_record_by_id(self, record_id: int):
         """يبحث عن سجل بالـ ID ويحدده في الجدول."""
         if not self.data:
-            self.reload_data()
+            self.reload_data_sync()
         for row_idx, row in enumerate(self.data):
             if row.get("id") is not None and int(row["id"]) == int(record_id):
-                self.table.setCurrentCell(row_idx, 0)
+                self._set_current_row(row_idx)
                 self.table.scrollTo(self.table.model().index(row_idx, 0), self.table.PositionAtCenter)
                 self.table.selectRow(row_idx)
                 return
         try:
             self._reset_filters()
-            self.reload_data()
+            self.reload_data_sync()
             for row_idx, row in enumerate(self.data):
                 if row.get("id") is not None and int(row["id"]) == int(record_id):
-                    self.table.setCurrentCell(row_idx, 0)
+                    self._set_current_row(row_idx)
                     self.table.scrollTo(self.table.model().index(row_idx, 0), self.table.PositionAtCenter)
                     self.table.selectRow(row_idx)
                     return
@@ -1229,20 +1548,8 @@ class BaseTab(QWidget):
     def get_selected_rows(self) -> list:
         result = []
         for idx in self.table.selectionModel().selectedRows():
-            visual_row = idx.row()
             # [SORT-FIX] اقرأ الـ row dict من UserRole في col 1
-            item = self.table.item(visual_row, 1)
-            if item is not None:
-                row_data = item.data(Qt.UserRole)
-                if row_data is not None and self.data:
-                    try:
-                        data_idx = self.data.index(row_data)
-                        result.append(data_idx)
-                        continue
-                    except ValueError:
-                        pass
-            # fallback
-            result.append(visual_row)
+            result.append(self._data_index_for_visual_row(idx.row()))
         return result
 
     def _set_row_checkbox(self, row: int):
@@ -1281,6 +1588,9 @@ class BaseTab(QWidget):
     def _sync_row_checkboxes(self):
         """يُزامن checkboxes الصفوف مع الـ selection الحالي."""
         selected = {idx.row() for idx in self.table.selectionModel().selectedRows()}
+        if self.table_model is not None:
+            self.table_model.set_checked_rows(selected)
+            return
         for row in range(self.table.rowCount()):
             w = self.table.cellWidget(row, 0)
             if w:
@@ -1314,18 +1624,7 @@ class BaseTab(QWidget):
                 idx.row() for idx in self.table.selectionModel().selectedRows()
             }
             if not selected_visual_rows or clicked_visual_row not in selected_visual_rows:
-                item = self.table.item(clicked_visual_row, 1)
-                if item is not None:
-                    row_data = item.data(Qt.UserRole)
-                    if row_data is not None and self.data:
-                        try:
-                            rows = [self.data.index(row_data)]
-                        except ValueError:
-                            rows = [clicked_visual_row]
-                    else:
-                        rows = [clicked_visual_row]
-                else:
-                    rows = [clicked_visual_row]
+                rows = [self._data_index_for_visual_row(clicked_visual_row)]
 
         count = len(rows)
         menu  = QMenu(self)
@@ -1387,17 +1686,8 @@ class BaseTab(QWidget):
         return super().eventFilter(obj, event)
 
     def _on_row_double_clicked(self, index: QModelIndex):
-        visual_row = index.row()
         # [SORT-FIX] اقرأ الـ row dict من UserRole في col 1 وابحث عن index الحقيقي
-        item = self.table.item(visual_row, 1)
-        row = visual_row
-        if item is not None:
-            row_data = item.data(Qt.UserRole)
-            if row_data is not None and self.data:
-                try:
-                    row = self.data.index(row_data)
-                except ValueError:
-                    pass
+        row = self._data_index_for_visual_row(index.row())
         self.row_double_clicked.emit(row)
         # ملاحظة: request_view لا يُطلق من هنا — row_double_clicked هو المتصل الموحد
         # (request_view كان يسبب فتح الديالوج مرتين في transactions_tab)
@@ -1435,12 +1725,17 @@ class BaseTab(QWidget):
 
     def copy_selected(self):
         """Ctrl+C — ينسخ خلايا الجدول المحددة بصيغة TSV (متوافقة مع Excel)."""
-        selected = self.table.selectedItems()
-        if not selected:
-            return
         rows_data: dict = {}
-        for item in selected:
-            rows_data.setdefault(item.row(), {})[item.column()] = item.text()
+        if self.table_model is not None:
+            for idx in self.table.selectedIndexes():
+                val = idx.data(Qt.DisplayRole) if idx.column() > 0 else None
+                if val is not None:
+                    rows_data.setdefault(idx.row(), {})[idx.column()] = val
+        else:
+            for item in self.table.selectedItems():
+                rows_data.setdefault(item.row(), {})[item.column()] = item.text()
+        if not rows_data:
+            return
         lines = ["\t".join(rows_data[r][c] for c in sorted(rows_data[r])) for r in sorted(rows_data)]
         QGuiApplication.clipboard().setText("\n".join(lines))
 
@@ -1467,10 +1762,7 @@ class BaseTab(QWidget):
                 if not (i < len(self.columns) and self.columns[i].get("key") == "actions")
                 and not self.table.isColumnHidden(i)
             ]
-            headers = []
-            for i in col_indices:
-                h = self.table.horizontalHeaderItem(i)
-                headers.append(h.text() if h else "")
+            headers = [self._header_text(i) for i in col_indices]
 
             ws.append(headers)
 
@@ -1488,10 +1780,7 @@ class BaseTab(QWidget):
             alt_fill  = PatternFill(start_color="F1F5F9", end_color="F1F5F9", fill_type="solid")
             data_align = Alignment(horizontal="center", vertical="center")
             for row in range(self.table.rowCount()):
-                values = []
-                for ci in col_indices:
-                    item = self.table.item(row, ci)
-                    values.append(item.text() if item else "")
+                values = [self._cell_text(row, ci) for ci in col_indices]
                 ws.append(values)
                 if row % 2 == 0:
                     for col_num in range(1, len(headers) + 1):
@@ -1726,6 +2015,9 @@ class BaseTab(QWidget):
         row = self.table.currentRow()
         if row < 0:
             return
+        if self.table_model is not None:
+            self._on_row_checkbox_changed(row, 0 if self.table_model.is_checked(row) else 2)
+            return
         w = self.table.cellWidget(row, 0)
         if w:
             chk = w.findChild(QCheckBox)
@@ -1746,11 +2038,16 @@ class BaseTab(QWidget):
             self.search_bar.setPlaceholderText(self._("search") + "...")
             self._lbl_rows_per_page.setText(self._("rows_per_page"))
             self._lbl_empty_text.setText(self._("no_data_available"))
+            self._lbl_loading.setText(self._("loading"))
             self._update_pagination_label()
             if hasattr(self, "btn_col_visibility"):
                 self.btn_col_visibility.setToolTip(self._("columns_visibility"))
             # هيدر الجدول — col 0 هو checkbox، col 1+ هي الأعمدة
-            if self.columns and self.table.columnCount() == len(self.columns) + 1:
+            if self.table_model is not None:
+                self.table_model.set_header_labels(
+                    [self._(c.get("label", "")) if c.get("label") else "" for c in self.columns]
+                )
+            elif self.columns and self.table.columnCount() == len(self.columns) + 1:
                 for i, col in enumerate(self.columns):
                     h = self.table.horizontalHeaderItem(i + 1)
                     if h:
@@ -71,6 +71,12 @@ class DataBus(QObject, QObjectSingletonMixin):
         if entity not in ENTITIES:
             logger.debug("DataBus.emit: unknown entity '%s'", entity)
         logger.debug("DataBus: %s changed", entity)
+        # الجداول المرجعية المخزّنة تُبطَل قبل أن يعيد أي مشترك التحميل
+        try:
+            from services.reference_cache import ReferenceCache
+            ReferenceCache.get_instance().invalidate_entity(entity)
+        except Exception as e:
+            logger.debug("DataBus: reference cache invalidation skipped: %s", e)
         self.data_changed.emit(entity)
         # استدعاء المشتركين المباشرين
         for cb in list(self._subscribers.get(entity, [])):
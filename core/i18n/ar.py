@@ -1019,6 +1019,21 @@ translations ={
 "multiple_currencies_not_supported": "الأقلام تحتوي عملات مختلطة",
 "nothing_generated": "لم يُولَّد أي مستند",
 "generated_files": "الملفات المولّدة",
+"force_regenerate": "إعادة التوليد بالكامل",
+"force_regenerate_hint": "تجاهل النسخة المحفوظة وإعادة توليد المستندات حتى لو لم تتغير المعاملة",
+"unchanged_reused": "بدون تغيير — أُعيد استخدامه",
+"n_transactions_selected": "{n} معاملة محددة",
+"batch_cancelled": "أُلغيت الدفعة — {ok} مستند جاهز، {failed} فشل",
+"batch_finished_with_errors": "انتهت الدفعة — {ok} مستند جاهز، {failed} فشل",
+"cancelling_please_wait": "جارٍ الإلغاء بعد المستندات الجارية…",
+"generation_cancelled": "أُلغي التوليد — {ok} مستند جاهز",
+"doc_stage_status": "{done}/{total} · {doc} [{lang}] — {stage} ({secs:.1f} ث)",
+"doc_stage_context": "تجهيز البيانات",
+"doc_stage_html": "تصيير HTML",
+"doc_stage_pdf": "كتابة PDF",
+"doc_stage_persist": "الحفظ",
+"cancelling_current_document": "جارٍ الإلغاء بعد المرحلة الحالية…",
+"generate_documents_for_selection": "توليد مستندات للمحدد",
 "pdf_runtime_missing_html_only": "⚠ لا يتوفر محرك PDF — حُفظ كـ HTML",
 "please_select_invoice_type": "يرجى اختيار نوع الفاتورة",
 "please_select_packing_list_type": "يرجى اختيار نوع قائمة التعبئة",
@@ -1518,6 +1533,7 @@ translations ={
 "perm_cat_containers": "تتبع الحاويات",
 "perm_cat_admin": "لوحة الإدارة",
 "sync_now": "مزامنة الآن",
+"sync_full_reconcile": "مطابقة كاملة",
 "sync_settings_menu": "إعدادات المزامنة",
 "sync_state_disabled": "المزامنة غير مفعّلة",
 "sync_state_offline": "لا يوجد اتصال بالسيرفر",
@@ -1525,6 +1541,8 @@ translations ={
 "sync_state_ok": "متصل",
 "sync_state_error": "فشلت المزامنة",
 "sync_last_sync": "آخر مزامنة: {time}",
+"sync_progress": "{table}: {done} سطر",
+"sync_progress_remaining": "{table}: {done} سطر — متبقٍ {remaining}",
 "profile_online_badge": "● متصل",
 "profile_delete_avatar_btn": "🗑  حذف الصورة",
 "profile_office_label": "المكتب",
@@ -1019,6 +1019,21 @@ translations ={
 "multiple_currencies_not_supported": "Items have mixed currencies",
 "nothing_generated": "No documents were generated",
 "generated_files": "Generated Files",
+"force_regenerate": "Force regenerate",
+"force_regenerate_hint": "Ignore saved copies and regenerate documents even if the transaction hasn't changed",
+"unchanged_reused": "unchanged — reused",
+"n_transactions_selected": "{n} transactions selected",
+"batch_cancelled": "Batch cancelled — {ok} documents ready, {failed} failed",
+"batch_finished_with_errors": "Batch finished — {ok} documents ready, {failed} failed",
+"cancelling_please_wait": "Cancelling after the documents in progress…",
+"generation_cancelled": "Generation cancelled — {ok} documents ready",
+"doc_stage_status": "{done}/{total} · {doc} [{lang}] — {stage} ({secs:.1f}s)",
+"doc_stage_context": "Data prepared",
+"doc_stage_html": "HTML rendered",
+"doc_stage_pdf": "PDF written",
+"doc_stage_persist": "Saved",
+"cancelling_current_document": "Cancelling after the current step…",
+"generate_documents_for_selection": "Generate documents for selection",
 "pdf_runtime_missing_html_only": "⚠ No PDF engine — saved as HTML",
 "please_select_invoice_type": "Please select an invoice type",
 "please_select_packing_list_type": "Please select a packing list type",
@@ -1517,6 +1532,7 @@ translations ={
 "perm_cat_containers": "Container Tracking",
 "perm_cat_admin": "Admin Panel",
 "sync_now": "Sync Now",
+"sync_full_reconcile": "Full Reconcile",
 "sync_settings_menu": "Sync Settings",
 "sync_state_disabled": "Sync not enabled",
 "sync_state_offline": "No server connection",
@@ -1524,6 +1540,8 @@ translations ={
 "sync_state_ok": "Connected",
 "sync_state_error": "Sync failed",
 "sync_last_sync": "Last sync: {time}",
+"sync_progress": "{table}: {done} rows",
+"sync_progress_remaining": "{table}: {done} rows — {remaining} left",
 "profile_online_badge": "● Online",
 "profile_delete_avatar_btn": "🗑  Delete Photo",
 "profile_office_label": "Office",
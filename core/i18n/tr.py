@@ -1019,6 +1019,21 @@ translations ={
 "multiple_currencies_not_supported": "Kalemlerde karışık para birimleri var",
 "nothing_generated": "Hiçbir belge oluşturulmadı",
 "generated_files": "Oluşturulan Dosyalar",
+"force_regenerate": "Yeniden oluşturmaya zorla",
+"force_regenerate_hint": "Kayıtlı kopyaları yok say ve işlem değişmemiş olsa bile belgeleri yeniden oluştur",
+"unchanged_reused": "değişmedi — yeniden kullanıldı",
+"n_transactions_selected": "{n} işlem seçildi",
+"batch_cancelled": "Toplu işlem iptal edildi — {ok} belge hazır, {failed} başarısız",
+"batch_finished_with_errors": "Toplu işlem tamamlandı — {ok} belge hazır, {failed} başarısız",
+"cancelling_please_wait": "Devam eden belgelerden sonra iptal ediliyor…",
+"generation_cancelled": "Oluşturma iptal edildi — {ok} belge hazır",
+"doc_stage_status": "{done}/{total} · {doc} [{lang}] — {stage} ({secs:.1f} sn)",
+"doc_stage_context": "Veriler hazırlandı",
+"doc_stage_html": "HTML oluşturuldu",
+"doc_stage_pdf": "PDF yazıldı",
+"doc_stage_persist": "Kaydedildi",
+"cancelling_current_document": "Geçerli adımdan sonra iptal ediliyor…",
+"generate_documents_for_selection": "Seçilenler için belge oluştur",
 "pdf_runtime_missing_html_only": "⚠ PDF motoru yok — HTML olarak kaydedildi",
 "please_select_invoice_type": "Lütfen fatura türü seçiniz",
 "please_select_packing_list_type": "Lütfen paketleme listesi türü seçiniz",
@@ -1517,6 +1532,7 @@ translations ={
 "perm_cat_containers": "Konteyner Takibi",
 "perm_cat_admin": "Yönetim Paneli",
 "sync_now": "Şimdi Senkronize Et",
+"sync_full_reconcile": "Tam Eşitleme",
 "sync_settings_menu": "Senkronizasyon Ayarları",
 "sync_state_disabled": "Senkronizasyon etkin değil",
 "sync_state_offline": "Sunucu bağlantısı yok",
@@ -1524,6 +1540,8 @@ translations ={
 "sync_state_ok": "Bağlı",
 "sync_state_error": "Senkronizasyon başarısız",
 "sync_last_sync": "Son senkronizasyon: {time}",
+"sync_progress": "{table}: {done} satır",
+"sync_progress_remaining": "{table}: {done} satır — {remaining} kaldı",
 "profile_online_badge": "● Çevrimiçi",
 "profile_delete_avatar_btn": "🗑  Fotoğrafı Sil",
 "profile_office_label": "Ofis",
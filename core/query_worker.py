@@ -0,0 +1,185 @@
+"""
+core/query_worker.py
+====================
+تحميل بيانات التابات في الخلفية — بدون حجب event loop الخاص بـ Qt.
+
+QueryRunner (واحد لكل تاب):
+    - submit(fn, on_done, on_error) يشغّل fn(token) في QThreadPool مشترك
+      ويُرجع رقم الجيل (generation).
+    - كل submit جديد يلغي المهمة السابقة (CancelToken) ويرفع الجيل —
+      أي نتيجة تصل من جيل قديم (بحث سابق، صفحة سابقة) تُهمَل.
+    - loading_changed(bool) يُصدر عند بدء/انتهاء آخر مهمة.
+
+قواعد fn:
+    - تعمل في thread منفصل: لا تلمس أي QWidget.
+    - تفتح Session خاصة بها (get_session_local / CRUD) وتُرجع بيانات
+      جاهزة (list[dict] أو tuple) — لا Session مفتوحة تعبر الـ thread.
+    - تستدعي token.check() بين المراحل الطويلة لتتوقف مبكراً عند الإلغاء.
+
+الاستخدام:
+    runner = QueryRunner(self)
+    runner.loading_changed.connect(self._set_loading)
+    runner.submit(lambda token: build_rows(token), self._apply_rows)
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+logger = logging.getLogger(__name__)
+
+# SQLite: كاتب واحد + قرّاء WAL — لا فائدة من أكثر من threadين للقراءة
+_MAX_THREADS = 2
+_pool: Optional[QThreadPool] = None
+
+
+def query_pool() -> QThreadPool:
+    """QThreadPool مشترك لكل استعلامات التابات (منفصل عن globalInstance)."""
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(_MAX_THREADS)
+    return _pool
+
+
+class QueryCancelled(Exception):
+    """يُرفع من CancelToken.check() — ينهي المهمة بصمت."""
+
+
+class CancelToken:
+    """علم إلغاء thread-safe يُمرَّر لدالة المهمة."""
+
+    __slots__ = ("_event",)
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise QueryCancelled()
+
+
+class _JobSignals(QObject):
+    # (generation, result) — يُسلَّم على thread الواجهة (queued)
+    done   = Signal(int, object)
+    failed = Signal(int, str)
+
+
+class _QueryJob(QRunnable):
+
+    def __init__(self, generation: int, fn: Callable, token: CancelToken, signals: _JobSignals):
+        super().__init__()
+        self.setAutoDelete(True)
+        self._gen     = generation
+        self._fn      = fn
+        self._token   = token
+        self._signals = signals
+
+    def run(self):
+        if self._token.cancelled:
+            return
+        try:
+            result = self._fn(self._token)
+        except QueryCancelled:
+            return
+        except Exception as e:
+            logger.error(f"Background query failed (gen={self._gen}): {e}", exc_info=True)
+            if not self._token.cancelled:
+                self._signals.failed.emit(self._gen, str(e))
+            return
+        if not self._token.cancelled:
+            self._signals.done.emit(self._gen, result)
+
+
+class QueryRunner(QObject):
+    """
+    ينفّذ مهمة تحميل واحدة فعّالة في كل وقت ويُسقط النتائج القديمة.
+
+    on_done/on_error تُستدعى دائماً على thread الواجهة ولجيل المهمة
+    الأحدث فقط.
+    """
+
+    loading_changed = Signal(bool)
+
+    def __init__(self, parent=None, pool: Optional[QThreadPool] = None):
+        super().__init__(parent)
+        self._pool       = pool or query_pool()
+        self._generation = 0
+        self._token: Optional[CancelToken] = None
+        self._callbacks: tuple = (None, None)
+        self._loading    = False
+
+        self._signals = _JobSignals(self)
+        self._signals.done.connect(self._on_done)
+        self._signals.failed.connect(self._on_failed)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ─────────────────────────────────────────────────────────────────────
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def is_loading(self) -> bool:
+        return self._loading
+
+    def submit(self, fn: Callable[[CancelToken], Any],
+               on_done: Callable[[Any], None],
+               on_error: Optional[Callable[[str], None]] = None) -> int:
+        """يلغي المهمة السابقة ويجدول fn(token) — يُرجع رقم الجيل الجديد."""
+        if self._token is not None:
+            self._token.cancel()
+        self._generation += 1
+        self._token     = CancelToken()
+        self._callbacks = (on_done, on_error)
+        self._set_loading(True)
+        self._pool.start(_QueryJob(self._generation, fn, self._token, self._signals))
+        return self._generation
+
+    def cancel(self) -> None:
+        """يلغي المهمة الجارية (إن وُجدت) — نتيجتها لن تُسلَّم."""
+        if self._token is not None:
+            self._token.cancel()
+            self._token = None
+        self._generation += 1
+        self._set_loading(False)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # INTERNAL
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _set_loading(self, loading: bool) -> None:
+        if loading != self._loading:
+            self._loading = loading
+            self.loading_changed.emit(loading)
+
+    def _on_done(self, generation: int, result) -> None:
+        if generation != self._generation:
+            logger.debug(f"Dropping stale query result (gen={generation}, current={self._generation})")
+            return
+        self._token = None
+        self._set_loading(False)
+        on_done = self._callbacks[0]
+        if on_done is not None:
+            on_done(result)
+
+    def _on_failed(self, generation: int, message: str) -> None:
+        if generation != self._generation:
+            return
+        self._token = None
+        self._set_loading(False)
+        on_error = self._callbacks[1]
+        if on_error is not None:
+            on_error(message)
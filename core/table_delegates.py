@@ -0,0 +1,190 @@
+"""
+core/table_delegates.py
+=======================
+Delegates مشتركة لجداول RowTableView (انظر core/table_model.py).
+
+ActionButtonsDelegate:
+    يرسم زرّي تعديل/حذف داخل خلية عمود "actions" ويلتقط النقر عليهما
+    في editorEvent — بدون إنشاء QWidget/QPushButton لكل صف.
+    زرّان نموذجيان مخفيان فقط (واحد لكل نوع) يُستخدمان لتطبيق
+    ستايل QPushButton#table-edit / #table-delete من الثيم أثناء الرسم.
+
+الاستخدام:
+    delegate = ActionButtonsDelegate(view)
+    delegate.edit_requested.connect(self._open_edit_dialog)
+    delegate.delete_requested.connect(self._delete_single)
+    view.setItemDelegateForColumn(actions_col, delegate)
+"""
+
+from __future__ import annotations
+
+from PySide6.QtCore import Qt, QEvent, QRect, QSize, Signal
+from PySide6.QtWidgets import (
+    QStyledItemDelegate, QStyleOptionButton, QStyle, QPushButton, QApplication,
+)
+
+from core.translator import TranslationManager
+from core.table_model import RowTableModel
+
+_MARGIN  = 2    # نفس هوامش الـ QHBoxLayout القديم
+_SPACING = 3
+_PAD_X   = 14   # حشوة أفقية داخل الزر
+
+
+class ActionButtonsDelegate(QStyledItemDelegate):
+    """
+    يرسم أزرار Edit/Delete لعمود actions.
+
+    الكائن المُمرَّر في الإشارات هو row["actions"] — نفس ما كانت
+    _set_action_cell تمرّره لـ _open_edit_dialog / _delete_single.
+    """
+
+    edit_requested   = Signal(object)
+    delete_requested = Signal(object)
+
+    def __init__(self, view, parent=None):
+        super().__init__(parent or view)
+        self._view       = view
+        self._can_edit   = False
+        self._can_delete = False
+        self._hover      = None    # (row, col, "edit"|"delete")
+        self._pressed    = None
+
+        # نموذجا ستايل فقط — لا يُعرضان
+        self._proto = {}
+        for kind, obj_name in (("edit", "table-edit"), ("delete", "table-delete")):
+            btn = QPushButton(view)
+            btn.setObjectName(obj_name)
+            btn.hide()
+            self._proto[kind] = btn
+
+        view.setMouseTracking(True)
+        view.viewport().setMouseTracking(True)
+        view.entered.connect(self._on_entered)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ─────────────────────────────────────────────────────────────────────
+
+    def set_permissions(self, can_edit: bool, can_delete: bool) -> None:
+        self._can_edit   = bool(can_edit)
+        self._can_delete = bool(can_delete)
+
+    def _on_entered(self, index):
+        """يزيل حالة hover عند انتقال الماوس لخلية أخرى."""
+        if self._hover and (index.row(), index.column()) != self._hover[:2]:
+            self._hover = None
+            self._view.viewport().update()
+
+    # ─────────────────────────────────────────────────────────────────────
+    # LAYOUT
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _kinds(self) -> list:
+        kinds = []
+        if self._can_edit:
+            kinds.append("edit")
+        if self._can_delete:
+            kinds.append("delete")
+        return kinds
+
+    def _button_rects(self, cell: QRect) -> list:
+        """[(kind, QRect)] — تقسيم الخلية بالتساوي بين الأزرار المتاحة."""
+        kinds = self._kinds()
+        if not kinds:
+            return []
+        inner = cell.adjusted(_MARGIN, _MARGIN, -_MARGIN, -_MARGIN)
+        n = len(kinds)
+        w = max(1, (inner.width() - _SPACING * (n - 1)) // n)
+        rects = []
+        x = inner.left()
+        for kind in kinds:
+            rects.append((kind, QRect(x, inner.top(), w, inner.height())))
+            x += w + _SPACING
+        if self._view.layoutDirection() == Qt.RightToLeft:
+            # الزر الأول (تعديل) يكون على اليمين في RTL كما في QHBoxLayout
+            rects = [(k, QRect(cell.left() + cell.right() - r.right(), r.top(), r.width(), r.height()))
+                     for k, r in rects]
+        return rects
+
+    def _hit(self, cell: QRect, pos) -> str | None:
+        for kind, rect in self._button_rects(cell):
+            if rect.contains(pos):
+                return kind
+        return None
+
+    # ─────────────────────────────────────────────────────────────────────
+    # QStyledItemDelegate
+    # ─────────────────────────────────────────────────────────────────────
+
+    def paint(self, painter, option, index):
+        # خلفية الخلية (تحديد/تناوب) كالمعتاد — بدون نص
+        super().paint(painter, option, index)
+        _ = TranslationManager.get_instance().translate
+        cell = (index.row(), index.column())
+        for kind, rect in self._button_rects(option.rect):
+            proto = self._proto[kind]
+            opt = QStyleOptionButton()
+            opt.initFrom(proto)
+            opt.rect = rect
+            opt.text = _(kind)
+            opt.state = QStyle.State_Enabled | QStyle.State_Raised
+            if self._hover == (*cell, kind):
+                opt.state |= QStyle.State_MouseOver
+            if self._pressed == (*cell, kind):
+                opt.state |= QStyle.State_Sunken
+            style = proto.style() or QApplication.style()
+            style.drawControl(QStyle.CE_PushButton, opt, painter, proto)
+
+    def sizeHint(self, option, index):
+        _ = TranslationManager.get_instance().translate
+        fm = option.fontMetrics
+        kinds = self._kinds()
+        if not kinds:
+            return super().sizeHint(option, index)
+        w = sum(fm.horizontalAdvance(_(k)) + 2 * _PAD_X for k in kinds)
+        w += _SPACING * (len(kinds) - 1) + 2 * _MARGIN
+        return QSize(w, fm.height() + 2 * _MARGIN + 8)
+
+    def editorEvent(self, event, model, option, index):
+        et = event.type()
+        if et not in (QEvent.MouseMove, QEvent.MouseButtonPress,
+                      QEvent.MouseButtonRelease, QEvent.MouseButtonDblClick):
+            return super().editorEvent(event, model, option, index)
+
+        pos  = event.position().toPoint()
+        kind = self._hit(option.rect, pos)
+        cell = (index.row(), index.column())
+
+        if et == QEvent.MouseMove:
+            hover = (*cell, kind) if kind else None
+            if hover != self._hover:
+                self._hover = hover
+                self._view.viewport().update()
+            return False
+
+        if event.button() != Qt.LeftButton or kind is None:
+            self._pressed = None
+            return False
+
+        if et == QEvent.MouseButtonPress:
+            self._pressed = (*cell, kind)
+            self._view.viewport().update(option.rect)
+            return True
+
+        if et == QEvent.MouseButtonDblClick:
+            # لا نفتح نافذة العرض عند النقر المزدوج على زر
+            return True
+
+        # MouseButtonRelease
+        pressed, self._pressed = self._pressed, None
+        self._view.viewport().update(option.rect)
+        if pressed != (*cell, kind):
+            return True
+        row_data = index.data(RowTableModel.ROW_ROLE) or {}
+        obj = row_data.get("actions")
+        if kind == "edit":
+            self.edit_requested.emit(obj)
+        else:
+            self.delete_requested.emit(obj)
+        return True
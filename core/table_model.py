@@ -0,0 +1,267 @@
+"""
+core/table_model.py
+===================
+محرّك جداول model/view مشترك لـ BaseTab.
+
+بدل إنشاء QTableWidgetItem لكل خلية في كل صفحة، يحتفظ RowTableModel
+بقائمة row dicts كما هي، ويُنتج نص الخلية والفونت والمحاذاة عند الطلب
+داخل data() — لا يُنشأ أي كائن Qt لكل خلية.
+
+الاستخدام (في التاب الفرعي):
+    class ClientsTab(BaseTab):
+        use_model_view = True
+
+    BaseTab يبني RowTableView بدل QTableWidget ويمرّر صفوف الصفحة الحالية
+    إلى self.table_model.set_rows(page_rows).
+
+Column format: نفس BaseTab — {"label": "i18n_key", "key": "data_key", "align": Qt.AlignCenter}
+العمود 0 محجوز دائماً للـ checkbox (CheckStateRole).
+"""
+
+from __future__ import annotations
+
+import logging
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Signal
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QTableView
+
+logger = logging.getLogger(__name__)
+
+# أعمدة لا يُعرض محتواها كنص (تحمل كائنات — مثل عمود الإجراءات)
+_NON_TEXT_KEYS = frozenset({"actions"})
+
+
+class RowTableModel(QAbstractTableModel):
+    """
+    Model خفيف فوق list[dict].
+
+    - العمود 0: checkbox التحديد (حالته تُزامَن من selection الجدول)
+    - العمود 1+: self.columns بنفس ترتيبها
+    - Qt.UserRole على أي خلية يُرجع الـ row dict كاملاً
+    """
+
+    # (visual_row, checked) — يُصدر عند نقر المستخدم على checkbox صف
+    check_toggled = Signal(int, bool)
+
+    ROW_ROLE = Qt.UserRole
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list = []
+        self._keys: list = []
+        self._aligns: list = []
+        self._labels: list = []
+        self._checked: set = set()
+        self._font = QFont()
+
+    # ─────────────────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ─────────────────────────────────────────────────────────────────────
+
+    def set_columns(self, columns: list, labels: list) -> None:
+        """يعيّن الأعمدة (بدون عمود الـ checkbox) وعناوينها المترجمة."""
+        self.beginResetModel()
+        self._keys   = [c.get("key", "") for c in columns]
+        self._aligns = [c.get("align", Qt.AlignCenter) for c in columns]
+        self._labels = [""] + list(labels)
+        self._checked.clear()
+        self.endResetModel()
+
+    def set_header_labels(self, labels: list) -> None:
+        """يحدّث عناوين الأعمدة فقط (عند تغيير اللغة)."""
+        self._labels = [""] + list(labels)
+        if self._keys:
+            self.headerDataChanged.emit(Qt.Horizontal, 0, len(self._keys))
+
+    def set_rows(self, rows: list) -> None:
+        """
+        يستبدل صفوف الصفحة الحالية.
+
+        إذا تغيّر عدد الصفوف جذرياً (من/إلى صفر) → beginResetModel.
+        غير ذلك: dataChanged للنطاق الذي تغيّر نصه فعلاً
+        + removeRows/insertRows للفرق في الذيل فقط.
+        """
+        rows = list(rows or [])
+        old_n, new_n = len(self._rows), len(rows)
+
+        if old_n == 0 or new_n == 0:
+            self.beginResetModel()
+            self._rows = rows
+            self._checked.clear()
+            self.endResetModel()
+            return
+
+        if new_n < old_n:
+            self.beginRemoveRows(QModelIndex(), new_n, old_n - 1)
+            del self._rows[new_n:]
+            self._checked = {r for r in self._checked if r < new_n}
+            self.endRemoveRows()
+
+        common = min(old_n, new_n)
+        first = last = -1
+        for i in range(common):
+            if self._row_signature(self._rows[i]) != self._row_signature(rows[i]):
+                if first < 0:
+                    first = i
+                last = i
+            # نستبدل الـ dict دائماً — قد يحمل كائنات (actions) أحدث
+            self._rows[i] = rows[i]
+        if first >= 0:
+            self.dataChanged.emit(
+                self.index(first, 0), self.index(last, self.columnCount() - 1)
+            )
+
+        if new_n > old_n:
+            self.beginInsertRows(QModelIndex(), old_n, new_n - 1)
+            self._rows.extend(rows[old_n:])
+            self.endInsertRows()
+
+    def clear(self) -> None:
+        self.set_rows([])
+
+    def row_at(self, row: int) -> dict | None:
+        """يُرجع row dict للصف المرئي row أو None."""
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
+
+    def rows(self) -> list:
+        return self._rows
+
+    def column_key(self, col: int) -> str:
+        """مفتاح البيانات للعمود الحقيقي col (col 0 = checkbox → "")."""
+        if 1 <= col <= len(self._keys):
+            return self._keys[col - 1]
+        return ""
+
+    def cell_text(self, row: int, col: int) -> str:
+        """نص الخلية كما يُعرض — يُستخدم للتصدير والنسخ والمجاميع."""
+        val = self.data(self.index(row, col), Qt.DisplayRole)
+        return "" if val is None else val
+
+    def set_font(self, font: QFont) -> None:
+        """يعيّن فونت الخلايا المشترك (يُطبَّق عبر FontRole)."""
+        self._font = QFont(font)
+        if self._rows:
+            self.dataChanged.emit(
+                self.index(0, 0),
+                self.index(len(self._rows) - 1, self.columnCount() - 1),
+                [Qt.FontRole],
+            )
+
+    def set_checked_rows(self, rows: set) -> None:
+        """يُزامن checkboxes العمود 0 مع التحديد الحالي."""
+        rows = {r for r in rows if 0 <= r < len(self._rows)}
+        changed = rows ^ self._checked
+        self._checked = rows
+        if changed:
+            self.dataChanged.emit(
+                self.index(min(changed), 0), self.index(max(changed), 0),
+                [Qt.CheckStateRole],
+            )
+
+    def is_checked(self, row: int) -> bool:
+        return row in self._checked
+
+    # ─────────────────────────────────────────────────────────────────────
+    # QAbstractTableModel
+    # ─────────────────────────────────────────────────────────────────────
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._keys) + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        r, c = index.row(), index.column()
+        if r >= len(self._rows):
+            return None
+
+        if c == 0:
+            if role == Qt.CheckStateRole:
+                return Qt.Checked if r in self._checked else Qt.Unchecked
+            if role == self.ROW_ROLE:
+                return self._rows[r]
+            return None
+
+        key = self._keys[c - 1] if c - 1 < len(self._keys) else ""
+        if role == Qt.DisplayRole:
+            if key in _NON_TEXT_KEYS:
+                return None
+            val = self._rows[r].get(key, "")
+            return str(val) if val is not None else ""
+        if role == Qt.FontRole:
+            return self._font
+        if role == Qt.TextAlignmentRole:
+            return self._aligns[c - 1]
+        if role == self.ROW_ROLE:
+            return self._rows[r]
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole) -> bool:
+        if index.isValid() and index.column() == 0 and role == Qt.CheckStateRole:
+            checked = (value == Qt.Checked) or (value == 2)
+            r = index.row()
+            if checked:
+                self._checked.add(r)
+            else:
+                self._checked.discard(r)
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+            self.check_toggled.emit(r, checked)
+            return True
+        return False
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            if 0 <= section < len(self._labels):
+                return self._labels[section]
+            return None
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        base = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == 0:
+            return base | Qt.ItemIsUserCheckable
+        return base
+
+    # ─────────────────────────────────────────────────────────────────────
+    # INTERNAL
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _row_signature(self, row: dict) -> tuple:
+        """القيم المعروضة فقط — لمقارنة صفين دون الاعتماد على كائنات ORM."""
+        return tuple(row.get(k) for k in self._keys if k not in _NON_TEXT_KEYS)
+
+
+class RowTableView(QTableView):
+    """
+    QTableView مربوط بـ RowTableModel.
+
+    يوفّر rowCount()/columnCount()/currentRow() للتوافق مع الكود
+    المكتوب أصلاً لـ QTableWidget (BaseTab والتابات الفرعية).
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._row_model = RowTableModel(self)
+        self.setModel(self._row_model)
+
+    def row_model(self) -> RowTableModel:
+        return self._row_model
+
+    # ── backward-compat مع QTableWidget ──────────────────────────────────
+    def rowCount(self) -> int:
+        return self._row_model.rowCount()
+
+    def columnCount(self) -> int:
+        return self._row_model.columnCount()
+
+    def currentRow(self) -> int:
+        idx = self.currentIndex()
+        return idx.row() if idx.isValid() else -1
@@ -13,7 +13,20 @@ logger = logging.getLogger(__name__)
 # لازم تُرفع هاي القيمة +1 كل مرة تُضاف فيها migration أو seed جديد بهذا الملف،
 # وإلا التعديل الجديد لن يُطبَّق على قواعد بيانات المستخدمين الموجودة.
 # =============================================================================
-_SCHEMA_VERSION = 3
+_SCHEMA_VERSION = 12
+
+# كائنات تُنشئها الـ migrations فقط (لا create_all) — شبكة أمان إن نُسي رفع
+# _SCHEMA_VERSION: قاعدة بإصدار محدّث ينقصها أحدها تُعاد عليها الـ migrations.
+# أضف هنا كائناً واحداً من كل migration جديدة.
+_REQUIRED_SCHEMA_OBJECTS = (
+    "idx_trx_date_id",              # keyset pagination
+    "ix_transactions_numeric_no",   # transactions.numeric_no
+    "doc_counters",
+    "idx_oplog_entity_status",
+    "idx_oplog_entity_row",
+    "ix_documents_data_hash",       # documents.data_hash / totals_hash
+    "trg_documents_snapshots_del",
+)
 
 
 def _get_schema_version(conn) -> int:
@@ -29,6 +42,19 @@ def _set_schema_version(conn, version: int) -> None:
     conn.commit()
 
 
+def _missing_schema_objects(conn) -> list:
+    """ما ينقص من _REQUIRED_SCHEMA_OBJECTS — استعلام واحد على sqlite_master."""
+    try:
+        marks = ", ".join("?" for _ in _REQUIRED_SCHEMA_OBJECTS)
+        found = {r[0] for r in conn.execute(
+            f"SELECT name FROM sqlite_master WHERE name IN ({marks})",
+            _REQUIRED_SCHEMA_OBJECTS,
+        ).fetchall()}
+    except Exception:
+        return []
+    return [n for n in _REQUIRED_SCHEMA_OBJECTS if n not in found]
+
+
 # =============================================================================
 # نفس بيانات scripts/seed_data.py — مصدر واحد للحقيقة
 # =============================================================================
@@ -312,6 +338,28 @@ def _run_migrations(conn) -> None:
     except Exception as _e:
         logger.warning("Bootstrap: office_id (transactions) migration skipped: %s", _e)
 
+    # Migration: numeric_no لـ transactions — ترقيم تلقائي بـ MAX() مفهرس
+    # بدل مسح كل transaction_no (انظر NumberingService._get_db_max_numeric).
+    # القيم تُملأ كسولاً (NULL = لم يُحسب بعد)، والـ trigger يعيدها NULL
+    # عند تغيير transaction_no من أي مسار كتابة (ORM أو SQL خام).
+    try:
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(transactions)").fetchall()]
+        if "numeric_no" not in cols:
+            conn.execute("ALTER TABLE transactions ADD COLUMN numeric_no INTEGER")
+            logger.info("Bootstrap: added numeric_no to transactions")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_transactions_numeric_no ON transactions(numeric_no)")
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_transactions_no_changed
+            AFTER UPDATE OF transaction_no ON transactions
+            WHEN NEW.transaction_no IS NOT OLD.transaction_no
+            BEGIN
+                UPDATE transactions SET numeric_no = NULL WHERE id = NEW.id;
+            END
+        """)
+        conn.commit()
+    except Exception as _e:
+        logger.warning("Bootstrap: numeric_no (transactions) migration skipped: %s", _e)
+
     # Migration: origin_country / dest_country / certificate_date + CMR الثاني (أعمدة + أماكن)
     # — مجمّعة بفحص واحد لأعمدة transport_details بدل 3 استعلامات PRAGMA منفصلة
     try:
@@ -353,6 +401,26 @@ def _run_migrations(conn) -> None:
     except Exception as _e:
         logger.warning("Bootstrap: cmr_counters migration skipped: %s", _e)
 
+    # Migration: جدول doc_counters — عدادات أرقام المستندات و doc_groups.seq
+    # (services/doc_number_allocator.py) — تُبذَر من عدادات app_settings القديمة
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS doc_counters (
+                counter_key TEXT PRIMARY KEY,
+                last_number INTEGER NOT NULL DEFAULT 0,
+                updated_at  DATETIME DEFAULT (datetime('now'))
+            )
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO doc_counters (counter_key, last_number)
+            SELECT key, CAST(value AS INTEGER) FROM app_settings
+             WHERE key LIKE 'doc_counter_%' AND value GLOB '[0-9]*'
+        """)
+        conn.commit()
+        logger.debug("Bootstrap: doc_counters table ready")
+    except Exception as _e:
+        logger.warning("Bootstrap: doc_counters migration skipped: %s", _e)
+
     # Migration: performance indexes (safe — CREATE INDEX IF NOT EXISTS)
     _indexes = [
         # transactions
@@ -360,6 +428,8 @@ def _run_migrations(conn) -> None:
         ("idx_trx_client",     "CREATE INDEX IF NOT EXISTS idx_trx_client     ON transactions(client_id)"),
         ("idx_trx_office",     "CREATE INDEX IF NOT EXISTS idx_trx_office     ON transactions(office_id)"),
         ("idx_trx_type",       "CREATE INDEX IF NOT EXISTS idx_trx_type       ON transactions(transaction_type)"),
+        # keyset paging: ORDER BY transaction_date DESC, id DESC + WHERE (date, id) < (?, ?)
+        ("idx_trx_date_id",    "CREATE INDEX IF NOT EXISTS idx_trx_date_id    ON transactions(transaction_date, id)"),
         # transaction_items
         ("idx_trxitem_trx",    "CREATE INDEX IF NOT EXISTS idx_trxitem_trx    ON transaction_items(transaction_id)"),
         ("idx_trxitem_mat",    "CREATE INDEX IF NOT EXISTS idx_trxitem_mat    ON transaction_items(material_id)"),
@@ -369,6 +439,8 @@ def _run_migrations(conn) -> None:
         ("idx_audit_user",     "CREATE INDEX IF NOT EXISTS idx_audit_user     ON audit_log(user_id)"),
         ("idx_audit_table",    "CREATE INDEX IF NOT EXISTS idx_audit_table    ON audit_log(table_name)"),
         ("idx_audit_ts",       "CREATE INDEX IF NOT EXISTS idx_audit_ts       ON audit_log(timestamp)"),
+        # keyset paging: ORDER BY timestamp DESC, id DESC + WHERE (ts, id) < (?, ?)
+        ("idx_audit_ts_id",    "CREATE INDEX IF NOT EXISTS idx_audit_ts_id    ON audit_log(timestamp, id)"),
         # op_log (sync)
         ("idx_oplog_status",   "CREATE INDEX IF NOT EXISTS idx_oplog_status   ON op_log(status)"),
         ("idx_oplog_entity",   "CREATE INDEX IF NOT EXISTS idx_oplog_entity   ON op_log(entity_name)"),
@@ -585,6 +657,61 @@ def _run_migrations(conn) -> None:
     except Exception as _e:
         logger.warning("Bootstrap: login lockout migration skipped: %s", _e)
 
+    # Migration: render_hash على documents — مفتاح كاش التوليد (facade.render_document)
+    # بصمة context + القالب + اللغة؛ تطابقها يعني أن الملف المحفوظ ما زال صالحاً
+    try:
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(documents)").fetchall()]
+        if cols and "render_hash" not in cols:
+            conn.execute("ALTER TABLE documents ADD COLUMN render_hash TEXT")
+            conn.commit()
+            logger.info("Bootstrap: added render_hash to documents")
+    except Exception as _e:
+        logger.warning("Bootstrap: render_hash migration skipped: %s", _e)
+
+    # Migration: document_snapshots — data_json/totals_json مضغوطة ومُعنونة بالمحتوى
+    # (database/document_snapshots.py). triggers تحذف اللقطة حين لا يشير إليها
+    # أي مستند؛ JSON النصي القديم يُنقل ثم VACUUM لاسترجاع المساحة مرة واحدة.
+    try:
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(documents)").fetchall()]
+        if cols:
+            for _col in ("data_hash", "totals_hash"):
+                if _col not in cols:
+                    conn.execute(f"ALTER TABLE documents ADD COLUMN {_col} TEXT")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_snapshots (
+                    hash       TEXT PRIMARY KEY,
+                    codec      TEXT NOT NULL DEFAULT 'zlib',
+                    raw_size   INTEGER NOT NULL DEFAULT 0,
+                    body       BLOB NOT NULL,
+                    created_at DATETIME NOT NULL DEFAULT (datetime('now'))
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_documents_data_hash ON documents(data_hash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_documents_totals_hash ON documents(totals_hash)")
+            _orphans = """
+                DELETE FROM document_snapshots
+                 WHERE hash IN (OLD.data_hash, OLD.totals_hash)
+                   AND NOT EXISTS (SELECT 1 FROM documents WHERE data_hash = document_snapshots.hash)
+                   AND NOT EXISTS (SELECT 1 FROM documents WHERE totals_hash = document_snapshots.hash);
+            """
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_documents_snapshots_upd
+                AFTER UPDATE OF data_hash, totals_hash ON documents BEGIN {_orphans} END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_documents_snapshots_del
+                AFTER DELETE ON documents BEGIN {_orphans} END
+            """)
+            conn.commit()
+
+            from database.document_snapshots import migrate_legacy_snapshots
+            moved = migrate_legacy_snapshots(conn)
+            if moved:
+                conn.execute("VACUUM")
+                logger.info("Bootstrap: moved %d document snapshots out of documents", moved)
+    except Exception as _e:
+        logger.warning("Bootstrap: document_snapshots migration skipped: %s", _e)
+
     # =========================================================================
     # Migration SYNC-1: جدول local_sync_cursors
     # يحفظ آخر cursor لكل جدول في كل اتجاه (push/pull) لكل مكتب.
@@ -632,12 +759,15 @@ def _run_migrations(conn) -> None:
                 continue   # الجدول غير موجود بعد
             if "server_id" not in _existing:
                 conn.execute(f"ALTER TABLE {_tbl} ADD COLUMN server_id TEXT")
-                conn.execute(
-                    f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{_tbl}_server_id"
-                    f" ON {_tbl}(server_id) WHERE server_id IS NOT NULL"
-                )
                 logger.info("Bootstrap: added server_id to %s", _tbl)
+            # unique index دائماً (وليس فقط عند إضافة العمود) — شرط
+            # INSERT ... ON CONFLICT(server_id) في SyncService._upsert_local_many
+            conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{_tbl}_server_id"
+                f" ON {_tbl}(server_id) WHERE server_id IS NOT NULL"
+            )
         except Exception as _e:
+            # قيم server_id مكررة قديمة → SyncService يعود للمسار صفاً بصف
             logger.warning("Bootstrap: server_id(%s) skipped: %s", _tbl, _e)
     try:
         conn.commit()
@@ -723,6 +853,79 @@ def _run_migrations(conn) -> None:
     except Exception:
         pass
 
+    # =========================================================================
+    # Migration SYNC-5: journal التغييرات (op_log) للجداول المرجعية
+    # triggers تسجّل id كل صف يتغيّر — SyncService يرفع الفروقات فقط
+    # بدل إعادة رفع الجدول كاملاً كل دورة.
+    # SYNC-6: نفس الـ triggers على OUTBOX_TABLES (outbox للجداول ثنائية
+    # الاتجاه — يشمل الحذف) + index لضغط القيود لكل صف.
+    # =========================================================================
+    from database.models.sync_models import (
+        JOURNALED_TABLES, OUTBOX_TABLES, journal_trigger_name, journal_update_columns,
+    )
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS op_log (
+                id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity_name  VARCHAR(64) NOT NULL,
+                entity_id    INTEGER,
+                op           VARCHAR(16) NOT NULL,
+                payload_json TEXT,
+                version      INTEGER,
+                status       VARCHAR(16) DEFAULT 'pending',
+                created_at   DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_oplog_entity_status"
+            " ON op_log(entity_name, status, id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_oplog_entity_row"
+            " ON op_log(entity_name, entity_id, id)"
+        )
+    except Exception as _e:
+        logger.warning("Bootstrap: op_log table skipped: %s", _e)
+    for _tbl in dict.fromkeys(JOURNALED_TABLES + OUTBOX_TABLES):
+        try:
+            _cols = [r[1] for r in conn.execute(f"PRAGMA table_info({_tbl})").fetchall()]
+            if "id" not in _cols:
+                continue
+            _sid = "OLD.server_id" if "server_id" in _cols else "NULL"
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {journal_trigger_name(_tbl, 'ins')}
+                AFTER INSERT ON {_tbl} BEGIN
+                    INSERT INTO op_log (entity_name, entity_id, op, status)
+                    VALUES ('{_tbl}', NEW.id, 'create', 'pending');
+                END
+            """)
+            # UPDATE OF الأعمدة المُزامَنة فقط — تعبئة أعمدة محلية (numeric_no...)
+            # لا تُعيد رفع الصف. يُعاد إنشاؤه مع كل migration ليشمل الأعمدة الجديدة.
+            _synced = ", ".join(f'"{c}"' for c in journal_update_columns(_tbl, _cols))
+            conn.execute(f"DROP TRIGGER IF EXISTS {journal_trigger_name(_tbl, 'upd')}")
+            conn.execute(f"""
+                CREATE TRIGGER {journal_trigger_name(_tbl, 'upd')}
+                AFTER UPDATE OF {_synced} ON {_tbl} BEGIN
+                    INSERT INTO op_log (entity_name, entity_id, op, status)
+                    VALUES ('{_tbl}', NEW.id, 'update', 'pending');
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {journal_trigger_name(_tbl, 'del')}
+                AFTER DELETE ON {_tbl} BEGIN
+                    INSERT INTO op_log (entity_name, entity_id, op, payload_json, status)
+                    VALUES ('{_tbl}', OLD.id, 'delete',
+                            json_object('server_id', {_sid}), 'pending');
+                END
+            """)
+        except Exception as _e:
+            logger.warning("Bootstrap: op_log triggers(%s) skipped: %s", _tbl, _e)
+    try:
+        conn.commit()
+        logger.debug("Bootstrap: op_log journal triggers checked/created")
+    except Exception:
+        pass
+
     conn.commit()
     logger.debug("Bootstrap: migrations completed")
 
@@ -742,12 +945,20 @@ def run_bootstrap() -> bool:
         import sqlite3 as _sqlite3
         with _sqlite3.connect(get_db_path()) as _conn:
             _current_version = _get_schema_version(_conn)
-            if _current_version >= _SCHEMA_VERSION:
+            _missing = (
+                _missing_schema_objects(_conn) if _current_version >= _SCHEMA_VERSION else []
+            )
+            if _current_version >= _SCHEMA_VERSION and not _missing:
                 logger.debug(
                     "Bootstrap: schema up to date (v%d) — skipping migrations & seed",
                     _current_version,
                 )
             else:
+                if _missing:
+                    logger.warning(
+                        "Bootstrap: schema v%d is missing %s — re-running migrations",
+                        _current_version, ", ".join(_missing),
+                    )
                 _run_migrations(_conn)
 
                 # إعادة تهيئة الـ engine بعد الـ migrations لمسح الـ metadata القديمة
@@ -3,11 +3,14 @@ Audit Log CRUD - LOGIPORT
 Enhanced with logging and comprehensive error handling
 """
 import logging
-from typing import Optional
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import String, or_, type_coerce
+from sqlalchemy.orm import joinedload
 
 from database.models import get_session_local
 from database.models.audit_log import AuditLog
-from database.crud.base_crud import BaseCRUD
+from database.crud.base_crud import BaseCRUD, apply_keyset
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +18,9 @@ logger = logging.getLogger(__name__)
 class AuditLogCRUD(BaseCRUD):
     """CRUD operations for audit logs with logging and error handling"""
 
+    # list_logs accepts after/before = (timestamp, id)
+    supports_keyset = True
+
     def __init__(self):
         # Pass callable, not instance
         super().__init__(AuditLog, get_session_local)
@@ -79,4 +85,79 @@ class AuditLogCRUD(BaseCRUD):
             return self.filter_by(table_name=table_name)[:limit]
         except Exception as e:
             logger.error(f"Failed to get logs for table: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    # ------------------------------------------------------------------
+    # Paged listing (audit trail tab)
+    # ------------------------------------------------------------------
+
+    # timestamp is compared as the stored text: server_default rows are
+    # "YYYY-MM-DD HH:MM:SS" while a bound datetime renders with ".ffffff",
+    # so a datetime cursor would never match equal timestamps.
+    _TS_RAW = type_coerce(AuditLog.timestamp, String)
+
+    def keyset_key(self, obj) -> tuple:
+        return (getattr(obj, "_keyset_ts", None), getattr(obj, "id", None))
+
+    @staticmethod
+    def _apply_filters(q, *, date_from=None, date_to=None, user_id=None,
+                       action=None, table_name=None, search=None):
+        if date_from:
+            q = q.filter(AuditLog.timestamp >= date_from)
+        if date_to:
+            q = q.filter(AuditLog.timestamp <= date_to)
+        if user_id:
+            q = q.filter(AuditLog.user_id == user_id)
+        if action:
+            q = q.filter(AuditLog.action.ilike(f"%{action}%"))
+        if table_name:
+            q = q.filter(AuditLog.table_name == table_name)
+        if search:
+            q = q.filter(
+                or_(
+                    AuditLog.details.ilike(f"%{search}%"),
+                    AuditLog.record_id.cast(String).ilike(f"%{search}%"),
+                )
+            )
+        return q
+
+    def count_logs(self, **filters) -> int:
+        """Count audit logs matching the same filters as list_logs."""
+        with self.get_session() as s:
+            return self._apply_filters(s.query(AuditLog), **filters).count()
+
+    def list_logs(
+            self,
+            *,
+            limit: int = 50,
+            offset: int = 0,
+            after: Optional[Tuple[Any, int]] = None,
+            before: Optional[Tuple[Any, int]] = None,
+            **filters,
+    ) -> List[AuditLog]:
+        """
+        One page of audit logs ordered by timestamp DESC, id DESC.
+
+        after/before are keyset cursors (timestamp, id) of the last/first row
+        of the page on screen; when given, offset is ignored and the query
+        seeks via idx_audit_ts_id instead of skipping rows.
+        """
+        with self.get_session() as s:
+            q = self._apply_filters(
+                s.query(AuditLog, self._TS_RAW).options(joinedload(AuditLog.user)),
+                **filters,
+            )
+            reverse = False
+            if after is not None or before is not None:
+                q, reverse = apply_keyset(
+                    q, self._TS_RAW, AuditLog.id, after=after, before=before,
+                )
+                result = q.limit(limit).all()
+            else:
+                result = (q.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+                           .offset(offset).limit(limit).all())
+            rows = []
+            for log, ts_raw in result:
+                log._keyset_ts = ts_raw
+                rows.append(log)
+            return rows[::-1] if reverse else rows
@@ -9,12 +9,37 @@ BaseCRUD — الصنف الأساسي لجميع عمليات CRUD.
   3. rollback تلقائي عند أي استثناء
   4. close() مضمون في finally
   5. يدعم: callable (get_session_local) أو Session مباشرة (للاختبارات)
+
+Server-side paging:
+  QuerySpec + query_page(spec) → (rows, total) باستعلام واحد
+  (count(*) OVER () يُرجع الإجمالي مع صفوف الصفحة).
+  الأعمدة القابلة للبحث/الترتيب تُعرَّف تصريحياً في الـ CRUD الفرعي:
+      search_columns   = ("name_ar", "name_en", "name_tr", "code")
+      search_relations = {"country_id": (Country, ("name_ar", "name_en", "name_tr"))}
+      sort_columns     = {"name_local": "name_{lang}"}
+      sort_relations   = {"country_name": ("country_id", Country, ("name_{lang}", "name_ar"))}
+  أعمدة المستخدم (created_by_name / updated_by_name) تُبحث وتُرتَّب تلقائياً
+  عبر created_by_id / updated_by_id إن وُجدت في النموذج.
+
+Keyset (seek) paging:
+  للجداول الكبيرة المرتَّبة زمنياً (transactions, audit_log) — بدل OFFSET
+  الذي يمشي على كل الصفوف المتخطّاة، تُطلب الصفحة التالية بمفتاح آخر صف:
+      WHERE (ts, id) < (:last_ts, :last_id) ORDER BY ts DESC, id DESC LIMIT n
+  apply_keyset() تبني الشرط والترتيب، والـ CRUD يعلن supports_keyset
+  ويعرّف keyset_key(obj). يحتاج index مركّب (ts, id) — انظر bootstrap.
+
+Outbox المزامنة:
+  add/update/delete (وكل مسارات الكتابة الأخرى) على الجداول المُزامَنة
+  تُسجَّل في op_log عبر triggers (bootstrap SYNC-5/6) داخل نفس الـ
+  transaction — لا حاجة لاستدعاء صريح هنا. _sync_record يبقى hook
+  اختيارياً لـ sync_service خارجي.
 """
 
-from sqlalchemy import or_
+from sqlalchemy import or_, func, select
 from sqlalchemy.orm import Session
 from contextlib import contextmanager
-from typing import Any, Callable, List, Optional, Dict, Union, TypeVar, Generic
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Dict, Union, TypeVar, Generic, Tuple
 
 T = TypeVar("T")
 from database.db_utils import utc_now
@@ -29,8 +54,71 @@ except Exception:
     AuditLog = None
 
 
+@dataclass
+class QuerySpec:
+    """
+    وصف صفحة واحدة من جدول: بحث + ترتيب + pagination + فلاتر مساواة.
+
+    sort_key: مفتاح عمود العرض (row key) — يُترجَم لعمود DB عبر
+              BaseCRUD.sort_columns أو يُستخدم مباشرة إن كان عموداً في النموذج.
+    """
+    search:    str = ""
+    sort_key:  Optional[str] = None
+    sort_desc: bool = False
+    page:      int = 1
+    per_page:  int = 20
+    lang:      str = "ar"
+    filters:   Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def offset(self) -> int:
+        return (max(1, self.page) - 1) * self.per_page
+
+
+def apply_keyset(q, sort_col, id_col, *, after=None, before=None, desc: bool = True):
+    """
+    يضيف شرط keyset + ORDER BY إلى استعلام (select() أو Query).
+
+    after : (sort_value, id) لآخر صف في الصفحة المعروضة → الصفحة التالية
+    before: (sort_value, id) لأول صف في الصفحة المعروضة → الصفحة السابقة
+
+    يُرجع (q, reverse): مع before يُعكس الترتيب ليأخذ LIMIT أقرب الصفوف
+    للمؤشر، والمستدعي يعكس النتيجة (reverse=True) لتعود بالترتيب الأصلي.
+    sort_col يُفترض NOT NULL (transaction_date / timestamp).
+    """
+    reverse = before is not None and after is None
+    if after is not None:
+        val, last_id = after
+        if desc:
+            q = q.where(or_(sort_col < val, (sort_col == val) & (id_col < last_id)))
+        else:
+            q = q.where(or_(sort_col > val, (sort_col == val) & (id_col > last_id)))
+    elif before is not None:
+        val, first_id = before
+        if desc:
+            q = q.where(or_(sort_col > val, (sort_col == val) & (id_col > first_id)))
+        else:
+            q = q.where(or_(sort_col < val, (sort_col == val) & (id_col < first_id)))
+
+    forward_desc = desc != reverse
+    if forward_desc:
+        q = q.order_by(sort_col.desc(), id_col.desc())
+    else:
+        q = q.order_by(sort_col.asc(), id_col.asc())
+    return q, reverse
+
+
 class BaseCRUD:
 
+    # ── تعريف تصريحي للبحث/الترتيب server-side (انظر query_page) ──────────
+    search_columns:   Tuple[str, ...] = ()
+    search_relations: Dict[str, tuple] = {}
+    sort_columns:     Dict[str, str] = {}
+    sort_relations:   Dict[str, tuple] = {}
+
+    # ── keyset paging (انظر apply_keyset) — يفعّله الـ CRUD الفرعي ─────────
+    supports_keyset: bool = False
+
     def __init__(
         self,
         model: Any,
@@ -195,6 +283,14 @@ class BaseCRUD:
         except Exception:
             pass
 
+    def _invalidate_reference_cache(self):
+        """يُبطل نسخة الجدول في ReferenceCache (إن كان جدولاً مرجعياً) بعد أي commit."""
+        try:
+            from services.reference_cache import ReferenceCache
+            ReferenceCache.get_instance().invalidate_entity(self.table_name)
+        except Exception:
+            pass
+
     # ─────────────────────────────────────────────────────────────────────────
     # CRUD — commit واحد لكل عملية بعد كل شيء (audit + بيانات معاً)
     # ─────────────────────────────────────────────────────────────────────────
@@ -208,6 +304,7 @@ class BaseCRUD:
                         action="create", before=None, after=self._to_dict(obj))
             session.commit()
             session.refresh(obj)
+            self._invalidate_reference_cache()
             self._sync_record(entity_id=getattr(obj, "id", None),
                               op="create", payload=self._to_dict(obj))
             return obj
@@ -230,6 +327,7 @@ class BaseCRUD:
                 except Exception:
                     pass
             session.commit()
+            self._invalidate_reference_cache()
             for obj in objs:
                 try:
                     session.refresh(obj)
@@ -251,6 +349,7 @@ class BaseCRUD:
                         action="update", before=before, after={**before, **data})
             session.commit()
             session.refresh(obj)
+            self._invalidate_reference_cache()
             self._sync_record(entity_id=getattr(obj, "id", None),
                               op="update", payload=self._to_dict(obj))
             return obj
@@ -266,6 +365,7 @@ class BaseCRUD:
                         action="delete", before=before, after=None)
             session.delete(obj)
             session.commit()
+            self._invalidate_reference_cache()
             self._sync_record(entity_id=before.get("id"),
                               op="delete", payload=before)
             return True
@@ -325,6 +425,113 @@ class BaseCRUD:
                 "pages": max(1, (total + per_page - 1) // per_page),
             }
 
+    # ─────────────────────────────────────────────────────────────────────────
+    # Server-side query spec
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def _model_column(self, name: str):
+        try:
+            return self.model.__table__.c[name]
+        except Exception:
+            return None
+
+    def _user_relations(self) -> Dict[str, tuple]:
+        """created_by_name / updated_by_name → (fk، User، أعمدة الاسم) كما تعرضها التابات."""
+        from database.models.user import User
+        return {
+            f"{fk[:-3]}_name": (fk, User, ("full_name", "username"))
+            for fk in ("created_by_id", "updated_by_id")
+            if self._model_column(fk) is not None
+        }
+
+    def _spec_search_clause(self, term: str):
+        """شرط OR لكل أعمدة البحث + أعمدة الجداول المرتبطة (subquery IN)."""
+        pat = f"%{term}%"
+        conds = []
+        for name in self.search_columns:
+            col = self._model_column(name)
+            if col is not None:
+                conds.append(col.ilike(pat))
+        relations = dict(self.search_relations)
+        relations.update({fk: (m, cols) for fk, m, cols in self._user_relations().values()})
+        for fk_name, (rel_model, rel_cols) in relations.items():
+            fk = self._model_column(fk_name)
+            if fk is None:
+                continue
+            rel_conds = [getattr(rel_model, c).ilike(pat) for c in rel_cols if hasattr(rel_model, c)]
+            if rel_conds:
+                conds.append(fk.in_(select(rel_model.id).where(or_(*rel_conds))))
+        return or_(*conds) if conds else None
+
+    def _spec_relation_sort(self, key: str, lang: str):
+        """
+        عمود عرض مشتق من جدول مرتبط (country_name, currency_code...) →
+        subquery مترابط: (SELECT coalesce(cols) FROM rel WHERE rel.id = fk).
+        {lang} في أسماء الأعمدة يُستبدل بلغة الواجهة.
+        """
+        rel = self.sort_relations.get(key) or self._user_relations().get(key)
+        if rel is None:
+            return None
+        fk_name, rel_model, rel_cols = rel
+        fk = self._model_column(fk_name)
+        cols = [getattr(rel_model, c.format(lang=lang)) for c in rel_cols
+                if hasattr(rel_model, c.format(lang=lang))]
+        if fk is None or not cols:
+            return None
+        # '' مثل NULL — كما تختار التابات أول اسم غير فارغ
+        cols = [func.nullif(c, "") for c in cols]
+        value = func.coalesce(*cols) if len(cols) > 1 else cols[0]
+        return select(value).where(rel_model.id == fk).scalar_subquery()
+
+    def _spec_order_by(self, spec: QuerySpec) -> list:
+        order = []
+        if spec.sort_key:
+            name = self.sort_columns.get(spec.sort_key, spec.sort_key)
+            col = self._model_column(name.format(lang=spec.lang))
+            if col is None:
+                col = self._spec_relation_sort(spec.sort_key, spec.lang)
+            if col is not None:
+                order.append(col.desc() if spec.sort_desc else col.asc())
+        id_col = self._model_column("id")
+        if id_col is not None:
+            # الافتراضي: الأحدث أولاً — وفاصل ثابت للترتيب حتى لا تتكرر الصفوف بين الصفحات
+            order.append(id_col.desc() if (spec.sort_desc or not order) else id_col.asc())
+        return order
+
+    def _spec_apply_filters(self, q, spec: QuerySpec):
+        for name, value in (spec.filters or {}).items():
+            col = self._model_column(name)
+            if col is not None and value is not None:
+                q = q.filter(col == value)
+        term = (spec.search or "").strip()
+        if term:
+            clause = self._spec_search_clause(term)
+            if clause is not None:
+                q = q.filter(clause)
+        return q
+
+    def query_page(self, spec: QuerySpec) -> Tuple[List[Any], int]:
+        """
+        يُرجع (صفوف الصفحة، الإجمالي المطابق) من round trip واحد:
+            SELECT t.*, count(*) OVER () FROM t WHERE ... ORDER BY ... LIMIT/OFFSET
+        صفحة فارغة بعد آخر صفحة فقط تحتاج count() منفصلاً.
+        """
+        with self.get_session() as session:
+            total_col = func.count().over().label("_total")
+            q = self._spec_apply_filters(session.query(self.model, total_col), spec)
+            q = q.order_by(*self._spec_order_by(spec))
+            result = q.offset(spec.offset).limit(spec.per_page).all()
+            if result:
+                return [r[0] for r in result], int(result[0][1])
+            if spec.page <= 1:
+                return [], 0
+            total = self._spec_apply_filters(session.query(self.model), spec).count()
+            return [], total
+
+    def keyset_key(self, obj) -> tuple:
+        """مفتاح keyset لصف: (قيمة عمود الترتيب، id). يُعاد تعريفه مع supports_keyset."""
+        return (None, getattr(obj, "id", None))
+
     def delete_many(self, ids: List[Any], *, current_user=None) -> int:
         """
         حذف سجلات متعددة في transaction واحد.
@@ -358,6 +565,7 @@ class BaseCRUD:
             except Exception:
                 session.rollback()
                 raise
+            self._invalidate_reference_cache()
             return deleted
 
     def bulk_insert(self, objs: List[Any], *, current_user=None):
@@ -376,6 +584,7 @@ class BaseCRUD:
                 except Exception:
                     pass
             session.commit()
+            self._invalidate_reference_cache()
 
     def count(self, filters: Optional[Dict] = None) -> int:
         with self.get_session() as session:
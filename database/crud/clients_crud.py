@@ -1,11 +1,21 @@
 from typing import Optional, Dict, Any, List
-from database.models import get_session_local, Client, ClientContact
+from database.models import get_session_local, Client, ClientContact, Country
 from database.crud.base_crud import BaseCRUD
 from sqlalchemy import select, func, cast, Integer
 
 class ClientsCRUD(BaseCRUD):
     """CRUD for clients (no manual code; id is PK)."""
 
+    search_columns = (
+        "name_ar", "name_en", "name_tr", "code", "city", "phone", "email", "website",
+        "tax_id", "address_ar", "address_en", "address_tr", "address", "notes",
+    )
+    search_relations = {"country_id": (Country, ("name_ar", "name_en", "name_tr"))}
+    sort_columns = {"name_local": "name_{lang}", "address_local": "address_{lang}"}
+    sort_relations = {
+        "country_name": ("country_id", Country, ("name_{lang}", "name_en", "name_ar", "name_tr")),
+    }
+
     def __init__(self):
         super().__init__(Client, get_session_local)
 
@@ -3,6 +3,9 @@ from typing import Optional, Dict, Any, Iterable, List
 from database.models import get_session_local
 from database.crud.base_crud import BaseCRUD
 from database.models.company import Company, CompanyRoleLink
+from database.models.client import Client
+from database.models.country import Country
+from database.models.currency import Currency
 
 
 _MINIMAL_FIELDS = {
@@ -34,6 +37,22 @@ class CompaniesCRUD(BaseCRUD):
 
     model = Company
 
+    search_columns = (
+        "name_ar", "name_en", "name_tr", "city", "phone", "email", "website",
+        "tax_id", "registration_number", "notes",
+    )
+    search_relations = {
+        "country_id":      (Country, ("name_ar", "name_en", "name_tr")),
+        "owner_client_id": (Client,  ("name_ar", "name_en", "name_tr")),
+        "default_currency_id": (Currency, ("code",)),
+    }
+    sort_columns = {"name_local": "name_{lang}", "is_active_label": "is_active"}
+    sort_relations = {
+        "country_name":  ("country_id",          Country,  ("name_{lang}", "name_ar", "name_en")),
+        "owner_name":    ("owner_client_id",     Client,   ("name_{lang}", "name_ar", "name_en")),
+        "currency_code": ("default_currency_id", Currency, ("code",)),
+    }
+
     def __init__(self):
         super().__init__(Company, get_session_local)
 
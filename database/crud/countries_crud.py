@@ -14,6 +14,8 @@ logger = logging.getLogger(__name__)
 class CountriesCRUD(BaseCRUD):
     """CRUD operations for countries with automatic uppercase conversion"""
 
+    search_columns = ("name_ar", "name_en", "name_tr", "code")
+
     def __init__(self):
         super().__init__(Country, get_session_local)
         logger.debug("CountriesCRUD initialized")
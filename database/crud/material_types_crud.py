@@ -17,6 +17,8 @@ class MaterialTypesCRUD(BaseCRUD):
       those explicitly when user_id is provided.
     """
 
+    search_columns = ("name_ar", "name_en", "name_tr")
+
     def __init__(self):
         # IMPORTANT: pass the session factory, not an already-open session
         super().__init__(MaterialType, get_session_local)
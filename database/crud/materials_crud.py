@@ -1,6 +1,7 @@
 from typing import Optional, Dict, Any, List
 
-from database.models import get_session_local, Material  # تأكد أن Material مضاف في database.models
+from database.models import get_session_local, Material, MaterialType  # تأكد أن Material مضاف في database.models
+from database.models.currency import Currency
 from database.crud.base_crud import BaseCRUD
 
 
@@ -11,6 +12,16 @@ class MaterialsCRUD(BaseCRUD):
     - stamping created_by/updated_by إذا كانت الحقول بدون *_id أو معها
     """
 
+    search_columns = ("code", "name_ar", "name_en", "name_tr")
+    search_relations = {
+        "material_type_id": (MaterialType, ("name_ar", "name_en", "name_tr")),
+        "currency_id":      (Currency, ("code",)),
+    }
+    sort_relations = {
+        "material_type_name": ("material_type_id", MaterialType, ("name_{lang}", "name_en", "name_ar", "name_tr")),
+        "currency_code":      ("currency_id",      Currency,     ("code",)),
+    }
+
     def __init__(self):
         super().__init__(Material, get_session_local)
 
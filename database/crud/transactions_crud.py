@@ -22,7 +22,7 @@ from services.numbering_service import NumberingService
 
 from database.models import get_session_local
 from database.models.transport_details import TransportDetails
-from database.crud.base_crud import BaseCRUD  # ← مباشر، بدون v5
+from database.crud.base_crud import BaseCRUD, apply_keyset  # ← مباشر، بدون v5
 
 # Models
 try:
@@ -86,7 +86,14 @@ def _extract_manual_no(data: Dict[str, Any]) -> str:
 
 
 def _get_pricing_code_by_id(session: Session) -> Dict[int, str]:
-    """Map {pricing_type_id: CODE} من DB."""
+    """Map {pricing_type_id: CODE} — من ReferenceCache، وإلا من session مباشرة."""
+    try:
+        from services.reference_cache import ReferenceCache
+        codes = ReferenceCache.get_instance().pricing_codes()
+        if codes:
+            return codes
+    except Exception:
+        pass
     rows: List[Tuple[int, Optional[str]]] = []
     if PricingType is not None:
         try:
@@ -253,9 +260,15 @@ def _recalc_totals_from_db(s: Session, trx_id: int) -> Tuple[float, float, float
 class TransactionsCRUD(BaseCRUD):
     """CRUD للمعاملات — يستخدم get_session() من BaseCRUD مباشرة."""
 
+    # list_transactions تقبل after/before = (transaction_date, id)
+    supports_keyset = True
+
     def __init__(self):
         super().__init__(Transaction, get_session_local)
 
+    def keyset_key(self, obj) -> tuple:
+        return (getattr(obj, "transaction_date", None), getattr(obj, "id", None))
+
     # -- Create (safe override) -------------------------------------------
 
     def create(self, data: Dict[str, Any], **kwargs) -> "Transaction":
@@ -704,7 +717,15 @@ class TransactionsCRUD(BaseCRUD):
         office_id       : Optional[int] = None,
         limit           : int = 100,
         offset          : int = 0,
+        after           : Optional[Tuple[Any, int]] = None,
+        before          : Optional[Tuple[Any, int]] = None,
     ) -> List["Transaction"]:
+        """
+        صفحة معاملات مرتبة transaction_date DESC, id DESC.
+
+        after/before: مفتاح keyset (transaction_date, id) لآخر/أول صف في
+        الصفحة المعروضة — يُتجاهل offset عند تمريرهما (انظر apply_keyset).
+        """
         with self.get_session() as s:
             q = select(Transaction)
             if client_id:
@@ -742,6 +763,13 @@ class TransactionsCRUD(BaseCRUD):
                         Company.name_tr.ilike(pat),
                     )
                 )
+            if after is not None or before is not None:
+                q, reverse = apply_keyset(
+                    q, Transaction.transaction_date, Transaction.id,
+                    after=after, before=before,
+                )
+                rows = list(s.execute(q.limit(limit)).scalars().all())
+                return rows[::-1] if reverse else rows
             q = q.order_by(
                 Transaction.transaction_date.desc(),
                 Transaction.id.desc(),
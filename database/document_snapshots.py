@@ -0,0 +1,160 @@
+"""
+database/document_snapshots.py — LOGIPORT
+==========================================
+لقطات المستندات (data / totals) مضغوطة ومُعنونة بالمحتوى.
+
+documents.data_json كان يحمل context المستند كاملاً (بنود + أطراف + بنك
++ ختم base64) كنص غير مضغوط في كل صف — يتضخم مع آلاف المستندات ويبطئ
+النسخ الاحتياطي والمزامنة وقراءة صفحات documents.
+
+  - document_snapshots(hash, codec, raw_size, body): JSON قانوني
+    (sort_keys) → sha256 → zlib. نفس المحتوى يُخزَّن مرة واحدة (إعادة
+    توليد بلا تغيير، totals متطابقة بين لغات المعاملة...)
+  - documents.data_hash / totals_hash تشير إليها؛ data_json / totals_json
+    تبقى NULL للصفوف الجديدة (القديمة تُنقل عبر migrate_legacy_snapshots)
+  - triggers على documents (bootstrap) تحذف اللقطة حين لا يشير إليها أي صف
+  - القراءة عند الطلب فقط — عند فتح تفاصيل المستند
+
+الاستخدام:
+    from database.document_snapshots import load_document_data
+    load_document_data(document_id)     # dict — {} إن لم توجد لقطة
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import zlib
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+_ZLIB_LEVEL = 6
+
+# نفس الـ SQL لـ sqlite3 (bootstrap) و SQLAlchemy text() — معاملات :name
+INSERT_SNAPSHOT_SQL = (
+    "INSERT OR IGNORE INTO document_snapshots (hash, codec, raw_size, body) "
+    "VALUES (:hash, :codec, :raw_size, :body)"
+)
+
+
+class Snapshot(NamedTuple):
+    hash: str
+    codec: str          # "zlib" | "raw" (لقطات صغيرة لا يفيدها الضغط)
+    raw_size: int
+    body: bytes
+
+    def params(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+# ─── الترميز ─────────────────────────────────────────────────────────────────
+
+def encode_snapshot(obj: Any, encoder: Optional[Type[json.JSONEncoder]] = None) -> Optional[Snapshot]:
+    """JSON قانوني مضغوط — None للقيم الفارغة (None / {} / [])."""
+    if not obj:
+        return None
+    raw = json.dumps(obj, ensure_ascii=False, sort_keys=True,
+                     separators=(",", ":"), cls=encoder).encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    packed = zlib.compress(raw, _ZLIB_LEVEL)
+    if len(packed) < len(raw):
+        return Snapshot(digest, "zlib", len(raw), packed)
+    return Snapshot(digest, "raw", len(raw), raw)
+
+
+def decode_snapshot(codec: str, body: bytes) -> Any:
+    if codec == "zlib":
+        body = zlib.decompress(body)
+    elif codec != "raw":
+        raise ValueError(f"Unknown document snapshot codec: {codec!r}")
+    return json.loads(bytes(body).decode("utf-8"))
+
+
+def snapshot_params(snaps: Iterable[Optional[Snapshot]]) -> list:
+    """معاملات INSERT_SNAPSHOT_SQL بلا تكرار (نفس الـ hash مرة واحدة)."""
+    seen: Dict[str, Dict[str, Any]] = {}
+    for snap in snaps:
+        if snap is not None and snap.hash not in seen:
+            seen[snap.hash] = snap.params()
+    return list(seen.values())
+
+
+# ─── القراءة عند الطلب ───────────────────────────────────────────────────────
+
+def _load(document_id: int, hash_col: str, legacy_col: str) -> Dict[str, Any]:
+    from sqlalchemy import text
+    from database.models import get_session_local
+
+    with get_session_local()() as s:
+        row = s.execute(
+            text(f"SELECT d.{legacy_col}, s.codec, s.body FROM documents d "
+                 f"LEFT JOIN document_snapshots s ON s.hash = d.{hash_col} "
+                 f"WHERE d.id = :i"),
+            {"i": int(document_id)},
+        ).first()
+    if row is None:
+        return {}
+    legacy, codec, body = row
+    try:
+        if body is not None:
+            return decode_snapshot(codec, body) or {}
+        # صف لم يُنقل بعد (migration لم تكتمل) — JSON نصي قديم
+        return json.loads(legacy) if legacy else {}
+    except Exception as e:
+        logger.warning("Document %s: unreadable %s snapshot: %s", document_id, hash_col, e)
+        return {}
+
+
+def load_document_data(document_id: int) -> Dict[str, Any]:
+    """context المستند كما حُفظ عند التوليد — {} إن لم يوجد."""
+    return _load(document_id, "data_hash", "data_json")
+
+
+def load_document_totals(document_id: int) -> Dict[str, Any]:
+    """مجاميع المستند كما حُفظت عند التوليد — {} إن لم توجد."""
+    return _load(document_id, "totals_hash", "totals_json")
+
+
+# ─── نقل data_json / totals_json القديمة (bootstrap) ─────────────────────────
+
+def migrate_legacy_snapshots(conn, batch_size: int = 200) -> int:
+    """
+    ينقل JSON النصي من documents إلى document_snapshots ويُفرغ الأعمدة القديمة.
+    conn: sqlite3.Connection (bootstrap). يُرجع عدد الصفوف المنقولة.
+    صف بـ JSON تالف يبقى كما هو (load_document_data يقرؤه كنص).
+    """
+    moved = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, data_json, totals_json FROM documents "
+            "WHERE id > ? AND (data_json IS NOT NULL OR totals_json IS NOT NULL) "
+            "ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        snaps, updates = [], []
+        for doc_id, data_json, totals_json in rows:
+            last_id = doc_id
+            try:
+                data = encode_snapshot(json.loads(data_json) if data_json else None)
+                totals = encode_snapshot(json.loads(totals_json) if totals_json else None)
+            except ValueError:
+                continue
+            snaps += [data, totals]
+            updates.append({
+                "id": doc_id,
+                "data_hash": data.hash if data else None,
+                "totals_hash": totals.hash if totals else None,
+            })
+        conn.executemany(INSERT_SNAPSHOT_SQL, snapshot_params(snaps))
+        conn.executemany(
+            "UPDATE documents SET data_hash = :data_hash, totals_hash = :totals_hash, "
+            "data_json = NULL, totals_json = NULL WHERE id = :id",
+            updates,
+        )
+        conn.commit()
+        moved += len(updates)
+    return moved
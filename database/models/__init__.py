@@ -49,9 +49,9 @@ except Exception:
     DocumentType = None  # type: ignore
 
 try:
-    from .document import Document, DocumentTemplate  # type: ignore
+    from .document import Document, DocumentTemplate, DocumentSnapshot  # type: ignore
 except Exception:
-    Document = DocumentTemplate = None  # type: ignore
+    Document = DocumentTemplate = DocumentSnapshot = None  # type: ignore
 
 # جداول المزامنة المستقبلية — تُنشأ مع البقية عبر Base.metadata.create_all()
 try:
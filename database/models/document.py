@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, LargeBinary
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 from database.models.base import Base
 
@@ -10,7 +10,8 @@ class Document(Base):
 
     Columns (from DB):
       id, group_id, document_type_id, language, template_id, status,
-      file_path, totals_json, totals_text, data_json,
+      file_path, totals_json, totals_text, data_json, render_hash,
+      data_hash, totals_hash,
       created_by_id, created_at, updated_by_id, updated_at
     """
     __tablename__ = "documents"
@@ -26,9 +27,15 @@ class Document(Base):
     status = Column(Text, nullable=False, default="draft")
     file_path = Column(Text, nullable=True)
 
-    totals_json = Column(Text, nullable=True)
+    # JSON نصي قديم — الصفوف الجديدة تستخدم data_hash/totals_hash (لا يُحمَّل إلا عند طلبه)
+    totals_json = deferred(Column(Text, nullable=True))
     totals_text = Column(Text, nullable=True)
-    data_json = Column(Text, nullable=True)
+    data_json = deferred(Column(Text, nullable=True))
+    # لقطات مضغوطة في document_snapshots — database/document_snapshots.py
+    data_hash = Column(Text, nullable=True, index=True)
+    totals_hash = Column(Text, nullable=True, index=True)
+    # بصمة مدخلات التوليد (context + قالب + لغة) — كاش facade.render_document
+    render_hash = Column(Text, nullable=True)
 
     created_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -53,4 +60,18 @@ class DocumentTemplate(Base):
     storage_path = Column(Text, nullable=True)
     is_active = Column(Integer, nullable=False, default=1)
 
-    document_type = relationship("DocumentType")
\ No newline at end of file
+    document_type = relationship("DocumentType")
+
+
+class DocumentSnapshot(Base):
+    """لقطة JSON مضغوطة (context/totals) يشير إليها documents.data_hash/totals_hash."""
+    __tablename__ = "document_snapshots"
+
+    hash = Column(Text, primary_key=True)          # sha256 للـ JSON القانوني
+    codec = Column(Text, nullable=False, default="zlib")
+    raw_size = Column(Integer, nullable=False, default=0)
+    body = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<DocumentSnapshot(hash={self.hash[:12]!r}, codec={self.codec!r})>"
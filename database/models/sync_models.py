@@ -8,14 +8,97 @@ database/models/sync_models.py — LOGIPORT
   - op_log     : سجل العمليات المحلية المنتظرة للإرسال
 
 تُنشأ تلقائياً عبر init_db() في Bootstrap.
-مخصص لإصدارات مستقبلية — لا تُستخدم حالياً.
+
+op_log = journal التغييرات للجداول المرجعية (JOURNALED_TABLES)
+وoutbox الجداول ثنائية الاتجاه (OUTBOX_TABLES):
+  triggers (AFTER INSERT/UPDATE/DELETE) يُنشئها bootstrap تكتب صفاً
+  لكل تغيير داخل نفس الـ transaction — أي كتابة (BaseCRUD،
+  TransactionsCRUD، SQL مباشر) تُسجَّل ذرّياً مع البيانات.
+  SyncService يضغط القيود المتعددة لنفس الصف (compaction)، يرفع فقط
+  الصفوف المسجَّلة ثم يحذف قيودها، ويرفع الحذف (op='delete') بـ server_id.
 """
 from __future__ import annotations
 
+from typing import Dict
+
 from sqlalchemy import Column, Integer, String, Text, DateTime, func
 
 from database.models.base import Base
 
+# جداول مرجعية تُتتبَّع تغييراتها في op_log بدل الرفع الكامل كل دورة
+JOURNALED_TABLES: tuple = (
+    "countries", "currencies", "material_types", "packaging_types",
+    "delivery_methods", "pricing_types", "document_types", "roles",
+    "permissions", "company_roles", "offices", "materials",
+    "clients", "companies",
+)
+
+# جداول ثنائية الاتجاه — create/update/delete تمر عبر op_log (outbox)
+# بدل مسح updated_at > cursor (الجداول بدون id تبقى على الـ cursor)
+# doc_groups غير مُضمَّن: لا يُرفع أصلاً (بدون updated_at محلياً) —
+# وإلا تراكمت قيوده في op_log بلا مستهلك
+OUTBOX_TABLES: tuple = (
+    "clients", "companies", "client_contacts", "company_banks",
+    "company_role_links", "company_partner_links",
+    "entries", "entry_items", "transactions", "transaction_items",
+    "transaction_entries", "transport_details",
+    "container_tracking", "shipment_containers", "tasks",
+)
+
+
+# ── أعمدة موجودة في SQLite فقط — لا تُرسل لـ Supabase أبداً ─────────────────
+# (SyncService يحذفها من الصفوف المرفوعة؛ bootstrap يستثنيها من trigger
+#  التحديث — تغييرها وحده لا يُسجَّل في op_log ولا يُعاد رفع الصف بسببه)
+
+# أعمدة مشتركة بين كل الجداول (قديمة/محلية)
+GLOBAL_LOCAL_ONLY_COLUMNS: set = {
+    "synced_at",      # عمود قديم من نسخة سابقة
+}
+
+# أعمدة خاصة بجداول محددة — موجودة في SQLite لكن ليست في Supabase schema
+LOCAL_ONLY_COLUMNS: Dict[str, set] = {
+    "documents": {
+        "template_id", "totals_json", "totals_text", "data_json",
+        "status", "file_path", "render_hash", "data_hash", "totals_hash",
+    },
+    "container_tracking": {
+        "booking_no", "container_no", "vessel_name", "voyage_no",
+        "port_of_loading", "final_destination",
+        "atd", "ata", "customs_date", "delivery_date",
+    },
+    "delivery_methods": {
+        "code",
+    },
+    "pricing_types": {
+        "compute_by", "price_unit", "divisor", "sort_order",
+    },
+    "roles": {
+        "label_ar", "label_en", "label_tr",
+    },
+    "users": {
+        "created_by", "updated_by",
+    },
+    "companies": {
+        # [J2] stamp_image موجود في SQLite — لم يُطبَّق migration في Supabase بعد
+        "stamp_image",
+    },
+    "transactions": {
+        # فهرس محلي للترقيم التلقائي (NumberingService) — يُحسب من transaction_no
+        "numeric_no",
+    },
+}
+
+
+def journal_update_columns(table: str, columns) -> list:
+    """أعمدة trigger الـ UPDATE OF لجدول — كل أعمدته ما عدا المحلية فقط."""
+    skip = LOCAL_ONLY_COLUMNS.get(table, set()) | GLOBAL_LOCAL_ONLY_COLUMNS
+    return [c for c in columns if c not in skip]
+
+
+def journal_trigger_name(table: str, op: str) -> str:
+    """اسم trigger الـ journal — op: ins | upd | del."""
+    return f"trg_oplog_{table}_{op}"
+
 
 class SyncState(Base):
     """آخر إصدار مُزامَن لكل كيان (entity)."""
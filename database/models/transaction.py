@@ -20,6 +20,9 @@ class Transaction(Base):
 
     # Header / identity
     transaction_no = Column(String(32), unique=True, nullable=False, index=True)
+    # الجزء الرقمي من transaction_no (0 = رقم يدوي) — يملؤه NumberingService
+    # كسولاً ويُصفَّر بـ trigger عند تغيير transaction_no. MAX() عليه = آخر رقم.
+    numeric_no = Column(Integer, nullable=True, index=True)
     transaction_date = Column(Date, nullable=False, index=True)
     transaction_type = Column(String(16), nullable=False, default="export", index=True)
     status = Column(String(16), nullable=False, default="active")  # بقيت لأجل التوافق مع الـ DB
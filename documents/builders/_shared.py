@@ -13,6 +13,10 @@
         currency_info, delivery_method_name,
         pick_dest_col,
     )
+
+الـ helpers التي تأخذ s (Session) تستعلم عند كل استدعاء — builders تقرأ
+من TransactionSnapshot (context_loader.py) الذي يستخدم نفس دوال التنسيق
+(format_bank / company_dict / client_dict / localized_name) على صفوف مجلوبة مسبقاً.
 """
 from __future__ import annotations
 
@@ -71,21 +75,97 @@ def join_with_and(names: List[str], lang: str) -> str:
 
 
 # ─────────────────────────────────────────────
-# 2. Database helpers
+# 2. Row formatting (بدون DB)
+# ─────────────────────────────────────────────
+
+def localized_name(r: Optional[Mapping], lang: str, base: str = "name") -> str:
+    """{base}_{lang} ثم en ثم ar ثم tr."""
+    if not r:
+        return ""
+    return (r.get(f"{base}_{lang}") or r.get(f"{base}_en")
+            or r.get(f"{base}_ar") or r.get(f"{base}_tr") or "")
+
+
+def format_bank(b: Optional[Mapping]) -> str:
+    """صف company_banks → نص متعدد الأسطر (المستفيد، البنك — الفرع، IBAN، SWIFT، الحساب)."""
+    if not b:
+        return ""
+    lines = []
+    if b.get("beneficiary_name"): lines.append(b["beneficiary_name"])
+    if b.get("bank_name"):
+        line = b["bank_name"]
+        if b.get("branch"): line += f" — {b['branch']}"
+        lines.append(line)
+    if b.get("iban"):           lines.append(f"IBAN: {b['iban']}")
+    if b.get("swift_bic"):      lines.append(f"SWIFT/BIC: {b['swift_bic']}")
+    if b.get("account_number"): lines.append(f"A/C: {b['account_number']}")
+    return "\n".join(lines)
+
+
+def stamp_data_url(raw: Optional[str]) -> str:
+    """companies.stamp_image (base64 أو data URL) → data URL."""
+    raw = raw or ""
+    if not raw:
+        return ""
+    return raw if raw.startswith("data:") else f"data:image/png;base64,{raw}"
+
+
+def company_dict(r: Mapping, lang: str, *, country: str, bank_info: str) -> Dict[str, Any]:
+    """صف companies (كل الأعمدة) → dict الشركة الموحّد لكل builders."""
+    address = localized_name(r, lang, "address") or r.get("address") or ""
+    return {
+        "id":                  r.get("id"),
+        "name":                localized_name(r, lang),
+        "name_ar":             r.get("name_ar", ""),
+        "name_en":             r.get("name_en", ""),
+        "name_tr":             r.get("name_tr", ""),
+        "address":             address,
+        "city":                r.get("city") or "",
+        "country":             country,
+        "country_id":          r.get("country_id"),
+        "phone":               r.get("phone") or "",
+        "email":               r.get("email") or "",
+        "website":             r.get("website") or "",
+        "tax_id":              r.get("tax_id") or "",
+        "tax_no":              r.get("tax_id") or "",
+        "vat_no":              r.get("tax_id") or "",
+        "cr_no":               r.get("registration_number") or "",
+        "registration_number": r.get("registration_number") or "",
+        "bank_info":           bank_info,
+        "stamp_image":         stamp_data_url(r.get("stamp_image")),
+    }
+
+
+def client_dict(r: Mapping, lang: str, *, country: str) -> Dict[str, Any]:
+    """صف clients (كل الأعمدة) → dict العميل. address_{lang} فارغ (NULL) ← address."""
+    addr = {k: (r.get(f"address_{k}") if r.get(f"address_{k}") is not None else r.get("address"))
+            for k in ("ar", "en", "tr")}
+    return {
+        "id":      r.get("id"),
+        "name":    localized_name(r, lang),
+        "name_ar": r.get("name_ar", ""),
+        "name_en": r.get("name_en", ""),
+        "name_tr": r.get("name_tr", ""),
+        "address": addr.get(lang) or addr["en"] or addr["ar"] or addr["tr"] or "",
+        "city":    r.get("city") or "",
+        "country": country,
+        "phone":   r.get("phone") or "",
+        "email":   r.get("email") or "",
+        "website": r.get("website") or "",
+        "tax_id":  r.get("tax_id") or "",
+    }
+
+
+# ─────────────────────────────────────────────
+# 3. Database helpers
 # ─────────────────────────────────────────────
 
 def country_name(s: Any, country_id: Optional[int], lang: str) -> str:
-    """يُعيد اسم الدولة بالـ lang المطلوبة مع fallback."""
+    """يُعيد اسم الدولة بالـ lang المطلوبة مع fallback (من ReferenceCache — بلا SELECT)."""
     if not country_id:
         return ""
-    from sqlalchemy import text
-    r = s.execute(
-        text("SELECT name_ar, name_en, name_tr FROM countries WHERE id=:i"),
-        {"i": country_id}
-    ).mappings().first()
-    if not r:
-        return ""
-    return r.get(f"name_{lang}") or r.get("name_en") or r.get("name_ar") or r.get("name_tr") or ""
+    from services.reference_cache import ReferenceCache
+    return ReferenceCache.get_instance().name("countries", country_id, lang)
 
 
 def get_bank_info(s: Any, company_id: Optional[int]) -> str:
@@ -105,18 +185,9 @@ def get_bank_info(s: Any, company_id: Optional[int]) -> str:
             LIMIT 1
         """), {"cid": int(company_id)}).mappings().all()
         if banks:
-            b = banks[0]
-            lines = []
-            if b.get("beneficiary_name"): lines.append(b["beneficiary_name"])
-            if b.get("bank_name"):
-                line = b["bank_name"]
-                if b.get("branch"): line += f" — {b['branch']}"
-                lines.append(line)
-            if b.get("iban"):           lines.append(f"IBAN: {b['iban']}")
-            if b.get("swift_bic"):      lines.append(f"SWIFT/BIC: {b['swift_bic']}")
-            if b.get("account_number"): lines.append(f"A/C: {b['account_number']}")
+            lines = format_bank(banks[0])
             if lines:
-                return "\n".join(lines)
+                return lines
     except Exception:
         pass
 
@@ -136,74 +207,19 @@ def company_obj(s: Any, company_id: Optional[int], lang: str) -> Dict[str, Any]:
     """
     يُعيد dict كامل لشركة مع bank_info + stamp_image.
     يُستخدم في جميع builders (فواتير + CMR + Form A + ...).
-    stamp_image يُقرأ بـ query منفصلة آمنة حتى لو العمود لم يُضَف بعد في DB القديمة.
+    SELECT * — stamp_image يغيب بأمان في DB القديمة التي لم يُضَف فيها العمود بعد.
     """
     if not company_id:
         return {"name": "", "address": "", "stamp_image": ""}
     from sqlalchemy import text
 
-    r = s.execute(text("""
-        SELECT id,
-               name_ar, name_en, name_tr,
-               address_ar, address_en, address_tr,
-               country_id, city, phone, email, website, tax_id, registration_number,
-               bank_info
-        FROM companies WHERE id=:id
-    """), {"id": company_id}).mappings().first()
+    r = s.execute(text("SELECT * FROM companies WHERE id=:id"),
+                  {"id": company_id}).mappings().first()
     if not r:
         return {"name": "", "address": "", "stamp_image": ""}
-
-    name    = r.get(f"name_{lang}")    or r.get("name_en")    or r.get("name_ar")    or r.get("name_tr")    or ""
-    address = r.get(f"address_{lang}") or r.get("address_en") or r.get("address_ar") or r.get("address_tr") or ""
-    if not address:
-        try:
-            r2 = s.execute(text("SELECT address FROM companies WHERE id=:id"),
-                           {"id": company_id}).mappings().first()
-            if r2 and r2.get("address"):
-                address = r2["address"]
-        except Exception:
-            pass
-
-    bank = get_bank_info(s, company_id)
-
-    # قراءة الختم بـ query منفصلة آمنة — لو العمود غير موجود بعد في DB القديمة لا يكسر شيء
-    stamp_data_url = ""
-    try:
-        rs = s.execute(
-            text("SELECT stamp_image FROM companies WHERE id=:id"),
-            {"id": company_id}
-        ).mappings().first()
-        raw_stamp = (rs.get("stamp_image") or "") if rs else ""
-        if raw_stamp:
-            if raw_stamp.startswith("data:"):
-                stamp_data_url = raw_stamp
-            else:
-                stamp_data_url = f"data:image/png;base64,{raw_stamp}"
-    except Exception:
-        # العمود غير موجود في DB بعد — نتجاهل بصمت
-        stamp_data_url = ""
-
-    return {
-        "id":                  r.get("id"),
-        "name":                name,
-        "name_ar":             r.get("name_ar", ""),
-        "name_en":             r.get("name_en", ""),
-        "name_tr":             r.get("name_tr", ""),
-        "address":             address,
-        "city":                r.get("city") or "",
-        "country":             country_name(s, r.get("country_id"), lang),
-        "country_id":          r.get("country_id"),
-        "phone":               r.get("phone") or "",
-        "email":               r.get("email") or "",
-        "website":             r.get("website") or "",
-        "tax_id":              r.get("tax_id") or "",
-        "tax_no":              r.get("tax_id") or "",
-        "vat_no":              r.get("tax_id") or "",
-        "cr_no":               r.get("registration_number") or "",
-        "registration_number": r.get("registration_number") or "",
-        "bank_info":           bank,
-        "stamp_image":         stamp_data_url,
-    }
+    return company_dict(r, lang,
+                        country=country_name(s, r.get("country_id"), lang),
+                        bank_info=get_bank_info(s, company_id))
 
 
 def client_obj(s: Any, client_id: Optional[int], lang: str) -> Dict[str, Any]:
@@ -211,34 +227,11 @@ def client_obj(s: Any, client_id: Optional[int], lang: str) -> Dict[str, Any]:
     if not client_id:
         return {"name": "", "address": ""}
     from sqlalchemy import text
-    r = s.execute(text("""
-        SELECT id,
-               name_ar, name_en, name_tr,
-               COALESCE(address_ar, address) AS address_ar,
-               COALESCE(address_en, address) AS address_en,
-               COALESCE(address_tr, address) AS address_tr,
-               country_id, city, phone, email, website, tax_id
-        FROM clients WHERE id=:id
-    """), {"id": client_id}).mappings().first()
+    r = s.execute(text("SELECT * FROM clients WHERE id=:id"),
+                  {"id": client_id}).mappings().first()
     if not r:
         return {"name": "", "address": ""}
-
-    name    = r.get(f"name_{lang}")    or r.get("name_en")    or r.get("name_ar")    or r.get("name_tr")    or ""
-    address = r.get(f"address_{lang}") or r.get("address_en") or r.get("address_ar") or r.get("address_tr") or ""
-    return {
-        "id":      r.get("id"),
-        "name":    name,
-        "name_ar": r.get("name_ar", ""),
-        "name_en": r.get("name_en", ""),
-        "name_tr": r.get("name_tr", ""),
-        "address": address,
-        "city":    r.get("city") or "",
-        "country": country_name(s, r.get("country_id"), lang),
-        "phone":   r.get("phone") or "",
-        "email":   r.get("email") or "",
-        "website": r.get("website") or "",
-        "tax_id":  r.get("tax_id") or "",
-    }
+    return client_dict(r, lang, country=country_name(s, r.get("country_id"), lang))
 
 
 def currency_info(s: Any, currency_id: Optional[int], lang: str) -> Tuple[str, str, str]:
@@ -248,18 +241,18 @@ def currency_info(s: Any, currency_id: Optional[int], lang: str) -> Tuple[str, s
     if not currency_id:
         return "", "", ""
     from sqlalchemy import text
-    # اكتشف وجود عمود symbol
-    cols = {r["name"] for r in s.execute(text("PRAGMA table_info(currencies)")).mappings().all()}
-    q = text("SELECT code, name_ar, name_en, name_tr, symbol FROM currencies WHERE id=:id") \
-        if "symbol" in cols else \
-        text("SELECT code, name_ar, name_en, name_tr FROM currencies WHERE id=:id")
-    r = s.execute(q, {"id": currency_id}).mappings().first()
+    # SELECT * — عمود symbol غير موجود في الـ schema القديمة
+    r = s.execute(text("SELECT * FROM currencies WHERE id=:id"),
+                  {"id": currency_id}).mappings().first()
+    return currency_tuple(r, lang)
+
+
+def currency_tuple(r: Optional[Mapping], lang: str) -> Tuple[str, str, str]:
+    """صف currencies → (code, localized_name, symbol_or_code)."""
     if not r:
         return "", "", ""
-    code   = r["code"] or ""
-    name   = r.get(f"name_{lang}") or r.get("name_en") or r.get("name_ar") or r.get("name_tr") or ""
-    symbol = (r.get("symbol") if "symbol" in cols else None) or code
-    return code, name, symbol
+    code = r.get("code") or ""
+    return code, localized_name(r, lang), r.get("symbol") or code
 
 
 def delivery_method_name(s: Any, dm_id: Optional[int], lang: str) -> str:
@@ -271,9 +264,7 @@ def delivery_method_name(s: Any, dm_id: Optional[int], lang: str) -> str:
         text("SELECT name_ar, name_en, name_tr FROM delivery_methods WHERE id=:id"),
         {"id": dm_id}
     ).mappings().first()
-    if not r:
-        return ""
-    return r.get(f"name_{lang}") or r.get("name_en") or r.get("name_ar") or r.get("name_tr") or ""
+    return localized_name(r, lang)
 
 
 def pick_dest_col(s: Any) -> str:
@@ -284,7 +275,7 @@ def pick_dest_col(s: Any) -> str:
 
 
 # ─────────────────────────────────────────────
-# 3. Pricing helpers
+# 4. Pricing helpers
 # ─────────────────────────────────────────────
 
 def label_from_pricing_code(code: str) -> str:
@@ -335,7 +326,7 @@ def compute_line_amount(
 
 
 # ─────────────────────────────────────────────
-# 4. Tafqit (تفقيط)
+# 5. Tafqit (تفقيط)
 # ─────────────────────────────────────────────
 
 def tafqit_amount(total_value: float, currency_code: str, lang: str) -> str:
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+documents/builders/context_loader.py — LOGIPORT
+================================================
+TransactionContextLoader — لقطة (snapshot) ثابتة لكل ما تقرؤه builders من
+المعاملة، بعدد ثابت من الاستعلامات مهما كان عدد المعاملات أو البنود:
+
+    1. transactions       (+ delivery_methods عبر LEFT JOIN)
+    2. transaction_items  (+ materials / packaging_types / pricing_types / entry_items)
+    3. transport_details
+    4. companies          (مصدّر / مستورد / وسيط / ناقل ...)
+    5. clients
+    6. company_banks      (البنك الأساسي لكل شركة)
+    7. countries          (كل الدول المشار إليها)
+    8. currencies         (عملة المعاملة + عملات البنود)
+
+بدل SELECT لكل حقل (PRAGMA + دولة + عملة + طريقة تسليم + شركة + بنك ...)
+في كل build، تقرأ builders من TransactionSnapshot — واللقطة نفسها تُعاد لكل
+أنواع المستندات واللغات في نفس المهمة:
+
+    snaps = TransactionContextLoader.load([1, 2, 3])     # 8 استعلامات لكل 500 معاملة
+    with TransactionContextLoader.scope(snaps):
+        build_ctx(...)                                  # بلا استعلامات
+
+    with TransactionContextLoader.scope():              # حوار التوليد
+        render_document(...) × المستندات × اللغات        # تحميل واحد للمعاملة
+
+    snap = TransactionContextLoader.snapshot_for(tid)   # داخل builder — None إن لم توجد
+
+اللقطة غير قابلة للتعديل (MappingProxyType + tuple) — آمنة للمشاركة بين
+threads الدفعة. الدوال التي تُرجع dict (company_obj ...) تُنشئ نسخة جديدة.
+الـ scope مربوط بـ contextvars — كل thread/مهمة يرى scope الخاص به فقط.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from documents.builders._shared import (
+    client_dict, company_dict, currency_tuple, format_bank, localized_name,
+)
+
+logger = logging.getLogger(__name__)
+
+_CHUNK = 500     # حد IN (...) لكل استعلام
+
+# أعمدة transactions التي تشير إلى companies (الموجود منها فقط يُقرأ)
+_TX_COMPANY_COLS = (
+    "exporter_company_id", "importer_company_id", "broker_company_id",
+    "intermediary_supplier_id", "notify_company_id", "order_by_company_id",
+    "on_behalf_company_id", "on_behalf_of_company_id", "third_party_company_id",
+)
+_TD_COMPANY_COLS = ("carrier_company_id", "carrier_company_id_2")
+
+# أعمدة مرجعية تُضاف لكل بند بالبادئة (m_ / pk_ / pt_ / ei_)
+_ITEM_JOINS = """
+    m.id          AS m_id,
+    m.code        AS m_code,
+    m.name_ar     AS m_name_ar,
+    m.name_en     AS m_name_en,
+    m.name_tr     AS m_name_tr,
+    pk.name_ar    AS pk_name_ar,
+    pk.name_en    AS pk_name_en,
+    pk.name_tr    AS pk_name_tr,
+    pt.code       AS pt_code,
+    pt.name_ar    AS pt_name_ar,
+    pt.name_en    AS pt_name_en,
+    pt.name_tr    AS pt_name_tr,
+    pt.compute_by AS pt_compute_by,
+    pt.price_unit AS pt_price_unit,
+    pt.divisor    AS pt_divisor,
+    ei.mfg_date   AS ei_mfg_date,
+    ei.exp_date   AS ei_exp_date
+"""
+
+_EMPTY: Mapping[Any, Any] = MappingProxyType({})
+
+
+def _frozen(row: Mapping) -> Mapping[str, Any]:
+    return MappingProxyType(dict(row))
+
+
+def _in(ids: List[Any]) -> Tuple[str, Dict[str, Any]]:
+    """(":i0,:i1,...", params) لـ IN (...)."""
+    return (",".join(f":i{n}" for n in range(len(ids))),
+            {f"i{n}": v for n, v in enumerate(ids)})
+
+
+def _ids(values: Iterable[Any]) -> List[int]:
+    out = set()
+    for v in values:
+        if v in (None, "", 0):
+            continue
+        try:
+            out.add(int(v))
+        except (TypeError, ValueError):
+            pass
+    return sorted(out)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SNAPSHOT
+# ─────────────────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class TransactionSnapshot:
+    """
+    بيانات معاملة واحدة كما تحتاجها builders.
+      transaction : كل أعمدة transactions + no + destination_country_id
+      items       : صفوف transaction_items (ORDER BY id) + أعمدة m_/pk_/pt_/ei_
+      transport   : صف transport_details أو None
+      delivery_method : صف delivery_methods أو None
+      companies / clients / banks / countries / currencies : {id: صف}
+    """
+    transaction: Mapping[str, Any]
+    items: Tuple[Mapping[str, Any], ...] = ()
+    transport: Optional[Mapping[str, Any]] = None
+    delivery_method: Optional[Mapping[str, Any]] = None
+    companies: Mapping[int, Mapping[str, Any]] = field(default_factory=lambda: _EMPTY)
+    clients: Mapping[int, Mapping[str, Any]] = field(default_factory=lambda: _EMPTY)
+    banks: Mapping[int, Mapping[str, Any]] = field(default_factory=lambda: _EMPTY)
+    countries: Mapping[int, Mapping[str, Any]] = field(default_factory=lambda: _EMPTY)
+    currencies: Mapping[int, Mapping[str, Any]] = field(default_factory=lambda: _EMPTY)
+
+    @property
+    def id(self) -> int:
+        return int(self.transaction["id"])
+
+    @property
+    def no(self) -> str:
+        return str(self.transaction["no"])
+
+    # ── مراجع ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _get(m: Mapping[int, Mapping], key: Any) -> Optional[Mapping[str, Any]]:
+        if key in (None, ""):
+            return None
+        try:
+            return m.get(int(key))
+        except (TypeError, ValueError):
+            return None
+
+    def country(self, country_id: Any) -> Optional[Mapping[str, Any]]:
+        return self._get(self.countries, country_id)
+
+    def currency(self, currency_id: Any) -> Optional[Mapping[str, Any]]:
+        return self._get(self.currencies, currency_id)
+
+    def country_name(self, country_id: Any, lang: str) -> str:
+        """نفس _shared.country_name — name_{lang} ثم en ثم ar ثم tr."""
+        return localized_name(self.country(country_id), lang)
+
+    def currency_info(self, currency_id: Any, lang: str) -> Tuple[str, str, str]:
+        """نفس _shared.currency_info → (code, localized_name, symbol_or_code)."""
+        return currency_tuple(self.currency(currency_id), lang)
+
+    def delivery_method_name(self, lang: str) -> str:
+        return localized_name(self.delivery_method, lang)
+
+    def item_currency_ids(self) -> List[int]:
+        """عملات البنود المميزة بترتيب البنود (بديل SELECT DISTINCT ... JOIN currencies)."""
+        seen: Dict[int, None] = {}
+        for it in self.items:
+            cid = it.get("currency_id")
+            if cid and self.currency(cid) is not None:
+                seen.setdefault(int(cid), None)
+        return list(seen)
+
+    # ── الأطراف ────────────────────────────────────────────────────────────
+
+    def bank_info(self, company_id: Any) -> str:
+        """نفس _shared.get_bank_info: البنك الأساسي ثم companies.bank_info."""
+        if not company_id:
+            return ""
+        text = format_bank(self._get(self.banks, company_id))
+        if text:
+            return text
+        r = self._get(self.companies, company_id)
+        return (r.get("bank_info") or "") if r else ""
+
+    def company_obj(self, company_id: Any, lang: str) -> Dict[str, Any]:
+        """نفس _shared.company_obj — dict جديد في كل استدعاء."""
+        r = self._get(self.companies, company_id) if company_id else None
+        if not r:
+            return {"name": "", "address": "", "stamp_image": ""}
+        return company_dict(r, lang,
+                            country=self.country_name(r.get("country_id"), lang),
+                            bank_info=self.bank_info(company_id))
+
+    def client_obj(self, client_id: Any, lang: str) -> Dict[str, Any]:
+        """نفس _shared.client_obj."""
+        r = self._get(self.clients, client_id) if client_id else None
+        if not r:
+            return {"name": "", "address": ""}
+        return client_dict(r, lang, country=self.country_name(r.get("country_id"), lang))
+
+    # ── البنود ─────────────────────────────────────────────────────────────
+
+    def item_rows(self, lang: str, *, require_material: bool = True) -> List[Dict[str, Any]]:
+        """
+        البنود بأسماء الأعمدة التي كانت builders تختارها في SQL:
+          qty/net/gross/amount, material_code/material_name/description/hs_code,
+          packaging, pricing_code/pricing_name (+ pricing_type_*), pt_*,
+          unit_label, origin_country, customs_code, item_notes.
+        الأسماء بعمود اللغة نفسه بلا fallback (مثل m.name_{lang} في SQL).
+        require_material=True ← JOIN materials (بند بمادة محذوفة يُستبعد).
+        """
+        out: List[Dict[str, Any]] = []
+        for r in self.items:
+            if require_material and r.get("m_id") is None:
+                continue
+            row = dict(r)
+            oc = self.country(r.get("origin_country_id"))
+            row.update({
+                "qty":               r.get("quantity"),
+                "net":               r.get("net_weight_kg"),
+                "gross":             r.get("gross_weight_kg"),
+                "amount":            r.get("line_total"),
+                "item_notes":        r.get("notes"),
+                "material_code":     r.get("m_code"),
+                "hs_code":           r.get("m_code"),
+                "material_name":     r.get(f"m_name_{lang}"),
+                "material":          r.get(f"m_name_{lang}"),
+                "description":       r.get(f"m_name_{lang}"),
+                "packaging":         r.get(f"pk_name_{lang}"),
+                "pricing_code":      r.get("pt_code"),
+                "pricing_type_code": r.get("pt_code"),
+                "pricing_name":      r.get(f"pt_name_{lang}"),
+                "pricing_type_name": r.get(f"pt_name_{lang}"),
+                "unit_label":        r.get("pt_price_unit"),
+                "origin_country":    oc.get(f"name_{lang}") if oc else None,
+                # '' مقصود (بند بلا بند جمركي) — الرجوع لرمز المادة عند NULL فقط
+                "customs_code":      (tc if (tc := r.get("customs_tariff_code")) is not None
+                                      else (r.get("m_code") or "")),
+            })
+            out.append(row)
+        return out
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# LOADER
+# ─────────────────────────────────────────────────────────────────────────────
+
+_SCOPE: contextvars.ContextVar[Optional[Dict[int, Optional[TransactionSnapshot]]]] = \
+    contextvars.ContextVar("logiport_tx_snapshots", default=None)
+
+
+class TransactionContextLoader:
+    """تحميل اللقطات (load) + إعادة استخدامها داخل scope."""
+
+    @staticmethod
+    def load(transaction_ids: Iterable[Any], s: Any = None) -> Dict[int, TransactionSnapshot]:
+        """
+        {transaction_id: TransactionSnapshot} — المعاملات غير الموجودة لا تظهر.
+        8 استعلامات لكل _CHUNK معاملة. s: Session اختيارية (وإلا جلسة جديدة).
+        """
+        ids = _ids(transaction_ids)
+        if not ids:
+            return {}
+        if s is None:
+            from database.models import get_session_local
+            with get_session_local()() as s2:
+                return TransactionContextLoader.load(ids, s2)
+
+        out: Dict[int, TransactionSnapshot] = {}
+        for i in range(0, len(ids), _CHUNK):
+            out.update(_load_chunk(s, ids[i:i + _CHUNK]))
+        logger.debug("TransactionContextLoader: loaded %d/%d transaction(s)", len(out), len(ids))
+        return out
+
+    @staticmethod
+    def snapshot_for(transaction_id: Any) -> Optional[TransactionSnapshot]:
+        """لقطة المعاملة من الـ scope الحالي، أو تحميل جديد (يُحفظ في الـ scope إن وُجد)."""
+        tid = int(transaction_id)
+        scope = _SCOPE.get()
+        if scope is not None and tid in scope:
+            return scope[tid]
+        snap = TransactionContextLoader.load([tid]).get(tid)
+        if scope is not None:
+            scope[tid] = snap
+        return snap
+
+    @staticmethod
+    @contextmanager
+    def scope(snapshots: Optional[Mapping[int, TransactionSnapshot]] = None) -> Iterator[None]:
+        """
+        داخل الـ scope كل snapshot_for لنفس المعاملة يُعيد نفس اللقطة.
+        snapshots: لقطات محمّلة مسبقاً (load) — تُضاف فوق الـ scope الخارجي.
+        """
+        merged: Dict[int, Optional[TransactionSnapshot]] = dict(_SCOPE.get() or {})
+        merged.update(snapshots or {})
+        token = _SCOPE.set(merged)
+        try:
+            yield
+        finally:
+            _SCOPE.reset(token)
+
+
+def _load_chunk(s, ids: List[int]) -> Dict[int, TransactionSnapshot]:
+    from sqlalchemy import text
+
+    marks, params = _in(ids)
+
+    # 1. transactions + delivery_methods
+    tx: Dict[int, dict] = {}
+    dms: Dict[int, Optional[Mapping]] = {}
+    for r in s.execute(text(f"""
+        SELECT t.*,
+               COALESCE(t.transaction_no, CAST(t.id AS TEXT)) AS no,
+               dm.id AS dm_id, dm.name_ar AS dm_name_ar,
+               dm.name_en AS dm_name_en, dm.name_tr AS dm_name_tr
+        FROM transactions t
+        LEFT JOIN delivery_methods dm ON dm.id = t.delivery_method_id
+        WHERE t.id IN ({marks})
+    """), params).mappings():
+        row = dict(r)
+        dm = {k[3:]: row.pop(k) for k in ("dm_id", "dm_name_ar", "dm_name_en", "dm_name_tr")}
+        if "destination_country_id" not in row:
+            row["destination_country_id"] = row.get("dest_country_id")
+        tid = int(row["id"])
+        tx[tid] = row
+        dms[tid] = _frozen(dm) if dm["id"] is not None else None
+    if not tx:
+        return {}
+
+    # 2. transaction_items + materials / packaging / pricing / entry_items
+    items: Dict[int, List[Mapping]] = {tid: [] for tid in tx}
+    for r in s.execute(text(f"""
+        SELECT ti.*, {_ITEM_JOINS}
+        FROM transaction_items ti
+        LEFT JOIN materials m        ON m.id  = ti.material_id
+        LEFT JOIN packaging_types pk ON pk.id = ti.packaging_type_id
+        LEFT JOIN pricing_types pt   ON pt.id = ti.pricing_type_id
+        LEFT JOIN entry_items ei     ON ei.id = ti.entry_item_id
+        WHERE ti.transaction_id IN ({marks})
+        ORDER BY ti.transaction_id, ti.id
+    """), params).mappings():
+        items[int(r["transaction_id"])].append(_frozen(r))
+
+    # 3. transport_details (صف واحد لكل معاملة — الأقدم إن تكرر)
+    transport: Dict[int, Mapping] = {}
+    for r in s.execute(text(
+        f"SELECT * FROM transport_details WHERE transaction_id IN ({marks}) ORDER BY id"
+    ), params).mappings():
+        transport.setdefault(int(r["transaction_id"]), _frozen(r))
+
+    # 4. companies — كل عمود *_company_id موجود في المعاملة/النقل
+    company_ids = _ids(
+        [row.get(c) for row in tx.values() for c in _TX_COMPANY_COLS]
+        + [row.get(c) for row in transport.values() for c in _TD_COMPANY_COLS]
+    )
+    companies = _by_id(s, "companies", company_ids)
+
+    # 5. clients
+    clients = _by_id(s, "clients", _ids(row.get("client_id") for row in tx.values()))
+
+    # 6. company_banks — الأساسي أولاً ثم الأقدم (كـ get_bank_info)
+    banks: Dict[int, Mapping] = {}
+    if company_ids:
+        bm, bp = _in(company_ids)
+        for r in s.execute(text(
+            f"SELECT * FROM company_banks WHERE company_id IN ({bm}) "
+            f"ORDER BY company_id, is_primary DESC, id ASC"
+        ), bp).mappings():
+            banks.setdefault(int(r["company_id"]), _frozen(r))
+
+    # 7. countries — المعاملة + البنود + الشركات + العملاء
+    country_ids = _ids(
+        [row.get(c) for row in tx.values()
+         for c in ("origin_country_id", "dest_country_id", "destination_country_id")]
+        + [it.get("origin_country_id") for its in items.values() for it in its]
+        + [r.get("country_id") for r in companies.values()]
+        + [r.get("country_id") for r in clients.values()]
+    )
+    countries = _by_id(s, "countries", country_ids)
+
+    # 8. currencies — المعاملة + البنود
+    currency_ids = _ids(
+        [row.get("currency_id") for row in tx.values()]
+        + [it.get("currency_id") for its in items.values() for it in its]
+    )
+    currencies = _by_id(s, "currencies", currency_ids)
+
+    companies_p, clients_p, banks_p = (MappingProxyType(companies), MappingProxyType(clients),
+                                       MappingProxyType(banks))
+    countries_p, currencies_p = MappingProxyType(countries), MappingProxyType(currencies)
+    return {
+        tid: TransactionSnapshot(
+            transaction=MappingProxyType(row),
+            items=tuple(items[tid]),
+            transport=transport.get(tid),
+            delivery_method=dms[tid],
+            companies=companies_p,
+            clients=clients_p,
+            banks=banks_p,
+            countries=countries_p,
+            currencies=currencies_p,
+        )
+        for tid, row in tx.items()
+    }
+
+
+def _by_id(s, table: str, ids: List[int]) -> Dict[int, Mapping[str, Any]]:
+    """SELECT * FROM table WHERE id IN (...) → {id: صف}."""
+    if not ids:
+        return {}
+    from sqlalchemy import text
+    marks, params = _in(ids)
+    return {int(r["id"]): _frozen(r) for r in s.execute(
+        text(f"SELECT * FROM {table} WHERE id IN ({marks})"), params).mappings()}
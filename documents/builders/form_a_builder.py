@@ -21,12 +21,9 @@ documents/builders/form_a.py — LOGIPORT
 from __future__ import annotations
 from typing import Dict, Any, List
 from decimal import Decimal
-from sqlalchemy import text
-from database.models import get_session_local
+from documents.builders.context_loader import TransactionContextLoader
 from documents.builders._shared import (
     blankify as _blankify,
-    company_obj as _company_obj_full,
-    country_name as _country_name,
 )
 
 
@@ -36,9 +33,9 @@ def _val(x) -> str:
     return str(x).strip()
 
 
-def _company_block(s, company_id, lang: str) -> dict:
-    """wrapper → _shared.company_obj (unified)."""
-    return _company_obj_full(s, company_id, lang) or {
+def _company_block(snap, company_id, lang: str) -> dict:
+    """wrapper → TransactionSnapshot.company_obj (unified)."""
+    return snap.company_obj(company_id, lang) or {
         "name": "", "address": "", "city": "", "country": "", "tax_id": ""
     }
 
@@ -53,187 +50,127 @@ def build_ctx(doc_code: str, transaction_id: int, lang: str) -> Dict[str, Any]:
     if lang not in ("ar", "en", "tr"):
         lang = "en"
 
-    SessionLocal = get_session_local()
-    with SessionLocal() as s:
-
-        # ── رأس المعاملة ──────────────────────────────────────────────────────
-        t = s.execute(text("""
-            SELECT id,
-                   COALESCE(transaction_no, CAST(id AS TEXT)) AS no,
-                   transaction_date,
-                   exporter_company_id, importer_company_id,
-                   origin_country_id, dest_country_id,
-                   currency_id, delivery_method_id,
-                   transport_type, transport_ref,
-                   notes
-            FROM transactions WHERE id = :i
-        """), {"i": int(transaction_id)}).mappings().first()
-        if not t:
-            raise ValueError(f"المعاملة #{transaction_id} غير موجودة.")
-
-        # ── transport_details ─────────────────────────────────────────────────
-        td = s.execute(text("""
-            SELECT certificate_no, issuing_authority, certificate_date,
-                   shipment_date, carrier_company_id,
-                   truck_plate, loading_place, delivery_place,
-                   origin_country, dest_country
-            FROM transport_details WHERE transaction_id = :i
-        """), {"i": int(transaction_id)}).mappings().first()
-
-        # ── الأطراف ───────────────────────────────────────────────────────────
-        exporter  = _company_block(s, t["exporter_company_id"], lang)
-        consignee = _company_block(s, t["importer_company_id"], lang)
-
-        # ── الدول ─────────────────────────────────────────────────────────────
-        def _country(cid):
-            if not cid:
-                return ""
-            r = s.execute(
-                text("SELECT name_ar, name_en, name_tr FROM countries WHERE id=:id"),
-                {"id": cid}
-            ).mappings().first()
-            if not r:
-                return ""
-            return r.get(f"name_{lang}") or r.get("name_en") or r.get("name_ar") or ""
-
-        # الدول: من TransportDetails إن عبّأها المستخدم، وإلا من المعاملة
-        origin_country = (
-            (td.get("origin_country") or "") if td else ""
-        ) or _country(t["origin_country_id"])
-        dest_country = (
-            (td.get("dest_country") or "") if td else ""
-        ) or _country(t["dest_country_id"])
-
-        # ── العملة ────────────────────────────────────────────────────────────
-        currency_code = ""
-        if t["currency_id"]:
-            cur = s.execute(
-                text("SELECT code FROM currencies WHERE id=:id"),
-                {"id": t["currency_id"]}
-            ).mappings().first()
-            if cur:
-                currency_code = cur["code"] or ""
-
-        # ── طريقة التسليم ─────────────────────────────────────────────────────
-        delivery_method = ""
-        if t["delivery_method_id"]:
-            dm = s.execute(
-                text("SELECT name_ar, name_en, name_tr FROM delivery_methods WHERE id=:id"),
-                {"id": t["delivery_method_id"]}
-            ).mappings().first()
-            if dm:
-                delivery_method = dm.get(f"name_{lang}") or dm.get("name_en") or dm.get("name_ar") or ""
-
-        # ── بنود المعاملة ─────────────────────────────────────────────────────
-        rows = s.execute(text(f"""
-            SELECT ti.id,
-                   m.code                AS hs_code,
-                   m.name_{lang}         AS description,
-                   ti.quantity           AS qty,
-                   ti.gross_weight_kg    AS gross,
-                   ti.net_weight_kg      AS net,
-                   ti.unit_price         AS unit_price,
-                   ti.line_total         AS amount,
-                   pk.name_{lang}        AS packaging,
-                   c_orig.name_{lang}    AS origin_country
-            FROM transaction_items ti
-            JOIN materials m                   ON m.id = ti.material_id
-            LEFT JOIN packaging_types pk       ON pk.id = ti.packaging_type_id
-            LEFT JOIN countries c_orig         ON c_orig.id = ti.origin_country_id
-            WHERE ti.transaction_id = :tid
-            ORDER BY ti.id
-        """), {"tid": int(transaction_id)}).mappings().all()
-
-        items: List[Dict[str, Any]] = []
-        total_qty = total_gross = total_net = total_value = 0.0
-
-        for idx, r in enumerate(rows, start=1):
-            qty   = float(r["qty"]   or 0)
-            gross = float(r["gross"] or 0)
-            net   = float(r["net"]   or 0)
-            amt   = float(r["amount"] or 0)
-            total_qty   += qty
-            total_gross += gross
-            total_net   += net
-            total_value += amt
-
-            # بلد المنشأ لكل بند — يرجع لبلد المعاملة إذا لم يكن محدداً
-            item_origin = _val(r["origin_country"]) or origin_country
-
-            items.append({
-                "n":           idx,
-                "hs_code":     _val(r["hs_code"]),       # materials.code = HS Code
-                "description": _val(r["description"]),
-                "packaging":   _val(r["packaging"]),
-                "qty":         qty,
-                "gross":       gross,
-                "net":         net,
-                "amount":      amt,
-                "unit_price":  float(r["unit_price"] or 0),
-                "origin":      item_origin,
-            })
-
-        # ── بيانات الشهادة ────────────────────────────────────────────────────
-        certificate_no    = _val(td["certificate_no"])    if td else ""
-        issuing_authority = _val(td["issuing_authority"]) if td else ""
-        # تاريخ الشهادة (certificate_date) مستقل — يُعبأ يدوياً في تبويب الشحن
-        certificate_date  = td["certificate_date"] if td else None
-        shipment_date     = td["shipment_date"]     if td else None
-        transport_info    = _val(t["transport_ref"])
-
-        if td and td.get("loading_place") and td.get("delivery_place"):
-            transport_info = f"{_val(td['loading_place'])} → {_val(td['delivery_place'])}"
-        elif t["transport_type"]:
-            transport_info = f"{_val(t['transport_type'])} — {_val(t['transport_ref'])}"
-
-        return {
-            # ── رقم الشهادة ────────────────────────────────────────────────
-            "certificate_no":    certificate_no or _val(t["no"]),
-            "reference_no":      _val(t["no"]),
-            # date في Form A = تاريخ الشهادة إن وُجد، ثم الشحن، ثم تاريخ المعاملة
-            # التاريخ في Form A = certificate_date إن وُجد، ثم shipment_date (كلاهما يدوي)
-            "date":              certificate_date or shipment_date or "",
-            "trx_date":          t["transaction_date"],
-
-            # ── Box 1: المُصدِّر ──────────────────────────────────────────
-            "exporter": exporter,
-
-            # ── Box 3: المُستلِم ──────────────────────────────────────────
-            "consignee": consignee,
-
-            # ── Box 4: بلد المنشأ ─────────────────────────────────────────
-            "origin_country":  origin_country,
-
-            # ── Box 5: بلد الوجهة ─────────────────────────────────────────
-            "dest_country":    dest_country,
-
-            # ── Box 6: معلومات النقل ──────────────────────────────────────
-            "transport_info":     transport_info,
-            "delivery_method":    delivery_method,
-            "transport_ref":      _val(t["transport_ref"]),
-
-            # ── Box 8: البنود ─────────────────────────────────────────────
-            "items": items,
-            "totals": {
-                "qty":   total_qty,
-                "gross": total_gross,
-                "net":   total_net,
-                "value": total_value,
-            },
-            "currency_code": currency_code,
-
-            # ── Box 10: الفواتير المرجعية ─────────────────────────────────
-            "invoice_no": _val(t["no"]),
-
-            # ── Box 11: الجهة المُصدِرة ────────────────────────────────────
-            "issuing_authority": issuing_authority,
-            "issuing_place":     _val(td["loading_place"]) if td else "",
-
-            # ── تحذيرات (للـ UI، لا تظهر في المستند) ─────────────────────
-            "_warnings": _build_warnings(
-                certificate_no, issuing_authority, origin_country, items
-            ),
-        }
+    # ── رأس المعاملة ──────────────────────────────────────────────────────
+    snap = TransactionContextLoader.snapshot_for(transaction_id)
+    if snap is None:
+        raise ValueError(f"المعاملة #{transaction_id} غير موجودة.")
+    t = snap.transaction
+
+    # ── transport_details ─────────────────────────────────────────────────
+    td = snap.transport
+
+    # ── الأطراف ───────────────────────────────────────────────────────────
+    exporter  = _company_block(snap, t["exporter_company_id"], lang)
+    consignee = _company_block(snap, t["importer_company_id"], lang)
+
+    # ── الدول ─────────────────────────────────────────────────────────────
+    # الدول: من TransportDetails إن عبّأها المستخدم، وإلا من المعاملة
+    origin_country = (
+        (td.get("origin_country") or "") if td else ""
+    ) or snap.country_name(t["origin_country_id"], lang)
+    dest_country = (
+        (td.get("dest_country") or "") if td else ""
+    ) or snap.country_name(t["dest_country_id"], lang)
+
+    # ── العملة ────────────────────────────────────────────────────────────
+    currency_code = snap.currency_info(t["currency_id"], lang)[0]
+
+    # ── طريقة التسليم ─────────────────────────────────────────────────────
+    delivery_method = snap.delivery_method_name(lang)
+
+    # ── بنود المعاملة ─────────────────────────────────────────────────────
+    rows = snap.item_rows(lang)
+
+    items: List[Dict[str, Any]] = []
+    total_qty = total_gross = total_net = total_value = 0.0
+
+    for idx, r in enumerate(rows, start=1):
+        qty   = float(r["qty"]   or 0)
+        gross = float(r["gross"] or 0)
+        net   = float(r["net"]   or 0)
+        amt   = float(r["amount"] or 0)
+        total_qty   += qty
+        total_gross += gross
+        total_net   += net
+        total_value += amt
+
+        # بلد المنشأ لكل بند — يرجع لبلد المعاملة إذا لم يكن محدداً
+        item_origin = _val(r["origin_country"]) or origin_country
+
+        items.append({
+            "n":           idx,
+            "hs_code":     _val(r["hs_code"]),       # materials.code = HS Code
+            "description": _val(r["description"]),
+            "packaging":   _val(r["packaging"]),
+            "qty":         qty,
+            "gross":       gross,
+            "net":         net,
+            "amount":      amt,
+            "unit_price":  float(r["unit_price"] or 0),
+            "origin":      item_origin,
+        })
+
+    # ── بيانات الشهادة ────────────────────────────────────────────────────
+    certificate_no    = _val(td["certificate_no"])    if td else ""
+    issuing_authority = _val(td["issuing_authority"]) if td else ""
+    # تاريخ الشهادة (certificate_date) مستقل — يُعبأ يدوياً في تبويب الشحن
+    certificate_date  = td["certificate_date"] if td else None
+    shipment_date     = td["shipment_date"]     if td else None
+    transport_info    = _val(t["transport_ref"])
+
+    if td and td.get("loading_place") and td.get("delivery_place"):
+        transport_info = f"{_val(td['loading_place'])} → {_val(td['delivery_place'])}"
+    elif t["transport_type"]:
+        transport_info = f"{_val(t['transport_type'])} — {_val(t['transport_ref'])}"
+
+    return {
+        # ── رقم الشهادة ────────────────────────────────────────────────
+        "certificate_no":    certificate_no or _val(t["no"]),
+        "reference_no":      _val(t["no"]),
+        # date في Form A = تاريخ الشهادة إن وُجد، ثم الشحن، ثم تاريخ المعاملة
+        # التاريخ في Form A = certificate_date إن وُجد، ثم shipment_date (كلاهما يدوي)
+        "date":              certificate_date or shipment_date or "",
+        "trx_date":          t["transaction_date"],
+
+        # ── Box 1: المُصدِّر ──────────────────────────────────────────
+        "exporter": exporter,
+
+        # ── Box 3: المُستلِم ──────────────────────────────────────────
+        "consignee": consignee,
+
+        # ── Box 4: بلد المنشأ ─────────────────────────────────────────
+        "origin_country":  origin_country,
+
+        # ── Box 5: بلد الوجهة ─────────────────────────────────────────
+        "dest_country":    dest_country,
+
+        # ── Box 6: معلومات النقل ──────────────────────────────────────
+        "transport_info":     transport_info,
+        "delivery_method":    delivery_method,
+        "transport_ref":      _val(t["transport_ref"]),
+
+        # ── Box 8: البنود ─────────────────────────────────────────────
+        "items": items,
+        "totals": {
+            "qty":   total_qty,
+            "gross": total_gross,
+            "net":   total_net,
+            "value": total_value,
+        },
+        "currency_code": currency_code,
+
+        # ── Box 10: الفواتير المرجعية ─────────────────────────────────
+        "invoice_no": _val(t["no"]),
+
+        # ── Box 11: الجهة المُصدِرة ────────────────────────────────────
+        "issuing_authority": issuing_authority,
+        "issuing_place":     _val(td["loading_place"]) if td else "",
+
+        # ── تحذيرات (للـ UI، لا تظهر في المستند) ─────────────────────
+        "_warnings": _build_warnings(
+            certificate_no, issuing_authority, origin_country, items
+        ),
+    }
 
 
 def _build_warnings(certificate_no, issuing_authority, origin_country, items) -> list:
@@ -1,10 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 from typing import Any, Dict, Tuple, List
-from contextlib import closing
 import logging
-from sqlalchemy import text
-from sqlalchemy.exc import OperationalError
 
 _log = logging.getLogger(__name__)
 
@@ -13,11 +10,7 @@ try:
 except Exception:
     _entry_build_ctx2 = None  # type: ignore
 
-try:
-    from database.models import get_session_local
-except Exception:
-    def get_session_local():  # type: ignore
-        raise RuntimeError("database.models.get_session_local is not available")
+from documents.builders.context_loader import TransactionContextLoader, TransactionSnapshot
 
 
 # ------------------------- utils -------------------------
@@ -113,34 +106,24 @@ def _normalize_shared_blocks(base: Dict[str, Any]) -> None:
     })
 
 
-# ------------------------- DB: intermediary (localized) -------------------------
-
-def _fetch_company_localized(s, company_id: int, lang: str) -> Dict[str, Any]:
-    try:
-        row = s.execute(text("""
-            SELECT
-                cmp.name_ar     AS name_ar,
-                cmp.name_en     AS name_en,
-                cmp.name_tr     AS name_tr,
-                cmp.address_ar  AS address_ar,
-                cmp.address_en  AS address_en,
-                cmp.address_tr  AS address_tr,
-                (SELECT c.name_ar FROM countries c WHERE c.id = cmp.country_id) AS country_ar,
-                (SELECT c.name_en FROM countries c WHERE c.id = cmp.country_id) AS country_en,
-                (SELECT c.name_tr FROM countries c WHERE c.id = cmp.country_id) AS country_tr,
-                cmp.city        AS city_raw
-            FROM companies cmp
-            WHERE cmp.id = :cid
-        """), {"cid": int(company_id)}).mappings().first()
-        if row:
-            return {
-                "intermediary_supplier_name": _pick(row, "name", lang),
-                "intermediary_supplier_address": _pick(row, "address", lang),
-                "intermediary_supplier_country": _pick(row, "country", lang),
-                "intermediary_supplier_city": str(row.get("city_raw") or "").strip(),
-            }
-    except OperationalError:
-        pass
+# ------------------------- snapshot: intermediary (localized) -------------------------
+
+def _country_names(snap: TransactionSnapshot, country_id: Any) -> Dict[str, str]:
+    c = snap.country(country_id) or {}
+    return {k: c.get(f"name_{k}") or "" for k in ("ar", "en", "tr")}
+
+
+def _fetch_company_localized(snap: TransactionSnapshot, company_id: int, lang: str) -> Dict[str, Any]:
+    cmp = snap.companies.get(int(company_id))
+    if cmp:
+        row = dict(cmp)
+        row.update({f"country_{k}": v for k, v in _country_names(snap, cmp.get("country_id")).items()})
+        return {
+            "intermediary_supplier_name": _pick(row, "name", lang),
+            "intermediary_supplier_address": _pick(row, "address", lang),
+            "intermediary_supplier_country": _pick(row, "country", lang),
+            "intermediary_supplier_city": str(row.get("city") or "").strip(),
+        }
     return {
         "intermediary_supplier_name": "",
         "intermediary_supplier_address": "",
@@ -151,11 +134,10 @@ def _fetch_company_localized(s, company_id: int, lang: str) -> Dict[str, Any]:
 
 def _try_fetch_intermediary_fields(transaction_id: int, lang: str) -> Dict[str, Any]:
     """
-    Fetches intermediary/broker company data.
-    Uses broker_company_id (the actual DB column).
+    Fetches intermediary/broker company data from the transaction snapshot.
+    Uses intermediary_supplier_id first, then broker_company_id.
     Optional columns (intermediary_invoice_no, intermediary_invoice_date,
-    intermediary_supplier_id) are fetched with COALESCE/NULL fallback
-    so they never raise OperationalError on older DBs.
+    intermediary_supplier_id) simply read as empty on older DBs.
     """
     result: Dict[str, Any] = {
         "intermediary_invoice_no": "",
@@ -166,58 +148,25 @@ def _try_fetch_intermediary_fields(transaction_id: int, lang: str) -> Dict[str,
         "intermediary_supplier_city": "",
         "_source": "not_found",
     }
-    SessionLocal = get_session_local()
-    with closing(SessionLocal()) as s:
-        # First: try full query with all optional columns
-        try:
-            row = s.execute(text("""
-                SELECT
-                    COALESCE(intermediary_invoice_no,  '')  AS ino,
-                    COALESCE(intermediary_invoice_date, '') AS idate,
-                    COALESCE(intermediary_supplier_id,  0)  AS supplier_id,
-                    COALESCE(broker_company_id,         0)  AS broker_id
-                FROM transactions
-                WHERE id = :i
-            """), {"i": int(transaction_id)}).mappings().first()
-        except OperationalError:
-            # Optional columns missing — fall back to broker_company_id only
-            try:
-                row2 = s.execute(text("""
-                    SELECT broker_company_id
-                    FROM transactions
-                    WHERE id = :i
-                """), {"i": int(transaction_id)}).first()
-            except OperationalError:
-                return result
-
-            if not row2:
-                return result
-
-            broker_id = row2[0]
-            result["_source"] = "transactions.broker_company_id" if broker_id else "not_found"
-            if broker_id:
-                result.update(_fetch_company_localized(s, int(broker_id), lang))
-            return result
-
-        if not row:
-            return result
-
-        ino       = str(row["ino"]   or "").strip()
-        idate     = str(row["idate"] or "").strip()
-        supplier_id = int(row["supplier_id"] or 0)
-        broker_id   = int(row["broker_id"]   or 0)
-
-        result["intermediary_invoice_no"]   = ino
-        result["intermediary_invoice_date"] = idate
-
-        company_id = supplier_id or broker_id
-        result["_source"] = (
-            "transactions.intermediary_supplier_id" if supplier_id else
-            "transactions.broker_company_id"        if broker_id   else
-            "not_found"
-        )
-        if company_id:
-            result.update(_fetch_company_localized(s, int(company_id), lang))
+    snap = TransactionContextLoader.snapshot_for(transaction_id)
+    if snap is None:
+        return result
+    t = snap.transaction
+
+    supplier_id = int(t.get("intermediary_supplier_id") or 0)
+    broker_id   = int(t.get("broker_company_id")        or 0)
+
+    result["intermediary_invoice_no"]   = str(t.get("intermediary_invoice_no")   or "").strip()
+    result["intermediary_invoice_date"] = str(t.get("intermediary_invoice_date") or "").strip()
+
+    company_id = supplier_id or broker_id
+    result["_source"] = (
+        "transactions.intermediary_supplier_id" if supplier_id else
+        "transactions.broker_company_id"        if broker_id   else
+        "not_found"
+    )
+    if company_id:
+        result.update(_fetch_company_localized(snap, company_id, lang))
 
     return result
 
@@ -263,40 +212,13 @@ def _compute_transit_to_text(transaction_id: int, base: Dict[str, Any], lang: st
     names = {"ar": country_ar, "en": country_en, "tr": country_tr}
 
     if not any(names.values()):
-        SessionLocal = get_session_local()
-        with closing(SessionLocal()) as s:
-            try:
-                row = s.execute(text("""
-                    SELECT
-                       (SELECT cn.name_ar FROM countries cn WHERE cn.id = t.dest_country_id) AS dest_ar,
-                       (SELECT cn.name_en FROM countries cn WHERE cn.id = t.dest_country_id) AS dest_en,
-                       (SELECT cn.name_tr FROM countries cn WHERE cn.id = t.dest_country_id) AS dest_tr,
-                       t.importer_company_id
-                    FROM transactions t
-                    WHERE t.id = :i
-                """), {"i": int(transaction_id)}).mappings().first()
-            except OperationalError:
-                row = None
-
-            if row:
-                names = {
-                    "ar": row.get("dest_ar") or "",
-                    "en": row.get("dest_en") or "",
-                    "tr": row.get("dest_tr") or "",
-                }
-                if not any(names.values()) and row.get("importer_company_id"):
-                    try:
-                        r2 = s.execute(text("""
-                            SELECT
-                               (SELECT cn.name_ar FROM countries cn WHERE cn.id = cmp.country_id) AS c_ar,
-                               (SELECT cn.name_en FROM countries cn WHERE cn.id = cmp.country_id) AS c_en,
-                               (SELECT cn.name_tr FROM countries cn WHERE cn.id = cmp.country_id) AS c_tr
-                            FROM companies cmp WHERE cmp.id = :cid
-                        """), {"cid": int(row["importer_company_id"])}).mappings().first()
-                        if r2:
-                            names = {"ar": r2.get("c_ar") or "", "en": r2.get("c_en") or "", "tr": r2.get("c_tr") or ""}
-                    except OperationalError:
-                        pass
+        snap = TransactionContextLoader.snapshot_for(transaction_id)
+        if snap is not None:
+            t = snap.transaction
+            names = _country_names(snap, t.get("dest_country_id"))
+            if not any(names.values()) and t.get("importer_company_id"):
+                cmp = snap.companies.get(t["importer_company_id"]) or {}
+                names = _country_names(snap, cmp.get("country_id"))
 
     txt = {
         "ar": (f"ترانزيت إلى {names['ar']}".strip() if names["ar"] else "ترانزيت"),
@@ -33,21 +33,15 @@ Context contract (matches all 3 template variants):
 """
 
 from __future__ import annotations
-from contextlib import closing
 from typing import Dict, List, Any
-from sqlalchemy import text
-from database.models import get_session_local
 
 from documents.builders._shared import (
     blankify,
-    country_name,
-    company_obj,
-    client_obj,
+    localized_name,
     spell_non_monetary,
-    pick_dest_col,
-    delivery_method_name,
     join_with_and,
 )
+from documents.builders.context_loader import TransactionContextLoader, TransactionSnapshot
 
 DEFAULT_WEIGHT_UNIT = "kg"
 
@@ -56,46 +50,25 @@ DEFAULT_WEIGHT_UNIT = "kg"
 # HEADER  →  transaction + exporter + importer
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _fetch_header(transaction_id: int, lang: str) -> Dict[str, Any]:
-    SessionLocal = get_session_local()
-    with closing(SessionLocal()) as s:
-        dest_col = pick_dest_col(s)
-
-        row = s.execute(text(f"""
-            SELECT
-                t.transaction_no,
-                t.transaction_date      AS issue_date,
-                t.exporter_company_id,
-                t.importer_company_id,
-                t.client_id,
-                t.delivery_method_id,
-                t.origin_country_id,
-                t.{dest_col}            AS destination_country_id,
-                t.transport_type,
-                t.notes
-            FROM transactions t
-            WHERE t.id = :id
-        """), {"id": transaction_id}).mappings().first()
-
-        if not row:
-            raise ValueError(f"Transaction #{transaction_id} not found")
-
-        exporter = company_obj(s, row["exporter_company_id"], lang)
-        importer = company_obj(s, row["importer_company_id"], lang)
-        client   = client_obj(s,  row["client_id"],           lang)
-        delivery = delivery_method_name(s, row.get("delivery_method_id"), lang)
-
-        origin_country = country_name(s, row.get("origin_country_id"),      lang)
-        dest_country   = country_name(s, row.get("destination_country_id"), lang)
-
-        # incoterms — جلبه من pricing_type إذا وجد
-        incoterms = ""
+def _fetch_header(snap: TransactionSnapshot, lang: str) -> Dict[str, Any]:
+    row = snap.transaction
+
+    exporter = snap.company_obj(row["exporter_company_id"], lang)
+    importer = snap.company_obj(row["importer_company_id"], lang)
+    client   = snap.client_obj(row["client_id"],           lang)
+    delivery = snap.delivery_method_name(lang)
+
+    origin_country = snap.country_name(row.get("origin_country_id"),      lang)
+    dest_country   = snap.country_name(row.get("destination_country_id"), lang)
+
+    # incoterms — جلبه من pricing_type إذا وجد
+    incoterms = ""
 
     return {
         # للـ template: trx.no / trx.issue_date
         "transaction": {
             "no":         row["transaction_no"] or "",
-            "issue_date": str(row["issue_date"] or ""),
+            "issue_date": str(row["transaction_date"] or ""),
         },
         "exporter":           exporter,
         "importer":           importer,
@@ -115,63 +88,22 @@ def _fetch_header(transaction_id: int, lang: str) -> Dict[str, Any]:
 # ITEMS  →  rows list
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _fetch_rows(transaction_id: int, lang: str) -> List[Dict[str, Any]]:
-    SessionLocal = get_session_local()
-    with closing(SessionLocal()) as s:
-        rows = s.execute(text("""
-            SELECT
-                ti.id               AS ti_id,
-                ti.quantity,
-                ti.gross_weight_kg,
-                ti.net_weight_kg,
-                ti.packaging_type_id,
-                ti.transport_ref,
-                ti.entry_item_id,
-                m.code              AS mat_code,
-                m.name_ar           AS mat_ar,
-                m.name_en           AS mat_en,
-                m.name_tr           AS mat_tr,
-                ei.mfg_date,
-                ei.exp_date
-            FROM transaction_items ti
-            LEFT JOIN materials    m  ON m.id  = ti.material_id
-            LEFT JOIN entry_items  ei ON ei.id = ti.entry_item_id
-            WHERE ti.transaction_id = :id
-            ORDER BY ti.id
-        """), {"id": transaction_id}).mappings().all()
-
-        # جلب أسماء أنواع التغليف دفعة واحدة
-        pkg_ids = {r["packaging_type_id"] for r in rows if r["packaging_type_id"]}
-        pkg_names: Dict[int, str] = {}
-        if pkg_ids:
-            ph = ",".join(str(i) for i in pkg_ids)
-            for p in s.execute(text(f"""
-                SELECT id, name_ar, name_en, name_tr
-                FROM packaging_types WHERE id IN ({ph})
-            """)).mappings().all():
-                pkg_names[p["id"]] = (
-                    p.get(f"name_{lang}") or p.get("name_en")
-                    or p.get("name_ar") or p.get("name_tr") or ""
-                )
-
+def _fetch_rows(snap: TransactionSnapshot, lang: str) -> List[Dict[str, Any]]:
+    # LEFT JOIN materials — البند بلا مادة يبقى بوصف فارغ
     result: List[Dict[str, Any]] = []
-    for i, r in enumerate(rows, 1):
-        mat = (r.get(f"mat_{lang}") or r.get("mat_en")
-               or r.get("mat_ar")   or r.get("mat_tr") or "")
-        pkg_id = r.get("packaging_type_id")
-
+    for i, r in enumerate(snap.item_rows(lang, require_material=False), 1):
         result.append({
             "line_no":        i,
             "line_id":        str(r.get("entry_item_id") or ""),
-            "material_code":  r.get("mat_code") or "",
+            "material_code":  r.get("m_code") or "",
             "container_no":   r.get("transport_ref") or "",
-            "description":    mat,
+            "description":    localized_name(r, lang, "m_name"),
             "quantity":       float(r.get("quantity")        or 0),
             "gross_kg":       float(r.get("gross_weight_kg") or 0),
             "net_kg":         float(r.get("net_weight_kg")   or 0),
-            "packaging_type": pkg_names.get(pkg_id, "") if pkg_id else "",
-            "mfg_date":       str(r["mfg_date"] or "") if r.get("mfg_date") else "",
-            "exp_date":       str(r["exp_date"] or "") if r.get("exp_date") else "",
+            "packaging_type": localized_name(r, lang, "pk_name") if r.get("packaging_type_id") else "",
+            "mfg_date":       str(r["ei_mfg_date"] or "") if r.get("ei_mfg_date") else "",
+            "exp_date":       str(r["ei_exp_date"] or "") if r.get("ei_exp_date") else "",
             "entry_item_id":  r.get("entry_item_id") or 0,
         })
 
@@ -196,8 +128,11 @@ def _compute_totals(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
 # ─────────────────────────────────────────────────────────────────────────────
 
 def build_ctx(transaction_id: int, lang: str = "en") -> Dict[str, Any]:
-    header = _fetch_header(transaction_id, lang)
-    rows   = _fetch_rows(transaction_id, lang)
+    snap = TransactionContextLoader.snapshot_for(transaction_id)
+    if snap is None:
+        raise ValueError(f"Transaction #{transaction_id} not found")
+    header = _fetch_header(snap, lang)
+    rows   = _fetch_rows(snap, lang)
     totals = _compute_totals(rows)
     wu     = DEFAULT_WEIGHT_UNIT
 
@@ -1,7 +1,10 @@
 # documents/registry.py
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional, Tuple
+import os
+import threading
+import time
 from . import TEMPLATES_DIR
 
 # خريطة الأكواد إلى مجلدات القوالب
@@ -71,12 +74,76 @@ _CMR_COPY_FILES = {
 }
 
 
+# ── ذاكرة resolve_template ──────────────────────────────────────────────────
+# (doc_code, lang, carrier_id) → (spec, بصمة المجلدات التي يعتمد عليها الاختيار, وقت التحقق)
+# إضافة/حذف ملف قالب يغيّر mtime مجلده → تُعاد عملية الحل
+# البصمة تُفحص كل _RESOLVED_TTL ثانية كحد أقصى (كبصمة شجرة القوالب في facade)
+_RESOLVED: Dict[Tuple[str, str, Optional[int]], Tuple[TemplateSpec, tuple, float]] = {}
+_RESOLVED_LOCK = threading.Lock()
+_RESOLVED_TTL = 2.0
+
+
+def _dir_mtime(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _watched_dirs(doc_code: str, carrier_company_id: int | None) -> Tuple[Path, ...]:
+    """المجلدات التي يفحصها _resolve_template_uncached لهذا المفتاح."""
+    rel_folder = DOC_CODES.get(doc_code)
+    if not rel_folder:
+        return ()
+    dirs = [TEMPLATES_DIR / rel_folder]
+    if doc_code in _ENGLISH_ONLY_DOCS and carrier_company_id:
+        dirs.append(TEMPLATES_DIR / rel_folder / f"company_{carrier_company_id}")
+    if doc_code == "invoice.proforma":
+        dirs.append(TEMPLATES_DIR / DOC_CODES["invoice.commercial"])
+    return tuple(dirs)
+
+
+def _stamp(doc_code: str, carrier_company_id: int | None, spec: TemplateSpec) -> tuple:
+    # mtime ملف القالب نفسه: حذفه أو استبداله يُبطل المدخل أيضاً
+    return tuple(_dir_mtime(d) for d in _watched_dirs(doc_code, carrier_company_id)) \
+        + (_dir_mtime(spec.path),)
+
+
+def clear_template_cache() -> None:
+    """يُفرغ ذاكرة resolve_template (مثلاً بعد استيراد قوالب جديدة)."""
+    with _RESOLVED_LOCK:
+        _RESOLVED.clear()
+
+
 def resolve_template(doc_code: str, lang: str,
                      carrier_company_id: int | None = None) -> TemplateSpec:
     """
     يحل مسار القالب المناسب.
     carrier_company_id: لو مُرر، يبحث أولاً في مجلد company_{id} داخل مجلد CMR.
+    النتيجة محفوظة لكل (doc_code, lang, carrier_id) وتُتحقَّق بـ mtime المجلدات
+    بدل سلسلة exists() في كل توليد.
     """
+    key = (doc_code, lang, int(carrier_company_id) if carrier_company_id else None)
+    now = time.monotonic()
+    with _RESOLVED_LOCK:
+        hit = _RESOLVED.get(key)
+    if hit is not None:
+        spec, stamp, checked = hit
+        if now - checked < _RESOLVED_TTL:
+            return spec
+        if _stamp(doc_code, key[2], spec) == stamp:
+            with _RESOLVED_LOCK:
+                _RESOLVED[key] = (spec, stamp, now)
+            return spec
+
+    spec = _resolve_template_uncached(doc_code, lang, key[2])
+    with _RESOLVED_LOCK:
+        _RESOLVED[key] = (spec, _stamp(doc_code, key[2], spec), now)
+    return spec
+
+
+def _resolve_template_uncached(doc_code: str, lang: str,
+                               carrier_company_id: int | None = None) -> TemplateSpec:
     if lang not in LANG_SUFFIX:
         raise FileNotFoundError(f"Unsupported language: {lang}")
 
@@ -58,6 +58,13 @@ def main():
         )
         sys.exit(1)
 
+    # ترجمة قوالب المستندات مسبقاً في الخلفية (bytecode cache) — لا تؤخر الواجهة
+    try:
+        from services.html_engine import warm_up_templates
+        warm_up_templates(background=True)
+    except Exception:
+        pass
+
     # 5) أول تشغيل → نافذة الإعداد الأولي
     if needs_setup:
         from ui.setup_wizard import SetupWizard
@@ -88,4 +95,8 @@ def main():
 
 
 if __name__ == "__main__":
+    # عمليات render الفرعية (services/pdf_render_worker) تُشغَّل بـ spawn —
+    # في نسخة PyInstaller يجب أن تعود العملية الفرعية هنا قبل main()
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
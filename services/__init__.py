@@ -1,8 +1,18 @@
-from .facade import render_document, RenderResult
+from .facade import (
+    render_document, render_documents_batch, RenderResult, BatchRenderResult,
+    reserve_group_seqs, render_cache_stats, RenderCancelled,
+)
 from .healthcheck import check_pdf_runtime
+from .html_engine import warm_up_templates
 
 __all__ = [
     "render_document",
+    "render_documents_batch",
     "RenderResult",
+    "BatchRenderResult",
+    "reserve_group_seqs",
+    "render_cache_stats",
+    "RenderCancelled",
     "check_pdf_runtime",
+    "warm_up_templates",
 ]
\ No newline at end of file
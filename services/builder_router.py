@@ -50,16 +50,20 @@ _RULES = {
     "form.a": "documents.builders.form_a_builder",
 }
 
+# البادئات مرتبة مرة واحدة (الأطول أولاً) بدل الترتيب عند كل استدعاء
+_PREFIXES: Tuple[str, ...] = tuple(sorted(_RULES.keys(), key=len, reverse=True))
+
+@lru_cache(maxsize=256)
 def _best_rule(doc_code: str) -> Optional[Tuple[str, str]]:
     """
     يرجع (prefix, module_path) لأطول بادئة تطابق doc_code.
     مثال: 'invoice.syrian.entry.ar' سيطابق 'invoice.syrian.entry.' قبل 'invoice.syrian.'.
+    النتيجة محفوظة لكل doc_code — التوجيه بعد أول مرة lookup واحد.
     """
     if not doc_code:
         return None
     # جرّب مطابقة الأطول أولاً
-    candidates = sorted(_RULES.keys(), key=len, reverse=True)
-    for prefix in candidates:
+    for prefix in _PREFIXES:
         if doc_code.startswith(prefix):
             return prefix, _RULES[prefix]
     return None
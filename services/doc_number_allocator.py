@@ -0,0 +1,214 @@
+# services/doc_number_allocator.py
+"""
+Doc Number Allocator — LOGIPORT
+================================
+حجز ذرّي لأرقام المستندات وتسلسل doc_groups بدون تعارض بين المستخدمين.
+
+كل عداد صف واحد في جدول doc_counters (counter_key → last_number).
+الحجز يتم في transaction واحدة BEGIN IMMEDIATE على connection مستقلة:
+
+    UPDATE doc_counters SET last_number = last_number + :n
+     WHERE counter_key = :k RETURNING last_number
+
+  - BEGIN IMMEDIATE يأخذ قفل الكتابة فوراً → لا قراءتان لنفس القيمة
+  - RETURNING يُرجع نهاية النطاق المحجوز → النطاق [end-n+1 .. end]
+  - connection مستقلة → لا commit في منتصف Session المستدعي
+  - count > 1 يحجز نطاقاً كاملاً دفعة واحدة (مهام متعددة المستندات)
+
+الأرقام المحجوزة وغير المستخدمة (فشل التوليد، مجموعة موجودة مسبقاً)
+تترك فجوة — هذا مقبول: المطلوب التفرّد وليس التتابع الكامل.
+
+العدادات:
+  doc_counter_inv / pkl / cmr / forma  ← أرقام المستندات PREFIX-YYMM-NNNN
+  doc_seq:YYYY-MM                      ← doc_groups.seq (قيد year/month/seq)
+
+عند إنشاء عداد لأول مرة يُبذَر من الواقع (floor):
+  - أرقام المستندات: القيمة القديمة في app_settings
+  - التسلسل الشهري: MAX(seq) من doc_groups لنفس الشهر
+"""
+from __future__ import annotations
+
+import logging
+import sqlite3
+from contextlib import contextmanager
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# UPDATE ... RETURNING متاح منذ SQLite 3.35
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def seq_counter_key(year: int, month: int) -> str:
+    """مفتاح عداد doc_groups.seq لشهر معيّن."""
+    return f"doc_seq:{int(year):04d}-{int(month):02d}"
+
+
+@contextmanager
+def _immediate():
+    """connection مستقلة داخل BEGIN IMMEDIATE — commit عند النجاح."""
+    from database.models.base import get_engine
+    with get_engine().connect() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def _ensure_table(conn) -> None:
+    # نفس تعريف bootstrap — لقواعد لم تمر بالـ migration بعد
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS doc_counters (
+            counter_key TEXT PRIMARY KEY,
+            last_number INTEGER NOT NULL DEFAULT 0,
+            updated_at  DATETIME DEFAULT (datetime('now'))
+        )
+    """)
+
+
+def _legacy_floor(conn, key: str) -> int:
+    """القيمة الابتدائية لعداد جديد — من app_settings أو doc_groups."""
+    try:
+        if key.startswith("doc_seq:"):
+            year, month = key.split(":", 1)[1].split("-")
+            row = conn.exec_driver_sql(
+                "SELECT COALESCE(MAX(seq), 0) FROM doc_groups WHERE year = ? AND month = ?",
+                (int(year), int(month)),
+            ).fetchone()
+        else:
+            row = conn.exec_driver_sql(
+                "SELECT value FROM app_settings WHERE key = ?", (key,)
+            ).fetchone()
+        return int(row[0]) if row and row[0] else 0
+    except Exception as e:
+        logger.debug(f"DocNumberAllocator: no legacy floor for {key}: {e}")
+        return 0
+
+
+def _reserve_in(conn, key: str, count: int, floor: int) -> int:
+    """يحجز count رقماً داخل transaction مفتوحة — يُرجع أول رقم."""
+    row = conn.exec_driver_sql(
+        "SELECT last_number FROM doc_counters WHERE counter_key = ?", (key,)
+    ).fetchone()
+    if row is None:
+        conn.exec_driver_sql(
+            "INSERT INTO doc_counters (counter_key, last_number) VALUES (?, ?)",
+            (key, max(int(floor), _legacy_floor(conn, key))),
+        )
+    elif floor > int(row[0]):
+        conn.exec_driver_sql(
+            "UPDATE doc_counters SET last_number = ? WHERE counter_key = ?",
+            (int(floor), key),
+        )
+
+    update = ("UPDATE doc_counters SET last_number = last_number + ?, "
+              "updated_at = datetime('now') WHERE counter_key = ?")
+    if _HAS_RETURNING:
+        end = conn.exec_driver_sql(update + " RETURNING last_number", (count, key)).fetchone()[0]
+    else:
+        conn.exec_driver_sql(update, (count, key))
+        end = conn.exec_driver_sql(
+            "SELECT last_number FROM doc_counters WHERE counter_key = ?", (key,)
+        ).fetchone()[0]
+    return int(end) - count + 1
+
+
+class DocNumberAllocator:
+    """واجهة الحجز — كل الدوال ذرّية ومستقلة عن Session المستدعي."""
+
+    @staticmethod
+    def reserve(counter_key: str, count: int = 1, *, floor: int = 0) -> List[int]:
+        """
+        يحجز count رقماً متتالياً من العداد ويُرجعها.
+        floor: حد أدنى — العداد يُرفع إليه أولاً إن كان أقل.
+        """
+        count = max(1, int(count))
+        with _immediate() as conn:
+            _ensure_table(conn)
+            first = _reserve_in(conn, counter_key, count, floor)
+        return list(range(first, first + count))
+
+    @staticmethod
+    def peek(counter_key: str) -> int:
+        """الرقم التالي بدون حجز — للعرض فقط."""
+        from database.models.base import get_engine
+        try:
+            with get_engine().connect() as conn:
+                row = conn.exec_driver_sql(
+                    "SELECT last_number FROM doc_counters WHERE counter_key = ?", (counter_key,)
+                ).fetchone()
+                last = int(row[0]) if row else _legacy_floor(conn, counter_key)
+        except Exception:
+            with get_engine().connect() as conn:
+                last = _legacy_floor(conn, counter_key)
+        return last + 1
+
+    # ─────────────────────────────────────────────────────────────────────
+    # DOC NUMBERS  (PREFIX-YYMM-NNNN)
+    # ─────────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def reserve_doc_numbers(counter_key: str, prefix: str, yymm: str,
+                            count: int = 1) -> List[str]:
+        """
+        يحجز count رقم مستند غير مستخدم في doc_groups.
+        عند التصادم (مستند أُنشئ خارج العداد، مثلاً عبر المزامنة) يُرفع
+        العداد فوق أعلى رقم موجود بهذه البادئة بطلب واحد ويُعاد الحجز.
+        """
+        count = max(1, int(count))
+        stem = f"{prefix}-{yymm}-"
+        with _immediate() as conn:
+            _ensure_table(conn)
+            floor = 0
+            for _ in range(2):
+                first = _reserve_in(conn, counter_key, count, floor)
+                numbers = [f"{stem}{n:04d}" for n in range(first, first + count)]
+                marks = ",".join("?" * count)
+                taken = conn.exec_driver_sql(
+                    f"SELECT 1 FROM doc_groups WHERE doc_no IN ({marks}) LIMIT 1",
+                    tuple(numbers),
+                ).fetchone()
+                if not taken:
+                    return numbers
+                floor = _max_suffix(conn, stem)
+        raise RuntimeError(f"DocNumberAllocator: could not reserve {stem}NNNN")
+
+    # ─────────────────────────────────────────────────────────────────────
+    # doc_groups.seq
+    # ─────────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def reserve_group_seqs(count: int = 1, *, year: Optional[int] = None,
+                           month: Optional[int] = None, resync: bool = False) -> List[int]:
+        """
+        يحجز count قيمة seq للشهر (الحالي افتراضياً).
+        resync=True يرفع العداد إلى MAX(seq) الفعلي أولاً — بعد IntegrityError.
+        """
+        if year is None or month is None:
+            import datetime
+            today = datetime.date.today()
+            year, month = today.year, today.month
+        key = seq_counter_key(year, month)
+        count = max(1, int(count))
+        with _immediate() as conn:
+            _ensure_table(conn)
+            floor = _legacy_floor(conn, key) if resync else 0
+            first = _reserve_in(conn, key, count, floor)
+        return list(range(first, first + count))
+
+
+def _max_suffix(conn, stem: str) -> int:
+    """أعلى جزء رقمي لأرقام doc_groups التي تبدأ بـ stem."""
+    best = 0
+    rows = conn.exec_driver_sql(
+        "SELECT doc_no FROM doc_groups WHERE substr(doc_no, 1, ?) = ?",
+        (len(stem), stem),
+    ).fetchall()
+    for (doc_no,) in rows:
+        tail = str(doc_no)[len(stem):]
+        if tail.isdigit():
+            best = max(best, int(tail))
+    return best
@@ -0,0 +1,215 @@
+"""
+services/document_fonts.py — LOGIPORT
+======================================
+خطوط المستندات العربية كملف fonts.css واحد مشترك.
+
+بدل كتلة @font-face داخل كل مستند RTL:
+  - fonts-{stamp}.css يُولَّد مرة واحدة في AppData/LOGIPORT/cache/fonts
+    ويُربط من القالب (_partials/arabic_fonts.html) بـ <link> — نفس الـ URL
+    لكل المستندات، فصفحات PdfRenderPool الدافئة تحمّله وتفك الخطوط مرة
+    واحدة لكل renderer بدل كل مستند
+  - stamp = بصمة ملفات الخطوط (اسم/حجم/mtime) — تغيير خط يُنتج ملفاً جديداً
+    باسم جديد، فلا كاش قديم في المتصفح
+  - إن وُجدت fontTools + brotli (اختيارية): prepare_document_fonts() (من
+    warm_up_templates في الخلفية — عدة ثوانٍ مرة واحدة) يولّد نسخ WOFF2
+    مُقلَّصة للنطاقات المستخدمة (لاتيني + عربي + علامات) تأتي أولاً في src،
+    و TTF الأصلي احتياطي للمحركات التي لا تدعم WOFF2
+  - fonts_css_url() (عند كل تصيير) لا يُقلّص أبداً: نسخة WOFF2 إن جهزت،
+    وإلا fonts.css بـ TTF فقط (يُكتب فوراً)
+  - تعذّر الكتابة في AppData → fonts_css_url() == "" والقالب يعود لـ
+    @font-face المضمّن
+
+الاستخدام:
+    from services.document_fonts import fonts_css_url
+    fonts_css_url()        # file:///.../fonts-3fa1c2d4e5b6.css أو ""
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from documents import DOC_DIR
+
+logger = logging.getLogger(__name__)
+
+_FONTS_DIR = DOC_DIR / "static" / "fonts"
+
+# (family, weight, ملف TTF) — نفس الوجوه التي كان يحقنها facade
+_FACES: Tuple[Tuple[str, int, str], ...] = (
+    ("Noto Naskh Arabic", 400, "NotoNaskhArabic-Regular.ttf"),
+    ("Noto Naskh Arabic", 700, "NotoNaskhArabic-Bold.ttf"),
+    ("Amiri",             400, "Amiri-Regular.ttf"),
+    ("Amiri",             700, "Amiri-Bold.ttf"),
+)
+
+# نطاقات WOFF2 المُقلَّصة: لاتيني (مع التركي)، العربي وملحقاته وأشكال العرض،
+# علامات الترقيم العامة (ZWJ/ZWNJ/RLM...) ورموز العملات
+_SUBSET_UNICODES = (
+    "U+0020-007E,U+00A0-017F,U+0600-06FF,U+0750-077F,U+08A0-08FF,"
+    "U+FB50-FDFF,U+FE70-FEFF,U+2000-206F,U+20A0-20CF"
+)
+
+# يُرفع عند تغيير شكل fonts.css أو خيارات التقليص
+_CSS_VERSION = 1
+
+_LOCK = threading.Lock()
+_KNOWN: Dict[str, Path] = {}      # اسم ملف css → مساره (موجود على القرص)
+
+
+@lru_cache(maxsize=1)
+def _woff2_available() -> bool:
+    try:
+        import fontTools.subset  # noqa: F401
+        import brotli            # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def _cache_dir() -> Optional[Path]:
+    try:
+        from core.paths import get_user_data_dir
+        path = get_user_data_dir() / "cache" / "fonts"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+    except Exception as e:
+        logger.debug("Document fonts cache unavailable: %s", e)
+        return None
+
+
+def _fonts_stamp() -> Optional[str]:
+    h = hashlib.sha256(f"v{_CSS_VERSION};".encode("utf-8"))
+    found = False
+    for _family, _weight, name in _FACES:
+        try:
+            st = (_FONTS_DIR / name).stat()
+        except OSError:
+            continue
+        found = True
+        h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return h.hexdigest()[:12] if found else None
+
+
+def _write_atomic(path: Path, write) -> None:
+    # اسم مؤقت فريد — thread التحضير والتصيير قد يكتبان في نفس الوقت
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    write(tmp)
+    tmp.replace(path)
+
+
+def _subset_woff2(src: Path, dst: Path) -> bool:
+    sub_log = logging.getLogger("fontTools.subset")
+    level = sub_log.level
+    try:
+        from fontTools import subset
+        # fontTools يسجّل كل glyph ناقص (النطاقات أوسع من الخط) بمستوى INFO
+        sub_log.setLevel(logging.WARNING)
+        opts = subset.Options()
+        opts.flavor = "woff2"
+        opts.layout_features = ["*"]      # الوصل والتشكيل العربي (init/medi/fina/liga...)
+        opts.name_IDs = ["*"]
+        opts.notdef_outline = True
+        font = subset.load_font(str(src), opts)
+        subsetter = subset.Subsetter(opts)
+        subsetter.populate(unicodes=subset.parse_unicodes(_SUBSET_UNICODES))
+        subsetter.subset(font)
+        _write_atomic(dst, lambda tmp: subset.save_font(font, str(tmp), opts))
+        return True
+    except Exception as e:
+        logger.warning("WOFF2 subset failed for %s: %s", src.name, e)
+        return False
+    finally:
+        sub_log.setLevel(level)
+
+
+def _css_name(stamp: str, woff2: bool) -> str:
+    return f"fonts-{stamp}-woff2.css" if woff2 else f"fonts-{stamp}.css"
+
+
+def _build(cache: Path, stamp: str, woff2: bool) -> Path:
+    faces: List[str] = []
+    for family, weight, name in _FACES:
+        ttf = _FONTS_DIR / name
+        if not ttf.exists():
+            continue
+        sources = []
+        if woff2:
+            w2 = cache / f"{ttf.stem}-{stamp}.woff2"
+            if w2.exists() or _subset_woff2(ttf, w2):
+                sources.append(f"url('{w2.resolve().as_uri()}') format('woff2')")
+        sources.append(f"url('{ttf.resolve().as_uri()}') format('truetype')")
+        faces.append(
+            "@font-face {\n"
+            f"  font-family: '{family}';\n"
+            f"  font-weight: {weight};\n"
+            "  font-display: block;\n"
+            f"  src: {', '.join(sources)};\n"
+            "}\n"
+        )
+
+    css = cache / _css_name(stamp, woff2)
+    body = f"/* LOGIPORT document fonts — {stamp} */\n" + "".join(faces)
+    _write_atomic(css, lambda tmp: tmp.write_text(body, encoding="utf-8"))
+
+    # ملفات نسخ سابقة من الخطوط — لم يعد أي مستند جديد يشير إليها
+    for old in list(cache.glob("fonts-*.css")) + list(cache.glob("*.woff2")):
+        if stamp not in old.name:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+    logger.info("Document fonts.css ready | %s (woff2=%s)", css, woff2)
+    return css
+
+
+def _css_for(woff2: bool, build: bool) -> Optional[Path]:
+    stamp = _fonts_stamp()
+    if stamp is None:
+        return None
+    name = _css_name(stamp, woff2)
+    with _LOCK:
+        css = _KNOWN.get(name)
+    if css is not None:
+        return css
+    cache = _cache_dir()
+    if cache is None:
+        return None
+    css = cache / name
+    if not css.exists():
+        if not build:
+            return None
+        # البناء خارج القفل — تقليص WOFF2 في الخلفية لا يوقف التصيير
+        try:
+            css = _build(cache, stamp, woff2)
+        except Exception as e:
+            logger.warning("Document fonts.css build failed: %s", e)
+            return None
+    with _LOCK:
+        _KNOWN[name] = css
+    return css
+
+
+def prepare_document_fonts() -> Optional[Path]:
+    """يجهّز fonts.css النهائي (مع تقليص WOFF2 إن توفر) — بطيء أول مرة، للخلفية."""
+    return _css_for(_woff2_available(), build=True)
+
+
+def fonts_css_path() -> Optional[Path]:
+    """مسار fonts.css للتصيير الآن (لا يُقلّص الخطوط) أو None إن تعذّر."""
+    if _woff2_available():
+        css = _css_for(True, build=False)
+        if css is not None:
+            return css
+    return _css_for(False, build=True)
+
+
+def fonts_css_url() -> str:
+    """file:/// لـ fonts.css — "" إن لم يتوفر (القالب يعود للـ @font-face المضمّن)."""
+    css = fonts_css_path()
+    return css.resolve().as_uri() if css is not None else ""
+
@@ -1,18 +1,20 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Optional
 import datetime as _dt
 import os
 import logging
+import threading
+import time
 
 # -----------------------------------------------------------------------------
 # Logging
 logger = logging.getLogger(__name__)
 
 # -----------------------------------------------------------------------------
-from .html_engine import render_html
-from .persist_generated_doc import persist_document, allocate_group_doc_no
+from .html_engine import render_html_to_file
+from .persist_generated_doc import persist_document, allocate_group_doc_no, reserve_group_seqs
 from .builder_router import get_builder
 from .pdf_renderer import render_html_to_pdf, detect_engines
 
@@ -20,63 +22,18 @@ from documents import OUTPUT_DIR, DOC_DIR
 from pathlib import Path as _Path
 
 
-def _inject_arabic_fonts(html: str) -> str:
-    """
-    يحقن @font-face بمسار مطلق للخطوط العربية داخل HTML قبل الطباعة.
-    يُطبَّق فقط على صفحات dir="rtl" (العربية).
-    QtWebEngine لا يرى الخطوط المحلية بدون file:/// مطلق.
-    """
-    if 'dir="rtl"' not in html and "dir='rtl'" not in html:
-        return html
-
-    fonts_dir = (DOC_DIR / "static" / "fonts").resolve()
-    if not fonts_dir.exists():
-        return html
-
-    # بناء مسارات file:///
-    def furl(name: str) -> str:
-        return (fonts_dir / name).as_uri()
-
-    noto_reg = furl("NotoNaskhArabic-Regular.ttf")
-    noto_bold = furl("NotoNaskhArabic-Bold.ttf")
-    amiri_reg = furl("Amiri-Regular.ttf")
-    amiri_bold = furl("Amiri-Bold.ttf")
-
-    face_block = f"""
-<style id="_logiport_fonts">
-@font-face {{
-  font-family: 'Noto Naskh Arabic';
-  font-weight: 400;
-  src: url('{noto_reg}') format('truetype');
-}}
-@font-face {{
-  font-family: 'Noto Naskh Arabic';
-  font-weight: 700;
-  src: url('{noto_bold}') format('truetype');
-}}
-@font-face {{
-  font-family: 'Amiri';
-  font-weight: 400;
-  src: url('{amiri_reg}') format('truetype');
-}}
-@font-face {{
-  font-family: 'Amiri';
-  font-weight: 700;
-  src: url('{amiri_bold}') format('truetype');
-}}
-</style>"""
-
-    # حقن قبل </head> أو بعد <head>
-    if "</head>" in html:
-        return html.replace("</head>", face_block + "\n</head>", 1)
-    if "<head>" in html:
-        return html.replace("<head>", "<head>" + face_block, 1)
-    return face_block + html
-
 from database.models import get_session_local
 from sqlalchemy import text
 
 
+# مراحل المستند بالترتيب — progress(stage, ثوانٍ) بعد كل منها
+STAGES = ("context", "html", "pdf", "persist")
+
+
+class RenderCancelled(RuntimeError):
+    """أُلغي التوليد (cancel.is_set()) بين مرحلتين — لا شيء حُفظ للمستند."""
+
+
 @dataclass
 class RenderResult:
     doc_code: str
@@ -84,6 +41,11 @@ class RenderResult:
     doc_no: str
     out_html: Path
     out_pdf: Optional[Path]
+    # ثوانٍ لكل مرحلة: context / html / pdf (+ pdf_queue/pdf_load/pdf_print) / persist
+    timings: Dict[str, float] = field(default_factory=dict)
+    # True = أُعيد الملف المحفوظ (render_hash مطابق) بدون إعادة توليد
+    cached: bool = False
+    transaction_id: Optional[int] = None
 
 
 def _get_output_root() -> Path:
@@ -125,6 +87,10 @@ def _sanitize_tx_no(tx_no: str) -> str:
     return _re.sub(r"[/\\\s]+", "-", (tx_no or "").strip()) or "UNKNOWN"
 
 
+# عدة مستندات تُولَّد بالتوازي — اختيار الاسم + حجزه يجب أن يكون ذرّياً
+_OUTPUT_LOCK = threading.Lock()
+
+
 def _output_paths(
     prefix: str,
     transaction_no: str,
@@ -151,44 +117,236 @@ def _output_paths(
     safe_tx = _sanitize_tx_no(transaction_no)
     base_stem = f"{prefix}-{safe_tx}-{lang.upper()}"   # INV-COM-260006-AR
 
-    # ابحث عن أول اسم غير مستخدم
+    # ابحث عن أول اسم غير مستخدم — ويُحجز بإنشاء ملف HTML فارغ فوراً
     html_path = folder / f"{base_stem}.html"
     pdf_path  = folder / f"{base_stem}.pdf"
-    if not html_path.exists() and not pdf_path.exists():
-        return html_path, pdf_path
-
-    for v in range(2, 200):
-        stem_v = f"{base_stem}-v{v}"
-        hp = folder / f"{stem_v}.html"
-        pp = folder / f"{stem_v}.pdf"
-        if not hp.exists() and not pp.exists():
-            return hp, pp
+    with _OUTPUT_LOCK:
+        candidates = [(html_path, pdf_path)] + [
+            (folder / f"{base_stem}-v{v}.html", folder / f"{base_stem}-v{v}.pdf")
+            for v in range(2, 200)
+        ]
+        for hp, pp in candidates:
+            if not hp.exists() and not pp.exists():
+                hp.touch()
+                return hp, pp
 
     # fallback (لا يجب أن يصل هنا)
     return html_path, pdf_path
 
 
-def render_document(
-    *,
+# -----------------------------------------------------------------------------
+# Render cache — مفتاح = sha256(context + بصمة القالب + اللغة + الخيارات)
+# يُحفظ في documents.render_hash بجانب data_json؛ تطابقه + وجود الملف
+# يعني أن المستند المحفوظ ما زال صالحاً → يُعاد بدون Jinja/HTML/PDF/persist.
+# -----------------------------------------------------------------------------
+
+# يُرفع عند تغيير طريقة التوليد نفسها (حقن الخطوط، تخطيط الصفحة...) لإبطال الكل
+_RENDER_CACHE_VERSION = 1
+
+# بصمة شجرة القوالب (mtime/size لكل ملف) تُعاد حسابها كل _TREE_STAMP_TTL ثانية كحد أقصى
+_TREE_STAMP_TTL = 2.0
+
+_CACHE_LOCK = threading.Lock()
+_CACHE_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "forced": 0, "stored": 0}
+_TREE_STAMP: Dict[str, object] = {"at": 0.0, "value": ""}
+_TEMPLATE_HASHES: Dict[tuple, str] = {}     # (path, mtime_ns, size) → sha256
+
+
+def render_cache_stats() -> Dict[str, float]:
+    """hits / misses / forced / stored + hit_rate منذ بدء التشغيل."""
+    with _CACHE_LOCK:
+        out: Dict[str, float] = dict(_CACHE_STATS)
+    total = out["hits"] + out["misses"]
+    out["hit_rate"] = (out["hits"] / total) if total else 0.0
+    return out
+
+
+def _count_cache(key: str) -> None:
+    with _CACHE_LOCK:
+        _CACHE_STATS[key] += 1
+
+
+def _templates_tree_stamp() -> str:
+    """
+    بصمة كل ملفات القوالب والـ static (extends/include/CSS/خطوط) —
+    أي تعديل على ملف مشترك يُبطل كاش كل المستندات.
+    """
+    import hashlib
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        if now - float(_TREE_STAMP["at"]) < _TREE_STAMP_TTL:
+            return str(_TREE_STAMP["value"])
+    h = hashlib.sha256()
+    for root in (DOC_DIR / "templates", DOC_DIR / "static"):
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                try:
+                    st = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                h.update(f"{dirpath}/{name}:{st.st_mtime_ns}:{st.st_size};".encode("utf-8"))
+    value = h.hexdigest()
+    with _CACHE_LOCK:
+        _TREE_STAMP.update(at=now, value=value)
+    return value
+
+
+def _template_hash(path: Path) -> str:
+    """sha256 لمحتوى القالب — محفوظ حسب (mtime, size) فلا يُقرأ الملف كل مرة."""
+    import hashlib
+    st = path.stat()
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    with _CACHE_LOCK:
+        cached = _TEMPLATE_HASHES.get(key)
+    if cached is None:
+        cached = hashlib.sha256(path.read_bytes()).hexdigest()
+        with _CACHE_LOCK:
+            _TEMPLATE_HASHES[key] = cached
+    return cached
+
+
+def _render_fingerprint(
+    doc_code: str,
+    lang: str,
+    ctx: dict,
+    carrier_company_id,
+    force_html_only: bool,
+) -> Optional[str]:
+    """مفتاح الكاش — None إن تعذّر حسابه (القالب غير موجود مثلاً → لا كاش)."""
+    import hashlib
+    import json
+    from documents.registry import resolve_template
+    try:
+        spec = resolve_template(doc_code, lang, carrier_company_id=carrier_company_id)
+        payload = json.dumps(
+            {
+                "v":        _RENDER_CACHE_VERSION,
+                "doc_code": doc_code,
+                "lang":     lang,
+                "html_only": bool(force_html_only),
+                "template": str(spec.path),
+                "tpl_hash": _template_hash(spec.path),
+                "tree":     _templates_tree_stamp(),
+                "extra":    getattr(spec, "extra", None),
+                "ctx":      ctx,
+            },
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+    except Exception as e:
+        logger.debug("Render cache key skipped | doc_code=%s: %s", doc_code, e)
+        return None
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cached_output(
     transaction_id: int,
-    transaction_no: str,
+    doc_no: str,
     doc_code: str,
     lang: str,
-    force_html_only: bool = False,
-    explicit_doc_no: Optional[str] = None,
-    extra_options: Optional[dict] = None,
-) -> RenderResult:
-    """
-    يولّد المستند (HTML/PDF) بالاعتماد على transaction_id فقط.
-    """
+    render_hash: str,
+    force_html_only: bool,
+) -> Optional[tuple]:
+    """(out_html, out_pdf) للمستند المحفوظ إن طابق render_hash وما زال الملف موجوداً."""
+    from .persist_generated_doc import _resolve_document_type_code
+    try:
+        dtype_code = _resolve_document_type_code(doc_code)
+        with get_session_local()() as s:
+            row = s.execute(
+                text(
+                    "SELECT d.file_path, d.render_hash FROM documents d "
+                    "JOIN doc_groups g ON g.id = d.group_id "
+                    "JOIN document_types t ON t.id = d.document_type_id "
+                    "WHERE g.transaction_id = :t AND g.doc_no = :n "
+                    "AND t.code = :c AND d.language = :l "
+                    "ORDER BY d.id DESC LIMIT 1"
+                ),
+                {"t": int(transaction_id), "n": doc_no, "c": dtype_code, "l": lang},
+            ).fetchone()
+    except Exception as e:
+        logger.debug("Render cache lookup failed | doc_code=%s: %s", doc_code, e)
+        return None
+    if not row or not row[0] or row[1] != render_hash:
+        return None
 
-    logger.info(
-        "Render document started | tx_id=%s doc_code=%s lang=%s",
-        transaction_id, doc_code, lang
-    )
+    path = Path(row[0])
+    out_html = path.with_suffix(".html")
+    if force_html_only:
+        return (out_html, None) if out_html.is_file() else None
+    if path.suffix.lower() != ".pdf" or not path.is_file():
+        return None
+    return out_html, path
 
-    # -------------------------------------------------------------------------
-    # Runtime PDF diagnostics (non-blocking)
+
+@dataclass
+class _DocJob:
+    """حالة مستند واحد بين مراحل التوليد (مشتركة بين render_document والدفعات)."""
+    transaction_id: int
+    transaction_no: str
+    doc_code: str
+    lang: str
+    extra_options: Optional[dict] = None
+    force_html_only: bool = False
+    timings: Dict[str, float] = field(default_factory=dict)
+    ctx: Optional[dict] = None
+    doc_prefix: str = ""
+    doc_no: str = ""
+    carrier_cid: Optional[int] = None
+    render_hash: Optional[str] = None
+    out_html: Optional[Path] = None
+    out_pdf: Optional[Path] = None
+    # لقطة المعاملة (TransactionContextLoader) — تُمرَّر للـ builder عبر scope
+    snapshot: Optional[object] = None
+    # progress(stage, ثوانٍ) + كائن بـ is_set() يُفحص بين المراحل
+    progress: Optional[Callable[[str, float], None]] = None
+    cancel: Optional[object] = None
+
+    def check_cancel(self) -> None:
+        if self.cancel is not None and self.cancel.is_set():
+            # ملفات جزئية (HTML بلا PDF) تبقى على القرص وتدفع التوليد التالي لاسم -vN
+            self.discard_outputs()
+            raise RenderCancelled(
+                f"Cancelled | tx_id={self.transaction_id} doc_code={self.doc_code} lang={self.lang}")
+
+    def discard_outputs(self) -> None:
+        for path in (self.out_html, self.out_pdf):
+            if path is not None:
+                try:
+                    path.unlink(missing_ok=True)
+                except OSError as e:
+                    logger.warning("Cannot remove cancelled output %s: %s", path, e)
+        self.out_html = self.out_pdf = None
+
+    def stage_done(self, stage: str, check: bool = True) -> None:
+        """مرحلة انتهت: إشعار progress ثم فحص الإلغاء قبل التالية."""
+        if self.progress is not None:
+            try:
+                self.progress(stage, self.timings.get(stage, 0.0))
+            except Exception:
+                logger.debug("Stage progress callback failed", exc_info=True)
+        if check:
+            self.check_cancel()
+
+    def result(self, cached: bool = False) -> RenderResult:
+        return RenderResult(
+            doc_code=self.doc_code,
+            lang=self.lang,
+            doc_no=self.doc_no,
+            out_html=self.out_html,
+            out_pdf=self.out_pdf,
+            timings=self.timings,
+            cached=cached,
+            transaction_id=self.transaction_id,
+        )
+
+    @property
+    def store_hash(self) -> Optional[str]:
+        # PDF فشل → لا نحفظ البصمة، المحاولة التالية تعيد الطباعة
+        return self.render_hash if (self.out_pdf or self.force_html_only) else None
+
+
+def _log_pdf_runtime() -> None:
+    """Runtime PDF diagnostics (non-blocking)."""
     try:
         from .healthcheck import check_pdf_runtime
         report = check_pdf_runtime()
@@ -202,25 +360,11 @@ def render_document(
     except Exception as e:
         logger.debug("PDF runtime healthcheck skipped: %s", e)
 
-    # -------------------------------------------------------------------------
-    # Fetch real transaction_no from DB
-    SessionLocal = get_session_local()
-    with SessionLocal() as s:
-        row = s.execute(
-            text(
-                "SELECT COALESCE(transaction_no, CAST(id AS TEXT)) "
-                "FROM transactions WHERE id=:i"
-            ),
-            {"i": int(transaction_id)},
-        ).fetchone()
-
-        if not row or not row[0]:
-            logger.error("Transaction not found | tx_id=%s", transaction_id)
-            raise RuntimeError(f"Transaction id={transaction_id} not found")
-
-        transaction_no = str(row[0])
-        logger.debug("Resolved transaction_no=%s", transaction_no)
 
+def _build_context(job: _DocJob, explicit_doc_no: Optional[str]) -> None:
+    """builder → ctx + خيارات إضافية + doc_no + carrier (يملأ job)."""
+    doc_code, transaction_id, lang = job.doc_code, job.transaction_id, job.lang
+    extra_options = job.extra_options
 
     # -------------------------------------------------------------------------
     # Resolve builder
@@ -233,16 +377,22 @@ def render_document(
 
     # -------------------------------------------------------------------------
     # Build context
+    from documents.builders.context_loader import TransactionContextLoader
+    _t = time.perf_counter()
     try:
         import inspect
         sig = inspect.signature(builder)
         params = list(sig.parameters.keys())
-        # builders جديدة: (doc_code, transaction_id, lang)
-        # builders قديمة: (transaction_id, lang)
-        if len(params) >= 3 and params[0] not in ("transaction_id", "tx_id"):
-            ctx = builder(doc_code, transaction_id, lang)
-        else:
-            ctx = builder(transaction_id, lang)
+        # اللقطة المحمّلة مسبقاً تصل للـ builder عبر scope (الـ ContextVar لا
+        # يعبر threads الدفعة، لذا نمررها مع الـ job)
+        preloaded = {transaction_id: job.snapshot} if job.snapshot is not None else None
+        with TransactionContextLoader.scope(preloaded):
+            # builders جديدة: (doc_code, transaction_id, lang)
+            # builders قديمة: (transaction_id, lang)
+            if len(params) >= 3 and params[0] not in ("transaction_id", "tx_id"):
+                ctx = builder(doc_code, transaction_id, lang)
+            else:
+                ctx = builder(transaction_id, lang)
 
         # تمرير extra_options للـ context (مثلاً cmr_variant للـ CMR builder)
         if extra_options:
@@ -276,114 +426,440 @@ def render_document(
         )
         raise
 
+    job.timings["context"] = time.perf_counter() - _t
+
     # -------------------------------------------------------------------------
     # اختيار بادئة المستند حسب نوعه
     from services.numbering_service import NumberingService as _NS
-    _doc_prefix = _NS.prefix_for_doc_code(doc_code)
+    job.doc_prefix = _NS.prefix_for_doc_code(doc_code)
 
     # doc_no = البادئة + رقم المعاملة (يُستخدم كمعرّف في doc_groups وعمود رقم المستند)
     if explicit_doc_no and explicit_doc_no.strip():
-        doc_no = explicit_doc_no.strip()
-        logger.info("Using explicit doc_no=%s", doc_no)
+        job.doc_no = explicit_doc_no.strip()
+        logger.info("Using explicit doc_no=%s", job.doc_no)
     else:
-        doc_no = f"{_doc_prefix}-{transaction_no}"
-        logger.info("Allocated doc_no=%s", doc_no)
+        job.doc_no = f"{job.doc_prefix}-{job.transaction_no}"
+        logger.info("Allocated doc_no=%s", job.doc_no)
 
     # Inject context
-    ctx["transaction_no"] = transaction_no
-    ctx["doc_no"] = doc_no
-    ctx.setdefault("invoice_no", doc_no)
+    ctx["transaction_no"] = job.transaction_no
+    ctx["doc_no"] = job.doc_no
+    ctx.setdefault("invoice_no", job.doc_no)
 
-    # -------------------------------------------------------------------------
-    # Render HTML
     # لـ CMR: نمرر carrier_company_id لاختيار القالب الخاص بالشركة الناقلة
-    _carrier_cid = None
     if doc_code in ("cmr", "cmr.copy1.sender", "cmr.copy2.consignee",
                     "cmr.copy3.carrier", "cmr.copy4.archive"):
         _car = ctx.get("carrier") or {}
         if isinstance(_car, dict):
-            _carrier_cid = _car.get("id")
+            job.carrier_cid = _car.get("id")
+
+    job.ctx = ctx
+    job.render_hash = _render_fingerprint(doc_code, job.lang, ctx, job.carrier_cid,
+                                          job.force_html_only)
+    job.stage_done("context")
+
+
+def _produce(job: _DocJob) -> None:
+    """
+    Jinja → HTML على القرص → PDF (يملأ job.out_html / job.out_pdf).
+    HTML يُكتب مباشرة للملف أثناء التصيير (الخطوط العربية من
+    _partials/arabic_fonts.html في القالب) ومحرك PDF يحمّل الملف نفسه —
+    لا نسخ نصية كاملة للمستند في الذاكرة.
+    """
+    doc_code, lang = job.doc_code, job.lang
+
+    # -------------------------------------------------------------------------
+    # Output paths
+    _t = time.perf_counter()
+    out_html, out_pdf = _output_paths(job.doc_prefix, job.transaction_no, lang)
+    out_html.parent.mkdir(parents=True, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # Render HTML (streaming → out_html)
     try:
-        html_str = render_html(doc_code, lang, ctx,
-                               carrier_company_id=_carrier_cid)
-        logger.debug("HTML rendered successfully")
+        render_html_to_file(doc_code, lang, job.ctx, out_html,
+                            carrier_company_id=job.carrier_cid)
     except Exception:
         logger.exception(
             "HTML rendering failed | doc_code=%s lang=%s",
             doc_code, lang
         )
         raise
+    logger.info("HTML written | path=%s", out_html)
+    job.out_html = out_html
+    job.timings["html"] = time.perf_counter() - _t
+    # HTML فقط = الملف النهائي جاهز — الإلغاء بعده يُتجاهل (انظر "pdf")
+    job.stage_done("html", check=not job.force_html_only)
 
     # -------------------------------------------------------------------------
-    # Output paths
-    out_html, out_pdf = _output_paths(_doc_prefix, transaction_no, lang)
-    out_html.parent.mkdir(parents=True, exist_ok=True)
+    # PDF generation
+    if job.force_html_only:
+        return
 
-    # حقن الخطوط العربية بمسارات مطلقة (للصفحات RTL فقط)
-    html_str = _inject_arabic_fonts(html_str)
+    _t = time.perf_counter()
+    try:
+        base_url = str(out_html.parent)
+        prefer_engine = "qtwebengine"
+
+        ok, info = render_html_to_pdf(
+            html=None,
+            out_path=str(out_pdf),
+            base_url=base_url,
+            prefer=prefer_engine,
+            html_path=str(out_html),
+        )
 
-    out_html.write_text(html_str, encoding="utf-8")
-    logger.info("HTML written | path=%s", out_html)
+        job.timings.update({f"pdf_{k}": v for k, v in (info.get("timings") or {}).items()
+                            if k != "total"})
+        if ok:
+            job.out_pdf = out_pdf
+            logger.info("PDF generated | engine=%s path=%s", prefer_engine, out_pdf)
+        else:
+            logger.warning(
+                "PDF generation failed — HTML only | details=%s",
+                info
+            )
+    except Exception:
+        logger.exception("PDF rendering crashed — keeping HTML only")
+    job.timings["pdf"] = time.perf_counter() - _t
+    # الملفات اكتملت — الإلغاء الآن يُتجاهل والمستند يُحفظ (لا ملفات يتيمة)
+    job.stage_done("pdf", check=False)
+
+
+def render_document(
+    *,
+    transaction_id: int,
+    transaction_no: str,
+    doc_code: str,
+    lang: str,
+    force_html_only: bool = False,
+    explicit_doc_no: Optional[str] = None,
+    extra_options: Optional[dict] = None,
+    reserved_seq: Optional[int] = None,
+    force_regenerate: bool = False,
+    progress: Optional[Callable[[str, float], None]] = None,
+    cancel=None,
+) -> RenderResult:
+    """
+    يولّد المستند (HTML/PDF) بالاعتماد على transaction_id فقط.
+    reserved_seq: seq محجوز مسبقاً لـ doc_groups (انظر reserve_group_seqs).
+    إذا لم تتغير مدخلات التوليد منذ آخر مرة (render_hash) يُعاد الملف المحفوظ
+    مباشرة (result.cached=True) — force_regenerate=True يتجاوز الكاش.
+    progress(stage, seconds): بعد كل مرحلة من STAGES (أو "cache" عند إعادة
+    الاستخدام) — من thread التوليد.
+    cancel: كائن بـ is_set() (threading.Event) يُفحص قبل كل مرحلة —
+            RenderCancelled إن ضُبط (المرحلة الجارية، مثل طباعة PDF، تكتمل أولاً)
+            وتُحذف الملفات الجزئية؛ بعد اكتمال الملف النهائي يُتجاهل الإلغاء.
+    """
+
+    logger.info(
+        "Render document started | tx_id=%s doc_code=%s lang=%s",
+        transaction_id, doc_code, lang
+    )
+    _log_pdf_runtime()
 
     # -------------------------------------------------------------------------
-    # PDF generation
-    pdf_path: Optional[Path] = None
+    # Fetch real transaction_no from DB (لقطة المعاملة — تُعاد للـ builder نفسها)
+    from documents.builders.context_loader import TransactionContextLoader
+    snap = TransactionContextLoader.snapshot_for(transaction_id)
+    if snap is None or not snap.no:
+        logger.error("Transaction not found | tx_id=%s", transaction_id)
+        raise RuntimeError(f"Transaction id={transaction_id} not found")
+
+    transaction_no = str(snap.no)
+    logger.debug("Resolved transaction_no=%s", transaction_no)
+
+    job = _DocJob(transaction_id, transaction_no, doc_code, lang,
+                  extra_options=extra_options, force_html_only=force_html_only,
+                  snapshot=snap, progress=progress, cancel=cancel)
+    job.check_cancel()
+    _build_context(job, explicit_doc_no)
 
-    if not force_html_only:
-        try:
-            base_url = str(out_html.parent)
-            prefer_engine = "qtwebengine"
-
-            ok, info = render_html_to_pdf(
-                html=html_str,
-                out_path=str(out_pdf),
-                base_url=base_url,
-                prefer=prefer_engine,
+    # -------------------------------------------------------------------------
+    # Render cache
+    if job.render_hash and force_regenerate:
+        _count_cache("forced")
+    elif job.render_hash:
+        _t = time.perf_counter()
+        hit = _cached_output(transaction_id, job.doc_no, doc_code, lang,
+                             job.render_hash, force_html_only)
+        job.timings["cache"] = time.perf_counter() - _t
+        if hit:
+            _count_cache("hits")
+            logger.info(
+                "Render cache hit — reusing %s | tx_id=%s doc_no=%s",
+                hit[1] or hit[0], transaction_id, job.doc_no,
             )
+            job.out_html, job.out_pdf = hit
+            job.stage_done("cache", check=False)
+            return job.result(cached=True)
+        _count_cache("misses")
 
-            if ok:
-                pdf_path = out_pdf
-                logger.info("PDF generated | engine=%s path=%s", prefer_engine, out_pdf)
-            else:
-                logger.warning(
-                    "PDF generation failed — HTML only | details=%s",
-                    info
-                )
-        except Exception:
-            logger.exception("PDF rendering crashed — keeping HTML only")
+    _produce(job)
 
     # -------------------------------------------------------------------------
     # Persist document
+    _t = time.perf_counter()
     try:
         persist_document(
             transaction_id=transaction_id,
             doc_code=doc_code,
             lang=lang,
-            file_path=str(pdf_path or out_html),
-            totals=ctx.get("totals"),
-            data=ctx,
-            document_no=doc_no,
+            file_path=str(job.out_pdf or job.out_html),
+            totals=job.ctx.get("totals"),
+            data=job.ctx,
+            document_no=job.doc_no,
+            seq=reserved_seq,
+            render_hash=job.store_hash,
         )
+        if job.store_hash:
+            _count_cache("stored")
         logger.info(
             "Document persisted | tx_id=%s doc_no=%s type=%s lang=%s",
-            transaction_id, doc_no, doc_code, lang
+            transaction_id, job.doc_no, doc_code, lang
         )
     except Exception:
         logger.exception(
             "Failed to persist document | tx_id=%s doc_no=%s",
-            transaction_id, doc_no
+            transaction_id, job.doc_no
         )
         raise
 
+    job.timings["persist"] = time.perf_counter() - _t
+    job.stage_done("persist", check=False)
+
     logger.info(
-        "Render document finished successfully | tx_id=%s doc_no=%s",
-        transaction_id, doc_no
+        "Render document finished successfully | tx_id=%s doc_no=%s timings=%s",
+        transaction_id, job.doc_no,
+        ", ".join(f"{k}={v:.2f}s" for k, v in job.timings.items()),
     )
 
-    return RenderResult(
-        doc_code=doc_code,
-        lang=lang,
-        doc_no=doc_no,
-        out_html=out_html,
-        out_pdf=pdf_path,
-    )
\ No newline at end of file
+    return job.result()
+
+
+# -----------------------------------------------------------------------------
+# Batch — مستندات لعدة معاملات دفعة واحدة (نهاية الشهر)
+# -----------------------------------------------------------------------------
+
+# مستندات تُبنى/تُطبع بالتوازي — تغذي RenderWorkerPool (عمليات × صفحات)
+_BATCH_WORKERS = 6
+# حجم IN (...) في استعلامات الجلب المسبق — دون حد SQLite للـ placeholders
+_PREFETCH_CHUNK = 500
+
+
+@dataclass
+class BatchRenderResult:
+    results: list = field(default_factory=list)      # RenderResult (مع transaction_id)
+    # (transaction_id, doc_code, lang, error) — transaction_id=None: خطأ يخص doc_code كله
+    failed: list = field(default_factory=list)
+    cancelled: bool = False
+    # ثوانٍ: prefetch / render / persist / total
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def _chunks(seq: list, size: int = _PREFETCH_CHUNK):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _prefetch_render_hashes(s, ids: list) -> Dict[tuple, tuple]:
+    """{(transaction_id, doc_no, type_code, lang): (file_path, render_hash)} — الأحدث لكل مفتاح."""
+    out: Dict[tuple, tuple] = {}
+    for part in _chunks(ids):
+        marks = ",".join(f":i{n}" for n in range(len(part)))
+        rows = s.execute(
+            text(
+                "SELECT g.transaction_id, g.doc_no, t.code, d.language, d.file_path, d.render_hash "
+                "FROM documents d "
+                "JOIN doc_groups g ON g.id = d.group_id "
+                "JOIN document_types t ON t.id = d.document_type_id "
+                f"WHERE g.transaction_id IN ({marks}) AND d.render_hash IS NOT NULL "
+                "ORDER BY d.id"
+            ),
+            {f"i{n}": int(v) for n, v in enumerate(part)},
+        ).fetchall()
+        for r in rows:
+            out[(int(r[0]), r[1], r[2], r[3])] = (r[4], r[5])
+    return out
+
+
+def _reuse_output(job: _DocJob, stored: Optional[tuple]) -> bool:
+    """نسخة _cached_output على بيانات مجلوبة مسبقاً."""
+    if not stored or not job.render_hash or stored[1] != job.render_hash or not stored[0]:
+        return False
+    path = Path(stored[0])
+    out_html = path.with_suffix(".html")
+    if job.force_html_only:
+        if not out_html.is_file():
+            return False
+        job.out_html, job.out_pdf = out_html, None
+        return True
+    if path.suffix.lower() != ".pdf" or not path.is_file():
+        return False
+    job.out_html, job.out_pdf = out_html, path
+    return True
+
+
+def render_documents_batch(
+    transaction_ids,
+    doc_codes,
+    langs=("ar",),
+    *,
+    force_html_only: bool = False,
+    force_regenerate: bool = False,
+    extra_options: Optional[Dict[str, dict]] = None,
+    group_prefix: Optional[str] = None,
+    progress=None,
+    cancel=None,
+    max_workers: int = _BATCH_WORKERS,
+) -> BatchRenderResult:
+    """
+    يولّد doc_codes × langs لكل معاملة في transaction_ids.
+
+      - جلب مسبق بعدد ثابت من الاستعلامات: لقطات المعاملات
+        (TransactionContextLoader.load) + بصمات الكاش
+      - بناء الـ context و HTML و PDF بالتوازي (max_workers) — PDF عبر
+        RenderWorkerPool/PdfRenderPool كالمعتاد
+      - كل صفوف documents/doc_groups تُحفظ في transaction واحدة بالنهاية
+        (persist_documents) — فشل مستند لا يوقف الدفعة، يُسجَّل في failed
+      - CMR (قالب EN فقط) يُولَّد بالإنجليزية مرة واحدة مهما كانت langs
+
+    extra_options: {doc_code: options} (مثلاً {"cmr": {"cmr_variant": "2"}})
+    group_prefix: doc_no مشترك لكل مستندات المعاملة = "{prefix}-{transaction_no}"
+                  (كالحوار — allocate_group_doc_no)؛ None = بادئة كل نوع.
+    progress(done, total): بعد كل مستند (من thread الدفعة).
+    cancel: كائن بـ is_set() (threading.Event) — يوقف المهام التي لم تبدأ
+            والجارية عند المرحلة التالية؛ المستندات المنتهية تُحفظ.
+    """
+    from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+    from documents.registry import _ENGLISH_ONLY_DOCS
+    from .persist_generated_doc import (
+        _resolve_document_type_code, group_doc_no, persist_documents,
+    )
+
+    t_start = time.perf_counter()
+    out = BatchRenderResult()
+    ids = list(dict.fromkeys(int(i) for i in transaction_ids))
+    codes = list(dict.fromkeys(doc_codes))
+    langs = list(dict.fromkeys(langs)) or ["ar"]
+    extra_options = extra_options or {}
+    _log_pdf_runtime()
+
+    # -------------------------------------------------------------------------
+    # Prefetch
+    _t = time.perf_counter()
+    type_codes: Dict[str, Optional[str]] = {}
+    for code in codes:
+        try:
+            type_codes[code] = _resolve_document_type_code(code)
+        except ValueError as e:
+            type_codes[code] = None
+            out.failed.append((None, code, "", str(e)))
+    from documents.builders.context_loader import TransactionContextLoader
+    with get_session_local()() as s:
+        snaps = TransactionContextLoader.load(ids, s)
+        stored = {} if force_regenerate else _prefetch_render_hashes(s, ids)
+        wanted = sorted({c for c in type_codes.values() if c})
+        known = {r[0] for r in s.execute(
+            text("SELECT code FROM document_types WHERE code IN (%s)"
+                 % ",".join(f":c{n}" for n in range(len(wanted)))),
+            {f"c{n}": c for n, c in enumerate(wanted)},
+        ).fetchall()} if wanted else set()
+    for code, tcode in type_codes.items():
+        if tcode and tcode not in known:
+            type_codes[code] = None
+            out.failed.append((None, code, "",
+                               f"document_types لا يحوي الكود '{tcode}' المطلوب لـ '{code}'"))
+
+    jobs: list = []
+    for tid in ids:
+        snap = snaps.get(tid)
+        if snap is None:
+            out.failed.append((tid, "", "", f"Transaction id={tid} not found"))
+            continue
+        for code in codes:
+            if type_codes.get(code) is None:
+                continue
+            for lg in (["en"] if code in _ENGLISH_ONLY_DOCS else langs):
+                jobs.append(_DocJob(tid, str(snap.no), code, lg,
+                                    extra_options=extra_options.get(code),
+                                    force_html_only=force_html_only,
+                                    snapshot=snap, cancel=cancel))
+    out.timings["prefetch"] = time.perf_counter() - _t
+    logger.info("Batch render started | transactions=%d jobs=%d", len(ids), len(jobs))
+
+    def _one(job: _DocJob) -> bool:
+        """True = أُعيد استخدام الملف المحفوظ."""
+        explicit = group_doc_no(group_prefix, job.transaction_no) if group_prefix else None
+        job.check_cancel()
+        _build_context(job, explicit)
+        if job.render_hash and force_regenerate:
+            _count_cache("forced")
+        elif job.render_hash:
+            key = (job.transaction_id, job.doc_no, type_codes[job.doc_code], job.lang)
+            if _reuse_output(job, stored.get(key)):
+                _count_cache("hits")
+                return True
+            _count_cache("misses")
+        _produce(job)
+        return False
+
+    # -------------------------------------------------------------------------
+    # Render
+    _t = time.perf_counter()
+    done: list = []
+    total = len(jobs)
+    ex = ThreadPoolExecutor(max_workers=max(1, min(total or 1, int(max_workers))),
+                            thread_name_prefix="logiport-batch")
+    try:
+        futures = {ex.submit(_one, j): j for j in jobs}
+        for n, fut in enumerate(as_completed(futures), 1):
+            job = futures[fut]
+            try:
+                done.append((job, fut.result()))
+            except (RenderCancelled, CancelledError):
+                pass                # أُلغي قبل الحفظ — ليس فشلاً
+            except Exception as e:
+                out.failed.append((job.transaction_id, job.doc_code, job.lang,
+                                   f"{type(e).__name__}: {e}"))
+            if progress is not None:
+                progress(n, total)
+            if cancel is not None and cancel.is_set() and not out.cancelled:
+                out.cancelled = True
+                for f in futures:
+                    f.cancel()
+                logger.info("Batch render cancelled after %d/%d documents", n, total)
+    finally:
+        ex.shutdown(wait=True, cancel_futures=True)
+    out.timings["render"] = time.perf_counter() - _t
+
+    # -------------------------------------------------------------------------
+    # Persist — transaction واحدة لكل الصفوف الجديدة/المحدَّثة
+    _t = time.perf_counter()
+    fresh = [job for job, reused in done if not reused]
+    if fresh:
+        persist_documents([
+            {
+                "transaction_id": job.transaction_id,
+                "doc_code":       job.doc_code,
+                "lang":           job.lang,
+                "file_path":      str(job.out_pdf or job.out_html),
+                "totals":         job.ctx.get("totals"),
+                "data":           job.ctx,
+                "document_no":    job.doc_no,
+                "render_hash":    job.store_hash,
+            }
+            for job in fresh
+        ])
+        with _CACHE_LOCK:
+            _CACHE_STATS["stored"] += sum(1 for job in fresh if job.store_hash)
+    out.timings["persist"] = time.perf_counter() - _t
+
+    out.results = [job.result(cached=reused) for job, reused in done]
+    out.timings["total"] = time.perf_counter() - t_start
+    logger.info(
+        "Batch render finished | ok=%d reused=%d failed=%d cancelled=%s timings=%s",
+        len(out.results), sum(1 for _, r in done if r), len(out.failed), out.cancelled,
+        ", ".join(f"{k}={v:.2f}s" for k, v in out.timings.items()),
+    )
+    return out
@@ -1,27 +1,102 @@
 # services/html_engine.py
 from __future__ import annotations
-from typing import Dict
-from jinja2 import Environment, FileSystemLoader
-from documents import TEMPLATES_DIR
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import threading
+import time
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, Template
+from documents import TEMPLATES_DIR, DOC_DIR
 from documents.registry import resolve_template
 # استخدام الأسماء الكانونية من exceptions.py مباشرةً
 from .exceptions import TemplateNotFoundError, HtmlRenderError
+from .document_fonts import fonts_css_url, prepare_document_fonts
 # alias للتوافق مع الكود القديم الذي قد يستخدم الاسم القصير
 TemplateNotFound = TemplateNotFoundError
 
+logger = logging.getLogger(__name__)
+
+
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    """
+    كاش bytecode دائم في AppData/LOGIPORT/cache/jinja — القوالب لا تُعاد ترجمتها
+    عند كل تشغيل. Jinja يقارن checksum المصدر فلا يُستخدم bytecode قديم أبداً.
+    """
+    try:
+        from core.paths import get_user_data_dir
+        path = get_user_data_dir() / "cache" / "jinja"
+        path.mkdir(parents=True, exist_ok=True)
+        return FileSystemBytecodeCache(str(path), "logiport-%s.cache")
+    except Exception as e:
+        logger.debug("Jinja bytecode cache disabled: %s", e)
+        return None
+
+
 _env = Environment(
     loader=FileSystemLoader(str(TEMPLATES_DIR)),
     autoescape=False,
     trim_blocks=True,
     lstrip_blocks=True,
+    bytecode_cache=_bytecode_cache(),
+    # auto_reload (الافتراضي) يتحقق من mtime القالب — تعديل القالب يُعاد تحميله
 )
 
-def render_html(doc_code: str, lang: str, ctx: Dict,
-                carrier_company_id: int | None = None) -> str:
+
+def _arabic_fonts_url() -> str:
+    fonts_dir = (DOC_DIR / "static" / "fonts").resolve()
+    return fonts_dir.as_uri() if fonts_dir.exists() else ""
+
+
+# _partials/arabic_fonts.html (قوالب RTL): fonts.css المشترك، و @font-face
+# بمسار file:/// مطلق كاحتياطي
+_env.globals["arabic_fonts_url"] = _arabic_fonts_url()
+_env.globals["fonts_css_url"] = fonts_css_url
+
+# render_html_to_file: عدد قطع Jinja المجمّعة في كل write
+_STREAM_BUFFER = 64
+
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_THREAD: Optional[threading.Thread] = None
+
+
+def _compile_all_templates() -> None:
+    _t = time.perf_counter()
+    # fonts.css (+ تقليص WOFF2 إن توفر) قبل أول مستند
+    prepare_document_fonts()
+    names = _env.list_templates(extensions=["html"])
+    failed = 0
+    for name in names:
+        try:
+            _env.get_template(name)
+        except Exception as e:
+            failed += 1
+            logger.warning("Template warm-up failed | %s: %s", name, e)
+    logger.info("Templates warmed up | %d template(s), %d failed in %.2fs",
+                len(names), failed, time.perf_counter() - _t)
+
+
+def warm_up_templates(background: bool = True) -> Optional[threading.Thread]:
     """
-    يُصيّر HTML من قالب Jinja2.
-    carrier_company_id: لو مُرر مع CMR، يبحث عن قالب خاص بالشركة الناقلة أولاً.
+    يترجم كل قوالب documents/templates مسبقاً (ويملأ كاش الـ bytecode)
+    ويجهّز fonts.css المشترك للمستندات.
+    background=True: في thread خلفي (مرة واحدة لكل تشغيل) — يُعيد الـ thread.
     """
+    global _WARMUP_THREAD
+    if not background:
+        _compile_all_templates()
+        return None
+    with _WARMUP_LOCK:
+        if _WARMUP_THREAD is None:
+            _WARMUP_THREAD = threading.Thread(target=_compile_all_templates,
+                                              name="logiport-tpl-warmup", daemon=True)
+            _WARMUP_THREAD.start()
+        return _WARMUP_THREAD
+
+
+def _prepare(doc_code: str, lang: str, ctx: Dict,
+             carrier_company_id: int | None) -> Tuple[Template, Dict, str]:
+    """(template, context مدموج مع spec.extra, المسار النسبي للقالب)."""
     try:
         spec = resolve_template(doc_code, lang,
                                 carrier_company_id=carrier_company_id)
@@ -35,15 +110,48 @@ def render_html(doc_code: str, lang: str, ctx: Dict,
 
     try:
         tpl = _env.get_template(template_rel)
-        merge_ctx = dict(ctx)
+    except Exception as e:
+        raise HtmlRenderError(f"Jinja2 render failed for {template_rel}: {e}") from e
+    merge_ctx = dict(ctx)
 
-        # آمنة حتى لو ما فيه خاصية extra
-        extra = getattr(spec, "extra", None)
-        if isinstance(extra, dict):
-            merge_ctx.update(extra)
+    # آمنة حتى لو ما فيه خاصية extra
+    extra = getattr(spec, "extra", None)
+    if isinstance(extra, dict):
+        merge_ctx.update(extra)
+    return tpl, merge_ctx, template_rel
 
+
+def render_html(doc_code: str, lang: str, ctx: Dict,
+                carrier_company_id: int | None = None) -> str:
+    """
+    يُصيّر HTML من قالب Jinja2.
+    carrier_company_id: لو مُرر مع CMR، يبحث عن قالب خاص بالشركة الناقلة أولاً.
+    """
+    tpl, merge_ctx, template_rel = _prepare(doc_code, lang, ctx, carrier_company_id)
+    try:
         return tpl.render(**merge_ctx)
-    except HtmlRenderError:
-        raise
     except Exception as e:
-        raise HtmlRenderError(f"Jinja2 render failed for {template_rel}: {e}") from e
\ No newline at end of file
+        raise HtmlRenderError(f"Jinja2 render failed for {template_rel}: {e}") from e
+
+
+def render_html_to_file(doc_code: str, lang: str, ctx: Dict, out_path,
+                        carrier_company_id: int | None = None) -> Path:
+    """
+    مثل render_html لكن يكتب الناتج مباشرة في out_path أثناء التصيير
+    (tpl.generate() قطعة قطعة) — قوائم التعبئة بآلاف الأسطر لا تُبنى كنص
+    كامل في الذاكرة. فشل التصيير يحذف الملف الجزئي.
+    """
+    tpl, merge_ctx, template_rel = _prepare(doc_code, lang, ctx, carrier_company_id)
+    out_path = Path(out_path)
+    try:
+        with open(out_path, "w", encoding="utf-8") as fh:
+            stream = tpl.stream(**merge_ctx)
+            stream.enable_buffering(_STREAM_BUFFER)
+            stream.dump(fh)
+    except Exception as e:
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
+        raise HtmlRenderError(f"Jinja2 render failed for {template_rel}: {e}") from e
+    return out_path
\ No newline at end of file
@@ -16,6 +16,18 @@ Smart Transaction & Document Numbering Service — v2
      → تمنع تراكم الأرقام الضائعة
 
   3. backward compatible بالكامل — لا يحتاج تعديل أي كود آخر
+
+  4. ترقيم O(1):
+     - transactions.numeric_no يحفظ الجزء الرقمي من transaction_no
+       (0 للأرقام اليدوية) مع index → MAX(numeric_no) بدل مسح كل الصفوف
+     - الصفوف الجديدة (NULL) تُحسب كسولاً قبل MAX — عادةً صف أو صفان فقط
+     - get_next_transaction_number لا يعمل commit: تحديث العداد يُحفظ
+       مع INSERT المعاملة في نفس الـ transaction
+
+  5. أرقام المستندات ذرّية (services/doc_number_allocator.py):
+     - get_next_doc_number يحجز عبر UPDATE ... RETURNING داخل BEGIN IMMEDIATE
+       على connection مستقلة — لا probe متكرر ولا commit لـ Session المستدعي
+     - reserve_doc_numbers يحجز نطاقاً كاملاً لمهام متعددة المستندات
 """
 
 from __future__ import annotations
@@ -26,6 +38,26 @@ import re
 logger = logging.getLogger(__name__)
 
 
+def _numeric_part(tx_no, prefix: str = "") -> int:
+    """
+    الجزء الرقمي لرقم معاملة مولَّد تلقائياً — 0 إذا لم يكن كذلك.
+    نفس قواعد المسح القديم: تجاهل / - فراغ، إزالة البادئة، حد 9 أرقام.
+    """
+    if not tx_no:
+        return 0
+    s = str(tx_no)
+    if any(c in s for c in ('/', '-', ' ')):
+        return 0
+    body = s[len(prefix):] if prefix and s.startswith(prefix) else s
+    digits = re.sub(r'\D', '', body)
+    if digits and len(digits) <= 9:
+        try:
+            return int(digits)
+        except ValueError:
+            pass
+    return 0
+
+
 class NumberingService:
 
     DOC_PREFIXES = {
@@ -53,7 +85,7 @@ class NumberingService:
         "cmr.copy4.archive":                "CMR",
     }
 
-    # ── counter key لكل عائلة مستندات في app_settings ──────────────────
+    # ── counter key لكل عائلة مستندات في doc_counters ──────────────────
     _DOC_COUNTER_KEY = {
         "INV":     "doc_counter_inv",
         "INV-COM": "doc_counter_inv",
@@ -99,71 +131,49 @@ class NumberingService:
           - CMR counter مستقل
           - Form A counter مستقل
           - Packing List counter مستقل
+
+        db_session: للتوافق فقط — الحجز يتم على connection مستقلة
+        ولا يُلمس الـ transaction الخاص بالمستدعي.
+        """
+        return NumberingService.reserve_doc_numbers(doc_code, 1)[0]
+
+    @staticmethod
+    def reserve_doc_numbers(doc_code: str, count: int = 1) -> list:
+        """
+        يحجز count رقم مستند دفعة واحدة (BEGIN IMMEDIATE واحدة).
+        عند فشل الحجز: أرقام احتياطية مبنية على timestamp (كالسابق).
         """
-        from sqlalchemy import text
         import datetime
+        from services.doc_number_allocator import DocNumberAllocator
 
         prefix      = NumberingService.prefix_for_doc_code(doc_code)
         counter_key = NumberingService._DOC_COUNTER_KEY.get(prefix, "doc_counter_inv")
-        today       = datetime.date.today()
-        yymm        = today.strftime("%y%m")   # مثال: 2604
+        yymm        = datetime.date.today().strftime("%y%m")   # مثال: 2604
 
         try:
-            # قرأ آخر رقم
-            row = db_session.execute(
-                text("SELECT value FROM app_settings WHERE key = :k"),
-                {"k": counter_key}
-            ).fetchone()
-            last = int(row[0]) if row and row[0] else 0
-            next_num = last + 1
-
-            # تحقق من عدم التكرار في doc_groups
-            for _ in range(200):
-                doc_no = f"{prefix}-{yymm}-{next_num:04d}"
-                exists = db_session.execute(
-                    text("SELECT 1 FROM doc_groups WHERE doc_no = :n"),
-                    {"n": doc_no}
-                ).fetchone()
-                if not exists:
-                    break
-                next_num += 1
-
-            # احفظ الرقم الجديد
-            db_session.execute(
-                text("UPDATE app_settings SET value = :v WHERE key = :k"),
-                {"v": str(next_num), "k": counter_key}
-            )
-            db_session.commit()
-
-            return f"{prefix}-{yymm}-{next_num:04d}"
-
+            return DocNumberAllocator.reserve_doc_numbers(counter_key, prefix, yymm, count)
         except Exception as e:
-            db_session.rollback()
-            logger.warning("get_next_doc_number error: %s", e)
+            logger.warning("reserve_doc_numbers error: %s", e)
             # fallback: استخدم timestamp
             ts = datetime.datetime.now().strftime("%y%m%d%H%M")
-            return f"{prefix}-{ts}"
+            if count == 1:
+                return [f"{prefix}-{ts}"]
+            return [f"{prefix}-{ts}-{i + 1}" for i in range(count)]
 
     @staticmethod
     def peek_next_doc_number(db_session, doc_code: str) -> str:
         """
         يعرض الرقم التالي بدون حجزه — للعرض في الـ UI فقط.
         """
-        from sqlalchemy import text
         import datetime
+        from services.doc_number_allocator import DocNumberAllocator
 
         prefix      = NumberingService.prefix_for_doc_code(doc_code)
         counter_key = NumberingService._DOC_COUNTER_KEY.get(prefix, "doc_counter_inv")
-        today       = datetime.date.today()
-        yymm        = today.strftime("%y%m")
+        yymm        = datetime.date.today().strftime("%y%m")
 
         try:
-            row = db_session.execute(
-                text("SELECT value FROM app_settings WHERE key = :k"),
-                {"k": counter_key}
-            ).fetchone()
-            last = int(row[0]) if row and row[0] else 0
-            return f"{prefix}-{yymm}-{last + 1:04d}"
+            return f"{prefix}-{yymm}-{DocNumberAllocator.peek(counter_key):04d}"
         except Exception:
             return f"{prefix}-{yymm}-????"
 
@@ -205,8 +215,8 @@ class NumberingService:
             new_number = NumberingService._find_next_available(
                 db_session, last + 1, prefix)
 
-            # 5. حفظ في app_settings
-            NumberingService._save_last_number(db_session, new_number)
+            # 5. حفظ في app_settings — بدون commit: يُحفظ مع INSERT المعاملة
+            NumberingService._save_last_number(db_session, new_number, commit=False)
 
             return f"{prefix}{new_number}" if prefix else str(new_number)
 
@@ -265,31 +275,48 @@ class NumberingService:
 
     @staticmethod
     def _get_db_max_numeric(db_session, prefix: str = "") -> int:
-        """أعلى رقم رقمي مولَّد تلقائياً في جدول transactions."""
+        """
+        أعلى رقم رقمي مولَّد تلقائياً في جدول transactions.
+
+        يملأ numeric_no للصفوف التي لم تُحسب بعد (index على numeric_no IS NULL)
+        ثم MAX(numeric_no) مفهرس. DB قديمة بلا العمود → المسح الكامل.
+        لا rollback هنا — الجلسة للمستدعي وقد تحمل كتابات لم تُحفظ بعد.
+        """
+        from sqlalchemy import text
+        try:
+            has_col = db_session.execute(
+                text("SELECT 1 FROM pragma_table_info('transactions') WHERE name = 'numeric_no'")
+            ).first()
+        except Exception:
+            has_col = None
+        if not has_col:
+            return NumberingService._scan_db_max_numeric(db_session, prefix)
+        try:
+            pending = db_session.execute(
+                text("SELECT id, transaction_no FROM transactions WHERE numeric_no IS NULL")
+            ).fetchall()
+            if pending:
+                db_session.execute(
+                    text("UPDATE transactions SET numeric_no = :n WHERE id = :i"),
+                    [{"n": _numeric_part(no, prefix), "i": rid} for rid, no in pending],
+                )
+            row = db_session.execute(
+                text("SELECT MAX(numeric_no) FROM transactions")
+            ).fetchone()
+            return int(row[0] or 0) if row else 0
+        except Exception as e:
+            logger.debug(f"numeric_no unavailable, scanning transaction_no: {e}")
+        return NumberingService._scan_db_max_numeric(db_session, prefix)
+
+    @staticmethod
+    def _scan_db_max_numeric(db_session, prefix: str = "") -> int:
+        """المسح القديم لكل transaction_no — fallback فقط قبل migration numeric_no."""
         from sqlalchemy import text
         try:
             rows = db_session.execute(
                 text("SELECT transaction_no FROM transactions")
             ).fetchall()
-            max_num = 0
-            for (tx_no,) in rows:
-                if not tx_no:
-                    continue
-                s = str(tx_no)
-                # تجاهل الأرقام اليدوية التي تحتوي على / أو - أو فراغات
-                if any(c in s for c in ('/', '-', ' ')):
-                    continue
-                # إزالة البادئة إن وجدت
-                body = s[len(prefix):] if prefix and s.startswith(prefix) else s
-                digits = re.sub(r'\D', '', body)
-                if digits and len(digits) <= 9:
-                    try:
-                        n = int(digits)
-                        if n > max_num:
-                            max_num = n
-                    except ValueError:
-                        pass
-            return max_num
+            return max((_numeric_part(tx_no, prefix) for (tx_no,) in rows), default=0)
         except Exception:
             return 0
 
@@ -297,6 +324,21 @@ class NumberingService:
     def _find_next_available(db_session, start: int, prefix: str) -> int:
         """أول رقم >= start غير موجود فعلاً في transactions."""
         from sqlalchemy import text
+        try:
+            # استعلام واحد مفهرس: تخطَّ الأرقام المحجوزة من start فصاعداً،
+            # ثم تحقّق النص الكامل أدناه (عادةً محاولة واحدة)
+            taken = {r[0] for r in db_session.execute(
+                text("SELECT numeric_no FROM transactions"
+                     " WHERE numeric_no >= :s ORDER BY numeric_no LIMIT 200"),
+                {"s": start},
+            ).fetchall()}
+            while start in taken:
+                start += 1
+        except Exception:
+            try:
+                db_session.rollback()
+            except Exception:
+                pass
         number = start
         for _ in range(200):  # حد أقصى 200 محاولة
             tx_no = f"{prefix}{number}" if prefix else str(number)
@@ -310,7 +352,7 @@ class NumberingService:
         return number
 
     @staticmethod
-    def _save_last_number(db_session, number: int):
+    def _save_last_number(db_session, number: int, *, commit: bool = True):
         from sqlalchemy import text
         db_session.execute(
             text("""UPDATE app_settings
@@ -318,7 +360,8 @@ class NumberingService:
                     WHERE key = 'transaction_last_number'"""),
             {"val": str(number)}
         )
-        db_session.commit()
+        if commit:
+            db_session.commit()
 
     # ─── باقي الدوال — محفوظة بالكامل ────────────────────────────────
 
@@ -0,0 +1,257 @@
+"""
+services/pdf_render_pool.py — LOGIPORT
+=======================================
+مجمّع صفحات QWebEnginePage دافئة لتحويل HTML → PDF بالتوازي.
+
+بدل صفحة جديدة + QEventLoop متداخل لكل مستند (وكل worker ينتظر دوره
+على thread الواجهة)، PdfRenderPool:
+  - يعيش على thread الواجهة ويحتفظ بحتى _POOL_SIZE صفحة off-screen
+    تُعاد استخدامها بين المستندات (لا إنشاء/هدم renderer لكل ملف)
+  - submit(html, out_path, base_url) آمنة من أي thread → RenderJob فوراً
+    (أو submit(None, out_path, html_path=...) — الصفحة تحمّل الملف بـ URL
+    بدل setHtml: لا نسخة نصية في الذاكرة ولا حد حجم setHtml)
+  - حتى _POOL_SIZE مستند يُحمَّل ويُطبع في نفس الوقت — الباقي في طابور
+  - التسلسل كله عبر signals: setHtml → loadFinished → printToPdf →
+    pdfPrintingFinished — بدون QEventLoop متداخل، الواجهة تبقى مستجيبة
+  - job_finished(RenderJob) لكل مستند، مع توقيت كل مرحلة (timings)
+  - صفحة تتجاوز _JOB_TIMEOUT تُفشَل مهمتها وتُستبدل بصفحة جديدة
+
+الاستخدام:
+    job = PdfRenderPool.instance().submit(html, "/tmp/a.pdf", base_dir)
+    job.wait(PdfRenderPool.wait_timeout())     # من worker thread
+    job.ok, job.info, job.timings()
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+from PySide6.QtCore import QCoreApplication, QObject, QThread, QTimer, QUrl, Qt, Signal
+
+logger = logging.getLogger(__name__)
+
+_POOL_SIZE   = 3     # صفحات متزامنة — كل صفحة renderer process في Chromium
+_JOB_TIMEOUT = 60    # ثانية لكل مستند من بدء التحميل حتى انتهاء الطباعة
+
+
+class RenderJob:
+    """مهمة تحويل واحدة — تُنشأ من submit() وتُكمَل على thread الواجهة."""
+
+    def __init__(self, html: Optional[str], out_path: str, base_url: Optional[str],
+                 html_path: Optional[str] = None):
+        self.html      = html or ""
+        self.html_path = html_path
+        self.out_path  = out_path
+        self.base_url  = base_url
+        self.ok        = False
+        self.info: Dict = {}
+        self.queued_at   = time.perf_counter()
+        self.started_at: Optional[float]  = None
+        self.loaded_at:  Optional[float]  = None
+        self.finished_at: Optional[float] = None
+        self._event = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ينتظر انتهاء المهمة (لا يُستدعى من thread الواجهة)."""
+        return self._event.wait(timeout)
+
+    def timings(self) -> Dict[str, float]:
+        """ثوانٍ: queue (انتظار صفحة) / load / print / total."""
+        out: Dict[str, float] = {}
+        if self.started_at is not None:
+            out["queue"] = self.started_at - self.queued_at
+        if self.loaded_at is not None and self.started_at is not None:
+            out["load"] = self.loaded_at - self.started_at
+        if self.finished_at is not None:
+            if self.loaded_at is not None:
+                out["print"] = self.finished_at - self.loaded_at
+            out["total"] = self.finished_at - self.queued_at
+        return out
+
+
+class PdfRenderPool(QObject):
+    """
+    singleton على thread الواجهة — instance() آمنة من أي thread.
+    يجب أن يوجد QApplication (QtWebEngine يتطلبه).
+    """
+
+    job_finished = Signal(object)      # RenderJob
+    _submitted   = Signal(object)      # داخلي: RenderJob → thread الواجهة
+
+    _instance: Optional["PdfRenderPool"] = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "PdfRenderPool":
+        with cls._instance_lock:
+            if cls._instance is None:
+                app = QCoreApplication.instance()
+                if app is None:
+                    raise RuntimeError("No QApplication instance")
+                pool = cls()
+                if QThread.currentThread() is not app.thread():
+                    pool.moveToThread(app.thread())
+                app.aboutToQuit.connect(pool.shutdown)
+                cls._instance = pool
+            return cls._instance
+
+    @staticmethod
+    def wait_timeout(jobs: int = 1) -> float:
+        """مهلة انتظار واقعية لـ jobs مهمة مُرسلة معاً (تشمل الطابور)."""
+        rounds = -(-max(1, jobs) // _POOL_SIZE)
+        return _JOB_TIMEOUT * rounds + 5
+
+    def __init__(self, size: int = _POOL_SIZE):
+        super().__init__()
+        self._size   = max(1, int(size))
+        self._idle:  List = []
+        self._busy:  Dict = {}            # page → RenderJob
+        self._timers: Dict = {}           # page → QTimer
+        self._queue: Deque[RenderJob] = deque()
+        self._layout = None
+        self._closed = False
+        self._submitted.connect(self._enqueue, Qt.ConnectionType.QueuedConnection)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ─────────────────────────────────────────────────────────────────────
+
+    def submit(self, html: Optional[str], out_path: str, base_url: Optional[str] = None,
+               *, html_path: Optional[str] = None) -> RenderJob:
+        """يضيف مهمة للطابور ويُرجعها فوراً — آمنة من أي thread."""
+        job = RenderJob(html, out_path, base_url, html_path)
+        self._submitted.emit(job)
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        return {"pages": len(self._idle) + len(self._busy),
+                "busy": len(self._busy), "queued": len(self._queue)}
+
+    def shutdown(self) -> None:
+        """يحرّر الصفحات قبل هدم QWebEngineProfile (عند إغلاق التطبيق)."""
+        self._closed = True
+        while self._queue:
+            self._complete(self._queue.popleft(), False, "Render pool shut down")
+        for page in list(self._busy):
+            self._finish(page, False, "Render pool shut down")
+        for page in self._idle:
+            page.deleteLater()
+        self._idle.clear()
+
+    # ─────────────────────────────────────────────────────────────────────
+    # INTERNAL — كل ما يلي يعمل على thread الواجهة
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _enqueue(self, job: RenderJob) -> None:
+        if self._closed:
+            self._complete(job, False, "Render pool shut down")
+            return
+        self._queue.append(job)
+        self._pump()
+
+    def _pump(self) -> None:
+        while self._queue and (self._idle or len(self._busy) < self._size):
+            page = self._idle.pop() if self._idle else self._new_page()
+            if page is None:
+                self._complete(self._queue.popleft(), False, "QWebEnginePage unavailable")
+                continue
+            self._start(page, self._queue.popleft())
+
+    def _new_page(self):
+        try:
+            from PySide6.QtWebEngineCore import QWebEnginePage
+        except Exception as e:
+            logger.error(f"PdfRenderPool: QtWebEngine unavailable: {e}")
+            return None
+        page = QWebEnginePage(self)
+        page.loadFinished.connect(lambda ok, p=page: self._on_loaded(p, ok))
+        page.pdfPrintingFinished.connect(
+            lambda path, success=True, p=page: self._on_printed(p, path, success))
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda p=page: self._on_timeout(p))
+        self._timers[page] = timer
+        logger.debug(f"PdfRenderPool: page created ({len(self._timers)}/{self._size})")
+        return page
+
+    def _page_layout(self):
+        if self._layout is None:
+            from PySide6.QtCore import QMarginsF
+            from PySide6.QtGui import QPageLayout, QPageSize
+            self._layout = QPageLayout(
+                QPageSize(QPageSize.PageSizeId.A4),
+                QPageLayout.Orientation.Portrait,
+                QMarginsF(10.0, 10.0, 10.0, 10.0),
+                QPageLayout.Unit.Millimeter,
+            )
+        return self._layout
+
+    def _start(self, page, job: RenderJob) -> None:
+        from services.pdf_renderer import _inject_base_tag
+        self._busy[page] = job
+        job.started_at = time.perf_counter()
+        self._timers[page].start(_JOB_TIMEOUT * 1000)
+        if job.html_path:
+            # الروابط النسبية تُحل من مجلد الملف — لا حاجة لـ <base>
+            page.load(QUrl.fromLocalFile(str(Path(job.html_path).resolve())))
+            return
+        html = _inject_base_tag(job.html, job.base_url)
+        if job.base_url:
+            page.setHtml(html, QUrl.fromLocalFile(str(Path(job.base_url).resolve()) + "/"))
+        else:
+            page.setHtml(html)
+
+    def _on_loaded(self, page, ok: bool) -> None:
+        job = self._busy.get(page)
+        if job is None or job.loaded_at is not None:
+            return
+        if not ok:
+            self._finish(page, False, "Page failed to load")
+            return
+        job.loaded_at = time.perf_counter()
+        page.printToPdf(job.out_path, self._page_layout())
+
+    def _on_printed(self, page, path: str, success: bool) -> None:
+        if page not in self._busy:
+            return
+        if path and success:
+            self._finish(page, True, "")
+        else:
+            self._finish(page, False, "printToPdf returned empty path")
+
+    def _on_timeout(self, page) -> None:
+        if page not in self._busy:
+            return
+        logger.warning("PdfRenderPool: render timed out (%ss) — recycling page", _JOB_TIMEOUT)
+        self._finish(page, False, f"Render timed out ({_JOB_TIMEOUT}s)", recycle=False)
+
+    def _finish(self, page, ok: bool, error: str, recycle: bool = True) -> None:
+        job = self._busy.pop(page)
+        self._timers[page].stop()
+        self._complete(job, ok, error)
+        if recycle and not self._closed:
+            self._idle.append(page)
+        else:
+            # صفحة عالقة أو إغلاق — لا تُعاد للمجمّع
+            self._timers.pop(page).deleteLater()
+            page.deleteLater()
+        if not self._closed:
+            self._pump()
+
+    def _complete(self, job: RenderJob, ok: bool, error: str) -> None:
+        job.finished_at = time.perf_counter()
+        job.ok   = ok
+        job.info = {"engine": "qtwebengine", "timings": job.timings()}
+        if not ok:
+            job.info["error"] = error
+        job.html = ""   # لا نحتفظ بالـ HTML بعد الانتهاء
+        job._event.set()
+        self.job_finished.emit(job)
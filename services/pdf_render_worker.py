@@ -0,0 +1,418 @@
+"""
+services/pdf_render_worker.py — LOGIPORT
+=========================================
+عمليات render منفصلة (out-of-process) لتحويل HTML → PDF في الدفعات.
+
+PdfRenderPool (pdf_render_pool.py) يطبع داخل العملية على thread الواجهة —
+دفعة نهاية الشهر (مئات المستندات) تُشغل حلقة أحداث الواجهة بكل loadFinished
+و printToPdf. RenderWorkerPool ينقل هذا العمل إلى عمليات فرعية:
+  - كل عملية: QGuiApplication خاص (QT_QPA_PLATFORM=offscreen) + PdfRenderPool
+    دافئ — بدون نوافذ ولا مشاركة لحلقة الأحداث مع الواجهة
+  - الاتصال عبر multiprocessing.Pipe (spawn — نفس السلوك على Windows/Linux)
+  - الطلب: HTML كنص أو مسار ملف HTML + out_path + base_url → (ok, info)
+  - حتى _PROCESSES عملية، كل طلب يذهب للعملية الأقل انشغالاً
+  - العمليات تُشغَّل عند أول طلب وتبقى دافئة حتى إغلاق التطبيق
+  - عملية تموت (crash في Chromium) تُفشل مهامها المعلّقة فقط وتُستبدل
+    عند الطلب التالي — فشل التشغيل الأول يعطّل المجمّع لبقية الجلسة
+  - مهمة تتجاوز المهلة تُنهي عمليتها (kill) قبل الرجوع للمستدعي — لا تبقى
+    عملية تكتب out_path بينما يعيد المستدعي الطباعة داخل العملية
+  - تشغيل العمليات (حتى _READY_TIMEOUT لكل منها) خارج قفل المجمّع —
+    الطلبات تستمر على العمليات الحية أثناء استبدال عملية ميتة
+  - info["worker_error"]=True يعني فشل البنية (لا المستند) — المستدعي
+    يعيد المحاولة داخل العملية (pdf_renderer._try_qtwebengine)
+
+الاستخدام:
+    pool = RenderWorkerPool.instance()
+    if pool.available():
+        ok, info = pool.render(html, "/tmp/a.pdf", base_dir)
+    fut = pool.submit(html_path="/tmp/a.html", out_path="/tmp/a.pdf")
+
+LOGIPORT_PDF_WORKERS=N يحدد عدد العمليات (0 = تعطيل، الطباعة داخل العملية).
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PROCESSES     = 2     # عمليات render — كل عملية بصفحاتها (_POOL_SIZE)
+_READY_TIMEOUT = 30    # ثانية لتهيئة QtWebEngine في العملية الفرعية
+_STOP_TIMEOUT  = 5
+
+
+def _configured_processes() -> int:
+    raw = os.environ.get("LOGIPORT_PDF_WORKERS", "").strip()
+    if not raw:
+        return _PROCESSES
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        logger.warning(f"RenderWorkerPool: invalid LOGIPORT_PDF_WORKERS={raw!r}")
+        return _PROCESSES
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CHILD PROCESS
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _child_main(conn) -> None:
+    """
+    نقطة دخول العملية الفرعية (spawn). البروتوكول (tuples عبر Pipe):
+        → ("render", job_id, html, html_path, out_path, base_url)
+        → ("stop",)
+        ← ("ready", pid) | ("error", message)
+        ← ("done", job_id, ok, info)
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ.setdefault("QT_LOGGING_RULES", "*.debug=false;*.warning=false")
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        from PySide6.QtCore import QCoreApplication, QObject, Qt, Signal
+        from PySide6.QtGui import QGuiApplication
+        QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+        import PySide6.QtWebEngineCore  # noqa: F401 — يجب قبل إنشاء التطبيق
+        app = QGuiApplication(["logiport-pdf-worker"])
+
+        from services.pdf_render_pool import PdfRenderPool
+        pool = PdfRenderPool.instance()
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        conn.close()
+        return
+
+    class _Bridge(QObject):
+        stop = Signal()
+
+    bridge = _Bridge()
+    bridge.stop.connect(app.quit, Qt.ConnectionType.QueuedConnection)
+
+    send_lock = threading.Lock()
+    job_ids: Dict[object, int] = {}
+
+    def _send(msg) -> None:
+        with send_lock:
+            try:
+                conn.send(msg)
+            except (OSError, ValueError):
+                pass   # الأب أُغلق — الخروج يتم عبر الـ reader
+
+    def _on_finished(job) -> None:
+        jid = job_ids.pop(job, None)
+        if jid is not None:
+            _send(("done", jid, job.ok, job.info))
+
+    pool.job_finished.connect(_on_finished)
+
+    def _reader() -> None:
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            if msg[0] == "stop":
+                break
+            _, jid, html, html_path, out_path, base_url = msg
+            try:
+                # html_path: الصفحة تحمّل الملف مباشرة (بدون قراءته كنص هنا)
+                if html is None and not os.path.isfile(html_path):
+                    raise FileNotFoundError(html_path)
+                os.makedirs(os.path.dirname(os.path.abspath(out_path)) or ".", exist_ok=True)
+            except Exception as e:
+                _send(("done", jid, False,
+                       {"engine": "qtwebengine", "error": f"{type(e).__name__}: {e}"}))
+                continue
+            job = pool.submit(html, out_path, base_url,
+                              html_path=html_path if html is None else None)
+            job_ids[job] = jid
+            # قد تنتهي المهمة قبل تسجيل job_id (فشل فوري) — pop يضمن إرسالاً واحداً
+            if job.done:
+                _on_finished(job)
+        bridge.stop.emit()
+
+    conn.send(("ready", os.getpid()))
+    threading.Thread(target=_reader, name="logiport-pdf-reader", daemon=True).start()
+    app.exec()
+    pool.shutdown()
+    conn.close()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PARENT SIDE
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _WorkerProcess:
+    """عملية render واحدة + thread يقرأ نتائجها ويُكمل الـ Futures."""
+
+    def __init__(self, ctx, index: int):
+        self.index = index
+        self._conn, child_conn = ctx.Pipe(duplex=True)
+        self._proc = ctx.Process(target=_child_main, args=(child_conn,),
+                                 name=f"logiport-pdf-{index}", daemon=True)
+        self._child_conn = child_conn
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self.alive = False
+
+    @property
+    def load(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        """يشغّل العملية وينتظر ("ready") — RuntimeError عند الفشل."""
+        self._proc.start()
+        self._child_conn.close()   # نسخة الأب — ليصل EOF عند موت الابن
+        if not self._conn.poll(_READY_TIMEOUT):
+            self.stop()
+            raise RuntimeError(f"render worker not ready after {_READY_TIMEOUT}s")
+        try:
+            msg = self._conn.recv()
+        except (EOFError, OSError) as e:
+            self.stop()
+            raise RuntimeError(f"render worker exited during startup: {e}")
+        if msg[0] != "ready":
+            self.stop()
+            raise RuntimeError(f"render worker failed: {msg[1]}")
+        self.alive = True
+        threading.Thread(target=self._read_loop, name=f"logiport-pdf-{self.index}-rx",
+                         daemon=True).start()
+        logger.info(f"RenderWorkerPool: worker {self.index} ready (pid={msg[1]})")
+
+    def submit(self, jid: int, html: Optional[str], html_path: Optional[str],
+               out_path: str, base_url: Optional[str]) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if not self.alive:
+                raise RuntimeError("render worker not running")
+            self._pending[jid] = fut
+        try:
+            with self._send_lock:
+                self._conn.send(("render", jid, html, html_path, out_path, base_url))
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._pending.pop(jid, None)
+            self._mark_dead(f"send failed: {e}")
+            raise RuntimeError(f"render worker send failed: {e}")
+        return fut
+
+    def stop(self) -> None:
+        try:
+            with self._send_lock:
+                self._conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self._proc.join(_STOP_TIMEOUT)
+        if self._proc.is_alive():
+            self._proc.terminate()
+            self._proc.join(_STOP_TIMEOUT)
+        self._mark_dead("render worker stopped")
+        try:
+            self._conn.close()
+        except OSError:
+            pass
+
+    def kill(self, reason: str) -> None:
+        """إنهاء فوري لعملية عالقة — مهامها المعلّقة تفشل بـ worker_error."""
+        if self._proc.is_alive():
+            self._proc.terminate()
+            self._proc.join(_STOP_TIMEOUT)
+            if self._proc.is_alive():
+                self._proc.kill()
+                self._proc.join(_STOP_TIMEOUT)
+        self._mark_dead(reason)
+        try:
+            self._conn.close()
+        except OSError:
+            pass
+
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                msg = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            if msg[0] != "done":
+                continue
+            _, jid, ok, info = msg
+            with self._lock:
+                fut = self._pending.pop(jid, None)
+            if fut is not None:
+                fut.set_result((bool(ok), dict(info or {})))
+        self._proc.join(1)
+        self._mark_dead(f"render worker exited (code={self._proc.exitcode})")
+
+    def _mark_dead(self, reason: str) -> None:
+        with self._lock:
+            was_alive, self.alive = self.alive, False
+            pending, self._pending = self._pending, {}
+        if was_alive and pending:
+            logger.warning(f"RenderWorkerPool: worker {self.index}: {reason} "
+                           f"— failing {len(pending)} job(s)")
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_result((False, {"engine": "qtwebengine", "error": reason,
+                                        "worker_error": True}))
+
+
+class RenderWorkerPool:
+    """
+    singleton — instance() و submit/render آمنة من أي thread.
+    لا يتطلب QApplication في العملية الأم (مفيد للسكربتات والدفعات).
+    """
+
+    _instance: Optional["RenderWorkerPool"] = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "RenderWorkerPool":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self, processes: Optional[int] = None):
+        self._size = _configured_processes() if processes is None else max(0, int(processes))
+        self._workers: List[_WorkerProcess] = []
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()   # تشغيل العمليات — خارج self._lock
+        self._ids = itertools.count(1)
+        self._disabled: Optional[str] = None if self._size else "disabled by configuration"
+        self._started = 0
+        self._ctx = None
+
+    # ─────────────────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ─────────────────────────────────────────────────────────────────────
+
+    def available(self) -> bool:
+        """يشغّل العمليات عند أول استدعاء — False إن تعذّر (fallback داخل العملية)."""
+        return self._ensure_started()
+
+    def submit(self, html: Optional[str] = None, out_path: str = "",
+               base_url: Optional[str] = None, *, html_path: Optional[str] = None) -> Future:
+        """Future → (ok, info). يُمرَّر html أو html_path (يُقرأ داخل العملية الفرعية)."""
+        return self._submit(html, out_path, base_url, html_path)[1]
+
+    def render(self, html: Optional[str] = None, out_path: str = "",
+               base_url: Optional[str] = None, *, html_path: Optional[str] = None,
+               timeout: Optional[float] = None) -> Tuple[bool, Dict]:
+        """نسخة متزامنة من submit — لا تُستدعى من thread الواجهة."""
+        t0 = time.perf_counter()
+        try:
+            worker, fut = self._submit(html, out_path, base_url, html_path)
+        except RuntimeError as e:
+            return False, {"engine": "qtwebengine", "error": str(e), "worker_error": True}
+        if timeout is None:
+            from services.pdf_render_pool import PdfRenderPool
+            timeout = PdfRenderPool.wait_timeout(self.stats()["queued"])
+        try:
+            ok, info = fut.result(timeout=timeout)
+        except Exception:
+            # العملية قد تكون ما زالت تكتب out_path — تُنهى قبل fallback المستدعي
+            # وتُستبدل عند الطلب التالي
+            worker.kill("render timed out")
+            return False, {"engine": "qtwebengine", "error": "Render worker timed out",
+                           "worker_error": True}
+        info["out_of_process"] = True
+        timings = info.setdefault("timings", {})
+        timings["ipc"] = max(0.0, time.perf_counter() - t0 - timings.get("total", 0.0))
+        return ok, info
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            live = [w for w in self._workers if w.alive]
+            return {"processes": len(live), "queued": sum(w.load for w in live),
+                    "started": self._started}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+            if self._disabled is None:
+                self._disabled = "shut down"
+        for w in workers:
+            w.stop()
+
+    # ─────────────────────────────────────────────────────────────────────
+    # INTERNAL
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _submit(self, html: Optional[str], out_path: str, base_url: Optional[str],
+                html_path: Optional[str]) -> Tuple["_WorkerProcess", Future]:
+        if html is None and not html_path:
+            raise ValueError("html or html_path is required")
+        if not self._ensure_started():
+            raise RuntimeError(f"render workers unavailable: {self._disabled}")
+        with self._lock:
+            live = [w for w in self._workers if w.alive]
+            if not live:
+                raise RuntimeError("render workers unavailable: no live worker")
+            worker = min(live, key=lambda w: w.load)
+            jid = next(self._ids)
+        return worker, worker.submit(jid, html, html_path, os.path.abspath(out_path), base_url)
+
+    def _live_state(self) -> Tuple[int, int]:
+        """(العمليات الحية، الناقصة) — تحت self._lock."""
+        self._workers = [w for w in self._workers if w.alive]
+        return len(self._workers), self._size - len(self._workers)
+
+    def _ensure_started(self) -> bool:
+        """
+        يكمل العمليات الناقصة. التشغيل (حتى _READY_TIMEOUT لكل عملية) تحت
+        _start_lock وحده: مع وجود عملية حية لا ينتظر أحد — الاستبدال في
+        thread خلفي والطلبات تذهب للموجود؛ بدونها ينتظر المستدعون أول تشغيل.
+        """
+        with self._lock:
+            if self._disabled is not None:
+                return False
+            live, missing = self._live_state()
+        if missing <= 0:
+            return True
+        if live:
+            if self._start_lock.acquire(blocking=False):
+                threading.Thread(target=self._top_up, name="logiport-pdf-start",
+                                 daemon=True).start()
+            return True
+        self._start_lock.acquire()
+        return self._top_up()
+
+    def _top_up(self) -> bool:
+        """يشغّل العمليات الناقصة — يُستدعى و _start_lock محجوز، ويحرّره."""
+        try:
+            with self._lock:
+                if self._disabled is not None:
+                    return False
+                _, missing = self._live_state()
+                if self._ctx is None:
+                    import atexit
+                    import multiprocessing
+                    self._ctx = multiprocessing.get_context("spawn")
+                    atexit.register(self.shutdown)
+            for _ in range(max(0, missing)):
+                w = _WorkerProcess(self._ctx, self._started)
+                try:
+                    w.start()
+                except Exception as e:
+                    logger.warning(f"RenderWorkerPool: cannot start render worker: {e}")
+                    with self._lock:
+                        if not any(x.alive for x in self._workers):
+                            # لا عملية واحدة تعمل — نعطّل بدل إعادة المحاولة مع كل مستند
+                            self._disabled = str(e)
+                            return False
+                    break
+                with self._lock:
+                    if self._disabled is None:
+                        self._started += 1
+                        self._workers.append(w)
+                        continue
+                w.stop()   # shutdown() أثناء التشغيل
+                return False
+            return True
+        finally:
+            self._start_lock.release()
@@ -6,9 +6,19 @@ Fallback        : WeasyPrint
 
 Thread safety:
   QWebEnginePage.printToPdf MUST run on the main Qt thread.
-  render_html_to_pdf() detects whether it is on the main thread:
-    - Main thread  → renders directly via QEventLoop
-    - Worker thread → dispatches to main thread via QMetaObject (blocking)
+  All QtWebEngine renders go through PdfRenderPool (pdf_render_pool.py):
+  a pool of warm off-screen pages on the main thread that renders up to
+  N documents concurrently.
+    - Worker thread → submit() + wait on the job (several workers render
+                      in parallel instead of queueing one by one)
+    - Main thread   → submit() + one QEventLoop until the job finishes
+
+Out-of-process (pdf_render_worker.py):
+  Off the main thread (batch generation, scripts without a QApplication)
+  renders go first to RenderWorkerPool — headless subprocesses with their
+  own offscreen QGuiApplication — so batches never touch the GUI event
+  loop. If the workers can't start or a worker dies, the same render is
+  retried in-process through PdfRenderPool.
 """
 
 from __future__ import annotations
@@ -110,64 +120,65 @@ def detect_engines() -> Dict[str, bool]:
 # ─────────────────────────────────────────────────────────────────────────────
 
 def _qtwebengine_on_main_thread(
-    html: str,
+    html: Optional[str],
     out_path: str,
     base_url: Optional[str],
+    html_path: Optional[str] = None,
 ) -> Tuple[bool, Dict]:
-    """Direct render — call ONLY from main thread."""
+    """Synchronous render for main-thread callers — waits on a pooled page."""
     try:
-        from PySide6.QtCore import QEventLoop, QMarginsF, QUrl
-        from PySide6.QtGui import QPageLayout, QPageSize
-        from PySide6.QtWebEngineCore import QWebEnginePage
-
-        html_with_base = _inject_base_tag(html, base_url)
-
-        page_layout = QPageLayout(
-            QPageSize(QPageSize.PageSizeId.A4),
-            QPageLayout.Orientation.Portrait,
-            QMarginsF(10.0, 10.0, 10.0, 10.0),
-            QPageLayout.Unit.Millimeter,
-        )
-
-        loop     = QEventLoop()
-        result   = {"ok": False, "error": ""}
-        web_page = QWebEnginePage()
-
-        def _on_load(ok: bool):
-            if not ok:
-                result["error"] = "Page failed to load"
-                loop.quit()
-                return
+        from PySide6.QtCore import QEventLoop
+        from services.pdf_render_pool import PdfRenderPool
+
+        pool = PdfRenderPool.instance()
+        loop = QEventLoop()
+        job  = pool.submit(html, out_path, base_url, html_path=html_path)
 
-            def _on_pdf_done(pdf_path: str):
-                result["ok"] = bool(pdf_path)
-                if not pdf_path:
-                    result["error"] = "printToPdf returned empty path"
+        def _on_finished(finished):
+            if finished is job:
                 loop.quit()
 
-            web_page.pdfPrintingFinished.connect(_on_pdf_done)
-            web_page.printToPdf(out_path, page_layout)
+        pool.job_finished.connect(_on_finished)
+        try:
+            if not job.done:
+                loop.exec()
+        finally:
+            pool.job_finished.disconnect(_on_finished)
+        return job.ok, job.info
+
+    except Exception as e:
+        return False, {
+            "engine": "qtwebengine",
+            "error":  f"{type(e).__name__}: {e}",
+            "trace":  traceback.format_exc(),
+        }
 
-        web_page.loadFinished.connect(_on_load)
 
-        if base_url:
-            base_qurl = QUrl.fromLocalFile(str(Path(base_url).resolve()) + "/")
-            web_page.setHtml(html_with_base, base_qurl)
-        else:
-            web_page.setHtml(html_with_base)
+# ─────────────────────────────────────────────────────────────────────────────
+# QtWebEngine — out-of-process workers
+# ─────────────────────────────────────────────────────────────────────────────
 
-        loop.exec()
-        web_page.deleteLater()
+def _try_render_worker(
+    html: Optional[str],
+    out_path: str,
+    base_url: Optional[str],
+    html_path: Optional[str] = None,
+) -> Tuple[bool, Dict]:
+    """Render in a RenderWorkerPool subprocess — worker_error=True means fall back."""
+    try:
+        from services.pdf_render_worker import RenderWorkerPool
 
-        if result["ok"]:
-            return True, {"engine": "qtwebengine"}
-        return False, {"engine": "qtwebengine", "error": result["error"]}
+        pool = RenderWorkerPool.instance()
+        if not pool.available():
+            return False, {"engine": "qtwebengine", "error": "Render workers unavailable",
+                           "worker_error": True}
+        return pool.render(html, out_path, base_url, html_path=html_path)
 
     except Exception as e:
         return False, {
-            "engine": "qtwebengine",
-            "error":  f"{type(e).__name__}: {e}",
-            "trace":  traceback.format_exc(),
+            "engine":       "qtwebengine",
+            "error":        f"Render worker failed: {type(e).__name__}: {e}",
+            "worker_error": True,
         }
 
 
@@ -176,60 +187,41 @@ def _qtwebengine_on_main_thread(
 # ─────────────────────────────────────────────────────────────────────────────
 
 def _try_qtwebengine(
-    html: str,
+    html: Optional[str],
     out_path: str,
     base_url: Optional[str],
+    html_path: Optional[str] = None,
 ) -> Tuple[bool, Dict]:
     """
     Thread-safe entry point.
-    - If called from main thread: renders directly.
-    - If called from worker thread: dispatches to main thread via
-      QMetaObject.invokeMethod (BlockingQueuedConnection) and waits.
+    - If called from main thread: renders via the pool and a local event loop.
+    - If called from worker thread: renders in a RenderWorkerPool subprocess;
+      falls back to submitting to the in-process pool and waiting — other
+      workers' jobs render concurrently on the other pooled pages.
     """
     if not _has_qtwebengine():
         return False, {"engine": "qtwebengine", "error": "QtWebEngineCore not available"}
 
+    if not _is_main_thread():
+        ok, info = _try_render_worker(html, out_path, base_url, html_path)
+        if ok or not info.get("worker_error"):
+            return ok, info
+        logger.debug(f"Render worker unavailable ({info.get('error')}) — rendering in-process")
+
     if not _get_qapp():
         return False, {"engine": "qtwebengine", "error": "No QApplication instance"}
 
     if _is_main_thread():
-        return _qtwebengine_on_main_thread(html, out_path, base_url)
+        return _qtwebengine_on_main_thread(html, out_path, base_url, html_path)
 
-    # ── Worker thread path: dispatch to main thread and wait ──────────────
     try:
-        from PySide6.QtCore import QMetaObject, Qt, QObject, Signal, Slot
-        import threading
-
-        event   = threading.Event()
-        outcome = {}
+        from services.pdf_render_pool import PdfRenderPool
 
-        class _Dispatcher(QObject):
-            trigger = Signal(str, str, str)   # html, out_path, base_url
-
-            def __init__(self):
-                super().__init__()
-                # Move to main thread so slot runs there
-                app = _get_qapp()
-                if app:
-                    self.moveToThread(app.thread())
-                self.trigger.connect(self._do_render, Qt.ConnectionType.QueuedConnection)
-
-            @Slot(str, str, str)
-            def _do_render(self, h: str, p: str, b: str):
-                ok, info = _qtwebengine_on_main_thread(h, p, b or None)
-                outcome["ok"]   = ok
-                outcome["info"] = info
-                event.set()
-
-        dispatcher = _Dispatcher()
-        dispatcher.trigger.emit(html, out_path, base_url or "")
-        event.wait(timeout=60)   # 60s max
-        dispatcher.deleteLater()
-
-        if not outcome:
-            return False, {"engine": "qtwebengine", "error": "Render timed out (60s)"}
-
-        return outcome["ok"], outcome["info"]
+        pool = PdfRenderPool.instance()
+        job  = pool.submit(html, out_path, base_url, html_path=html_path)
+        if not job.wait(timeout=PdfRenderPool.wait_timeout(pool.stats()["queued"] + 1)):
+            return False, {"engine": "qtwebengine", "error": "Render timed out"}
+        return job.ok, job.info
 
     except Exception as e:
         return False, {
@@ -244,15 +236,19 @@ def _try_qtwebengine(
 # ─────────────────────────────────────────────────────────────────────────────
 
 def _try_weasyprint(
-    html: str,
+    html: Optional[str],
     out_path: str,
     base_url: Optional[str],
+    html_path: Optional[str] = None,
 ) -> Tuple[bool, Dict]:
     if not _has_weasyprint_stack():
         return False, {"engine": "weasyprint", "error": "Stack incomplete"}
     try:
         from weasyprint import HTML
-        HTML(string=html, base_url=base_url).write_pdf(out_path)
+        if html_path:
+            HTML(filename=html_path, base_url=base_url).write_pdf(out_path)
+        else:
+            HTML(string=html, base_url=base_url).write_pdf(out_path)
         return True, {"engine": "weasyprint"}
     except Exception as e:
         return False, {
@@ -267,21 +263,30 @@ def _try_weasyprint(
 # ─────────────────────────────────────────────────────────────────────────────
 
 def render_html_to_pdf(
-    html: str,
+    html: Optional[str],
     out_path: str,
     base_url: Optional[str] = None,
     prefer: Optional[str] = "qtwebengine",
+    *,
+    html_path: Optional[str] = None,
 ) -> Tuple[bool, Dict]:
     """
     Render HTML to PDF. Thread-safe — can be called from any thread.
 
+    html_path: an HTML file already on disk — engines load it by URL instead
+    of receiving the document as a string (html may then be None). Relative
+    URLs resolve against the file's directory, like base_url does for strings.
+
     Engine order:
         1. QtWebEngine (dispatches to main thread if needed)
         2. WeasyPrint  (fallback)
 
     Returns: (ok: bool, info: dict)
     """
-    assert isinstance(html, str) and html.strip(), "HTML must be non-empty"
+    if html_path:
+        assert os.path.isfile(html_path), f"HTML file not found: {html_path}"
+    else:
+        assert isinstance(html, str) and html.strip(), "HTML must be non-empty"
 
     out_dir = os.path.dirname(os.path.abspath(out_path)) or "."
     os.makedirs(out_dir, exist_ok=True)
@@ -297,9 +302,9 @@ def render_html_to_pdf(
 
     for engine in order:
         if engine == "qtwebengine" and engines["qtwebengine"]:
-            ok, info = _try_qtwebengine(html, out_path, base_url)
+            ok, info = _try_qtwebengine(html, out_path, base_url, html_path)
         elif engine == "weasyprint" and engines["weasyprint_stack"]:
-            ok, info = _try_weasyprint(html, out_path, base_url)
+            ok, info = _try_weasyprint(html, out_path, base_url, html_path)
         else:
             continue
 
@@ -311,6 +316,8 @@ def render_html_to_pdf(
                 "engine":   info["engine"],
                 "path":     os.path.abspath(out_path),
                 "attempts": attempts,
+                "timings":  info.get("timings", {}),
+                "out_of_process": bool(info.get("out_of_process")),
             }
 
         logger.warning(f"Engine '{engine}' failed: {info.get('error')}")
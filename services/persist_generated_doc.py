@@ -1,6 +1,6 @@
 # services/persist_generated_doc.py (UPsert version)
 from __future__ import annotations
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 import json
 from decimal import Decimal
 from datetime import date
@@ -9,6 +9,9 @@ from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 
 from database.models import get_session_local
+from database.document_snapshots import (
+    INSERT_SNAPSHOT_SQL, Snapshot, encode_snapshot, snapshot_params,
+)
 
 
 class _DecimalEncoder(json.JSONEncoder):
@@ -90,12 +93,87 @@ def _resolve_document_type_code(doc_code: str) -> str:
     )
 
 
-def _next_seq_db(s, year: int, month: int) -> int:
-    row = s.execute(
-        text("SELECT COALESCE(MAX(seq), 0) + 1 FROM doc_groups WHERE year=:y AND month=:m"),
-        {"y": year, "m": month},
-    ).first()
-    return int(row[0]) if row and row[0] is not None else 1
+def _next_seq_db(s, year: int, month: int, *, resync: bool = False) -> int:
+    """
+    يحجز seq فريداً للشهر عبر DocNumberAllocator (BEGIN IMMEDIATE مستقل).
+    s: للتوافق فقط — الحجز لا يلمس Session المستدعي.
+    """
+    from services.doc_number_allocator import DocNumberAllocator
+    return DocNumberAllocator.reserve_group_seqs(1, year=year, month=month, resync=resync)[0]
+
+
+def reserve_group_seqs(count: int) -> list[int]:
+    """يحجز count قيمة seq للشهر الحالي دفعة واحدة — لمهام متعددة المستندات."""
+    from services.doc_number_allocator import DocNumberAllocator
+    return DocNumberAllocator.reserve_group_seqs(count)
+
+
+def _insert_group(s, transaction_id: int, doc_no: str, year: int, month: int,
+                  seq: Optional[int] = None) -> tuple[int, int]:
+    """
+    INSERT في doc_groups بـ seq محجوز مسبقاً — يُرجع (group_id, seq).
+    IntegrityError يعني seq أُدخل خارج العداد (مزامنة/إصدار قديم):
+    يُرفع العداد إلى MAX(seq) الفعلي ويُعاد الحجز مرة واحدة.
+    """
+    if seq is None:
+        seq = _next_seq_db(s, year, month)
+    for attempt in range(2):
+        try:
+            res = s.execute(
+                text("INSERT INTO doc_groups (transaction_id, doc_no, year, month, seq) VALUES (:t,:n,:y,:m,:s)"),
+                {"t": transaction_id, "n": doc_no, "y": year, "m": month, "s": seq}
+            )
+            s.commit()
+            return int(res.lastrowid), seq
+        except IntegrityError:
+            s.rollback()
+            seq = _next_seq_db(s, year, month, resync=True)
+    raise RuntimeError("فشل إنشاء doc_groups بعد عدة محاولات.")
+
+
+# data/totals → document_snapshots (مضغوطة، بلا تكرار)؛ الأعمدة النصية القديمة تُفرَّغ
+_UPSERT_DOCUMENT = text("""
+    INSERT INTO documents
+        (group_id, document_type_id, language, status, file_path, totals_hash, data_hash,
+         totals_json, data_json, render_hash)
+    VALUES
+        (:g, :dt, :lang, 'ready', :path, :totals, :data, NULL, NULL, :rhash)
+    ON CONFLICT(group_id, document_type_id, language) DO UPDATE SET
+        status      = excluded.status,
+        file_path   = excluded.file_path,
+        totals_hash = excluded.totals_hash,
+        data_hash   = excluded.data_hash,
+        totals_json = NULL,
+        data_json   = NULL,
+        render_hash = excluded.render_hash
+""")
+
+_INSERT_SNAPSHOT = text(INSERT_SNAPSHOT_SQL)
+
+
+def _snapshots(totals: Optional[Dict], data: Optional[Dict]) -> tuple:
+    """(totals, data) كلقطات مضغوطة — خارج أي قفل كتابة."""
+    return (encode_snapshot(totals, _DecimalEncoder),
+            encode_snapshot(data, _DecimalEncoder))
+
+
+def _store_snapshots(s, snaps: List[Optional[Snapshot]]) -> None:
+    # يجب أن يكون في نفس transaction الـ UPSERT — trigger الحذف لا يرى لقطة
+    # مُدرجة بلا مستند يشير إليها إلا بعد commit
+    params = snapshot_params(snaps)
+    if params:
+        s.execute(_INSERT_SNAPSHOT, params)
+
+
+def _document_params(group_id: int, document_type_id: int, lang: str, file_path: str,
+                     totals: Optional[Snapshot], data: Optional[Snapshot],
+                     render_hash: Optional[str]) -> Dict:
+    return {
+        "g": group_id, "dt": document_type_id, "lang": lang, "path": file_path,
+        "totals": totals.hash if totals else None,
+        "data":   data.hash if data else None,
+        "rhash":  render_hash,
+    }
 
 
 def persist_document(
@@ -106,13 +184,20 @@ def persist_document(
     totals: Optional[Dict] = None,
     data: Optional[Dict] = None,
     document_no: Optional[str] = None,
+    seq: Optional[int] = None,
+    render_hash: Optional[str] = None,
 ) -> Dict:
     """
     Persist (or upsert) a document row.
     doc_no = PREFIX-{transaction_no}  (مثال: INV-COM-260006)
     Uniqueness key: (transaction_id, document_type_id, language)
     → نفس النوع + نفس اللغة + نفس المعاملة = update الصف الموجود
+    seq: قيمة محجوزة مسبقاً عبر reserve_group_seqs (اختياري) — تُستخدم
+    فقط إذا احتاج الأمر إنشاء doc_groups جديد.
+    render_hash: بصمة مدخلات التوليد (كاش facade) — None يُبطل الكاش للصف.
+    totals/data تُحفظ في document_snapshots — تُقرأ عبر load_document_data.
     """
+    totals_snap, data_snap = _snapshots(totals, data)
     SessionLocal = get_session_local()
     with SessionLocal() as s:
         # 1) نوع المستند
@@ -149,43 +234,12 @@ def persist_document(
             group_id = int(grp["id"])
             seq = int(grp["seq"] or 0)
         else:
-            seq = _next_seq_db(s, year, month)
-            inserted = False
-            for attempt in range(8):
-                try:
-                    res = s.execute(
-                        text("INSERT INTO doc_groups (transaction_id, doc_no, year, month, seq) VALUES (:t,:n,:y,:m,:s)"),
-                        {"t": transaction_id, "n": doc_no, "y": year, "m": month, "s": seq}
-                    )
-                    s.commit()
-                    group_id = int(res.lastrowid)
-                    inserted = True
-                    break
-                except IntegrityError:
-                    s.rollback()
-                    seq += 1
-                    continue
-            if not inserted:
-                raise RuntimeError("فشل إنشاء doc_groups بعد عدة محاولات.")
+            group_id, seq = _insert_group(s, transaction_id, doc_no, year, month, seq)
 
         # 5) UPSERT في documents بناءً على (group_id, document_type_id, language)
-        totals_json = json.dumps(totals or {}, ensure_ascii=False, cls=_DecimalEncoder)
-        data_json   = json.dumps(data   or {}, ensure_ascii=False, cls=_DecimalEncoder)
-
-        s.execute(text("""
-            INSERT INTO documents
-                (group_id, document_type_id, language, status, file_path, totals_json, data_json)
-            VALUES
-                (:g, :dt, :lang, 'ready', :path, :totals, :data)
-            ON CONFLICT(group_id, document_type_id, language) DO UPDATE SET
-                status      = excluded.status,
-                file_path   = excluded.file_path,
-                totals_json = excluded.totals_json,
-                data_json   = excluded.data_json
-        """), {
-            "g": group_id, "dt": document_type_id, "lang": lang,
-            "path": file_path, "totals": totals_json, "data": data_json,
-        })
+        _store_snapshots(s, [totals_snap, data_snap])
+        s.execute(_UPSERT_DOCUMENT, _document_params(
+            group_id, document_type_id, lang, file_path, totals_snap, data_snap, render_hash))
         s.commit()
 
         return {
@@ -197,12 +251,118 @@ def persist_document(
 
 
 
+def _groups_for(s, tx_ids: List[int]) -> Dict[tuple, tuple]:
+    """{(transaction_id, doc_no): (group_id, seq)} — الأحدث لكل زوج."""
+    out: Dict[tuple, tuple] = {}
+    for i in range(0, len(tx_ids), 500):
+        part = tx_ids[i:i + 500]
+        marks = ",".join(f":t{n}" for n in range(len(part)))
+        rows = s.execute(
+            text(f"SELECT id, transaction_id, doc_no, seq FROM doc_groups "
+                 f"WHERE transaction_id IN ({marks}) ORDER BY id"),
+            {f"t{n}": v for n, v in enumerate(part)},
+        ).fetchall()
+        for gid, tid, doc_no, seq in rows:
+            out[(int(tid), doc_no)] = (int(gid), int(seq or 0))
+    return out
+
+
+def persist_documents(rows: List[Dict]) -> List[Dict]:
+    """
+    نسخة دفعية من persist_document — كل الصفوف في transaction واحدة.
+    كل row: transaction_id, doc_code, lang, file_path, document_no
+            (+ اختياري: totals, data, render_hash).
+
+    seq للمجموعات الجديدة يُحجز دفعة واحدة قبل BEGIN IMMEDIATE (الحجز
+    يستخدم connection مستقلة لا يجوز أن تنتظر قفل هذه الـ transaction)؛
+    داخل القفل: seq مأخوذ مسبقاً (مزامنة) → MAX(seq)+1 للشهر.
+    """
+    if not rows:
+        return []
+    today = date.today()
+    year, month = today.year, today.month
+    SessionLocal = get_session_local()
+    with SessionLocal() as s:
+        # 1) أنواع المستندات — استعلام واحد
+        type_codes = {r["doc_code"]: _resolve_document_type_code(r["doc_code"]) for r in rows}
+        wanted = sorted(set(type_codes.values()))
+        marks = ",".join(f":c{n}" for n in range(len(wanted)))
+        type_ids = {code: int(i) for i, code in s.execute(
+            text(f"SELECT id, code FROM document_types WHERE code IN ({marks})"),
+            {f"c{n}": c for n, c in enumerate(wanted)},
+        ).fetchall()}
+        for doc_code, code in type_codes.items():
+            if code not in type_ids:
+                raise RuntimeError(f"document_types لا يحوي الكود '{code}' المطلوب لـ '{doc_code}'")
+
+        # 2) المجموعات الناقصة → حجز seq لها دفعة واحدة
+        pairs = list(dict.fromkeys((int(r["transaction_id"]), r["document_no"]) for r in rows))
+        tx_ids = sorted({t for t, _ in pairs})
+        existing = _groups_for(s, tx_ids)
+        missing = [p for p in pairs if p not in existing]
+        s.commit()
+        seqs = reserve_group_seqs(len(missing)) if missing else []
+
+        # ضغط اللقطات قبل القفل — داخل BEGIN IMMEDIATE كتابة فقط
+        snaps = [_snapshots(r.get("totals"), r.get("data")) for r in rows]
+
+        # 3) الكتابة — transaction واحدة
+        s.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            groups = _groups_for(s, tx_ids)
+            spare = iter(seqs)
+            for tid, doc_no in pairs:
+                if (tid, doc_no) in groups:
+                    continue
+                seq = next(spare, None)
+                taken = seq is None or s.execute(
+                    text("SELECT 1 FROM doc_groups WHERE year=:y AND month=:m AND seq=:s"),
+                    {"y": year, "m": month, "s": seq},
+                ).first()
+                if taken:
+                    seq = int(s.execute(
+                        text("SELECT COALESCE(MAX(seq), 0) + 1 FROM doc_groups "
+                             "WHERE year=:y AND month=:m"),
+                        {"y": year, "m": month},
+                    ).scalar())
+                res = s.execute(
+                    text("INSERT INTO doc_groups (transaction_id, doc_no, year, month, seq) "
+                         "VALUES (:t,:n,:y,:m,:s)"),
+                    {"t": tid, "n": doc_no, "y": year, "m": month, "s": seq},
+                )
+                groups[(tid, doc_no)] = (int(res.lastrowid), seq)
+
+            out = []
+            params = []
+            for r, (totals_snap, data_snap) in zip(rows, snaps):
+                group_id, seq = groups[(int(r["transaction_id"]), r["document_no"])]
+                code = type_codes[r["doc_code"]]
+                params.append(_document_params(
+                    group_id, type_ids[code], r["lang"], r["file_path"],
+                    totals_snap, data_snap, r.get("render_hash")))
+                out.append({"group_id": group_id, "document_no": r["document_no"],
+                            "document_type_code": code, "seq": seq})
+            _store_snapshots(s, [snap for pair in snaps for snap in pair])
+            s.execute(_UPSERT_DOCUMENT, params)
+            s.commit()
+        except Exception:
+            s.rollback()
+            raise
+        return out
+
+
+def group_doc_no(prefix: str, transaction_no: str) -> str:
+    """doc_no المشترك لمستندات معاملة = PREFIX-{transaction_no} (بدون / و \\)."""
+    import re as _re
+    safe_tx = _re.sub(r"[\\/]", "-", str(transaction_no).strip())
+    return f"{prefix}-{safe_tx}"
+
+
 def allocate_group_doc_no(transaction_id: int, prefix: str = "INVPL") -> str:
     """
     يعيد doc_no = PREFIX-{transaction_no}.
     إذا موجود بالفعل → يعيده مباشرة (reuse).
     """
-    import re as _re
     SessionLocal = get_session_local()
     with SessionLocal() as s:
         # جلب رقم المعاملة الفعلي
@@ -211,8 +371,7 @@ def allocate_group_doc_no(transaction_id: int, prefix: str = "INVPL") -> str:
             {"i": int(transaction_id)}
         ).fetchone()
         transaction_no = str(tx_row[0]) if tx_row and tx_row[0] else str(transaction_id)
-        safe_tx = _re.sub(r"[\\/]", "-", transaction_no.strip())
-        doc_no = f"{prefix}-{safe_tx}"
+        doc_no = group_doc_no(prefix, transaction_no)
 
         # هل موجود مسبقاً؟
         row = s.execute(
@@ -224,18 +383,5 @@ def allocate_group_doc_no(transaction_id: int, prefix: str = "INVPL") -> str:
 
         # أنشئ سجل جديد
         today = date.today()
-        year, month = today.year, today.month
-        seq = _next_seq_db(s, year, month)
-        for attempt in range(8):
-            try:
-                s.execute(
-                    text("INSERT INTO doc_groups (transaction_id, doc_no, year, month, seq) VALUES (:t,:n,:y,:m,:s)"),
-                    {"t": transaction_id, "n": doc_no, "y": year, "m": month, "s": seq}
-                )
-                s.commit()
-                return doc_no
-            except IntegrityError:
-                s.rollback()
-                seq += 1
-                continue
-        raise RuntimeError("Failed to allocate doc_no after several attempts.")
\ No newline at end of file
+        _insert_group(s, transaction_id, doc_no, today.year, today.month)
+        return doc_no
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+services/reference_cache.py
+============================
+ReferenceCache — ذاكرة مشتركة للجداول المرجعية الصغيرة داخل العملية.
+
+الجداول: countries, currencies, materials, packaging_types, pricing_types, users
+كل جدول يُحمَّل مرة واحدة (SELECT واحد) كخريطة {id: dict} ويبقى في الذاكرة
+حتى يُبطَل:
+  - DataBus.emit(entity)           ← عند أي تعديل من الواجهة
+  - BaseCRUD add/update/delete/...  ← عند أي كتابة عبر CRUD
+  - SyncService._commit_pulled      ← بعد كل دفعة مسحوبة من السيرفر
+
+الاستخدام:
+    cache = ReferenceCache.get_instance()
+    cache.name("countries", 5, "ar")     # اسم مترجم مع fallback
+    cache.records("currencies")          # list[dict] مرتبة بالـ id
+    cache.pricing_codes()                # {pricing_type_id: "CODE"}
+    cache.stats()                        # hits / misses / loads
+
+Thread-safe: يُستخدم من thread الواجهة و run_async و builders الوثائق.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from core.singleton import SingletonMeta
+
+logger = logging.getLogger(__name__)
+
+# table → (اسم الموديل في database.models، الأعمدة المحمَّلة)
+_TABLES: Dict[str, tuple] = {
+    "countries":       ("Country",       ("id", "code", "name_ar", "name_en", "name_tr")),
+    "currencies":      ("Currency",      ("id", "code", "symbol", "name_ar", "name_en", "name_tr")),
+    "materials":       ("Material",      ("id", "code", "name_ar", "name_en", "name_tr",
+                                          "material_type_id", "estimated_price", "currency_id")),
+    "packaging_types": ("PackagingType", ("id", "name_ar", "name_en", "name_tr")),
+    "pricing_types":   ("PricingType",   ("id", "code", "name_ar", "name_en", "name_tr", "is_active",
+                                          "sort_order", "compute_by", "price_unit", "divisor")),
+    "users":           ("User",          ("id", "username", "full_name", "office_id")),
+}
+
+# كيانات DataBus التي لا يطابق اسمها اسم الجدول
+_BUS_ENTITIES: Dict[str, tuple] = {
+    "pricing":   ("pricing_types",),
+    "packaging": ("packaging_types",),
+    "all":       tuple(_TABLES),
+}
+
+
+class ReferenceCache(metaclass=SingletonMeta):
+
+    def __init__(self, session_factory: Optional[Callable] = None):
+        # session_factory: sessionmaker (افتراضياً get_session_local())
+        self._session_factory = session_factory
+        self._lock   = threading.RLock()
+        self._maps:  Dict[str, Dict[int, dict]] = {}
+        self._hits   = 0
+        self._misses = 0
+        self._loads: Dict[str, int] = {}
+
+    # ─────────────────────────────────────────────────────────────────────
+    # READ
+    # ─────────────────────────────────────────────────────────────────────
+
+    def map(self, table: str) -> Dict[int, dict]:
+        """{id: record dict} — تحميل كسول عند أول طلب بعد الإبطال."""
+        with self._lock:
+            m = self._maps.get(table)
+            if m is not None:
+                self._hits += 1
+                return m
+            self._misses += 1
+            m = self._load(table)
+            self._maps[table] = m
+            self._loads[table] = self._loads.get(table, 0) + 1
+            return m
+
+    def records(self, table: str, *, newest_first: bool = False) -> List[dict]:
+        """list[dict] مرتبة بالـ id — newest_first يطابق ترتيب BaseCRUD.get_all()."""
+        rows = list(self.map(table).values())
+        return rows[::-1] if newest_first else rows
+
+    def get(self, table: str, record_id: Any) -> Optional[dict]:
+        if record_id in (None, ""):
+            return None
+        try:
+            return self.map(table).get(int(record_id))
+        except (TypeError, ValueError):
+            return None
+
+    def name(self, table: str, record_id: Any, lang: str = "ar") -> str:
+        """
+        الاسم المترجم: name_{lang} ثم en ثم ar ثم tr.
+        users: full_name ثم username.
+        """
+        rec = self.get(table, record_id)
+        if not rec:
+            return ""
+        if table == "users":
+            return rec.get("full_name") or rec.get("username") or str(rec.get("id", ""))
+        return (rec.get(f"name_{lang}") or rec.get("name_en")
+                or rec.get("name_ar") or rec.get("name_tr") or "")
+
+    def pricing_codes(self) -> Dict[int, str]:
+        """{pricing_type_id: CODE} — بديل _get_pricing_code_by_id."""
+        return {pid: (r.get("code") or "").upper()
+                for pid, r in self.map("pricing_types").items()}
+
+    # ─────────────────────────────────────────────────────────────────────
+    # INVALIDATION
+    # ─────────────────────────────────────────────────────────────────────
+
+    def invalidate(self, table: Optional[str] = None) -> None:
+        """يُبطل جدولاً واحداً (أو الكل إذا table=None)."""
+        with self._lock:
+            if table is None:
+                self._maps.clear()
+            else:
+                self._maps.pop(table, None)
+
+    def invalidate_entity(self, entity: str) -> None:
+        """يُستدعى من DataBus.emit و BaseCRUD — يتجاهل الجداول غير المخزّنة."""
+        for table in _BUS_ENTITIES.get(entity, (entity,)):
+            if table in _TABLES:
+                self.invalidate(table)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits":     self._hits,
+                "misses":   self._misses,
+                "hit_rate": (self._hits / total) if total else 0.0,
+                "loads":    dict(self._loads),
+                "cached":   sorted(self._maps),
+            }
+
+    # ─────────────────────────────────────────────────────────────────────
+    # INTERNAL
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _load(self, table: str) -> Dict[int, dict]:
+        if table not in _TABLES:
+            raise KeyError(f"ReferenceCache: unknown table '{table}'")
+        model_name, wanted = _TABLES[table]
+        import database.models as models
+        model = getattr(models, model_name)
+        cols = [getattr(model, c) for c in wanted if hasattr(model, c)]
+        keys = [c.key for c in cols]
+
+        factory = self._session_factory or models.get_session_local()
+        with factory() as s:
+            rows = s.query(*cols).order_by(model.id).all()
+        out = {int(r[0]): dict(zip(keys, r)) for r in rows}
+        logger.debug(f"ReferenceCache: loaded {table} ({len(out)} rows)")
+        return out
@@ -2,22 +2,32 @@
 services/supabase_client.py — LOGIPORT
 ============================
 Lightweight Supabase REST client for LOGIPORT sync.
-لا يعتمد على supabase-py — فقط urllib من stdlib.
+لا يعتمد على supabase-py — فقط http.client من stdlib.
 
 إصلاحات:
   - [FIX] ping_timeout منفصل (5s بدل 15s) لاختبار الاتصال السريع
   - [FIX] ping() يُعيد الخطأ الحقيقي بدل False الصامت
   - [FIX] exponential backoff للـ retry على الطلبات
   - [FIX] أفضل معالجة للـ network errors
+  - [PERF] keep-alive: _ConnectionPool يعيد استخدام اتصالات TLS بين كل
+    الطلبات والجداول (بدل handshake جديد لكل urlopen)
+  - [PERF] gzip: Accept-Encoding للردود + ضغط أجسام upsert الكبيرة
+  - [PERF] retry مع jitter (شبكة + 429/502/503/504) داخل _request
+  - [PERF] metrics(): زمن وحجم كل طلب لتحليل توقيت المزامنة
 """
 from __future__ import annotations
 
+import gzip
+import http.client
 import json
 import logging
+import random
+import ssl
+import threading
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
+from collections import deque
+from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
@@ -26,6 +36,13 @@ _TIMEOUT      = 15   # timeout للعمليات العادية (ثانية)
 _PING_TIMEOUT = 8    # timeout لاختبار الاتصال (ثانية)
 _MAX_RETRIES  = 3    # عدد محاولات الإعادة عند فشل الشبكة
 
+_POOL_SIZE       = 6       # اتصالات keep-alive محفوظة لكل host (≥ SyncService._MAX_WORKERS)
+_GZIP_MIN_BYTES  = 8192    # أجسام upsert أكبر من هذا تُضغط
+_BACKOFF_BASE    = 1.0     # ثانية — 1, 2, 4 ... × jitter [0.5, 1.5]
+_BACKOFF_CAP     = 15.0
+_RETRY_STATUSES  = {429, 502, 503, 504}
+_METRICS_KEEP    = 2000    # آخر N طلب في الذاكرة
+
 
 class SupabaseError(Exception):
     def __init__(self, status: int, message: str):
@@ -34,10 +51,75 @@ class SupabaseError(Exception):
         self.message = message
 
 
+@dataclass
+class RequestMetric:
+    """قياس طلب HTTP واحد — يُجمع في SupabaseClient.metrics()."""
+    at:         float    # time.monotonic() عند البدء
+    method:     str
+    table:      str
+    status:     int      # 0 = خطأ شبكة
+    seconds:    float
+    bytes_out:  int
+    bytes_in:   int
+    reused:     bool     # اتصال keep-alive مُعاد استخدامه
+    attempts:   int
+
+
+class _ConnectionPool:
+    """
+    اتصالات http.client محفوظة (keep-alive) لـ host واحد.
+    thread-safe: كل thread يأخذ اتصالاً حصرياً ثم يعيده.
+    """
+
+    def __init__(self, scheme: str, host: str, port: Optional[int], size: int = _POOL_SIZE):
+        self._scheme = scheme
+        self._host   = host
+        self._port   = port
+        self._size   = size
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock   = threading.Lock()
+        self._ssl    = ssl.create_default_context() if scheme == "https" else None
+
+    def acquire(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """(connection, reused)"""
+        if not self._host:
+            raise ValueError("invalid Supabase URL (no host)")
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        if self._scheme == "https":
+            conn = http.client.HTTPSConnection(self._host, self._port, timeout=timeout,
+                                               context=self._ssl)
+        else:
+            conn = http.client.HTTPConnection(self._host, self._port, timeout=timeout)
+        return conn, False
+
+    def release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self._size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
 class SupabaseClient:
     """
     REST wrapper حول Supabase PostgREST API.
     يدعم: select / upsert / delete + health check.
+    كل الطلبات تمر عبر _ConnectionPool واحد لكل client (keep-alive).
     """
 
     def __init__(
@@ -52,6 +134,14 @@ class SupabaseClient:
         self.office_id    = office_id
         self._ping_timeout = ping_timeout or _PING_TIMEOUT
 
+        parts = urllib.parse.urlsplit(self.url)
+        self._base_path = parts.path.rstrip("/")
+        self._pool = _ConnectionPool(parts.scheme or "https", parts.hostname or "", parts.port)
+        # يُعطَّل تلقائياً إذا رفض السيرفر جسماً مضغوطاً (400/415)
+        self.compress_requests = True
+        self._metrics: deque = deque(maxlen=_METRICS_KEEP)
+        self._metrics_lock = threading.Lock()
+
     # ─────────────────────────────────────────────────────
     # Internal helpers
     # ─────────────────────────────────────────────────────
@@ -70,6 +160,46 @@ class SupabaseClient:
             h.update(extra)
         return h
 
+    def _send(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+        timeout: float,
+    ) -> Tuple[int, Dict[str, str], bytes, bool]:
+        """
+        طلب واحد على اتصال من الـ pool → (status, headers, body, reused).
+        اتصال keep-alive أغلقه السيرفر (idle) يُستبدل مرة واحدة بصمت.
+        أخطاء http.client تُحوَّل لـ ConnectionError (OSError) كما كان urllib.
+        """
+        for fresh_try in range(2):
+            conn, reused = self._pool.acquire(timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                raw  = resp.read()
+                resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if reused and fresh_try == 0:
+                    continue
+                if isinstance(e, OSError):
+                    raise
+                raise ConnectionError(str(e)) from e
+            if resp_headers.get("connection", "").lower() == "close" or resp.will_close:
+                conn.close()
+            else:
+                self._pool.release(conn)
+            if resp_headers.get("content-encoding", "").lower() == "gzip" and raw:
+                raw = gzip.decompress(raw)
+            return resp.status, resp_headers, raw, reused
+        raise ConnectionError("connection pool exhausted")
+
+    def _record(self, metric: RequestMetric) -> None:
+        with self._metrics_lock:
+            self._metrics.append(metric)
+
     def _request(
         self,
         method: str,
@@ -80,54 +210,117 @@ class SupabaseClient:
         timeout: Optional[int] = None,
         retries: int = 0,
     ) -> Any:
-        url = f"{self.url}/rest/v1/{path}"
+        url = f"{self._base_path}/rest/v1/{path}"
         if params:
             url += "?" + urllib.parse.urlencode(params)
 
+        headers = self._headers(extra_headers)
+        headers["Accept-Encoding"] = "gzip"
         data = json.dumps(body).encode() if body is not None else None
-        req  = urllib.request.Request(
-            url,
-            data=data,
-            headers=self._headers(extra_headers),
-            method=method,
-        )
+        compressed = False
+        if data is not None and self.compress_requests and len(data) >= _GZIP_MIN_BYTES:
+            data = gzip.compress(data, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+            compressed = True
         _timeout = timeout or _TIMEOUT
+        table = path.split("?", 1)[0]
 
         last_exc: Exception | None = None
-        for attempt in range(max(1, retries + 1)):
+        attempt = 0
+        while attempt < max(1, retries + 1):
+            t0 = time.monotonic()
+            status, bytes_in, reused = 0, 0, False
             try:
-                with urllib.request.urlopen(req, timeout=_timeout) as resp:
-                    raw = resp.read()
-                    return json.loads(raw) if raw else []
-
-            except urllib.error.HTTPError as e:
-                # HTTP error (4xx/5xx) — لا نُعيد المحاولة
-                body_text = e.read().decode(errors="replace")
-                logger.error("Supabase %s %s → %s: %s", method, path, e.code, body_text)
-                raise SupabaseError(e.code, body_text) from e
-
-            except (urllib.error.URLError, OSError, TimeoutError) as e:
+                status, resp_headers, raw, reused = self._send(method, url, data, headers, _timeout)
+                bytes_in = len(raw)
+            except (OSError, TimeoutError) as e:
                 # خطأ شبكة — نُعيد المحاولة مع تأخير
                 last_exc = e
-                if attempt < retries:
-                    wait = 2 ** attempt   # 1s, 2s, 4s
-                    logger.warning(
-                        "Supabase %s %s: network error (attempt %d/%d), retry in %ds: %s",
-                        method, path, attempt + 1, retries + 1, wait, e,
-                    )
-                    time.sleep(wait)
-                else:
-                    logger.error("Supabase %s %s: failed after %d attempts: %s",
-                                 method, path, retries + 1, e)
-
-            except Exception as e:
-                logger.error("Supabase request failed: %s", e)
-                raise
+            finally:
+                self._record(RequestMetric(
+                    at=t0, method=method, table=table, status=status,
+                    seconds=time.monotonic() - t0,
+                    bytes_out=len(data or b""), bytes_in=bytes_in,
+                    reused=reused, attempts=attempt + 1,
+                ))
+
+            if status:
+                if status < 400:
+                    return json.loads(raw) if raw else []
+                body_text = raw.decode(errors="replace")
+                if compressed and status in (400, 415):
+                    # السيرفر لا يقبل Content-Encoding: gzip — أعد بدون ضغط
+                    logger.info("Supabase: gzip request bodies rejected (%s) — disabled", status)
+                    self.compress_requests = False
+                    data = json.dumps(body).encode()
+                    headers.pop("Content-Encoding", None)
+                    compressed = False
+                    continue
+                if status not in _RETRY_STATUSES or attempt >= retries:
+                    # HTTP error (4xx/5xx) — لا نُعيد المحاولة
+                    logger.error("Supabase %s %s → %s: %s", method, path, status, body_text)
+                    raise SupabaseError(status, body_text)
+                last_exc = SupabaseError(status, body_text)
+
+            if attempt < retries:
+                wait = min(_BACKOFF_CAP, _BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(
+                    "Supabase %s %s: attempt %d/%d failed, retry in %.1fs: %s",
+                    method, path, attempt + 1, retries + 1, wait, last_exc,
+                )
+                time.sleep(wait)
+            else:
+                logger.error("Supabase %s %s: failed after %d attempts: %s",
+                             method, path, retries + 1, last_exc)
+            attempt += 1
 
         if last_exc:
             raise last_exc
         raise RuntimeError("Supabase request failed unexpectedly")
 
+    # ─────────────────────────────────────────────────────
+    # Metrics
+    # ─────────────────────────────────────────────────────
+
+    def request_metrics(self, since: Optional[float] = None) -> List[RequestMetric]:
+        """القياسات الخام (منذ since — time.monotonic()) ."""
+        with self._metrics_lock:
+            items = list(self._metrics)
+        if since is not None:
+            items = [m for m in items if m.at >= since]
+        return items
+
+    def metrics(self, since: Optional[float] = None) -> Dict[str, Any]:
+        """
+        ملخّص: إجمالي + لكل جدول {requests, seconds, avg_ms, bytes_out, bytes_in}.
+        reused_ratio = نسبة الطلبات على اتصال keep-alive قائم.
+        """
+        items = self.request_metrics(since)
+        per_table: Dict[str, Dict[str, Any]] = {}
+        for m in items:
+            t = per_table.setdefault(m.table, {"requests": 0, "seconds": 0.0,
+                                               "bytes_out": 0, "bytes_in": 0, "errors": 0})
+            t["requests"]  += 1
+            t["seconds"]   += m.seconds
+            t["bytes_out"] += m.bytes_out
+            t["bytes_in"]  += m.bytes_in
+            t["errors"]    += 0 if 0 < m.status < 400 else 1
+        for t in per_table.values():
+            t["avg_ms"] = round(1000 * t["seconds"] / t["requests"], 1)
+        n = len(items)
+        return {
+            "requests":     n,
+            "seconds":      sum(m.seconds for m in items),
+            "bytes_out":    sum(m.bytes_out for m in items),
+            "bytes_in":     sum(m.bytes_in for m in items),
+            "reused_ratio": (sum(1 for m in items if m.reused) / n) if n else 0.0,
+            "tables":       per_table,
+        }
+
+    def close(self) -> None:
+        """يغلق اتصالات keep-alive المحفوظة."""
+        self._pool.close()
+
     # ─────────────────────────────────────────────────────
     # Public API
     # ─────────────────────────────────────────────────────
@@ -139,6 +332,7 @@ class SupabaseClient:
         filters: Optional[Dict[str, str]] = None,
         order: Optional[str] = None,
         limit: Optional[int] = None,
+        offset: Optional[int] = None,
     ) -> List[Dict]:
         """
         SELECT rows من جدول.
@@ -152,6 +346,8 @@ class SupabaseClient:
             params["order"] = order
         if limit is not None:
             params["limit"] = limit
+        if offset:
+            params["offset"] = offset
         return self._request("GET", table, params=params, retries=2)
 
     def upsert(
@@ -192,6 +388,24 @@ class SupabaseClient:
             retries=1,
         )
 
+    def delete_many(
+        self,
+        table: str,
+        server_ids: List[str],
+        chunk: int = 100,
+    ) -> None:
+        """DELETE عدة صفوف بـ server_id=in.(...) — طلب لكل chunk (طول الـ URL)."""
+        ids = [str(s) for s in server_ids if s]
+        for i in range(0, len(ids), chunk):
+            quoted = ",".join('"%s"' % s.replace('"', "") for s in ids[i:i + chunk])
+            self._request(
+                "DELETE",
+                table,
+                params={"server_id": f"in.({quoted})"},
+                extra_headers={"Prefer": "return=minimal"},
+                retries=1,
+            )
+
     def get_cursor(self, office_id: int, table_name: str) -> Optional[str]:
         """
         يجلب آخر وقت مزامنة لجدول معيّن من sync_cursors.
@@ -231,23 +445,15 @@ class SupabaseClient:
         mode='test': يُطلق exception عند 401 (للـ dialog)
         mode='poll': يرجع True/False فقط (للـ widget وauto-sync)
         """
-        url = f"{self.url}/rest/v1/"
-        req = urllib.request.Request(
-            url,
-            headers=self._headers(),
-            method="GET",
-        )
         try:
-            with urllib.request.urlopen(req, timeout=self._ping_timeout) as resp:
-                _ = resp.read()
-            return True
-        except urllib.error.HTTPError as e:
+            self._send("GET", f"{self._base_path}/rest/v1/", None,
+                       self._headers(), self._ping_timeout)
             # أي HTTP response تعني السيرفر يستجيب والـ URL صحيح
             # 401 = key خاطئ لكن السيرفر موصول
             # 403 = RLS يمنع لكن السيرفر موصول
             # نرجع True للـ connectivity check، False فقط عند انقطاع الشبكة
             return True
-        except (urllib.error.URLError, OSError, TimeoutError):
+        except (OSError, TimeoutError):
             # انقطاع شبكة حقيقي
             return False
 
@@ -255,37 +461,36 @@ class SupabaseClient:
         """
         يتحقق من صحة الـ credentials فعلياً — يستخدمه dialog الإعدادات فقط.
         يُطلق SupabaseError(401) إذا كان الـ key خاطئاً.
-        يُطلق URLError إذا انقطعت الشبكة.
+        يُطلق OSError (ConnectionError/TimeoutError) إذا انقطعت الشبكة.
         """
         # نحاول SELECT بسيط — إذا رجع 401 الـ key خاطئ، 200 يعني صحيح
-        url = f"{self.url}/rest/v1/offices"
         params = urllib.parse.urlencode({"select": "id", "limit": "1"})
-        req = urllib.request.Request(
-            f"{url}?{params}",
-            headers=self._headers(),
-            method="GET",
+        status, _, _, _ = self._send(
+            "GET", f"{self._base_path}/rest/v1/offices?{params}", None,
+            self._headers(), self._ping_timeout,
         )
-        try:
-            with urllib.request.urlopen(req, timeout=self._ping_timeout) as resp:
-                _ = resp.read()
-            return True
-        except urllib.error.HTTPError as e:
-            if e.code == 401:
-                raise SupabaseError(401, "Unauthorized — invalid API key") from e
-            # 404 = الجدول غير موجود لكن الـ key صحيح
-            # 403 = RLS لكن الـ key صحيح
-            return True
+        if status == 401:
+            raise SupabaseError(401, "Unauthorized — invalid API key")
+        # 404 = الجدول غير موجود لكن الـ key صحيح
+        # 403 = RLS لكن الـ key صحيح
+        return True
 
 
 # ─────────────────────────────────────────────────────────
 # Factory — يُنشئ client من SettingsManager
 # ─────────────────────────────────────────────────────────
 
+_shared_client: Optional[SupabaseClient] = None
+_shared_lock = threading.Lock()
+
+
 def get_supabase_client() -> Optional[SupabaseClient]:
     """
-    يُنشئ SupabaseClient من إعدادات التطبيق.
+    يُعيد SupabaseClient من إعدادات التطبيق.
     يُعيد None إذا لم تكن الإعدادات مكتملة.
+    نفس الـ instance (ونفس اتصالات keep-alive) يُعاد ما دام url/key لم يتغيّرا.
     """
+    global _shared_client
     try:
         from core.settings_manager import SettingsManager
         sm = SettingsManager.get_instance()
@@ -294,7 +499,15 @@ def get_supabase_client() -> Optional[SupabaseClient]:
         office  = sm.get("sync_office_id", None)
         if not url or not key:
             return None
-        return SupabaseClient(url, key, office_id=office)
+        with _shared_lock:
+            c = _shared_client
+            if c is None or c.url != url.rstrip("/") or c.anon_key != key:
+                if c is not None:
+                    c.close()
+                c = _shared_client = SupabaseClient(url, key, office_id=office)
+            elif office is not None:
+                c.office_id = office
+            return c
     except Exception as e:
         logger.error("Failed to create Supabase client: %s", e)
         return None
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+services/sync_scheduler.py — LOGIPORT
+======================================
+جدولة خطوات المزامنة حسب FK dependencies بدل التسلسل الكامل.
+
+كل خطوة = (phase, table):
+    push_ref  — جداول PUSH_REF_ORDER (مرجعية، رفع كامل)
+    push      — TWO_WAY_TABLES + PUSH_ONLY_TABLES (رفع عبر cursor)
+    push_del  — قيود الحذف في op_log (outbox) — بترتيب FK معكوس
+    pull      — TWO_WAY_TABLES (سحب عبر cursor)
+    pull_ref  — PULL_ONLY_TABLES
+
+قواعد الاعتماد (نفس ضمانات الترتيب القديم [G] على حواف FK فقط):
+  - رفع جدول ينتظر رفع كل آباءه (FK) — push_ref ثم push
+  - رفع جدول في TWO_WAY ينتظر push_ref لنفس الجدول (clients/companies)
+  - حذف جدول ينتظر رفع وحذف كل أبنائه (الابن يُحذف/يُنقل قبل الأب)
+    ورفع نفس الجدول
+  - سحب جدول ينتظر سحب آباءه + رفع وحذف نفس الجدول (لا نسحب قبل أن نرفع)
+
+الخطوات المستقلة تُنفَّذ على ThreadPoolExecutor محدود (max_workers).
+خطأ شبكة (abort_on) يوقف جدولة خطوات جديدة — الجارية تكتمل.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────
+# FK parents لكل جدول مُزامَن (ضمن الجداول المُزامَنة فقط)
+# users غير مُزامَن عبر هذه القوائم — لذلك لا يظهر كأب
+# ─────────────────────────────────────────────────────────
+TABLE_PARENTS: Dict[str, Tuple[str, ...]] = {
+    "materials":             ("currencies", "material_types"),
+    "role_permissions":      ("roles", "permissions"),
+    "clients":               ("countries", "currencies", "delivery_methods", "packaging_types"),
+    "companies":             ("clients", "countries", "currencies"),
+    "client_contacts":       ("clients",),
+    "company_banks":         ("companies", "countries", "currencies"),
+    "company_role_links":    ("companies", "company_roles"),
+    "company_partner_links": ("clients", "companies"),
+    "entries":               ("clients",),
+    "entry_items":           ("countries", "entries", "materials", "packaging_types"),
+    "transactions":          ("clients", "companies", "countries", "currencies",
+                              "delivery_methods", "offices", "pricing_types"),
+    "transaction_items":     ("countries", "currencies", "entries", "entry_items", "materials",
+                              "packaging_types", "pricing_types", "transactions"),
+    "transaction_entries":   ("entries", "transactions"),
+    "transport_details":     ("companies", "transactions"),
+    "doc_groups":            ("transactions",),
+    "container_tracking":    ("clients", "offices", "transactions"),
+    "shipment_containers":   ("container_tracking",),
+    "tasks":                 ("clients", "container_tracking", "transactions"),
+    "pricing":               ("companies", "currencies", "delivery_methods",
+                              "materials", "pricing_types"),
+}
+
+PUSH_PHASES = ("push_ref", "push")
+PULL_PHASES = ("pull", "pull_ref")
+
+
+def table_children(parents: Dict[str, Tuple[str, ...]]) -> Dict[str, Tuple[str, ...]]:
+    """عكس TABLE_PARENTS — {أب: أبناء}."""
+    out: Dict[str, list] = {}
+    for child, ps in parents.items():
+        for p in ps:
+            if p != child:
+                out.setdefault(p, []).append(child)
+    return {p: tuple(cs) for p, cs in out.items()}
+
+
+@dataclass
+class SyncStep:
+    phase: str
+    table: str
+    deps:  set = field(default_factory=set)
+    # ترتيب الخطة القديمة — يُستخدم لكسر التعادل (نفس الأولوية السابقة)
+    order: int = 0
+
+    @property
+    def key(self) -> str:
+        return f"{self.phase}:{self.table}"
+
+
+@dataclass
+class StepOutcome:
+    step:     SyncStep
+    value:    int = 0
+    error:    Optional[BaseException] = None
+    started:  float = 0.0
+    duration: float = 0.0
+
+
+def build_sync_plan(
+    push_ref: Iterable[str],
+    push: Iterable[str],
+    pull: Iterable[str],
+    pull_ref: Iterable[str],
+    parents: Optional[Dict[str, Tuple[str, ...]]] = None,
+    push_del: Iterable[str] = (),
+) -> List[SyncStep]:
+    """يبني الخطوات مع dependencies — بترتيب القوائم الأصلية."""
+    parents = TABLE_PARENTS if parents is None else parents
+    children = table_children(parents)
+    steps: List[SyncStep] = []
+    keys: Dict[str, SyncStep] = {}
+
+    def add(phase: str, table: str) -> SyncStep:
+        st = SyncStep(phase, table, order=len(steps))
+        steps.append(st)
+        keys[st.key] = st
+        return st
+
+    for t in push_ref:
+        add("push_ref", t)
+    for t in push:
+        add("push", t)
+    for t in push_del:
+        add("push_del", t)
+    for t in pull:
+        add("pull", t)
+    for t in pull_ref:
+        add("pull_ref", t)
+
+    def latest(table: str, phases: Tuple[str, ...]) -> List[str]:
+        return [f"{p}:{table}" for p in phases if f"{p}:{table}" in keys]
+
+    for st in steps:
+        table_parents = [p for p in parents.get(st.table, ()) if p != st.table]
+        if st.phase in PUSH_PHASES:
+            for p in table_parents:
+                st.deps.update(latest(p, PUSH_PHASES))
+            if st.phase == "push":
+                st.deps.update(latest(st.table, ("push_ref",)))
+        elif st.phase == "push_del":
+            for c in children.get(st.table, ()):
+                st.deps.update(latest(c, PUSH_PHASES + ("push_del",)))
+            st.deps.update(latest(st.table, PUSH_PHASES))
+        else:
+            for p in table_parents:
+                st.deps.update(latest(p, PULL_PHASES))
+            st.deps.update(latest(st.table, PUSH_PHASES + ("push_del",)))
+            if st.phase == "pull_ref":
+                st.deps.update(latest(st.table, ("pull",)))
+        st.deps.discard(st.key)
+    return steps
+
+
+class SyncScheduler:
+    """
+    ينفّذ SyncStep بالتوازي مع احترام deps.
+
+    run(steps, fn) → {key: StepOutcome}
+    fn(step) تُرجع عدد الصفوف. استثناء من نوع abort_on يوقف الجدولة
+    (aborted=True) — أي استثناء آخر يُسجَّل في outcome.error فقط
+    والخطوات التابعة تستمر (كالسلوك التسلسلي السابق).
+    """
+
+    def __init__(self, max_workers: int = 4,
+                 abort_on: Tuple[type, ...] = (OSError, TimeoutError)):
+        self.max_workers = max(1, int(max_workers))
+        self.abort_on    = abort_on
+        self.aborted     = False
+
+    def run(self, steps: List[SyncStep], fn: Callable[[SyncStep], int]) -> Dict[str, StepOutcome]:
+        pending  = {st.key: st for st in sorted(steps, key=lambda s: s.order)}
+        done:    set = set()
+        results: Dict[str, StepOutcome] = {}
+
+        def _run(st: SyncStep) -> StepOutcome:
+            out = StepOutcome(st, started=time.perf_counter())
+            try:
+                out.value = int(fn(st) or 0)
+            except Exception as e:
+                out.error = e
+            out.duration = time.perf_counter() - out.started
+            return out
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="logiport-sync") as pool:
+            running: Dict = {}
+            while pending or running:
+                if not self.aborted:
+                    ready = [st for st in pending.values() if st.deps <= done]
+                    if not ready and not running:
+                        # دورة في الرسم (لا يُتوقع) — شغّل الأقدم لتجنب التوقف
+                        ready = [next(iter(pending.values()))]
+                    for st in ready[: self.max_workers - len(running)]:
+                        del pending[st.key]
+                        running[pool.submit(_run, st)] = st
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    st  = running.pop(fut)
+                    out = fut.result()
+                    results[st.key] = out
+                    done.add(st.key)
+                    if out.error is not None and isinstance(out.error, self.abort_on):
+                        self.aborted = True
+                if self.aborted:
+                    pending.clear()
+        return results
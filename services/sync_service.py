@@ -14,20 +14,50 @@ Two-way sync بين SQLite المحلي و Supabase.
   [H] ping() بسيطة — True/False بدون exceptions
   [I] إصلاح 409: entries/transactions أُزيلا من ALWAYS_FULL + حذف id عند server_id conflict
   [J] إصلاح 400: أعمدة CMR-2 في _LOCAL_ONLY_COLS حتى تطبيق Migration في Supabase
+  [L] مزامنة متوازية: الجداول المستقلة تُرفع/تُسحب معاً عبر SyncScheduler
+      (services/sync_scheduler.py) — الترتيب محفوظ على حواف FK فقط،
+      وتوقيت كل خطوة في SyncResult.timings
+  [M] تصريف كامل للـ backlog: كل جدول يُرفع/يُسحب دفعة بعد دفعة حتى
+      يفرغ أو تنتهي ميزانية الوقت (_DRAIN_BUDGET) — حجم الدفعة يتكيّف
+      مع زمن الاستجابة، والتقدّم يُرسل لـ progress callback
+  [N] upsert محلي مجمّع: كل دفعة سحب = executemany واحد لـ
+      INSERT ... ON CONFLICT(server_id) DO UPDATE ... WHERE الأحدث فقط
+      (يتطلب unique index على server_id — bootstrap يضمنه)
+  [O] journal للجداول المرجعية: triggers تسجّل التغييرات في op_log —
+      push_ref يرفع الصفوف المسجَّلة فقط، والرفع الكامل يتم مرة أولى
+      ثم عند الطلب فقط (request_full_reconcile / sync_now(full=True))
+  [P] HTTP keep-alive + gzip في SupabaseClient — client واحد مشترك بين
+      الدورات، وقياسات الطلبات (client.metrics) في SyncResult.http
+  [Q] cursors في الذاكرة: كل cursors المكتب تُقرأ بـ SELECT واحد عند بدء
+      الدورة، والتحديثات تُكتب دفعة واحدة (executemany) عند checkpoint
+      وفي نهاية الدورة — _set_cursor يُستدعى دائماً بعد commit البيانات،
+      لذا الـ cursor المحفوظ لا يسبق البيانات المطبَّقة أبداً
+  [R] outbox للجداول ثنائية الاتجاه: نفس triggers الـ journal [O] على
+      OUTBOX_TABLES — بعد مرور cursor كامل واحد يُرفع من op_log فقط،
+      القيود المتعددة لنفس الصف تُضغط لقيد واحد (_journal_compact)،
+      والحذف يُرفع في phase مستقلة (push_del) بترتيب FK معكوس
 """
 from __future__ import annotations
 
+import json
 import logging
 import threading
 import time
 import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from sqlalchemy import text
 
 from database.models import get_session_local
+from database.models.sync_models import (
+    GLOBAL_LOCAL_ONLY_COLUMNS, JOURNALED_TABLES, LOCAL_ONLY_COLUMNS, OUTBOX_TABLES,
+    journal_trigger_name,
+)
 from services.supabase_client import SupabaseClient, SupabaseError, get_supabase_client
+from services.sync_scheduler import SyncScheduler, SyncStep, build_sync_plan
 
 logger = logging.getLogger(__name__)
 
@@ -52,40 +82,9 @@ def _local(remote_table: str) -> str:
 # [A] أعمدة موجودة في SQLite فقط — لا تُرسل لـ Supabase أبداً
 # ─────────────────────────────────────────────────────────
 
-# أعمدة مشتركة بين كل الجداول (قديمة/محلية)
-_GLOBAL_LOCAL_ONLY: set = {
-    "synced_at",      # عمود قديم من نسخة سابقة
-}
-
-# أعمدة خاصة بجداول محددة — موجودة في SQLite لكن ليست في Supabase schema
-_LOCAL_ONLY_COLS: Dict[str, set] = {
-    "documents": {
-        "template_id", "totals_json", "totals_text", "data_json",
-        "status", "file_path",
-    },
-    "container_tracking": {
-        "booking_no", "container_no", "vessel_name", "voyage_no",
-        "port_of_loading", "final_destination",
-        "atd", "ata", "customs_date", "delivery_date",
-    },
-    "delivery_methods": {
-        "code",
-    },
-    "pricing_types": {
-        "compute_by", "price_unit", "divisor", "sort_order",
-    },
-    "roles": {
-        "label_ar", "label_en", "label_tr",
-    },
-    "users": {
-        "created_by", "updated_by",
-    },
-    "companies": {
-        # [J2] stamp_image موجود في SQLite — لم يُطبَّق migration في Supabase بعد
-        "stamp_image",
-    },
-
-}
+# التعريف في sync_models — bootstrap يستثنيها من trigger تحديث op_log
+_GLOBAL_LOCAL_ONLY: set = GLOBAL_LOCAL_ONLY_COLUMNS
+_LOCAL_ONLY_COLS: Dict[str, set] = LOCAL_ONLY_COLUMNS
 
 # أعمدة موجودة في Supabase فقط — لا تُكتب في SQLite
 _REMOTE_ONLY_COLS: Dict[str, set] = {
@@ -186,6 +185,9 @@ PUSH_ONLY_TABLES: List[str] = [
     "audit_log",
 ]
 
+# [R] جداول يُرفع حذفها من op_log — الجاهزة فقط (triggers موجودة) تعمل فعلياً
+PUSH_DELETE_TABLES: List[str] = list(dict.fromkeys(JOURNALED_TABLES + OUTBOX_TABLES))
+
 PULL_ONLY_TABLES: List[str] = [
     "offices",
     "countries",
@@ -200,6 +202,18 @@ PULL_ONLY_TABLES: List[str] = [
     "roles",
 ]
 
+# has_office لكل جدول في TWO_WAY_TABLES — PUSH_ONLY_TABLES بدون office filter
+_TWO_WAY_HAS_OFFICE: Dict[str, bool] = dict(TWO_WAY_TABLES)
+
+# نصوص رسائل الخطأ لكل phase (نفس صيغة الرسائل السابقة)
+_STEP_LABELS: Dict[str, str] = {
+    "push_ref": "push ref",
+    "push":     "push",
+    "push_del": "push delete",
+    "pull":     "pull",
+    "pull_ref": "pull ref",
+}
+
 # ─────────────────────────────────────────────────────────
 # جداول بدون updated_at في Supabase
 # ─────────────────────────────────────────────────────────
@@ -211,6 +225,9 @@ _TABLES_NO_UPDATED_AT_REMOTE: set = {
     "transaction_entries",
 }
 
+# حد الدفعة الواحدة لجداول بلا updated_at ولا id (لا يمكن ترقيمها بترتيب ثابت)
+_NO_CURSOR_CAP = 1000
+
 _TABLES_NO_ID: set = {
     "role_permissions",
     "transaction_entries",
@@ -247,6 +264,37 @@ _TABLES_WITH_UPDATED_AT: set = {
 
 _EPOCH = "1970-01-01T00:00:00+00:00"
 
+# ─────────────────────────────────────────────────────────
+# [R] ضغط op_log لكل جدول قبل الرفع
+#   1) create/update يليه أي قيد أحدث لنفس الصف → يُحذف
+#      (الرفع يقرأ الحالة الحالية للصف، والحذف اللاحق يلغيه)
+#   2) delete بدون server_id → الصف لم يصل للسيرفر قط، لا شيء للحذف
+# ─────────────────────────────────────────────────────────
+_COMPACT_SQL: Tuple[str, ...] = (
+    """
+    DELETE FROM op_log
+     WHERE entity_name = :t AND status = 'pending' AND op IN ('create', 'update')
+       AND EXISTS (SELECT 1 FROM op_log n
+                    WHERE n.entity_name = op_log.entity_name
+                      AND n.entity_id   = op_log.entity_id
+                      AND n.id > op_log.id AND n.status = 'pending')
+    """,
+    """
+    DELETE FROM op_log
+     WHERE entity_name = :t AND status = 'pending' AND op = 'delete'
+       AND json_extract(payload_json, '$.server_id') IS NULL
+    """,
+)
+
+# ─────────────────────────────────────────────────────────
+# [M] حجم الدفعة التكيّفي — يتضاعف إذا كانت الاستجابة سريعة
+# ويتنصّف إذا تجاوزت ضعف الزمن المستهدف
+# ─────────────────────────────────────────────────────────
+_BATCH_MIN            = 100
+_BATCH_INITIAL        = 500
+_BATCH_MAX            = 2000
+_BATCH_TARGET_SECONDS = 2.0
+
 # ─────────────────────────────────────────────────────────
 # on_conflict column لكل جدول في Supabase
 # ─────────────────────────────────────────────────────────
@@ -359,6 +407,20 @@ def _cursor_col(local_table: str) -> str:
     return _CURSOR_COLUMN.get(local_table, "updated_at")
 
 
+# ─────────────────────────────────────────────────────────
+# SyncProgress  [M]
+# ─────────────────────────────────────────────────────────
+
+@dataclass
+class SyncProgress:
+    """حالة جدول أثناء التصريف — تُمرَّر لـ progress callback بعد كل دفعة."""
+    phase:      str                     # push_ref | push | pull | pull_ref
+    table:      str
+    done:       int                     # صفوف هذه الدورة حتى الآن
+    remaining:  Optional[int] = None    # push فقط (COUNT محلي) — None إن لم يُعرف
+    batch_size: int = 0
+
+
 # ─────────────────────────────────────────────────────────
 # SyncResult
 # ─────────────────────────────────────────────────────────
@@ -371,6 +433,11 @@ class SyncResult:
         self.is_offline: bool           = False
         self.started_at  = _now_iso()
         self.finished_at: Optional[str] = None
+        # [L] "phase:table" → ثوانٍ — يُملأ من SyncScheduler
+        self.timings:    Dict[str, float] = {}
+        self.elapsed:    float            = 0.0
+        # [P] ملخّص طلبات HTTP للدورة — SupabaseClient.metrics()
+        self.http:       Dict[str, Any]   = {}
 
     @property
     def success(self) -> bool:
@@ -387,6 +454,21 @@ class SyncResult:
     def finish(self):
         self.finished_at = _now_iso()
 
+    def timing_report(self, top: int = 10) -> str:
+        """أبطأ الخطوات — للـ log وتشخيص بطء المزامنة."""
+        slow = sorted(self.timings.items(), key=lambda kv: kv[1], reverse=True)[:top]
+        lines = [f"sync elapsed {self.elapsed:.2f}s (steps={len(self.timings)}, "
+                 f"serial={sum(self.timings.values()):.2f}s)"]
+        lines += [f"  {k:<32} {v:6.2f}s" for k, v in slow]
+        if self.http.get("requests"):
+            h = self.http
+            lines.append(
+                f"http requests={h['requests']} time={h['seconds']:.2f}s "
+                f"out={h['bytes_out'] / 1024:.1f}KB in={h['bytes_in'] / 1024:.1f}KB "
+                f"reused={h['reused_ratio']:.0%}"
+            )
+        return "\n".join(lines)
+
     def summary(self) -> str:
         if self.is_offline:
             return "لا يوجد اتصال بالإنترنت — سيتم المحاولة لاحقاً"
@@ -405,18 +487,41 @@ class SyncResult:
 
 class SyncService:
     _RETRY_DELAYS = [10, 30, 60]
+    # [L] عدد الطلبات المتزامنة لـ Supabase — SQLite يكتب بالتسلسل (busy_timeout)
+    _MAX_WORKERS  = 4
+    # [M] أقصى زمن (ثانية) لتصريف الـ backlog في دورة واحدة — الباقي للدورة التالية
+    _DRAIN_BUDGET = 120
+    # [Q] أقصى مدة (ثانية) تبقى فيها تحديثات الـ cursors في الذاكرة قبل الكتابة
+    _CURSOR_CHECKPOINT = 15.0
 
     def __init__(self):
         self._lock       = threading.Lock()
+        self._col_cache: Dict[str, set] = {}
+        self._sid_unique: Dict[str, bool] = {}
+        self._upsert_sql: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+        self._batch_sizes: Dict[str, int] = {}
+        self._deadline:  Optional[float] = None
+        self._progress:  Optional[Callable[[SyncProgress], None]] = None
+        self._journal:   Dict[str, bool] = {}
+        self._force_full = False
+        self._full_tables: set = set()
+        self._cursor_lock  = threading.Lock()
+        self._cursors:      Optional[Dict[str, str]] = None
+        self._cursor_dirty: Dict[str, str] = {}
+        self._cursor_office: Optional[int] = None
+        self._cursor_flushed = 0.0
         self._running    = False
         self._timer:    Optional[threading.Timer] = None
         self._office_id: Optional[int] = None
         self._interval   = 5 * 60
         self._consecutive_failures = 0
 
-    def configure(self, office_id: int, interval_seconds: int = 300):
+    def configure(self, office_id: int, interval_seconds: int = 300,
+                  drain_budget: Optional[int] = None):
         self._office_id = _to_int(office_id)
         self._interval  = interval_seconds
+        if drain_budget is not None:
+            self._DRAIN_BUDGET = drain_budget
 
     # ── Public API ────────────────────────────────────────
 
@@ -446,15 +551,57 @@ class SyncService:
             self._timer = None
         logger.info("Sync: auto-sync stopped")
 
-    def sync_now(self, callback=None) -> None:
+    def request_full_reconcile(self) -> None:
+        """[O] الدورة التالية ترفع الجداول المرجعية كاملة بدل الـ journal."""
+        self._force_full = True
+
+    def discard_journal(self) -> int:
+        """
+        بلا بيانات اتصال لا دورة (تلقائية أو يدوية) تستهلك op_log → يُفرَّغ
+        بدل أن يكبر بلا حد.
+        cursors الـ outbox_* / full_* تُعاد للـ epoch → أول دورة بعد التفعيل
+        ترفع بالـ cursor (push_{table}) ما تغيّر منذ آخر رفع ومطابقة كاملة
+        للجداول المرجعية، ثم تعود للـ journal. يُرجع عدد القيود المحذوفة.
+        """
+        if self._running or self.is_enabled():
+            return 0
+        try:
+            SessionLocal = get_session_local()
+            with SessionLocal() as s:
+                removed = s.execute(text("DELETE FROM op_log")).rowcount or 0
+                s.execute(text(
+                    "DELETE FROM local_sync_cursors"
+                    " WHERE table_name LIKE 'outbox\\_%' ESCAPE '\\'"
+                    "    OR table_name LIKE 'full\\_%' ESCAPE '\\'"
+                ))
+                s.commit()
+        except Exception as e:
+            logger.warning("Sync: op_log discard failed: %s", e)
+            return 0
+        with self._cursor_lock:
+            self._cursors = None
+            self._cursor_dirty = {}
+            self._cursor_office = None
+        if removed:
+            logger.info("Sync: not configured — discarded %d op_log entries", removed)
+        return removed
+
+    def sync_now(self, callback=None, progress=None, full: bool = False) -> None:
+        """
+        progress(SyncProgress) يُستدعى من threads المزامنة بعد كل دفعة —
+        على الواجهة تمريره لـ thread الـ UI (QTimer.singleShot).
+        full=True: مطابقة كاملة للجداول المرجعية (انظر request_full_reconcile).
+        """
         if not self.is_enabled():
             return
         if self._running:
             logger.warning("Sync: already running — skipped")
             return
+        if full:
+            self.request_full_reconcile()
 
         def _run():
-            result = self._do_sync()
+            result = self._do_sync(progress=progress)
             if callback:
                 try:
                     callback(result)
@@ -485,7 +632,7 @@ class SyncService:
 
     # ── Core sync ─────────────────────────────────────────
 
-    def _do_sync(self) -> SyncResult:
+    def _do_sync(self, progress: Optional[Callable[[SyncProgress], None]] = None) -> SyncResult:
         result = SyncResult()
 
         with self._lock:
@@ -493,7 +640,13 @@ class SyncService:
                 result.errors.append("sync already in progress")
                 return result
             self._running = True
+        self._progress = progress
+        self._deadline = time.monotonic() + self._DRAIN_BUDGET
+        force_full, self._force_full = self._force_full, False
+        self._full_tables = set(JOURNALED_TABLES) if force_full else set()
 
+        http_t0 = time.monotonic()
+        client: Optional[SupabaseClient] = None
         try:
             client = get_supabase_client()
             if not client:
@@ -511,83 +664,56 @@ class SyncService:
                 return result
 
             client.office_id = office_id
-
-            # ── Push ──────────────────────────────────────
-            for local_tbl in PUSH_REF_ORDER:
-                try:
-                    n = self._push_ref_table(client, office_id, local_tbl)
-                    if n:
-                        result.pushed[local_tbl] = n
-                except (OSError, TimeoutError):
-                    result.is_offline = True
-                    return result
-                except Exception as e:
-                    logger.error("Sync: push ref %s: %s", local_tbl, e)
-                    result.errors.append(f"push ref {local_tbl}: {e}")
-
-            for local_tbl, has_office in TWO_WAY_TABLES:
-                try:
-                    n = self._push_table(client, office_id, local_tbl, has_office)
-                    if n:
-                        result.pushed[local_tbl] = n
-                except (OSError, TimeoutError):
-                    result.is_offline = True
-                    return result
-                except Exception as e:
-                    msg = f"push {local_tbl}: {e}"
-                    logger.error("Sync: %s", msg)
-                    result.errors.append(msg)
-
-            for local_tbl in PUSH_ONLY_TABLES:
-                try:
-                    n = self._push_table(client, office_id, local_tbl, False)
-                    if n:
-                        result.pushed[local_tbl] = n
-                except (OSError, TimeoutError):
-                    result.is_offline = True
-                    return result
-                except Exception as e:
-                    msg = f"push {local_tbl}: {e}"
-                    logger.error("Sync: %s", msg)
-                    result.errors.append(msg)
-
-            # ── Pull ──────────────────────────────────────
-            for local_tbl, _ in TWO_WAY_TABLES:
-                try:
-                    n = self._pull_table(client, office_id, local_tbl)
-                    if n:
-                        result.pulled[local_tbl] = n
-                except (OSError, TimeoutError):
-                    result.is_offline = True
-                    return result
-                except Exception as e:
-                    msg = f"pull {local_tbl}: {e}"
+            self._load_cursors(office_id)
+
+            # ── Push + Pull (FK dependency graph) ─────────
+            plan = build_sync_plan(
+                push_ref=PUSH_REF_ORDER,
+                push=[t for t, _ in TWO_WAY_TABLES] + PUSH_ONLY_TABLES,
+                pull=[t for t, _ in TWO_WAY_TABLES],
+                pull_ref=PULL_ONLY_TABLES,
+                push_del=PUSH_DELETE_TABLES,
+            )
+            scheduler = SyncScheduler(max_workers=self._MAX_WORKERS)
+            t0 = time.perf_counter()
+            outcomes = scheduler.run(plan, lambda st: self._run_step(client, office_id, st))
+            result.elapsed = time.perf_counter() - t0
+            result.http = client.metrics(since=http_t0)
+
+            for step in plan:
+                out = outcomes.get(step.key)
+                if out is None:
+                    continue
+                result.timings[step.key] = out.duration
+                if out.error is None:
+                    if out.value:
+                        bucket = result.pushed if step.phase.startswith("push") else result.pulled
+                        bucket[step.table] = bucket.get(step.table, 0) + out.value
+                elif not isinstance(out.error, scheduler.abort_on):
+                    msg = f"{_STEP_LABELS[step.phase]} {step.table}: {out.error}"
                     logger.error("Sync: %s", msg)
                     result.errors.append(msg)
 
-            for local_tbl in PULL_ONLY_TABLES:
-                try:
-                    n = self._pull_table(client, office_id, local_tbl)
-                    if n:
-                        result.pulled[local_tbl] = n
-                except (OSError, TimeoutError):
-                    result.is_offline = True
-                    return result
-                except Exception as e:
-                    msg = f"pull ref {local_tbl}: {e}"
-                    logger.error("Sync: %s", msg)
-                    result.errors.append(msg)
+            if scheduler.aborted:
+                result.is_offline = True
+                return result
 
             logger.info(
                 "Sync complete: pushed=%d pulled=%d errors=%d",
                 result.total_pushed, result.total_pulled, len(result.errors),
             )
+            logger.debug("Sync timings:\n%s", result.timing_report())
 
         except Exception as e:
             logger.exception("Sync: unexpected error")
             result.errors.append(str(e))
         finally:
+            if client is not None and not result.http:
+                result.http = client.metrics(since=http_t0)
+            self._release_cursors()
             result.finish()
+            self._progress = None
+            self._deadline = None
             self._running = False
 
         try:
@@ -606,67 +732,176 @@ class SyncService:
 
         return result
 
+    def _run_step(self, client: SupabaseClient, office_id: int, step: SyncStep) -> int:
+        """ينفّذ خطوة واحدة من الخطة — يُستدعى من threads الـ scheduler."""
+        if step.phase == "push_ref":
+            return self._push_ref_table(client, office_id, step.table)
+        if step.phase == "push":
+            return self._push_table(client, office_id, step.table,
+                                    _TWO_WAY_HAS_OFFICE.get(step.table, False))
+        if step.phase == "push_del":
+            return self._push_deletes(client, step.table)
+        return self._pull_table(client, office_id, step.table, phase=step.phase)
+
+    # ── Drain loop  [M] ───────────────────────────────────
+
+    def _drain(
+        self,
+        phase: str,
+        table: str,
+        run_batch: Callable[[int], Tuple[int, int]],
+        remaining: Optional[Callable[[], int]] = None,
+    ) -> int:
+        """
+        يكرّر run_batch(limit) حتى تعود دفعة ناقصة أو تنتهي الميزانية.
+        run_batch → (صفوف مُحضَرة، صفوف محسوبة في النتيجة).
+        """
+        key   = f"{phase}:{table}"
+        total = 0
+        while True:
+            size = self._batch_sizes.get(key, _BATCH_INITIAL)
+            t0 = time.perf_counter()
+            fetched, counted = run_batch(size)
+            self._tune_batch(key, size, fetched, time.perf_counter() - t0)
+            total += counted
+            if fetched:
+                self._report_progress(SyncProgress(phase, table, total, None, size), remaining)
+            if fetched < size:
+                return total
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                logger.info("Sync %s: time budget exhausted — backlog continues next cycle", key)
+                return total
+
+    def _tune_batch(self, key: str, size: int, fetched: int, seconds: float) -> None:
+        if fetched < size:
+            return   # دفعة ناقصة لا تمثّل زمن دفعة كاملة
+        if seconds < _BATCH_TARGET_SECONDS / 2:
+            size = min(_BATCH_MAX, size * 2)
+        elif seconds > _BATCH_TARGET_SECONDS * 2:
+            size = max(_BATCH_MIN, size // 2)
+        self._batch_sizes[key] = size
+
+    def _report_progress(self, progress: SyncProgress,
+                         remaining: Optional[Callable[[], int]] = None) -> None:
+        cb = self._progress
+        if cb is None:
+            return
+        try:
+            if remaining is not None:
+                progress.remaining = remaining()
+            cb(progress)
+        except Exception as e:
+            logger.debug("Sync progress callback error: %s", e)
+
+    def _count_pending(self, local_table: str, cursor_col: str,
+                       where_extra: str = "", params: Optional[Dict[str, Any]] = None,
+                       direction_key: Optional[str] = None, office_id: Optional[int] = None) -> int:
+        """عدد الصفوف المتبقية للرفع بعد الـ cursor الحالي (للتقدّم فقط)."""
+        cursor = self._get_cursor(office_id, direction_key) if direction_key else _EPOCH
+        SessionLocal = get_session_local()
+        with SessionLocal() as s:
+            return int(s.execute(
+                text(f"SELECT COUNT(*) FROM [{local_table}] WHERE {cursor_col} > :cursor{where_extra}"),
+                {**(params or {}), "cursor": cursor},
+            ).scalar() or 0)
+
     # ── Push refs ─────────────────────────────────────────
 
+    # [I] entries و transactions أُزيلا — ALWAYS_FULL للجداول المرجعية فقط
+    _ALWAYS_FULL: set = {
+        "countries", "currencies", "material_types", "packaging_types",
+        "delivery_methods", "pricing_types", "document_types", "roles",
+        "permissions", "company_roles", "offices", "materials",
+        "clients", "companies",
+    }
+
     def _push_ref_table(self, client: SupabaseClient, office_id: int, local_table: str) -> int:
+        # cursor  — updated_at > cursor
+        # journal — [O] الصفوف المسجَّلة في op_log فقط
+        # full    — الجدول كاملاً صفحة بعد صفحة على rowid
+        if local_table not in self._ALWAYS_FULL and local_table in _TABLES_WITH_UPDATED_AT:
+            mode = "cursor"
+        elif self._journal_ready(local_table) and not self._full_due(office_id, local_table):
+            mode = "journal"
+        else:
+            mode = "full"
+        state: Dict[str, Any] = {"after": 0, "complete": False}
+        if mode == "journal":
+            self._journal_compact(local_table)
+        if mode == "full" and self._journal_ready(local_table):
+            state["journal_mark"] = self._journal_mark()
+
+        def remaining() -> int:
+            if mode == "journal":
+                return self._journal_pending(local_table)
+            return self._count_pending(local_table, "updated_at",
+                                       direction_key=f"push_{local_table}",
+                                       office_id=office_id)
+
+        total = self._drain(
+            "push_ref", local_table,
+            lambda limit: self._push_ref_batch(client, office_id, local_table,
+                                               limit, mode, state),
+            remaining if mode != "full" else None,
+        )
+        if mode == "full" and state["complete"] and "journal_mark" in state:
+            # الجدول كله على السيرفر الآن — قيود الـ journal السابقة للمرور لا حاجة لها
+            self._journal_consume(local_table, upto=state["journal_mark"])
+            self._set_cursor(office_id, f"full_{local_table}", _now_iso())
+            logger.info("Sync: full reconcile of %s done (%d rows)", local_table, total)
+        return total
+
+    def _push_ref_batch(
+        self,
+        client: SupabaseClient,
+        office_id: int,
+        local_table: str,
+        limit: int,
+        mode: str,
+        state: Dict[str, Any],
+    ) -> Tuple[int, int]:
         remote_table   = _remote(local_table)
-        has_updated_at = local_table in _TABLES_WITH_UPDATED_AT
         has_server_id  = local_table in _TABLES_WITH_SERVER_ID
-
-        # [I] entries و transactions أُزيلا — ALWAYS_FULL للجداول المرجعية فقط
-        ALWAYS_FULL: set = {
-            "countries", "currencies", "material_types", "packaging_types",
-            "delivery_methods", "pricing_types", "document_types", "roles",
-            "permissions", "company_roles", "offices", "materials",
-            "clients", "companies",
-        }
+        use_cursor     = mode == "cursor"
+        op_ids: List[int] = []
 
         SessionLocal = get_session_local()
         with SessionLocal() as s:
-            if local_table in ALWAYS_FULL:
-                cursor = None
-                rows = s.execute(
-                    text(f"SELECT * FROM [{local_table}] LIMIT 1000"),
-                ).mappings().all()
-            elif has_updated_at:
+            if mode == "journal":
+                op_ids, rows = self._journal_batch(s, local_table, state, limit)
+                if not op_ids:
+                    return 0, 0
+                if not rows:
+                    # كل الصفوف حُذفت منذ تسجيلها — لا شيء للرفع
+                    self._journal_consume(local_table, ids=op_ids)
+                    return len(op_ids), 0
+            elif use_cursor:
                 cursor = self._get_cursor(office_id, f"push_{local_table}")
                 rows = s.execute(
                     text(f"SELECT * FROM [{local_table}] WHERE updated_at > :cursor"
-                         f" ORDER BY updated_at LIMIT 500"),
-                    {"cursor": cursor},
+                         f" ORDER BY updated_at LIMIT :lim"),
+                    {"cursor": cursor, "lim": limit},
                 ).mappings().all()
             else:
-                cursor = None
                 rows = s.execute(
-                    text(f"SELECT * FROM [{local_table}] LIMIT 500"),
+                    text(f"SELECT rowid AS _sync_rowid, * FROM [{local_table}]"
+                         f" WHERE rowid > :after ORDER BY rowid LIMIT :lim"),
+                    {"after": state["after"], "lim": limit},
                 ).mappings().all()
 
         if not rows:
-            return 0
+            state["complete"] = True
+            return 0, 0
 
         dicts = [_row_to_dict(r) for r in rows]
+        if mode == "full":
+            state["after"] = dicts[-1]["_sync_rowid"]
+            state["complete"] = len(rows) < limit
+            for d in dicts:
+                d.pop("_sync_rowid", None)
 
         if has_server_id and local_table not in _TABLES_NO_ID:
-            rows_need_sid = [d for d in dicts if not d.get("server_id")]
-            if rows_need_sid:
-                try:
-                    SL2 = get_session_local()
-                    with SL2() as s2:
-                        for d in rows_need_sid:
-                            row_id = d.get("id")
-                            if not row_id:
-                                continue
-                            new_sid = str(uuid.uuid4())
-                            s2.execute(
-                                text(f"UPDATE [{local_table}] SET server_id = :sid WHERE id = :id"),
-                                {"sid": new_sid, "id": row_id},
-                            )
-                            d["server_id"] = new_sid
-                        s2.commit()
-                except Exception as e:
-                    logger.warning("Sync: server_id not in SQLite for %s: %s", local_table, e)
-                    for d in rows_need_sid:
-                        d.pop("server_id", None)
+            self._assign_server_ids(local_table, dicts)
 
         conflict_col = _conflict_col(local_table)
 
@@ -712,17 +947,172 @@ class SyncService:
 
             remote_dicts.append(mapped)
 
-        if not remote_dicts:
-            return 0
+        if remote_dicts:
+            client.upsert(remote_table, remote_dicts, on_conflict=conflict_col)
 
-        client.upsert(remote_table, remote_dicts, on_conflict=conflict_col)
-
-        if has_updated_at and cursor is not None:
+        # الـ cursor يتقدّم حتى لو لم يكن في الدفعة صف قابل للإرسال —
+        # وإلا تعلق حلقة التصريف على نفس الدفعة
+        if use_cursor:
             latest = max(str(d.get("updated_at", _EPOCH)) for d in dicts)
             self._set_cursor(office_id, f"push_{local_table}", latest)
+        if op_ids:
+            self._journal_consume(local_table, ids=op_ids)
+
+        if not remote_dicts:
+            return (len(op_ids) or len(rows)), 0
 
         logger.debug("Sync push_ref %s→%s: %d rows", local_table, remote_table, len(dicts))
-        return len(dicts)
+        return (len(op_ids) or len(rows)), len(dicts)
+
+    def _assign_server_ids(self, local_table: str, dicts: List[Dict[str, Any]]) -> None:
+        """يولّد server_id للصفوف التي تفتقده ويحفظه محلياً قبل الرفع."""
+        rows_need_sid = [d for d in dicts if not d.get("server_id")]
+        if not rows_need_sid:
+            return
+        try:
+            SessionLocal = get_session_local()
+            with SessionLocal() as s2:
+                with self._journal_muted(s2, local_table):
+                    for d in rows_need_sid:
+                        row_id = d.get("id")
+                        if not row_id:
+                            continue
+                        new_sid = str(uuid.uuid4())
+                        s2.execute(
+                            text(f"UPDATE [{local_table}] SET server_id = :sid WHERE id = :id"),
+                            {"sid": new_sid, "id": row_id},
+                        )
+                        d["server_id"] = new_sid
+                s2.commit()
+        except Exception as e:
+            logger.warning("Sync: server_id not in SQLite for %s: %s", local_table, e)
+            for d in rows_need_sid:
+                d.pop("server_id", None)
+
+    # ── Change journal (op_log)  [O] ──────────────────────
+
+    def _journal_ready(self, local_table: str) -> bool:
+        """هل triggers الـ journal مُنشأة لهذا الجدول؟ (bootstrap SYNC-5)."""
+        if local_table not in JOURNALED_TABLES and local_table not in OUTBOX_TABLES:
+            return False
+        if local_table not in self._journal:
+            try:
+                SessionLocal = get_session_local()
+                with SessionLocal() as s:
+                    found = s.execute(
+                        text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'"
+                             " AND name IN (:i, :u, :d)"),
+                        {"i": journal_trigger_name(local_table, "ins"),
+                         "u": journal_trigger_name(local_table, "upd"),
+                         "d": journal_trigger_name(local_table, "del")},
+                    ).scalar()
+                self._journal[local_table] = found == 3
+            except Exception:
+                self._journal[local_table] = False
+        return self._journal[local_table]
+
+    def _full_due(self, office_id: int, local_table: str) -> bool:
+        """الرفع الكامل مطلوب: عند الطلب أو إذا لم يتم قط لهذا المكتب."""
+        if local_table in self._full_tables:
+            return True
+        return self._get_cursor(office_id, f"full_{local_table}") == _EPOCH
+
+    def _journal_batch(
+        self,
+        s,
+        local_table: str,
+        state: Dict[str, Any],
+        limit: int,
+        where: str = "",
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[int], list]:
+        """الدفعة التالية من قيود create/update → (op ids، الصفوف الحالية)."""
+        ops = s.execute(
+            text("SELECT id, entity_id FROM op_log"
+                 " WHERE entity_name = :t AND status = 'pending'"
+                 " AND op IN ('create', 'update') AND id > :after"
+                 " ORDER BY id LIMIT :lim"),
+            {"t": local_table, "after": state["after"], "lim": limit},
+        ).fetchall()
+        if not ops:
+            return [], []
+        op_ids = [int(o[0]) for o in ops]
+        state["after"] = op_ids[-1]
+        entity_ids = sorted({int(o[1]) for o in ops if o[1] is not None})
+        rows = s.execute(
+            text(f"SELECT * FROM [{local_table}]"
+                 f" WHERE id IN ({', '.join(str(i) for i in entity_ids) or 'NULL'}){where}"),
+            params or {},
+        ).mappings().all()
+        return op_ids, rows
+
+    def _journal_compact(self, local_table: str) -> int:
+        """[R] يضغط قيود الصف الواحد (انظر _COMPACT_SQL) — يُرجع عدد القيود المحذوفة."""
+        removed = 0
+        try:
+            SessionLocal = get_session_local()
+            with SessionLocal() as s:
+                for sql in _COMPACT_SQL:
+                    removed += s.execute(text(sql), {"t": local_table}).rowcount or 0
+                s.commit()
+        except Exception as e:
+            logger.warning("Sync: op_log compaction for %s failed: %s", local_table, e)
+        if removed:
+            logger.debug("Sync: op_log %s compacted (%d entries)", local_table, removed)
+        return removed
+
+    def _journal_mark(self) -> int:
+        SessionLocal = get_session_local()
+        with SessionLocal() as s:
+            return int(s.execute(text("SELECT COALESCE(MAX(id), 0) FROM op_log")).scalar() or 0)
+
+    def _journal_pending(self, local_table: str,
+                         ops: Tuple[str, ...] = ("create", "update")) -> int:
+        SessionLocal = get_session_local()
+        with SessionLocal() as s:
+            return int(s.execute(
+                text(f"SELECT COUNT(*) FROM op_log WHERE entity_name = :t"
+                     f" AND status = 'pending' AND op IN ({', '.join(repr(o) for o in ops)})"),
+                {"t": local_table},
+            ).scalar() or 0)
+
+    def _journal_consume(self, local_table: str, ids: Optional[List[int]] = None,
+                         upto: Optional[int] = None) -> None:
+        """
+        يحذف القيود المرفوعة: ids — قيود بعينها (أي op)،
+        upto — create/update حتى العلامة (قيود delete تنتظر push_del).
+        """
+        SessionLocal = get_session_local()
+        with SessionLocal() as s:
+            if ids:
+                s.execute(
+                    text(f"DELETE FROM op_log WHERE id IN ({', '.join(str(int(i)) for i in ids)})"),
+                )
+            elif upto is not None:
+                s.execute(
+                    text("DELETE FROM op_log WHERE entity_name = :t AND id <= :m"
+                         " AND op IN ('create', 'update')"),
+                    {"t": local_table, "m": upto},
+                )
+            s.commit()
+
+    @contextmanager
+    def _journal_muted(self, s, local_table: str):
+        """
+        كتابات المزامنة نفسها (سحب، توليد server_id) لا تُسجَّل في الـ journal —
+        وإلا عادت للسيرفر في الدورة التالية. الحذف داخل نفس الـ transaction.
+        """
+        if not self._journal_ready(local_table):
+            yield
+            return
+        # عبارة كتابة فارغة تأخذ قفل الكتابة أولاً → لا كاتب آخر بين العلامة والحذف
+        s.execute(text("DELETE FROM op_log WHERE 0"))
+        mark = s.execute(text("SELECT COALESCE(MAX(id), 0) FROM op_log")).scalar() or 0
+        yield
+        s.execute(
+            text("DELETE FROM op_log WHERE id > :m AND entity_name = :t"),
+            {"m": mark, "t": local_table},
+        )
 
     # ── Push — local → server ─────────────────────────────
 
@@ -738,50 +1128,84 @@ class SyncService:
         if local_table not in _TABLES_WITH_UPDATED_AT:
             return 0
 
+        # cursor  — updated_at > cursor (قبل أول مرور كامل أو بدون triggers)
+        # journal — [R] قيود op_log فقط (outbox_{table} = تم مرور cursor كامل
+        #           بعد تفعيل الـ triggers → كل تغيير لاحق مسجَّل)
+        state: Dict[str, Any] = {"after": 0, "complete": False}
+        mode = "cursor"
+        if self._journal_ready(local_table):
+            self._journal_compact(local_table)
+            if self._get_cursor(office_id, f"outbox_{local_table}") != _EPOCH:
+                mode = "journal"
+            else:
+                state["journal_mark"] = self._journal_mark()
+
+        office_where = " AND (office_id = :oid OR office_id IS NULL)" if has_office else ""
+        office_params = {"oid": office_id} if has_office else {}
+
+        def remaining() -> int:
+            if mode == "journal":
+                return self._journal_pending(local_table)
+            return self._count_pending(local_table, _cursor_col(local_table),
+                                       office_where, office_params,
+                                       f"push_{local_table}", office_id)
+
+        total = self._drain(
+            "push", local_table,
+            lambda limit: self._push_batch(client, office_id, local_table, has_office,
+                                           limit, mode, state),
+            remaining,
+        )
+        if mode == "cursor" and state["complete"] and "journal_mark" in state:
+            # ما سبق العلامة رُفع عبر الـ cursor — من الآن الـ outbox وحده يكفي
+            self._journal_consume(local_table, upto=state["journal_mark"])
+            self._set_cursor(office_id, f"outbox_{local_table}", _now_iso())
+            logger.info("Sync: %s switched to op_log outbox", local_table)
+        return total
+
+    def _push_batch(
+        self,
+        client: SupabaseClient,
+        office_id: int,
+        local_table: str,
+        has_office: bool,
+        limit: int,
+        mode: str = "cursor",
+        state: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[int, int]:
         remote_table = _remote(local_table)
         cursor_col   = _cursor_col(local_table)
-        cursor       = self._get_cursor(office_id, f"push_{local_table}")
+        state        = {"after": 0} if state is None else state
+        op_ids: List[int] = []
 
         SessionLocal = get_session_local()
         with SessionLocal() as s:
-            where  = f"{cursor_col} > :cursor"
-            params: Dict[str, Any] = {"cursor": cursor}
-            if has_office:
-                where += " AND (office_id = :oid OR office_id IS NULL)"
-                params["oid"] = office_id
-
-            rows = s.execute(
-                text(f"SELECT * FROM [{local_table}] WHERE {where}"
-                     f" ORDER BY {cursor_col} LIMIT 500"),
-                params,
-            ).mappings().all()
+            office_where = " AND (office_id = :oid OR office_id IS NULL)" if has_office else ""
+            office_params = {"oid": office_id} if has_office else {}
+            if mode == "journal":
+                op_ids, rows = self._journal_batch(s, local_table, state, limit,
+                                                   office_where, office_params)
+                if not op_ids:
+                    return 0, 0
+            else:
+                cursor = self._get_cursor(office_id, f"push_{local_table}")
+                rows = s.execute(
+                    text(f"SELECT * FROM [{local_table}] WHERE {cursor_col} > :cursor{office_where}"
+                         f" ORDER BY {cursor_col} LIMIT :lim"),
+                    {**office_params, "cursor": cursor, "lim": limit},
+                ).mappings().all()
+                state["complete"] = len(rows) < limit
 
         if not rows:
-            return 0
+            if op_ids:
+                # الصفوف حُذفت (أو لمكتب آخر) منذ تسجيلها
+                self._journal_consume(local_table, ids=op_ids)
+            return len(op_ids), 0
 
         dicts = [_row_to_dict(r) for r in rows]
 
         if local_table not in _TABLES_NO_ID:
-            rows_need_sid = [d for d in dicts if not d.get("server_id")]
-            if rows_need_sid:
-                try:
-                    SessionLocal2 = get_session_local()
-                    with SessionLocal2() as s2:
-                        for d in rows_need_sid:
-                            row_id = d.get("id")
-                            if not row_id:
-                                continue
-                            new_sid = str(uuid.uuid4())
-                            s2.execute(
-                                text(f"UPDATE [{local_table}] SET server_id = :sid WHERE id = :id"),
-                                {"sid": new_sid, "id": row_id},
-                            )
-                            d["server_id"] = new_sid
-                        s2.commit()
-                except Exception as e:
-                    logger.warning("Sync: server_id not in SQLite for %s: %s", local_table, e)
-                    for d in rows_need_sid:
-                        d.pop("server_id", None)
+            self._assign_server_ids(local_table, dicts)
 
         cc = _conflict_col(local_table)
         seen = set()
@@ -821,16 +1245,92 @@ class SyncService:
 
             remote_dicts.append(mapped)
 
+        if remote_dicts:
+            client.upsert(remote_table, remote_dicts, on_conflict=cc)
+
+        if mode == "cursor":
+            latest = max(str(d.get(cursor_col, _EPOCH)) for d in dicts)
+            self._set_cursor(office_id, f"push_{local_table}", latest)
+        if op_ids:
+            self._journal_consume(local_table, ids=op_ids)
+
         if not remote_dicts:
+            return (len(op_ids) or len(rows)), 0
+
+        logger.debug("Sync push %s→%s: %d rows", local_table, remote_table, len(dicts))
+        return (len(op_ids) or len(rows)), len(dicts)
+
+    # ── Push deletes — op_log → server  [R] ───────────────
+
+    def _push_deletes(self, client: SupabaseClient, local_table: str) -> int:
+        """يرفع قيود الحذف المسجَّلة (server_id في payload_json)."""
+        if not self._journal_ready(local_table):
             return 0
+        self._journal_compact(local_table)
+        state: Dict[str, Any] = {"after": 0}
+        return self._drain(
+            "push_del", local_table,
+            lambda limit: self._push_delete_batch(client, local_table, limit, state),
+            lambda: self._journal_pending(local_table, ops=("delete",)),
+        )
 
-        client.upsert(remote_table, remote_dicts, on_conflict=cc)
+    def _push_delete_batch(
+        self,
+        client: SupabaseClient,
+        local_table: str,
+        limit: int,
+        state: Dict[str, Any],
+    ) -> Tuple[int, int]:
+        SessionLocal = get_session_local()
+        with SessionLocal() as s:
+            ops = s.execute(
+                text("SELECT id, payload_json FROM op_log"
+                     " WHERE entity_name = :t AND status = 'pending' AND op = 'delete'"
+                     " AND id > :after ORDER BY id LIMIT :lim"),
+                {"t": local_table, "after": state["after"], "lim": limit},
+            ).fetchall()
+        if not ops:
+            return 0, 0
+        state["after"] = int(ops[-1][0])
+
+        op_sid: Dict[int, Optional[str]] = {}
+        for op_id, payload in ops:
+            try:
+                sid = json.loads(payload or "{}").get("server_id")
+            except (ValueError, AttributeError):
+                sid = None
+            op_sid[int(op_id)] = str(sid) if sid else None
+        sids = list(dict.fromkeys(v for v in op_sid.values() if v))
 
-        latest = max(str(d.get(cursor_col, _EPOCH)) for d in dicts)
-        self._set_cursor(office_id, f"push_{local_table}", latest)
+        remote_table = _remote(local_table)
+        rejected: set = set()
+        if sids:
+            try:
+                client.delete_many(remote_table, sids)
+            except SupabaseError as e:
+                # رفض دائم (FK/RLS) لصف واحد يُفشل الدفعة — نعزله صفاً صفاً
+                logger.warning("Sync push_del %s: bulk delete rejected (%s) — per row",
+                               local_table, e)
+                for sid in sids:
+                    try:
+                        client.delete(remote_table, sid)
+                    except SupabaseError as e1:
+                        logger.warning("Sync push_del %s: %s rejected: %s", local_table, sid, e1)
+                        rejected.add(sid)
+
+        failed = [i for i, sid in op_sid.items() if sid in rejected]
+        done   = [i for i, sid in op_sid.items() if sid not in rejected]
+        if failed:
+            # تبقى في op_log للمراجعة لكن لا تُعاد كل دورة
+            with SessionLocal() as s:
+                s.execute(text(f"UPDATE op_log SET status = 'failed'"
+                               f" WHERE id IN ({', '.join(str(i) for i in failed)})"))
+                s.commit()
+        if done:
+            self._journal_consume(local_table, ids=done)
 
-        logger.debug("Sync push %s→%s: %d rows", local_table, remote_table, len(dicts))
-        return len(dicts)
+        logger.debug("Sync push_del %s→%s: %d rows", local_table, remote_table, len(sids))
+        return len(ops), len(sids) - len(rejected)
 
     # ── Pull — server → local ─────────────────────────────
 
@@ -839,76 +1339,213 @@ class SyncService:
         client: SupabaseClient,
         office_id: int,
         local_table: str,
+        phase: str = "pull",
     ) -> int:
         remote_table = _remote(local_table)
 
         if remote_table in _TABLES_NO_UPDATED_AT_REMOTE or local_table in _TABLES_NO_UPDATED_AT_REMOTE:
-            return self._pull_table_no_cursor(client, local_table, remote_table)
-
-        cursor = self._get_cursor(office_id, f"pull_{local_table}")
+            return self._pull_table_no_cursor(client, office_id, local_table, remote_table, phase)
 
         try:
-            rows = client.select(
-                remote_table,
-                filters={"updated_at": f"gt.{cursor}"},
-                order="updated_at.asc",
-                limit=500,
+            return self._drain(
+                phase, local_table,
+                lambda limit: self._pull_batch(client, office_id, local_table, limit),
             )
         except SupabaseError as e:
             if e.status == 400 and "updated_at" in str(e.message):
                 logger.warning("Sync: %s has no updated_at in Supabase, fetching all", remote_table)
-                return self._pull_table_no_cursor(client, local_table, remote_table)
+                return self._pull_table_no_cursor(client, office_id, local_table, remote_table, phase)
             raise
 
+    def _pull_batch(
+        self,
+        client: SupabaseClient,
+        office_id: int,
+        local_table: str,
+        limit: int,
+    ) -> Tuple[int, int]:
+        remote_table = _remote(local_table)
+        cursor = self._get_cursor(office_id, f"pull_{local_table}")
+
+        rows = client.select(
+            remote_table,
+            filters={"updated_at": f"gt.{cursor}"},
+            order="updated_at.asc",
+            limit=limit,
+        )
+
         if not rows:
-            return 0
+            return 0, 0
 
         SessionLocal = get_session_local()
         with SessionLocal() as s:
-            for row in rows:
-                local_row = _apply_col_mapping_to_local(remote_table, row)
-                self._upsert_local(s, local_table, local_row)
-            s.commit()
+            self._upsert_local_many(
+                s, local_table, [_apply_col_mapping_to_local(remote_table, r) for r in rows])
+            self._commit_pulled(s, local_table)
 
         latest = max(r.get("updated_at", _EPOCH) for r in rows)
         self._set_cursor(office_id, f"pull_{local_table}", latest)
 
         logger.debug("Sync pull %s←%s: %d rows", local_table, remote_table, len(rows))
-        return len(rows)
+        return len(rows), len(rows)
 
     def _pull_table_no_cursor(
         self,
         client: SupabaseClient,
+        office_id: int,
         local_table: str,
         remote_table: str,
+        phase: str = "pull",
     ) -> int:
+        """
+        جداول بلا updated_at: صفحات مرتبة على id بعد آخر id مسحوب
+        (high-water mark في local_sync_cursors) — كل دورة تجلب الجديد فقط.
+        """
+        if local_table in _TABLES_NO_ID or remote_table in _TABLES_NO_ID:
+            # مفتاح مركّب بلا id — دفعة واحدة محدودة كما كان
+            return self._pull_no_cursor_capped(client, local_table, remote_table)
+
+        key = f"pull_{local_table}_id"
         try:
-            rows = client.select(remote_table, limit=1000)
+            last_id = int(self._get_cursor(office_id, key))
+        except (TypeError, ValueError):
+            last_id = 0      # _EPOCH: لم يُسحب شيء بعد
+
+        def _batch(limit: int) -> Tuple[int, int]:
+            nonlocal last_id
+            try:
+                rows = client.select(
+                    remote_table,
+                    filters={"id": f"gt.{last_id}"},
+                    order="id.asc",
+                    limit=limit,
+                )
+            except Exception as e:
+                logger.warning("Sync: pull_no_cursor %s failed: %s", remote_table, e)
+                return 0, 0
+            if not rows:
+                return 0, 0
+            counted = self._pull_no_cursor_apply(local_table, remote_table, rows)
+            ids = [int(r["id"]) for r in rows if r.get("id") is not None]
+            if not ids:
+                return 0, counted     # بلا id لا يمكن التقدم — لا نكرر نفس الصفحة
+            last_id = max(ids)
+            self._set_cursor(office_id, key, str(last_id))
+            return len(rows), counted
+
+        return self._drain(phase, local_table, _batch)
+
+    def _pull_no_cursor_capped(self, client: SupabaseClient, local_table: str,
+                               remote_table: str) -> int:
+        try:
+            rows = client.select(remote_table, limit=_NO_CURSOR_CAP)
         except Exception as e:
             logger.warning("Sync: pull_no_cursor %s failed: %s", remote_table, e)
             return 0
+        return self._pull_no_cursor_apply(local_table, remote_table, rows)
 
+    def _pull_no_cursor_apply(self, local_table: str, remote_table: str, rows: List[Dict]) -> int:
         if not rows:
             return 0
 
         SessionLocal = get_session_local()
         with SessionLocal() as s:
-            for row in rows:
-                local_row = _apply_col_mapping_to_local(remote_table, row)
-                self._upsert_local(s, local_table, local_row)
-            s.commit()
+            self._upsert_local_many(
+                s, local_table, [_apply_col_mapping_to_local(remote_table, r) for r in rows])
+            self._commit_pulled(s, local_table)
 
         logger.debug("Sync pull(no-cursor) %s←%s: %d rows", local_table, remote_table, len(rows))
         return len(rows)
 
     def _get_local_cols(self, s, table: str) -> set:
-        if not hasattr(self, '_col_cache'):
-            self._col_cache: Dict[str, set] = {}
         if table not in self._col_cache:
             rows = s.execute(text(f"PRAGMA table_info({table})")).fetchall()
             self._col_cache[table] = {r[1] for r in rows}
         return self._col_cache[table]
 
+    def _has_sid_unique(self, s, table: str) -> bool:
+        """هل يوجد unique index على server_id وحده؟ (شرط ON CONFLICT)."""
+        if table not in self._sid_unique:
+            found = False
+            try:
+                for idx in s.execute(text(f"PRAGMA index_list([{table}])")).fetchall():
+                    if not idx[2]:   # unique
+                        continue
+                    cols = [r[2] for r in s.execute(text(f"PRAGMA index_info([{idx[1]}])")).fetchall()]
+                    if cols == ["server_id"]:
+                        found = True
+                        break
+            except Exception as e:
+                logger.debug("Sync: index_list(%s) failed: %s", table, e)
+            self._sid_unique[table] = found
+        return self._sid_unique[table]
+
+    def _upsert_stmt(self, local_table: str, cols: Tuple[str, ...]):
+        """نص upsert مُجمَّع لكل (جدول، أعمدة) — يُبنى مرة واحدة."""
+        key = (local_table, cols)
+        stmt = self._upsert_sql.get(key)
+        if stmt is None:
+            updates = [c for c in cols if c != "server_id"]
+            if updates:
+                action = (
+                    f"DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updates)}"
+                    f" WHERE [{local_table}].updated_at IS NULL"
+                    f" OR [{local_table}].updated_at < :_srv_updated"
+                )
+            else:
+                action = "DO NOTHING"
+            # OR IGNORE: بقية القيود (code مكرر، NOT NULL) تُتجاهل كما في INSERT OR IGNORE السابق
+            stmt = text(
+                f"INSERT OR IGNORE INTO [{local_table}] ({', '.join(cols)})"
+                f" VALUES ({', '.join(f':{c}' for c in cols)})"
+                f" ON CONFLICT(server_id) WHERE server_id IS NOT NULL {action}"
+            )
+            self._upsert_sql[key] = stmt
+        return stmt
+
+    def _upsert_local_many(self, s, local_table: str, rows: List[Dict[str, Any]]) -> None:
+        """
+        [N] upsert دفعة كاملة — executemany واحد لكل مجموعة أعمدة.
+        نفس قواعد _upsert_local: الصف المحلي الأحدث (أو المساوي) لا يُستبدل،
+        الصفوف بدون server_id تمر عبر _upsert_reference.
+        """
+        if not rows:
+            return
+        with self._journal_muted(s, local_table):
+            self._apply_pulled(s, local_table, rows)
+
+    def _commit_pulled(self, s, local_table: str) -> None:
+        """
+        commit لدفعة مسحوبة ثم إبطال نسخة الجدول في ReferenceCache —
+        الكتابة هنا SQL خام لا تمر بـ BaseCRUD ولا DataBus.
+        """
+        s.commit()
+        try:
+            from services.reference_cache import ReferenceCache
+            ReferenceCache.get_instance().invalidate_entity(local_table)
+        except Exception as e:
+            logger.debug("Sync: reference cache invalidation for %s failed: %s", local_table, e)
+
+    def _apply_pulled(self, s, local_table: str, rows: List[Dict[str, Any]]) -> None:
+        if not self._has_sid_unique(s, local_table):
+            for row in rows:
+                self._upsert_local(s, local_table, row)
+            return
+
+        local_cols = self._get_local_cols(s, local_table)
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            if not row.get("server_id"):
+                self._upsert_reference(s, local_table, row)
+                continue
+            data = {k: v for k, v in row.items() if k != "id" and k in local_cols}
+            data["_srv_updated"] = str(row.get("updated_at", _EPOCH))
+            cols = tuple(k for k in data if k != "_srv_updated")
+            groups.setdefault(cols, []).append(data)
+
+        for cols, params in groups.items():
+            s.execute(self._upsert_stmt(local_table, cols), params)
+
     def _upsert_local(self, s, local_table: str, row: Dict[str, Any]):
         server_id      = row.get("server_id")
         server_updated = row.get("updated_at", _EPOCH)
@@ -984,7 +1621,73 @@ class SyncService:
 
     # ── Cursor management ─────────────────────────────────
 
+    # [Q] خلال _do_sync: القراءة من الذاكرة والكتابة مؤجّلة حتى checkpoint.
+    # خارج الدورة (self._cursors is None): قراءة/كتابة مباشرة كالسابق.
+    # المستدعي يضمن أن set_cursor يأتي بعد commit البيانات المحلية (pull)
+    # أو نجاح الرفع (push) — لذلك أي cursor في الذاكرة آمن للكتابة في أي
+    # لحظة، وفقدان غير المكتوب (انهيار) يعني فقط إعادة دفعة idempotent.
+
+    def _load_cursors(self, office_id: int) -> None:
+        """يقرأ كل cursors المكتب بطلب واحد."""
+        cursors: Dict[str, str] = {}
+        try:
+            SessionLocal = get_session_local()
+            with SessionLocal() as s:
+                rows = s.execute(
+                    text("SELECT table_name, last_cursor FROM local_sync_cursors"
+                         " WHERE direction = :d"),
+                    {"d": str(office_id)},
+                ).fetchall()
+            cursors = {r[0]: r[1] for r in rows}
+        except Exception as e:
+            logger.warning("Sync: load cursors failed: %s", e)
+        with self._cursor_lock:
+            self._cursors        = cursors
+            self._cursor_dirty   = {}
+            self._cursor_office  = office_id
+            self._cursor_flushed = time.monotonic()
+
+    def _flush_cursors(self) -> None:
+        """يكتب الـ cursors المعدّلة في transaction واحدة."""
+        with self._cursor_lock:
+            dirty, self._cursor_dirty = self._cursor_dirty, {}
+            office_id = self._cursor_office
+            self._cursor_flushed = time.monotonic()
+        if not dirty:
+            return
+        try:
+            SessionLocal = get_session_local()
+            with SessionLocal() as s:
+                s.execute(
+                    text("""
+                        INSERT INTO local_sync_cursors (table_name, direction, last_cursor)
+                        VALUES (:t, :d, :c)
+                        ON CONFLICT (table_name, direction)
+                        DO UPDATE SET last_cursor = excluded.last_cursor
+                    """),
+                    [{"t": k, "d": str(office_id), "c": v} for k, v in dirty.items()],
+                )
+                s.commit()
+        except Exception as e:
+            logger.warning("Sync: flush cursors failed: %s", e)
+            with self._cursor_lock:
+                # أعِدها للمحاولة التالية — القيم الأحدث (إن وُجدت) تبقى
+                for k, v in dirty.items():
+                    self._cursor_dirty.setdefault(k, v)
+
+    def _release_cursors(self) -> None:
+        """نهاية الدورة: كتابة المتبقي والعودة للوضع المباشر."""
+        if self._cursors is None:
+            return
+        self._flush_cursors()
+        with self._cursor_lock:
+            self._cursors = None
+            self._cursor_office = None
+
     def _get_cursor(self, office_id: int, direction_key: str) -> str:
+        with self._cursor_lock:
+            if self._cursors is not None and office_id == self._cursor_office:
+                return self._cursors.get(direction_key, _EPOCH)
         try:
             SessionLocal = get_session_local()
             with SessionLocal() as s:
@@ -998,6 +1701,17 @@ class SyncService:
             return _EPOCH
 
     def _set_cursor(self, office_id: int, direction_key: str, cursor: str):
+        with self._cursor_lock:
+            if self._cursors is not None and office_id == self._cursor_office:
+                self._cursors[direction_key]      = cursor
+                self._cursor_dirty[direction_key] = cursor
+                due = time.monotonic() - self._cursor_flushed >= self._CURSOR_CHECKPOINT
+            else:
+                due = None
+        if due is not None:
+            if due:
+                self._flush_cursors()
+            return
         try:
             SessionLocal = get_session_local()
             with SessionLocal() as s:
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# يسمح بـ `pytest` من أي مجلد — الوحدات تُستورد من جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
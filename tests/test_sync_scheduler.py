@@ -0,0 +1,238 @@
+"""
+SyncScheduler + SyncService._do_sync ضد PostgREST وهمي عبر HTTP حقيقي:
+ThreadingHTTPServer على 127.0.0.1 و SupabaseClient الحقيقي موجّه إليه —
+فيمرّ كل طلب عبر keep-alive pool وتفاوض gzip وإعادة المحاولة (429/503)
+وترويسات bulk upsert كما في الإنتاج.
+
+  - رفع الآباء قبل الأبناء على حواف TABLE_PARENTS
+  - صفوف رُفضت بسبب FK (الأب لم يصل بعد) تبقى معلّقة وتُرفع في الدورة التالية
+  - upsert كبير: جسم مضغوط gzip + 429 عابر يُعاد تلقائياً
+"""
+import gzip
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+# ─────────────────────────────────────────────────────────
+# Fake PostgREST
+# ─────────────────────────────────────────────────────────
+
+class FakePostgREST:
+    """
+    حالة السيرفر الوهمي — يشاركها كل handler thread.
+    down:  جداول تُرجع 503 دائماً (سيرفر متعطّل لها)
+    flaky: جداول تُرجع 429 مرة واحدة ثم تقبل
+    companies ترفض (FK) ما لم يصل أي client للسيرفر.
+    """
+
+    def __init__(self, down=(), flaky=()):
+        self.rows = {}
+        self.upserts = []          # ترتيب upsert الناجح (اسم الجدول)
+        self.requests = []         # (method, table, headers) لكل طلب
+        self.connections = set()   # منافذ العميل — اتصال TCP لكل منفذ
+        self.gzip_bodies = 0
+        self.down = set(down)
+        self.flaky = set(flaky)
+        self.lock = threading.Lock()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"    # keep-alive
+    state: FakePostgREST = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _table(self):
+        path = urllib.parse.urlsplit(self.path).path
+        return path[len("/rest/v1/"):].strip("/")
+
+    def _query(self):
+        return dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+
+    def _reply(self, status, payload=None):
+        raw = json.dumps(payload).encode() if payload is not None else b""
+        gz = bool(raw) and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gz:
+            raw = gzip.compress(raw)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if gz:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _record(self):
+        s = self.state
+        with s.lock:
+            s.connections.add(self.client_address[1])
+            s.requests.append((self.command, self._table(), dict(self.headers)))
+
+    def do_GET(self):
+        self._record()
+        self._reply(200, [])
+
+    def do_DELETE(self):
+        self._record()
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        self._record()
+        s = self.state
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+            with s.lock:
+                s.gzip_bodies += 1
+        rows = json.loads(raw)
+        table = self._table()
+        key = self._query().get("on_conflict", "server_id")
+        with s.lock:
+            if table in s.down:
+                return self._reply(503, {"message": "Service Unavailable"})
+            if table in s.flaky:
+                s.flaky.discard(table)
+                return self._reply(429, {"message": "Too Many Requests"})
+            if table == "companies" and not s.rows.get("clients"):
+                return self._reply(409, {
+                    "code": "23503",
+                    "message": 'insert or update on table "companies" '
+                               'violates foreign key constraint',
+                })
+            s.upserts.append(table)
+            store = s.rows.setdefault(table, {})
+            for r in rows:
+                store[r.get(key)] = r
+        self._reply(201, rows)
+
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    # backoff الحقيقي (1s, 2s ...) يبطئ الاختبار فقط — المنطق نفسه يُختبر
+    import services.supabase_client as sc
+    monkeypatch.setattr(sc, "_BACKOFF_BASE", 0.0)
+
+    state = FakePostgREST()
+    handler = type("Handler", (_Handler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    client = sc.SupabaseClient(f"http://127.0.0.1:{server.server_port}", "test-anon-key")
+    import services.sync_service as sync_mod
+    monkeypatch.setattr(sync_mod, "get_supabase_client", lambda: client)
+    yield state
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sync_service(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("APPDATA", str(tmp_path))
+    import database.models.base as base
+    monkeypatch.setattr(base, "_engine", None)
+    monkeypatch.setattr(base, "_SessionLocal", None)
+
+    from database.bootstrap import run_bootstrap
+    run_bootstrap()
+
+    from sqlalchemy import text
+    with base.get_engine().begin() as c:
+        c.execute(text("INSERT INTO clients (id, code, name_ar, name_en) "
+                       "VALUES (1, 'C1', 'عميل', 'Client')"))
+        c.execute(text("INSERT INTO companies (id, name_ar, name_en, owner_client_id) "
+                       "VALUES (1, 'شركة', 'Company', 1)"))
+
+    from services.sync_service import SyncService
+    svc = SyncService()
+    svc.configure(office_id=1)
+    yield svc
+    base.get_engine().dispose()
+
+
+def _errors_for(result, table):
+    return [e for e in result.errors if f" {table}:" in e]
+
+
+def _posts(server, table):
+    return [h for m, t, h in server.requests if m == "POST" and t == table]
+
+
+# ─────────────────────────────────────────────────────────
+# Tests
+# ─────────────────────────────────────────────────────────
+
+def test_parents_are_pushed_before_children(sync_service, postgrest):
+    from services.sync_scheduler import TABLE_PARENTS
+
+    result = sync_service._do_sync()
+
+    assert not result.is_offline
+    assert not _errors_for(result, "clients") and not _errors_for(result, "companies")
+    first = {}
+    for i, table in enumerate(postgrest.upserts):
+        first.setdefault(table, i)
+    assert first["clients"] < first["companies"]
+    for child, parents in TABLE_PARENTS.items():
+        for parent in parents:
+            if child in first and parent in first:
+                assert first[parent] < first[child], (parent, child)
+
+    # ترويسات bulk upsert + تفاوض gzip + إعادة استخدام الاتصالات
+    for headers in _posts(postgrest, "clients"):
+        assert "resolution=merge-duplicates" in headers["Prefer"]
+        assert headers["Authorization"] == "Bearer test-anon-key"
+    # ping() يطرق /rest/v1/ مباشرة — باقي الطلبات تمر عبر _request
+    assert all("gzip" in h.get("Accept-Encoding", "")
+               for _, t, h in postgrest.requests if t)
+    assert len(postgrest.connections) < len(postgrest.requests)
+    assert result.http["reused_ratio"] > 0
+
+
+def test_fk_rejected_rows_are_retried_next_cycle(sync_service, postgrest):
+    postgrest.down.add("clients")
+
+    first = sync_service._do_sync()
+    assert _errors_for(first, "clients")
+    assert any("foreign key" in e for e in _errors_for(first, "companies"))
+    assert "companies" not in postgrest.rows
+    # 503 ضمن _RETRY_STATUSES — كل upsert يُعاد (retries=2) قبل الاستسلام
+    attempts = len(_posts(postgrest, "clients"))
+    assert attempts >= 3 and attempts % 3 == 0
+
+    postgrest.down.clear()
+    second = sync_service._do_sync()
+    assert not _errors_for(second, "clients") and not _errors_for(second, "companies")
+    assert postgrest.upserts.index("clients") < postgrest.upserts.index("companies")
+    assert len(postgrest.rows["companies"]) == 1
+
+
+def test_large_upsert_is_gzipped_and_survives_429(sync_service, postgrest):
+    import database.models.base as base
+    from sqlalchemy import text
+
+    with base.get_engine().begin() as c:
+        c.execute(
+            text("INSERT INTO clients (id, code, name_ar, name_en) "
+                 "VALUES (:id, :code, :ar, :en)"),
+            [{"id": i, "code": f"C{i}", "ar": f"عميل {i}", "en": f"Client {i}"}
+             for i in range(2, 202)],
+        )
+    postgrest.flaky.add("clients")
+
+    result = sync_service._do_sync()
+
+    assert not _errors_for(result, "clients")
+    assert postgrest.gzip_bodies >= 1
+    assert len(postgrest.rows["clients"]) == 201
+    assert "clients" not in postgrest.flaky          # 429 أُرسل فعلاً ثم أُعيد الطلب
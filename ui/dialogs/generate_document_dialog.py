@@ -11,7 +11,9 @@ GenerateDocumentDialog — v4  (Card-Based Design)
 from __future__ import annotations
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
 import os
+import threading
 
 from PySide6.QtCore import Qt, QThread, Signal, QObject, QUrl, QPropertyAnimation, QEasingCurve
 from PySide6.QtGui import QDesktopServices, QFont, QColor, QPalette
@@ -20,7 +22,7 @@ from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QComboBox, QMessageBox, QProgressBar, QLineEdit, QFileDialog,
     QFrame, QSizePolicy, QWidget, QScrollArea, QListWidget,
-    QListWidgetItem,
+    QListWidgetItem, QCheckBox,
 )
 
 import logging
@@ -104,32 +106,135 @@ class _JobSpec:
     options: Dict
 
 
+# مستندات تُولَّد بالتوازي — بحجم PdfRenderPool (صفحات الطباعة المتزامنة)
+_PARALLEL_JOBS = 3
+
+# مراحل كل مستند (services.facade.STAGES) — خطوات شريط التقدم لكل مهمة
+_STAGES = ("context", "html", "pdf", "persist")
+
+
 class _Worker(QObject):
-    done   = Signal(dict)
-    failed = Signal(str)
+    done     = Signal(dict)
+    failed   = Signal(str)
+    job_done = Signal(int, int)     # (منتهية، الإجمالي) — بعد كل مستند
+    # (رقم المهمة، المرحلة، ثوانٍ) — بعد كل مرحلة من _STAGES أو "cache"
+    stage_done = Signal(int, str, float)
 
-    def __init__(self, trx_id, trx_no, jobs, shared_doc_no=None):
+    def __init__(self, trx_id, trx_no, jobs, shared_doc_no=None, force_regenerate=False):
         super().__init__()
         self.trx_id = trx_id; self.trx_no = trx_no
         self.jobs = jobs; self.shared_doc_no = shared_doc_no
+        self.force_regenerate = force_regenerate
+        self.cancel_event = threading.Event()   # يُضبط من thread الواجهة
 
     def run(self):
         try:
-            from services import render_document, check_pdf_runtime
+            from services import (
+                render_document, check_pdf_runtime, reserve_group_seqs, RenderCancelled,
+            )
             report = check_pdf_runtime()
             force_html_only = not (report.weasyprint_stack or report.qtwebengine)
+            # حجز seq لكل المستندات دفعة واحدة (BEGIN IMMEDIATE واحدة) —
+            # مع shared_doc_no المجموعة أُنشئت مسبقاً (allocate_group_doc_no)
+            # ولا تُستهلك أي seq؛ الحجز هنا يترك فجوات في الترقيم
+            seqs = [None] * len(self.jobs)
+            if not self.shared_doc_no:
+                try:
+                    seqs = reserve_group_seqs(len(self.jobs))
+                except Exception:
+                    pass
+            # لقطة المعاملة مرة واحدة لكل الأنواع واللغات (بدل استعلامات كل builder)
+            from documents.builders.context_loader import TransactionContextLoader
+            snaps = TransactionContextLoader.load([self.trx_id])
+            def _one(i, j, seq):
+                with TransactionContextLoader.scope(snaps):
+                    return render_document(
+                        transaction_id=self.trx_id, transaction_no=self.trx_no,
+                        doc_code=j.doc_code, lang=j.lang,
+                        force_html_only=force_html_only,
+                        explicit_doc_no=self.shared_doc_no,
+                        extra_options=j.options,
+                        reserved_seq=seq,
+                        force_regenerate=self.force_regenerate,
+                        progress=lambda stage, secs: self.stage_done.emit(i, stage, secs),
+                        cancel=self.cancel_event,
+                    )
+
+            # كل المهام تُرسل معاً — PdfRenderPool يطبع عدة مستندات في نفس الوقت
+            total   = len(self.jobs)
+            results = [None] * total
+            cancelled = False
+            ex = ThreadPoolExecutor(max_workers=max(1, min(total, _PARALLEL_JOBS)),
+                                    thread_name_prefix="logiport-doc")
+            try:
+                futures = {ex.submit(_one, i, j, seq): i
+                           for i, (j, seq) in enumerate(zip(self.jobs, seqs))}
+                for n, fut in enumerate(as_completed(futures), 1):
+                    try:
+                        results[futures[fut]] = fut.result()
+                    except (RenderCancelled, CancelledError):
+                        pass
+                    self.job_done.emit(n, total)
+                    if self.cancel_event.is_set() and not cancelled:
+                        # الجارية تتوقف عند المرحلة التالية، والباقية لا تبدأ
+                        cancelled = True
+                        for f in futures:
+                            f.cancel()
+                        logger.info("Document generation cancelled after %d/%d", n, total)
+            finally:
+                # عند أول فشل: لا تبدأ المهام المتبقية (نفس سلوك الحلقة السابقة)
+                ex.shutdown(wait=True, cancel_futures=True)
+
             files = []
-            for j in self.jobs:
-                res = render_document(
-                    transaction_id=self.trx_id, transaction_no=self.trx_no,
-                    doc_code=j.doc_code, lang=j.lang,
-                    force_html_only=force_html_only,
-                    explicit_doc_no=self.shared_doc_no,
-                    extra_options=j.options,
-                )
+            for j, res in zip(self.jobs, results):
+                if res is None:
+                    continue
+                logger.info("Generated %s [%s] in %s", j.doc_type, j.lang,
+                            ", ".join(f"{k}={v:.2f}s" for k, v in res.timings.items()))
                 files.append({"doc_type": j.doc_type, "language": j.lang,
-                               "path": str(res.out_pdf or res.out_html)})
-            self.done.emit({"files": files, "html_only": force_html_only})
+                              "path": str(res.out_pdf or res.out_html),
+                              "timings": res.timings, "cached": res.cached})
+            self.done.emit({"files": files, "html_only": force_html_only,
+                            "cancelled": cancelled})
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class _BatchWorker(QObject):
+    """نفس إشارات _Worker — لعدة معاملات عبر render_documents_batch."""
+    done     = Signal(dict)
+    failed   = Signal(str)
+    job_done = Signal(int, int)
+
+    def __init__(self, trx_ids, doc_codes, langs, extra_options, group_prefix,
+                 force_regenerate=False):
+        super().__init__()
+        self.trx_ids = trx_ids; self.doc_codes = doc_codes; self.langs = langs
+        self.extra_options = extra_options; self.group_prefix = group_prefix
+        self.force_regenerate = force_regenerate
+        self.cancel_event = threading.Event()   # يُضبط من thread الواجهة
+
+    def run(self):
+        try:
+            from services import render_documents_batch, check_pdf_runtime
+            report = check_pdf_runtime()
+            force_html_only = not (report.weasyprint_stack or report.qtwebengine)
+            res = render_documents_batch(
+                self.trx_ids, self.doc_codes, self.langs,
+                force_html_only=force_html_only,
+                force_regenerate=self.force_regenerate,
+                extra_options=self.extra_options,
+                group_prefix=self.group_prefix,
+                progress=self.job_done.emit,
+                cancel=self.cancel_event,
+            )
+            files = [{"doc_type": "cmr" if r.doc_code.startswith("cmr") else r.doc_code.split(".")[0],
+                      "language": r.lang,
+                      "path": str(r.out_pdf or r.out_html),
+                      "timings": r.timings, "cached": r.cached}
+                     for r in res.results]
+            self.done.emit({"files": files, "html_only": force_html_only,
+                            "failures": res.failed, "cancelled": res.cancelled})
         except Exception as e:
             self.failed.emit(str(e))
 
@@ -166,7 +271,8 @@ class _ResultsDialog(_BaseDialog):
             fname = os.path.basename(f.get("path", ""))
             lang  = f.get("language", "").upper()
             dtype = f.get("doc_type", "?")
-            it = QListWidgetItem(f"📄  {dtype}  [{lang}]   →   {fname}")
+            mark  = "   ♻ " + _("unchanged_reused") if f.get("cached") else ""
+            it = QListWidgetItem(f"📄  {dtype}  [{lang}]   →   {fname}{mark}")
             it.setData(Qt.UserRole, f.get("path", ""))
             it.setToolTip(f.get("path", ""))
             self.listw.addItem(it)
@@ -475,7 +581,8 @@ class GenerateDocumentDialog(_BaseDialog):
     def __init__(self, transaction_id: int, transaction_no: str,
                  parent=None,
                  preselected_doc_types: Optional[List[int]] = None,
-                 preselected_doc_codes: Optional[List[str]] = None):
+                 preselected_doc_codes: Optional[List[str]] = None,
+                 transaction_ids: Optional[List[int]] = None):
         super().__init__(parent)
         self.setWindowTitle(_("generate_documents"))
         self.setMinimumWidth(500)
@@ -488,6 +595,9 @@ class GenerateDocumentDialog(_BaseDialog):
             self.resize(560, 640)
         self.trx_id = transaction_id
         self.trx_no = transaction_no
+        # وضع الدفعة: عدة معاملات (تحديد متعدد في TransactionsTab)
+        self.trx_ids: List[int] = list(transaction_ids or [])
+        self._batch = len(self.trx_ids) > 1
         self._thread: QThread | None = None
         self._preselected       = preselected_doc_types or []
         self._preselected_codes = preselected_doc_codes or []
@@ -527,7 +637,8 @@ class GenerateDocumentDialog(_BaseDialog):
         tf = QFont(); tf.setPointSize(14); tf.setBold(True)
         t.setFont(tf)
         hdr_lay.addWidget(t)
-        sub = QLabel(f"#{self.trx_no}")
+        sub = QLabel(_("n_transactions_selected").format(n=len(self.trx_ids))
+                     if self._batch else f"#{self.trx_no}")
         sub.setObjectName("form-dialog-subtitle")
         hdr_lay.addWidget(sub)
         sep0 = QFrame(); sep0.setFrameShape(QFrame.HLine)
@@ -635,6 +746,11 @@ class GenerateDocumentDialog(_BaseDialog):
         path_row.addWidget(self.btn_browse)
         foot_lay.addLayout(path_row)
 
+        # إعادة التوليد حتى لو لم تتغير المعاملة (تجاوز كاش render_hash)
+        self.chk_force = QCheckBox(_("force_regenerate"))
+        self.chk_force.setToolTip(_("force_regenerate_hint"))
+        foot_lay.addWidget(self.chk_force)
+
         # Progress
         self.progress = QProgressBar()
         self.progress.setRange(0, 0)
@@ -1015,6 +1131,9 @@ class GenerateDocumentDialog(_BaseDialog):
         except ValueError as e:
             QMessageBox.warning(self, _("warning"), str(e)); return
 
+        if self._batch:
+            self._start_batch(jobs); return
+
         try:
             unique_codes = sorted({j.doc_code for j in jobs})
             warnings = self._precheck_transaction_requirements(unique_codes)
@@ -1031,15 +1150,58 @@ class GenerateDocumentDialog(_BaseDialog):
             if reply != QMessageBox.Yes: return
 
         from services.persist_generated_doc import allocate_group_doc_no
+        try:
+            shared_no = allocate_group_doc_no(self.trx_id, prefix=self._group_prefix(jobs))
+        except Exception:
+            shared_no = None
+
+        output_path = self.txt_output_path.text().strip()
+        if output_path:
+            try:
+                from core.settings_manager import SettingsManager
+                SettingsManager.get_instance().set_documents_output_path(output_path)
+            except Exception as e:
+                logger.warning("Could not save output path: %s", e)
+
+        self._thread = QThread(self)
+        self._worker = _Worker(self.trx_id, self.trx_no, jobs, shared_doc_no=shared_no,
+                               force_regenerate=self.chk_force.isChecked())
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run)
+        self._worker.done.connect(self._on_done)
+        self._worker.failed.connect(self._on_failed)
+        self._worker.stage_done.connect(self._on_stage_done)
+        self._worker.done.connect(self._thread.quit)
+        self._worker.failed.connect(self._thread.quit)
+        self._thread.finished.connect(self._on_thread_finished)
+
+        self._stage_jobs = jobs
+        self._stage_steps = [0] * len(jobs)
+        self.btn_generate.setEnabled(False)
+        # زر الإلغاء يوقف التوليد عند المرحلة التالية لكل مستند
+        self.btn_cancel.setEnabled(True)
+        self.progress.setRange(0, len(jobs) * len(_STAGES))
+        self.progress.setValue(0)
+        self.progress.setVisible(True)
+        self.lbl_status.setText(_("documents_are_being_generated_please_wait"))
+        self.lbl_status.setVisible(True)
+        self._thread.start()
+
+    def _group_prefix(self, jobs) -> str:
         types_in_jobs = {j.doc_type for j in jobs}
-        prefix = "INVPL" if len(types_in_jobs) > 1 else (
+        return "INVPL" if len(types_in_jobs) > 1 else (
             "INV" if "invoice" in types_in_jobs else (
             "CMR" if any(t == "cmr" or t.startswith("cmr.copy") for t in types_in_jobs) else (
             "FA"  if "form_a"  in types_in_jobs else "PL")))
-        try:
-            shared_no = allocate_group_doc_no(self.trx_id, prefix=prefix)
-        except Exception:
-            shared_no = None
+
+    def _start_batch(self, jobs):
+        """
+        دفعة لعدة معاملات — بدون precheck لكل معاملة: المعاملات الناقصة
+        تظهر في قائمة الأخطاء بالنهاية بدل إيقاف الدفعة.
+        """
+        codes = list(dict.fromkeys(j.doc_code for j in jobs))
+        langs = [p.lang_code for p in self._lang_pills if p.isChecked()]
+        extra = {j.doc_code: j.options for j in jobs if j.options}
 
         output_path = self.txt_output_path.text().strip()
         if output_path:
@@ -1050,25 +1212,62 @@ class GenerateDocumentDialog(_BaseDialog):
                 logger.warning("Could not save output path: %s", e)
 
         self._thread = QThread(self)
-        self._worker = _Worker(self.trx_id, self.trx_no, jobs, shared_doc_no=shared_no)
+        self._worker = _BatchWorker(self.trx_ids, codes, langs, extra,
+                                    self._group_prefix(jobs),
+                                    force_regenerate=self.chk_force.isChecked())
         self._worker.moveToThread(self._thread)
         self._thread.started.connect(self._worker.run)
         self._worker.done.connect(self._on_done)
         self._worker.failed.connect(self._on_failed)
+        self._worker.job_done.connect(self._on_job_done)
         self._worker.done.connect(self._thread.quit)
         self._worker.failed.connect(self._thread.quit)
         self._thread.finished.connect(self._on_thread_finished)
 
         self.btn_generate.setEnabled(False)
-        self.btn_cancel.setEnabled(False)
+        # في الدفعة زر الإلغاء يبقى فعّالاً — يوقف المستندات التي لم تبدأ
+        self.btn_cancel.setEnabled(True)
+        self.progress.setRange(0, 0)
         self.progress.setVisible(True)
         self.lbl_status.setText(_("documents_are_being_generated_please_wait"))
         self.lbl_status.setVisible(True)
         self._thread.start()
 
+    def _on_job_done(self, done: int, total: int):
+        self.progress.setRange(0, total)
+        self.progress.setValue(done)
+
+    def _on_stage_done(self, index: int, stage: str, secs: float):
+        # "cache" (ملف محفوظ أُعيد) و persist تُنهيان المهمة؛ pdf يغيب في وضع HTML فقط
+        step = _STAGES.index(stage) + 1 if stage in _STAGES[:-1] else len(_STAGES)
+        self._stage_steps[index] = max(self._stage_steps[index], step)
+        self.progress.setValue(sum(self._stage_steps))
+        if self._worker.cancel_event.is_set():
+            return
+        job = self._stage_jobs[index]
+        label = _("unchanged_reused") if stage == "cache" else _(f"doc_stage_{stage}")
+        self.lbl_status.setText(_("doc_stage_status").format(
+            done=sum(1 for s in self._stage_steps if s == len(_STAGES)),
+            total=len(self._stage_jobs), doc=job.doc_type, lang=job.lang.upper(),
+            stage=label, secs=secs))
+
     def _on_done(self, result):
         self.progress.setVisible(False); self.lbl_status.setVisible(False)
         files = result.get("files", [])
+        failures = result.get("failures") or []
+        if failures or result.get("cancelled"):
+            lines = [f"#{tid or '—'}  " + (f"{code} [{(lang or '').upper()}]: " if code else "")
+                     + (err.splitlines() or [""])[0]
+                     for tid, code, lang, err in failures[:15]]
+            if len(failures) > 15:
+                lines.append("…")
+            if not result.get("cancelled"):
+                head = _("batch_finished_with_errors")
+            else:
+                head = _("batch_cancelled") if self._batch else _("generation_cancelled")
+            QMessageBox.warning(self, _("warning"),
+                                head.format(ok=len(files), failed=len(failures))
+                                + ("\n\n" + "\n".join(lines) if lines else ""))
         if not files:
             QMessageBox.information(self, _("done"), _("nothing_generated")); return
 
@@ -1098,7 +1297,10 @@ class GenerateDocumentDialog(_BaseDialog):
 
     def _on_cancel(self):
         if self._thread and self._thread.isRunning():
-            QMessageBox.information(self, _("please_wait"),
-                                    _("documents_are_being_generated_please_wait")); return
+            self._worker.cancel_event.set()
+            self.btn_cancel.setEnabled(False)
+            self.lbl_status.setText(_("cancelling_please_wait") if self._batch
+                                    else _("cancelling_current_document"))
+            return
         block_wheel_in(self)
         self.reject()
\ No newline at end of file
@@ -9,27 +9,21 @@ from PySide6.QtWidgets import (
 from core.translator import TranslationManager
 from ui.utils.wheel_blocker import block_wheel_in
 
-# -------- Guarded CRUD imports --------------------------------------------
+# -------- Guarded lookup source --------------------------------------------
+# القوائم المرجعية من الذاكرة (ReferenceCache) بدل get_all() عند كل فتح
 try:
-    from database.crud.materials_crud import MaterialsCRUD
+    from services.reference_cache import ReferenceCache
 except Exception:  # pragma: no cover
-    MaterialsCRUD = None  # type: ignore
-try:
-    from database.crud.packaging_types_crud import PackagingTypesCRUD
-except Exception:  # pragma: no cover
-    PackagingTypesCRUD = None  # type: ignore
-try:
-    from database.crud.pricing_types_crud import PricingTypesCRUD
-except Exception:  # pragma: no cover
-    PricingTypesCRUD = None  # type: ignore
-try:
-    from database.crud.currencies_crud import CurrenciesCRUD
-except Exception:  # pragma: no cover
-    CurrenciesCRUD = None  # type: ignore
-try:
-    from database.crud.countries_crud import CountriesCRUD
-except Exception:  # pragma: no cover
-    CountriesCRUD = None  # type: ignore
+    ReferenceCache = None  # type: ignore
+
+
+def _ref_records(table: str) -> list:
+    if ReferenceCache is None:
+        return []
+    try:
+        return ReferenceCache.get_instance().records(table, newest_first=True)
+    except Exception:
+        return []
 
 
 class ManualItemDialog(BaseDialog):
@@ -118,45 +112,25 @@ class ManualItemDialog(BaseDialog):
 
     def _fill_materials(self):
         self.cmb_material.clear(); self.cmb_material.addItem(self._("select"), None)
-        items = []
-        try:
-            if MaterialsCRUD:
-                items = (MaterialsCRUD()).get_all() or []
-        except Exception:
-            items = []
+        items = _ref_records("materials")
         for it in items:
             self.cmb_material.addItem(self._name_by_lang(it), self._id(it))
 
     def _fill_packaging(self):
         self.cmb_packaging.clear(); self.cmb_packaging.addItem(self._("not_set"), None)
-        items = []
-        try:
-            if PackagingTypesCRUD:
-                items = (PackagingTypesCRUD()).get_all() or []
-        except Exception:
-            items = []
+        items = _ref_records("packaging_types")
         for it in items:
             self.cmb_packaging.addItem(self._name_by_lang(it), self._id(it))
 
     def _fill_pricing_types(self):
         self.cmb_pricing_type.clear(); self.cmb_pricing_type.addItem(self._("select"), None)
-        items = []
-        try:
-            if PricingTypesCRUD:
-                items = (PricingTypesCRUD()).get_all() or []
-        except Exception:
-            items = []
+        items = _ref_records("pricing_types")
         for it in items:
             self.cmb_pricing_type.addItem(self._name_by_lang(it), self._id(it))
 
     def _fill_currencies(self):
         self.cmb_currency.clear(); self.cmb_currency.addItem(self._("select"), None)
-        items = []
-        try:
-            if CurrenciesCRUD:
-                items = (CurrenciesCRUD()).get_all() or []
-        except Exception:
-            items = []
+        items = _ref_records("currencies")
         for it in items:
             code = self._attr(it, 'code'); symbol = self._attr(it, 'symbol')
             label = (code or "") + (f" ({symbol})" if symbol else "")
@@ -164,12 +138,7 @@ class ManualItemDialog(BaseDialog):
 
     def _fill_countries(self):
         self.cmb_origin.clear(); self.cmb_origin.addItem(self._("select"), None)
-        items = []
-        try:
-            if CountriesCRUD:
-                items = (CountriesCRUD()).get_all() or []
-        except Exception:
-            items = []
+        items = _ref_records("countries")
         for it in items:
             self.cmb_origin.addItem(self._name_by_lang(it), self._id(it))
 
@@ -194,6 +194,8 @@ class SyncSettingsDialog(BaseDialog):
                     interval_seconds=interval * 60,
                 )
                 svc.start_auto_sync()
+            else:
+                svc.discard_journal()
         except Exception:
             pass
 
@@ -378,6 +378,7 @@ class MainWindow(BaseWindow):
 
             if not (url and key and office_raw and enabled):
                 logger.info("Sync: auto-start skipped — not fully configured")
+                get_sync_service().discard_journal()
                 return
 
             try:
@@ -28,6 +28,7 @@ from core.translator import TranslationManager
 from core.settings_manager import SettingsManager
 from database.db_utils import format_local_dt
 from database.models import get_session_local, AuditLog, User
+from database.crud.audit_log_crud import AuditLogCRUD
 from sqlalchemy import desc, func, or_, String
 from sqlalchemy.orm import joinedload
 from datetime import datetime
@@ -209,6 +210,10 @@ class AuditTrailTab(QWidget):
         self._page_size = 50
         self._total     = 0
         self._all_users: list = []
+        # keyset paging: (timestamp, id) لأول/آخر صف + مؤشر next/prev المعلَّق
+        self._crud      = AuditLogCRUD()
+        self._page_keys = (None, None)
+        self._nav       = None
         self._build_ui()
         self._load_user_list()
         self._reload()
@@ -469,12 +474,16 @@ class AuditTrailTab(QWidget):
 
     def _prev_page(self):
         if self._page > 1:
+            if self._page_keys[0] is not None:
+                self._nav = (self._page - 1, "before", self._page_keys[0])
             self._page -= 1
             self._reload()
 
     def _next_page(self):
         max_p = max(1, (self._total + self._page_size - 1) // self._page_size)
         if self._page < max_p:
+            if self._page_keys[1] is not None:
+                self._nav = (self._page + 1, "after", self._page_keys[1])
             self._page += 1
             self._reload()
 
@@ -498,34 +507,28 @@ class AuditTrailTab(QWidget):
         action  = self._action_combo.currentData()
         table   = self._table_combo.currentData()
         search  = self._search.text().strip()
+        # [4] البحث server-side — يشمل كل الصفحات
+        filters = dict(date_from=d_from, date_to=d_to, user_id=user_id,
+                       action=action, table_name=table, search=search)
+        nav, self._nav = self._nav, None
 
         try:
-            with get_session_local()() as s:
-                q = (s.query(AuditLog)
-                       .options(joinedload(AuditLog.user))
-                       .filter(AuditLog.timestamp >= d_from)
-                       .filter(AuditLog.timestamp <= d_to))
-                if user_id:
-                    q = q.filter(AuditLog.user_id == user_id)
-                if action:
-                    q = q.filter(AuditLog.action.ilike(f"%{action}%"))
-                if table:
-                    q = q.filter(AuditLog.table_name == table)
-                # [4] البحث server-side — يشمل كل الصفحات
-                if search:
-                    q = q.filter(
-                        or_(
-                            AuditLog.details.ilike(f"%{search}%"),
-                            AuditLog.record_id.cast(String).ilike(f"%{search}%"),
-                        )
-                    )
-                self._total = q.count()
-                rows = (q.order_by(desc(AuditLog.timestamp), desc(AuditLog.id))
-                          .offset((self._page - 1) * self._page_size)
-                          .limit(self._page_size)
-                          .all())
-                # احتفظ بالـ objects قبل إغلاق الجلسة
-                self._cached_rows = list(rows)
+            self._total = self._crud.count_logs(**filters)
+            rows = []
+            if nav and nav[0] == self._page and self._page > 1:
+                # next/prev → seek على (timestamp, id) بدل OFFSET
+                rows = self._crud.list_logs(limit=self._page_size, **{nav[1]: nav[2]}, **filters)
+            if not rows:
+                rows = self._crud.list_logs(
+                    limit=self._page_size,
+                    offset=(self._page - 1) * self._page_size,
+                    **filters,
+                )
+            self._cached_rows = list(rows)
+            self._page_keys = (
+                (self._crud.keyset_key(rows[0]), self._crud.keyset_key(rows[-1]))
+                if rows else (None, None)
+            )
 
         except Exception as e:
             self._render([])
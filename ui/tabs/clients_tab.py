@@ -11,6 +11,7 @@ from core.translator import TranslationManager
 from core.settings_manager import SettingsManager
 
 from database.models import get_session_local, User, Country
+from services.reference_cache import ReferenceCache
 
 from core.permissions import has_perm, is_admin
 from core.admin_columns import apply_admin_columns_to_table
@@ -30,6 +31,7 @@ class ClientsTab(BaseTab):
         "print":   ["view_clients"],
         "refresh": ["view_clients"],
     }
+    use_model_view = True
 
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
@@ -97,18 +99,12 @@ class ClientsTab(BaseTab):
         from PySide6.QtWidgets import QApplication
         from PySide6.QtCore import Qt
         QApplication.setOverrideCursor(Qt.WaitCursor)
-        self._skip_base_search = True   # البحث يتم server-side أو بـ _apply_search_filter
-        self._skip_base_sort   = True   # الترتيب يتم server-side أو يُدار بـ CRUD
         admin = is_admin(self.current_user)
 
-        # 1) اجلب السجلات
-        items = self.clients_crud.get_all() or []
+        # 1) اجلب الصفحة المرئية فقط — البحث والترتيب server-side (ClientsCRUD.query_page)
+        items = self.fetch_page(self.clients_crud)
 
-        # 2) طبّق الفلترة والفرز داخل الذاكرة
-        items = self._apply_search_filter(items)
-        items = self._apply_order(items)
-
-        # 3) جهّز مراجع المستخدمين والبلدان
+        # 2) جهّز مراجع المستخدمين والبلدان
         created_ids, updated_ids, country_ids = set(), set(), set()
         for c in items:
             cb_id = getattr(c, "created_by_id", None)
@@ -122,25 +118,19 @@ class ClientsTab(BaseTab):
 
         id_to_user, id_to_country = {}, {}
 
-        SessionLocal = get_session_local()
-        with SessionLocal() as s:
-            if admin and (created_ids or updated_ids):
-                q = s.query(User.id, User.full_name, User.username).filter(
-                    User.id.in_(created_ids | updated_ids)
-                )
-                for uid, full_name, username in q:
-                    id_to_user[uid] = full_name or username or str(uid)
-
-            if country_ids:
-                cq = s.query(Country.id, Country.name_ar, Country.name_en, Country.name_tr).filter(
-                    Country.id.in_(country_ids)
-                )
-                for cid, nar, nen, ntr in cq:
-                    id_to_country[cid] = {"ar": nar, "en": nen, "tr": ntr}
+        # users / countries من الذاكرة (ReferenceCache) بدل SELECT لكل reload
+        ref = ReferenceCache.get_instance()
+        if admin:
+            for uid in created_ids | updated_ids:
+                id_to_user[uid] = ref.name("users", uid) or str(uid)
+        for cid in country_ids:
+            rec = ref.get("countries", cid)
+            if rec:
+                id_to_country[cid] = {"ar": rec.get("name_ar"), "en": rec.get("name_en"), "tr": rec.get("name_tr")}
 
         lang = TranslationManager.get_instance().get_current_language()
 
-        # 4) ابنِ بيانات الجدول
+        # 3) ابنِ بيانات الجدول
         self.data = []
         for c in items:
             # country label by lang
@@ -211,7 +201,7 @@ class ClientsTab(BaseTab):
 
             self.data.append(row)
 
-        # 5) اعرض النتائج
+        # 4) اعرض النتائج
         QApplication.restoreOverrideCursor()
         self.display_data()
 
@@ -219,8 +209,9 @@ class ClientsTab(BaseTab):
         self._display_with_actions("edit_client", "delete_client")
 
     def add_new_item(self):
-        countries = self.countries_crud.get_all() or []
-        currencies = self.curr_crud.get_all() or []
+        ref = ReferenceCache.get_instance()
+        countries = ref.records("countries", newest_first=True)
+        currencies = ref.records("currencies", newest_first=True)
         dlg = AddClientDialog(self, None, countries=countries, currencies=currencies)
         if dlg.exec():
             data = dlg.get_data()
@@ -256,8 +247,9 @@ class ClientsTab(BaseTab):
         self._open_edit_dialog(client)
 
     def _open_edit_dialog(self, client):
-        countries = self.countries_crud.get_all() or []
-        currencies = self.curr_crud.get_all() or []
+        ref = ReferenceCache.get_instance()
+        countries = ref.records("countries", newest_first=True)
+        currencies = ref.records("currencies", newest_first=True)
         dlg = AddClientDialog(self, client, countries=countries, currencies=currencies)
         if dlg.exec():
             data = dlg.get_data()
@@ -337,83 +329,6 @@ class ClientsTab(BaseTab):
             return id_to_name.get(fallback_id, str(fallback_id))
         return ""
 
-    def _read_search_text(self) -> str:
-        for attr in ("get_search_text", "get_search_query"):
-            if hasattr(self, attr) and callable(getattr(self, attr)):
-                try:
-                    return str(getattr(self, attr)() or "").strip()
-                except Exception:
-                    pass
-        for name in ("search_bar", "search_input", "txt_search", "search_line_edit"):
-            w = getattr(self, name, None)
-            if w is not None and hasattr(w, "text"):
-                try:
-                    return str(w.text() or "").strip()
-                except Exception:
-                    pass
-        return ""
-
-    def _read_order_key(self) -> str:
-        # default ordering
-        key = "created_at_desc"
-        for name in ("order_combobox", "cmb_order", "order_by", "cmb_sort"):
-            w = getattr(self, name, None)
-            if w is None:
-                continue
-            for fn in ("currentData", "currentText"):
-                if hasattr(w, fn):
-                    try:
-                        v = getattr(w, fn)()
-                        if v:
-                            txt = str(v).strip().lower()
-                            if "name" in txt:
-                                return "name_asc"
-                            if "creation" in txt or "created" in txt or "date" in txt:
-                                return "created_at_desc"
-                            return txt
-                    except Exception:
-                        pass
-        return key
-
-    def _apply_search_filter(self, items):
-        q = self._read_search_text().casefold()
-        if not q:
-            return list(items)
-
-        def hit(c):
-            try:
-                fields = [
-                    getattr(c, "name_ar", ""), getattr(c, "name_en", ""), getattr(c, "name_tr", ""),
-                    getattr(c, "city", ""), getattr(c, "phone", ""), getattr(c, "email", ""), getattr(c, "website", ""),
-                    getattr(c, "tax_id", ""), getattr(c, "address_ar", ""), getattr(c, "address_en", ""),
-                    getattr(c, "address_tr", ""), getattr(c, "address", ""),
-                ]
-                if any(q in str(f or "").casefold() for f in fields):
-                    return True
-                co = getattr(c, "country", None)
-                if co is not None:
-                    for n in (getattr(co, "name_ar", None), getattr(co, "name_en", None), getattr(co, "name_tr", None)):
-                        if q in str(n or "").casefold():
-                            return True
-                return False
-            except Exception:
-                return False
-
-        return [c for c in items if hit(c)]
-
-    def _apply_order(self, items):
-        key = self._read_order_key()
-        if not items:
-            return items
-        try:
-            if key.startswith("name"):
-                return sorted(items, key=lambda c: (
-                    str(getattr(c, "name_en", "") or getattr(c, "name_ar", "") or getattr(c, "name_tr",
-                                                                                          "")).casefold()))
-            # default: الأحدث أولاً — created_at desc ثم id desc
-            return sorted(items, key=lambda c: (getattr(c, "created_at", None) or 0, getattr(c, "id", 0)), reverse=True)
-        except Exception:
-            return items
     def select_record_by_id(self, record_id: int):
         """
         يُحدِّد صف العميل ذي record_id في الجدول.
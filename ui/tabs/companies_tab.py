@@ -67,6 +67,7 @@ class CompaniesTab(BaseTab):
         "print":   ["view_companies"],
         "refresh": ["view_companies"],
     }
+    use_model_view = True
 
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
@@ -142,25 +143,29 @@ class CompaniesTab(BaseTab):
         admin = is_admin(self.current_user)
         lang  = self._lang   # نعرّف lang مبكراً لأن country_map يحتاجه
 
-        items = self.companies_crud.get_all() or []
+        items = self.fetch_page(self.companies_crud)
 
-        # خريطة رموز العملات والدول وأصحاب الشركات
+        # خريطة رموز العملات والدول وأصحاب الشركات — لصفوف الصفحة الحالية فقط
         currency_map = {}
         country_map  = {}   # country_id → name
         owner_map    = {}   # owner_client_id → name
+        currency_ids = {c.default_currency_id for c in items if getattr(c, "default_currency_id", None)}
+        country_ids  = {c.country_id for c in items if getattr(c, "country_id", None)}
+        owner_ids    = {c.owner_client_id for c in items if getattr(c, "owner_client_id", None)}
         SessionLocal = get_session_local()
         try:
             with SessionLocal() as s:
-                for cid, code in s.query(Currency.id, Currency.code).all():
-                    currency_map[cid] = (code or "").strip()
-                if Country is not None:
-                    for row in s.query(Country).all():
+                if currency_ids:
+                    for cid, code in s.query(Currency.id, Currency.code).filter(Currency.id.in_(currency_ids)):
+                        currency_map[cid] = (code or "").strip()
+                if Country is not None and country_ids:
+                    for row in s.query(Country).filter(Country.id.in_(country_ids)):
                         name = (getattr(row, f"name_{lang}", None) or
                                 getattr(row, "name_ar", None) or
                                 getattr(row, "name_en", None) or "")
                         country_map[row.id] = name
-                if Client is not None:
-                    for row in s.query(Client).all():
+                if Client is not None and owner_ids:
+                    for row in s.query(Client).filter(Client.id.in_(owner_ids)):
                         name = (getattr(row, f"name_{lang}", None) or
                                 getattr(row, "name_ar", None) or
                                 getattr(row, "name_en", None) or
@@ -34,6 +34,8 @@ class CountriesTab(BaseTab):
         "print": ["view_countries"],
         "refresh": ["view_countries"],
     }
+    use_model_view = True
+    async_reload   = True
 
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
@@ -104,14 +106,12 @@ class CountriesTab(BaseTab):
             pass
 
     def reload_data(self):
-        from PySide6.QtWidgets import QApplication
-        from PySide6.QtCore import Qt
-        QApplication.setOverrideCursor(Qt.WaitCursor)
         admin = is_admin(self.current_user)  # ✅ بدلاً من getattr(self, "is_admin", False)
+        # 1) اجلب العناصر وابنِ الصفوف في الخلفية — ثم display_data
+        self.fetch_page_async(self.countries_crud, lambda items: self._build_rows(items, admin))
 
-        # 1) اجلب العناصر
-        items = self.countries_crud.get_all() or []
-
+    def _build_rows(self, items, admin: bool) -> list:
+        """يعمل في thread الخلفية (run_async) — لا يلمس أي widget."""
         # 2) حضّر مجموعة IDs لمُنشئ/مُحدِّث السجلات (للأدمِن فقط) لتفادي N+1
         id_set = set()
         if admin:
@@ -133,7 +133,7 @@ class CountriesTab(BaseTab):
                     id_to_name[uid] = (full_name or username or str(uid))
 
         # 4) ابنِ صفوف الجدول
-        self.data = []
+        rows = []
         for c in items:
             row = {
                 "id": getattr(c, "id", None),
@@ -154,11 +154,8 @@ class CountriesTab(BaseTab):
                     "updated_at": str(getattr(c, "updated_at", "") or ""),
                 })
 
-            self.data.append(row)
-
-        # 5) اعرض البيانات
-        QApplication.restoreOverrideCursor()
-        self.display_data()
+            rows.append(row)
+        return rows
 
     # -----------------------------
     # Display (with optional action buttons)
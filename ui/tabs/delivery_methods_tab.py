@@ -33,6 +33,7 @@ class DeliveryMethodsTab(BaseTab):
         "refresh": "view_values",            # مهم لتفعيل زر التحديث
         "print":   "view_values",
     }
+    use_model_view = True
 
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
@@ -106,7 +107,7 @@ class DeliveryMethodsTab(BaseTab):
         QApplication.setOverrideCursor(Qt.WaitCursor)
         admin = is_admin(self.current_user)
 
-        items = self.delivery_methods_crud.get_all() or []
+        items = self.fetch_page(self.delivery_methods_crud)
 
         # خريطة id->name لمرة واحدة (للأدمِن فقط لتفادي N+1)
         id_set = set()
@@ -67,6 +67,7 @@ class EntriesTab(BaseTab):
         "print":   ["view_entries"],
         "refresh": ["view_entries"],
     }
+    use_model_view = True
 
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
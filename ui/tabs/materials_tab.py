@@ -40,6 +40,7 @@ class MaterialsTab(BaseTab):
         "print":   ["view_materials"],
         "refresh": ["view_materials"],
     }
+    use_model_view = True
 
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
@@ -117,7 +118,7 @@ class MaterialsTab(BaseTab):
         QApplication.setOverrideCursor(Qt.WaitCursor)
         admin = is_admin(self.current_user)
 
-        items = self.materials_crud.get_all() or []
+        items = self.fetch_page(self.materials_crud)
 
         # اجمع IDs للمستخدمين/الأنواع/العملات لتفادي N+1
         created_ids, updated_ids, type_ids, currency_ids = set(), set(), set(), set()
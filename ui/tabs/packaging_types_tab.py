@@ -33,6 +33,7 @@ class PackagingTypesTab(BaseTab):
         "refresh": "view_values",           # لتفعيل زر التحديث
         "print":   "view_values",
     }
+    use_model_view = True
 
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
@@ -106,7 +107,7 @@ class PackagingTypesTab(BaseTab):
         QApplication.setOverrideCursor(Qt.WaitCursor)
         admin = is_admin(self.current_user)
 
-        items = self.packaging_types_crud.get_all() or []
+        items = self.fetch_page(self.packaging_types_crud)
 
         # خريطة id->name لمرة واحدة (للأدمِن لتفادي N+1)
         id_set = set()
@@ -36,6 +36,7 @@ class PricingTab(BaseTab):
         "print":   ["view_pricing"],
         "refresh": ["view_pricing"],
     }
+    use_model_view = True
 
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
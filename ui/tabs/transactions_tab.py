@@ -18,6 +18,7 @@ from core.admin_columns import apply_admin_columns_to_table
 
 from database.crud.transactions_crud import TransactionsCRUD
 from database.models import get_session_local, User
+from services.reference_cache import ReferenceCache
 
 try:
     from database.models import Client, Company, Country, Currency
@@ -82,6 +83,9 @@ class TransactionsTab(BaseTab):
         "refresh": ["view_transactions"],
     }
 
+    # الاستعلامات + lookups (users/clients/companies/currencies/offices) في الخلفية
+    async_reload = True
+
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
         u = current_user or SettingsManager.get_instance().get("user")
@@ -322,22 +326,33 @@ class TransactionsTab(BaseTab):
             status           = status or None,
             office_id        = office_id,
         )
-        try:
-            self.total_rows  = self.trx_crud.count_transactions(**filters)
-        except Exception:
-            self.total_rows  = 0
-        self.total_pages = max(1, -(-self.total_rows // self.rows_per_page))  # ceiling div
-        self.current_page = min(self.current_page, self.total_pages)
-
-        try:
-            items = self.trx_crud.list_transactions(
-                limit  = self.rows_per_page,
-                offset = (self.current_page - 1) * self.rows_per_page,
-                **filters,
-            ) or []
-        except TypeError:
-            items = self.trx_crud.list_transactions(limit=self.rows_per_page) or []
+        page, per_page = self.current_page, self.rows_per_page
+        cursor = self._take_keyset_cursor(self.trx_crud)
+        crud   = self.trx_crud
 
+        def _job(token):
+            # thread الخلفية: count + الصفحة + lookups + بناء الصفوف
+            try:
+                total = crud.count_transactions(**filters)
+            except Exception:
+                total = 0
+            total_pages = max(1, -(-total // per_page))  # ceiling div
+            pg = min(page, total_pages)
+            try:
+                # next/prev → keyset (transaction_date, id) بدل OFFSET
+                items = self._keyset_fetch(
+                    crud.list_transactions, cursor if pg == page else None,
+                    pg, per_page, **filters,
+                )
+            except TypeError:
+                items = crud.list_transactions(limit=per_page) or []
+            token.check()
+            return total, pg, items, self._build_rows(items, admin)
+
+        self.run_async(_job, self._apply_reload)
+
+    def _build_rows(self, items, admin: bool) -> list:
+        """lookups + بناء row dicts — يعمل في run_async، لا يلمس أي widget."""
         client_ids, company_ids, currency_ids, office_ids = set(), set(), set(), set()
         created_ids, updated_ids = set(), set()
         for t in items:
@@ -352,19 +367,23 @@ class TransactionsTab(BaseTab):
         id_to_user = {}; id_to_client = {}; id_to_company = {}
         id_to_currency = {}; id_to_office = {}
 
+        # users / currencies من الذاكرة (ReferenceCache) — بلا SELECT لكل صفحة
+        ref = ReferenceCache.get_instance()
+        if admin:
+            for uid in created_ids | updated_ids:
+                id_to_user[uid] = ref.name("users", uid) or str(uid)
+        for cid in currency_ids:
+            cur = ref.get("currencies", cid)
+            if cur:
+                id_to_currency[cid] = {"code": cur.get("code"), "symbol": cur.get("symbol")}
+
         with get_session_local()() as s:
-            if admin and (created_ids | updated_ids):
-                for uid, fn, un in s.query(User.id, User.full_name, User.username).filter(User.id.in_(created_ids | updated_ids)):
-                    id_to_user[uid] = fn or un or str(uid)
             if client_ids and Client:
                 for cid, nar, nen, ntr in s.query(Client.id, Client.name_ar, Client.name_en, Client.name_tr).filter(Client.id.in_(client_ids)):
                     id_to_client[cid] = {"ar": nar, "en": nen, "tr": ntr}
             if company_ids and Company:
                 for kid, nar, nen, ntr in s.query(Company.id, Company.name_ar, Company.name_en, Company.name_tr).filter(Company.id.in_(company_ids)):
                     id_to_company[kid] = {"ar": nar, "en": nen, "tr": ntr}
-            if currency_ids and Currency:
-                for cid, code, sym in s.query(Currency.id, Currency.code, Currency.symbol).filter(Currency.id.in_(currency_ids)):
-                    id_to_currency[cid] = {"code": code, "symbol": sym}
             if office_ids:
                 try:
                     from database.models.office import Office as _Office
@@ -417,8 +436,15 @@ class TransactionsTab(BaseTab):
                     "updated_at":      str(getattr(t, "updated_at", "") or ""),
                 })
             all_rows.append(row)
+        return all_rows
 
-        self.data = all_rows
+    def _apply_reload(self, result):
+        total, page, items, rows = result
+        self.total_rows   = total
+        self.total_pages  = max(1, -(-total // self.rows_per_page))
+        self.current_page = page
+        self._remember_page_keys(self.trx_crud, items)
+        self.data = rows
 
         # ── Update result count ───────────────────────────────────
         if hasattr(self, "_count_lbl"):
@@ -686,11 +712,26 @@ class TransactionsTab(BaseTab):
                 self._copy_transaction(trx_id)
 
     def get_extra_context_actions(self, menu) -> list:
-        """يُضيف 'نسخ المعاملة' لقائمة الكليك اليمين."""
+        """يُضيف 'نسخ المعاملة' و'توليد مستندات للمحدد' لقائمة الكليك اليمين."""
         act_copy_trx = menu.addAction("📋  " + self._("copy_transaction"))
         rows = self.get_selected_rows()
         act_copy_trx.setEnabled(len(rows) == 1)
-        return [(act_copy_trx, lambda r: self._copy_trx_from_rows(r))]
+        act_gen_docs = menu.addAction("📄  " + self._("generate_documents_for_selection"))
+        act_gen_docs.setEnabled(bool(rows))
+        return [(act_copy_trx, lambda r: self._copy_trx_from_rows(r)),
+                (act_gen_docs, lambda r: self._generate_docs_for_rows(r))]
+
+    def _generate_docs_for_rows(self, rows: list):
+        """GenerateDocumentDialog لمعاملة واحدة، أو وضع الدفعة لعدة معاملات."""
+        trx_objs = [self.data[r]["actions"] for r in rows if 0 <= r < len(self.data)]
+        ids = [getattr(t, "id", None) for t in trx_objs]
+        ids = [i for i in ids if i]
+        if not ids:
+            return
+        from ui.dialogs.generate_document_dialog import GenerateDocumentDialog
+        first_no = getattr(trx_objs[0], "transaction_no", None) or str(ids[0])
+        dlg = GenerateDocumentDialog(ids[0], first_no, parent=self, transaction_ids=ids)
+        dlg.exec()
 
     def _copy_trx_from_rows(self, rows: list):
         if not rows or not (0 <= rows[0] < len(self.data)):
@@ -986,7 +1027,7 @@ class TransactionsTab(BaseTab):
                     trx_no = t[0]
             if trx_no and hasattr(self, "search_bar"):
                 self.search_bar.setText(trx_no)
-                self.reload_data()
+                self.reload_data_sync()
                 # بعد التحميل: حاول التحديد مجدداً
                 for ri, row in enumerate(self.data):
                     if row.get("id") == record_id:
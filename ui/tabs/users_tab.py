@@ -35,6 +35,7 @@ class UsersTab(BaseTab):
         "refresh": "view_users_roles",
         "print":   "view_users_roles",
     }
+    use_model_view = True
 
     def __init__(self, parent=None, current_user=None):
         _ = TranslationManager.get_instance().translate
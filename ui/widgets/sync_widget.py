@@ -146,7 +146,33 @@ class SyncWidget(QWidget):
             return   # لا نبدأ sync متوازي
 
         self.set_state(self.STATE_SYNCING)
-        svc.sync_now(callback=self._on_sync_done)
+        svc.sync_now(callback=self._on_sync_done, progress=self._on_sync_progress)
+
+    def _on_full_reconcile(self):
+        """مطابقة كاملة للجداول المرجعية — بدل الفروقات المسجَّلة فقط."""
+        from services.sync_service import get_sync_service
+        svc = get_sync_service()
+        if not svc.is_enabled():
+            self.sync_settings_requested.emit()
+            return
+        if svc.is_running():
+            return
+        self.set_state(self.STATE_SYNCING)
+        svc.sync_now(callback=self._on_sync_done, progress=self._on_sync_progress, full=True)
+
+    def _on_sync_progress(self, progress):
+        # يُستدعى من threads المزامنة بعد كل دفعة — نعرض تقلّص الـ backlog
+        def _update():
+            if self._state != self.STATE_SYNCING:
+                return
+            if progress.remaining is not None:
+                msg = self._("sync_progress_remaining").format(
+                    table=progress.table, done=progress.done, remaining=progress.remaining)
+            else:
+                msg = self._("sync_progress").format(table=progress.table, done=progress.done)
+            self._btn.setToolTip(self._("sync_state_syncing") + "\n" + msg)
+            self._show_toast(msg)
+        QTimer.singleShot(0, _update)
 
     def _on_sync_done(self, result):
         # يُستدعى من thread — نستخدم QTimer.singleShot للـ UI thread
@@ -195,6 +221,7 @@ class SyncWidget(QWidget):
     def _show_menu(self, pos):
         menu = QMenu(self)
         menu.addAction(self._("sync_now"),           self._on_click)
+        menu.addAction(self._("sync_full_reconcile"), self._on_full_reconcile)
         menu.addAction(self._("sync_settings_menu"), self.sync_settings_requested.emit)
         menu.exec(self._btn.mapToGlobal(pos))
 